@@ -29,27 +29,19 @@ _SCHEMA_DIR = Path(__file__).parents[1] / "schemas"
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
 
-from db.crud.read_nodes import read_nodes
+from db.crud.categories import get_category_names
 from db.crud.create_nodes import add_city, add_user, add_photo, add_issue, add_maintenance, add_category, add_node
 from db.crud.create_edges import add_relationship
 from db.crud.read_nodes import search_node
 
 def _load(name):
-    # Read existing categories, default to empty list if unavailable
-    nodes = read_nodes("Category") or []
     schema = json.loads((_SCHEMA_DIR/name).read_text())
     
     # Determine event type based on schema name
     event_type = "issue" if name == "issue.json" else "maintenance"
     
-    # Get category names from nodes filtered by correct event type
-    category_names = []
-    for node in nodes:
-        if node.get("event_type") == event_type:
-            if "name" in node:
-                category_names.append(node["name"])
-            elif "category_id" in node:
-                category_names.append(node["category_id"])
+    # Get category names for the event type from the cached catalogue
+    category_names = get_category_names(event_type)
     
     # Make sure the enum always has at least one value to satisfy validation
     # if not category_names:
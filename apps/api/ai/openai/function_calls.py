@@ -1,37 +1,28 @@
 """
-Defines OpenAI function-calling specifications using schemas.
+Defines OpenAI function-calling specifications using JSON schemas.
+
+The specs are built once per category set by a ToolSchemaRegistry and handed
+out as frozen payloads; treat the returned dicts as read-only.
 """
-import json
-from pathlib import Path
 import sys
 import os
-"""
-Defines OpenAI function-calling specifications using JSON schemas.
-"""
-import json
-from pathlib import Path
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
 
-from db.crud.read_nodes import read_nodes
+from ai.schemas.registry import ToolSchemaRegistry, load_schema_file
 
-# Directory containing JSON schema files
-_SCHEMA_DIR = Path(__file__).parents[1] / "schemas"
+def _with_other(names) -> list:
+    category_names = list(names or ())
+    # Add "other" category for elements that don't fit existing categories
+    if "other" not in category_names:
+        category_names.append("other")
+    return category_names
 
-def issue() -> dict:
-    """
-    Return function-calling spec to report a new issue.
-    """
-    nodes = read_nodes("Category")
-    schema_path = _SCHEMA_DIR / "issue.json"
-    schema = json.loads(schema_path.read_text())
+def _build_issue(categories: dict) -> dict:
+    schema = load_schema_file("issue.json")
     # Restrict category enum to 'issue' event type
     if "properties" in schema and "category" in schema["properties"]:
-        category_names = [n.get("name") for n in nodes if n.get("event_type") == "issue"]
-        # Add "other" category for issues that don't fit existing categories
-        if "other" not in category_names:
-            category_names.append("other")
-        schema["properties"]["category"]["enum"] = category_names
+        schema["properties"]["category"]["enum"] = _with_other(categories.get("issue"))
     # Disallow unspecified properties
     schema["additionalProperties"] = False
     return {
@@ -42,21 +33,12 @@ def issue() -> dict:
         "parameters": schema,
     }
 
-def maintained() -> dict:
-    """
-    Return function-calling spec to log a well-maintained element.
-    """
-    nodes = read_nodes("Category")
-    schema_path = _SCHEMA_DIR / "maintained.json"
-    spec = json.loads(schema_path.read_text())
+def _build_maintained(categories: dict) -> dict:
+    spec = load_schema_file("maintained.json")
     # Extract parameters object
     params = spec.get("parameters", {})
     if "properties" in params and "category" in params["properties"]:
-        category_names = [n.get("name") for n in nodes if n.get("event_type") == "maintenance"]
-        # Add "other" category for well-maintained elements that don't fit existing categories
-        if "other" not in category_names:
-            category_names.append("other")
-        params["properties"]["category"]["enum"] = category_names
+        params["properties"]["category"]["enum"] = _with_other(categories.get("maintenance"))
     # Disallow unspecified properties
     params["additionalProperties"] = False
     return {
@@ -66,19 +48,38 @@ def maintained() -> dict:
         ),
         "parameters": params,
     }
-  
-def irrelevant() -> dict:
-    """
-    Return function-calling spec for images irrelevant to city issues or well-maintained elements.
-    """
-    schema_path = _SCHEMA_DIR / "irrelevant.json"
-    schema = json.loads(schema_path.read_text())
+
+def _build_irrelevant(categories: dict) -> dict:
+    schema = load_schema_file("irrelevant.json")
     return {
         "name": "irrelevant_image",
         "description": schema.get("description", "Indicate the image is irrelevant to the domain."),
         "parameters": schema,
     }
 
+registry = ToolSchemaRegistry()
+registry.register("issue", _build_issue)
+registry.register("maintained", _build_maintained)
+registry.register("irrelevant", _build_irrelevant)
+
+def issue() -> dict:
+    """
+    Return function-calling spec to report a new issue.
+    """
+    return registry.snapshot().specs["issue"].payload
+
+def maintained() -> dict:
+    """
+    Return function-calling spec to log a well-maintained element.
+    """
+    return registry.snapshot().specs["maintained"].payload
+
+def irrelevant() -> dict:
+    """
+    Return function-calling spec for images irrelevant to city issues or well-maintained elements.
+    """
+    return registry.snapshot().specs["irrelevant"].payload
+
 
 
 # def issue() -> dict:
@@ -13,14 +13,10 @@ except Exception:
 
 from .def_agents import city_inspector
 
-import uuid
-from datetime import datetime
 import sys
 import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
-from db.crud.create_nodes import add_city, add_user, add_photo
-from db.crud.create_edges import add_uploaded_photo
-from db.crud.read_nodes import search_node
+from db.crud.ingest import ingest_photo_context
 
 async def run_with_image_url(image_url: str, user: dict, location: dict, message: str = "Analyze this image and report the main issue or well-maintained element"):
     """
@@ -31,45 +27,10 @@ async def run_with_image_url(image_url: str, user: dict, location: dict, message
     print(f"User: {user}")
     print(f"Location: {location}")
 
-    city_id_val = location.get('city')
-    city_node = search_node('City', 'name', city_id_val)
-    if not city_node:
-        city_node = add_city({
-            'city_id': city_id_val,
-            'name': city_id_val,
-            'country': location.get('country'),
-            'location': {
-                'latitude': location.get('latitude'),
-                'longitude': location.get('longitude')
-            }
-        })
-    user_id_val = user.get('id')
-    user_node = search_node('User', 'user_id', user_id_val)
-    if not user_node:
-        user_node = add_user({
-            'user_id': user_id_val,
-            'name': user.get('name')
-        })
-    user_id = user_node['user_id']
-
-    photo_id = str(uuid.uuid4())
-    add_photo({
-        'photo_id': photo_id,
-        'url': image_url,
-        'created_at': datetime.now().isoformat(),
-        'location': {
-            'latitude': location.get('latitude'),
-            'longitude': location.get('longitude')
-        }
-    })
-
-    add_uploaded_photo({
-        'user_id': user_id,
-        'photo_id': photo_id,
-        'uploadedAt': datetime.now().isoformat(),
-        'device': 'api',
-        'userNotes': ''
-    })
+    context = ingest_photo_context(image_url, user, location)
+    city_node = context["city"]
+    photo_id = context["photo_id"]
+    user_id = user.get('id')
     print(f"Created photo {photo_id} for user {user_id}")
 
     multimodal_input = [{
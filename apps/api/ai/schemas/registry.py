@@ -0,0 +1,189 @@
+"""
+Registry of prebuilt, versioned tool schemas.
+
+JSON schema files and Pydantic models are loaded once. Tool payloads are built
+with the current category enums merged in, frozen, serialized, and keyed by a
+version hash. They are rebuilt only when the category set changes, so the hot
+path does no disk I/O or JSON work.
+"""
+import copy
+import hashlib
+import json
+import threading
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+from db.crud.categories import category_cache
+
+# Directory containing JSON schema files
+_SCHEMA_DIR = Path(__file__).parent
+
+EVENT_TYPES = ("issue", "maintenance")
+
+
+class FrozenDict(dict):
+    """
+    Read-only dict used for shared tool payloads; still serializes as a plain dict.
+    """
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("tool schema payloads are read-only")
+
+    __setitem__ = __delitem__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return (FrozenDict, (dict(self),))
+
+
+def freeze(value):
+    """
+    Recursively convert dicts to FrozenDict and lists to tuples.
+    """
+    if isinstance(value, dict):
+        return FrozenDict({k: freeze(v) for k, v in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(v) for v in value)
+    return value
+
+
+@lru_cache(maxsize=None)
+def _read_schema_file(name: str) -> str:
+    return (_SCHEMA_DIR / name).read_text()
+
+
+def load_schema_file(name: str) -> dict:
+    """
+    Return a fresh, mutable copy of a JSON schema file from ai/schemas (read from disk once).
+    """
+    return json.loads(_read_schema_file(name))
+
+
+def merge_category_enum(schema: dict, names) -> dict:
+    """
+    Set the enum of the 'category' property, if the schema has one.
+    Handles plain string properties and Optional[str] (anyOf) Pydantic output.
+    """
+    prop = schema.get("properties", {}).get("category")
+    if prop is None or not names:
+        return schema
+    if "anyOf" in prop:
+        for branch in prop["anyOf"]:
+            if branch.get("type") == "string":
+                branch["enum"] = list(names)
+    else:
+        prop["enum"] = list(names)
+    return schema
+
+
+@dataclass(frozen=True)
+class ToolSpec:
+    """
+    A prebuilt tool payload with its serialized form and schema version.
+    """
+    name: str
+    payload: FrozenDict
+    json: str
+    version: str
+
+
+@dataclass(frozen=True)
+class ToolSet:
+    """
+    All tool specs of a registry for one category snapshot.
+    """
+    version: str
+    specs: Dict[str, ToolSpec]
+
+    def payloads(self, *names) -> list:
+        """
+        Return the frozen payloads for the given tool names (all tools if none given).
+        """
+        return [self.specs[n].payload for n in (names or self.specs)]
+
+
+class ToolSchemaRegistry:
+    """
+    Builds and caches tool payloads, keyed by the category set they were built from.
+    """
+
+    def __init__(self):
+        self._builders = {}
+        self._lock = threading.Lock()
+        self._toolset: Optional[ToolSet] = None
+        self._generation = None
+        self._fingerprint = None
+
+    def register(self, name: str, builder: Callable[[dict], dict]) -> None:
+        """
+        Register a tool builder. It receives {event_type: tuple_of_category_names}
+        and returns the tool payload dict.
+        """
+        with self._lock:
+            self._builders[name] = builder
+            self._toolset = None
+
+    def register_model(self, name: str, description: str, model, event_type: str = None) -> None:
+        """
+        Register a tool whose parameters come from a Pydantic model.
+        The model schema is generated once; category enums are merged per build.
+        """
+        base = model.model_json_schema()
+
+        def build(categories):
+            parameters = copy.deepcopy(base)
+            if event_type:
+                merge_category_enum(parameters, categories.get(event_type))
+            return {"name": name, "description": description, "parameters": parameters}
+
+        self.register(name, build)
+
+    def _build(self, categories: dict) -> ToolSet:
+        specs = {}
+        digest = hashlib.sha256()
+        for name, builder in self._builders.items():
+            payload = builder(categories)
+            serialized = json.dumps(payload, sort_keys=True, separators=(",", ":"))
+            digest.update(serialized.encode())
+            specs[name] = (payload, serialized)
+        version = digest.hexdigest()[:12]
+        return ToolSet(
+            version=version,
+            specs={
+                name: ToolSpec(name=name, payload=freeze(payload), json=serialized, version=version)
+                for name, (payload, serialized) in specs.items()
+            },
+        )
+
+    def snapshot(self) -> ToolSet:
+        """
+        Return the current tool set, rebuilding it only if the category set changed.
+        """
+        category_cache.get()
+        generation = category_cache.generation
+        toolset = self._toolset
+        if toolset is not None and generation == self._generation:
+            return toolset
+        with self._lock:
+            categories = {t: category_cache.names(t) for t in EVENT_TYPES}
+            fingerprint = tuple(sorted(categories.items()))
+            if self._toolset is None or fingerprint != self._fingerprint:
+                self._toolset = self._build(categories)
+                self._fingerprint = fingerprint
+            self._generation = generation
+            return self._toolset
+
+    async def asnapshot(self) -> ToolSet:
+        """
+        Async variant of snapshot() that refreshes categories through the async CRUD layer.
+        """
+        await category_cache.aget()
+        return self.snapshot()
@@ -1,11 +1,8 @@
-import instructor
-from openai import OpenAI
 from pydantic import BaseModel, Field, conint
 from typing import Optional, Dict, Any
 import json
-
-# Patch the OpenAI client with instructor
-client = instructor.from_openai(OpenAI())
+from aiv2.openai_client import create, acreate
+from utils.tracing import traced
 
 # --- Pydantic model for relevance scoring output (matching relevance.json) ---
 class RelevanceAnalysis(BaseModel):
@@ -29,8 +26,7 @@ RELEVANCE_ANALYZER_SYSTEM_PROMPT = (
     "Return all fields in the output."
 )
 
-# --- Main entry point ---
-def analyze_message(message: dict) -> RelevanceAnalysis:
+def _build_messages(message: dict) -> list:
     # Accepts a dict with keys photo, event, event_type, additional_info, message, submit_type
     if not isinstance(message, dict):
         raise ValueError("Input message must be a dict with keys 'photo', 'event', 'event_type', 'message', and 'submit_type'.")
@@ -49,13 +45,26 @@ def analyze_message(message: dict) -> RelevanceAnalysis:
         "message": user_message,
         "submit_type": submit_type
     }
-    messages = [
+    return [
         {"role": "system", "content": RELEVANCE_ANALYZER_SYSTEM_PROMPT},
         {"role": "user", "content": json.dumps(structured)},
     ]
-    result = client.chat.completions.create(
+
+# --- Main entry point ---
+@traced("agent.relevance")
+def analyze_message(message: dict) -> RelevanceAnalysis:
+    result = create(
+        model="gpt-4o",
+        messages=_build_messages(message),
+        response_model=RelevanceAnalysis,
+    )
+    return result
+
+@traced("agent.relevance")
+async def analyze_message_async(message: dict) -> RelevanceAnalysis:
+    result = await acreate(
         model="gpt-4o",
-        messages=messages,
+        messages=_build_messages(message),
         response_model=RelevanceAnalysis,
     )
     return result
@@ -0,0 +1,268 @@
+"""
+Offline reclassification of stored photos through a batch completion service.
+
+Requests use the same prompt and tool schemas as the interactive vision agent
+(build_classify_messages and tool_registry) and are written as JSONL, one chat
+completion per photo with the photo_id as custom_id. A BatchBackend submits
+the file and reports when the output is ready: OpenAIBatchBackend uses the
+provider Batch API, LocalBatchBackend is a file-based stand-in for tests and
+offline runs. Results are parsed back into IssueReport, WellMaintainedReport
+or IrrelevantImage and written through persist_result, i.e. the same
+run_iss_function / run_mai_function / run_irrelevant_function handlers.
+"""
+import abc
+import asyncio
+import json
+import os
+import shutil
+import time
+import uuid
+from pathlib import Path
+from typing import Callable, Optional
+
+from pydantic import ValidationError
+
+from aiv2.agents.vision.vision_agent import (
+    VISION_MODEL, IssueReport, WellMaintainedReport, IrrelevantImage,
+    build_classify_messages, persist_result, tool_registry,
+)
+from aiv2.openai_client import get_client
+from db.crud import aio
+from db.crud.create_nodes import BULK_CHUNK_SIZE, chunked
+
+# Where request files (and the local stand-in's batches) are kept
+BATCH_DIR = os.getenv("BATCH_DIR", str(Path(__file__).resolve().parents[3] / "data" / "batches"))
+BATCH_POLL_INTERVAL = float(os.getenv("BATCH_POLL_INTERVAL", "30"))
+BATCH_COMPLETION_WINDOW = os.getenv("BATCH_COMPLETION_WINDOW", "24h")
+# Concurrent handler calls while applying results
+BATCH_APPLY_CONCURRENCY = int(os.getenv("BATCH_APPLY_CONCURRENCY", "8"))
+
+TOOL_MODELS = {
+    "report_issue": IssueReport,
+    "log_well_maintained": WellMaintainedReport,
+    "irrelevant_image": IrrelevantImage,
+}
+
+FINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+
+def build_request(photo: dict, toolset) -> dict:
+    """
+    Batch request line classifying one photo ({"photo_id", "url", "city_id"}).
+    """
+    return {
+        "custom_id": photo["photo_id"],
+        "method": "POST",
+        "url": "/v1/chat/completions",
+        "body": {
+            "model": VISION_MODEL,
+            "messages": build_classify_messages(photo["url"], photo.get("city_id") or "", photo["photo_id"]),
+            "tools": [{"type": "function", "function": payload} for payload in toolset.payloads()],
+            "tool_choice": "required",
+            "parallel_tool_calls": False,
+        },
+    }
+
+
+def write_requests(photos: list, path: str) -> int:
+    """
+    Write one request per photo to a JSONL file.
+
+    :return: Number of requests written.
+    """
+    toolset = tool_registry.snapshot()
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w") as f:
+        for photo in photos:
+            f.write(json.dumps(build_request(photo, toolset)) + "\n")
+    return len(photos)
+
+
+def parse_result(line: dict) -> tuple:
+    """
+    Turn one batch output line into (photo_id, result model, error).
+    Exactly one of result and error is None.
+    """
+    photo_id = line.get("custom_id")
+    if line.get("error"):
+        return photo_id, None, str(line["error"])
+    response = line.get("response") or {}
+    if response.get("status_code") != 200:
+        return photo_id, None, f"status {response.get('status_code')}: {response.get('body')}"
+    try:
+        message = response["body"]["choices"][0]["message"]
+        call = message["tool_calls"][0]["function"]
+        model = TOOL_MODELS[call["name"]]
+        arguments = json.loads(call["arguments"])
+    except (KeyError, IndexError, TypeError, json.JSONDecodeError) as e:
+        return photo_id, None, f"no usable tool call: {e!r}"
+    # The photo is identified by custom_id, not by what the model echoed back
+    arguments["photo_id"] = photo_id
+    try:
+        return photo_id, model(**arguments), None
+    except ValidationError as e:
+        return photo_id, None, f"invalid {call['name']} arguments: {e}"
+
+
+class BatchBackend(abc.ABC):
+    """
+    Interface for batch completion services.
+    """
+
+    @abc.abstractmethod
+    def submit(self, requests_path: str) -> str:
+        """Submit a JSONL request file and return the batch id."""
+
+    @abc.abstractmethod
+    def status(self, batch_id: str) -> str:
+        """Return the batch status (validating, in_progress, completed, failed, expired, cancelled)."""
+
+    @abc.abstractmethod
+    def results(self, batch_id: str) -> list:
+        """Return the output lines of a completed batch."""
+
+
+class OpenAIBatchBackend(BatchBackend):
+    """
+    The OpenAI Batch API (/v1/batches) on the shared OpenAI client.
+    """
+
+    def __init__(self, client=None, completion_window: str = BATCH_COMPLETION_WINDOW):
+        self.client = client or get_client().client
+        self.completion_window = completion_window
+
+    def submit(self, requests_path: str) -> str:
+        with open(requests_path, "rb") as f:
+            uploaded = self.client.files.create(file=f, purpose="batch")
+        batch = self.client.batches.create(
+            input_file_id=uploaded.id,
+            endpoint="/v1/chat/completions",
+            completion_window=self.completion_window,
+        )
+        return batch.id
+
+    def status(self, batch_id: str) -> str:
+        return self.client.batches.retrieve(batch_id).status
+
+    def results(self, batch_id: str) -> list:
+        batch = self.client.batches.retrieve(batch_id)
+        lines = []
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if file_id:
+                text = self.client.files.content(file_id).text
+                lines.extend(json.loads(l) for l in text.splitlines() if l.strip())
+        return lines
+
+
+class LocalBatchBackend(BatchBackend):
+    """
+    File-based stand-in for the batch service. Each batch is a directory with
+    input.jsonl; it is completed once output.jsonl exists. With a responder
+    (request body -> chat completion body) the output is produced on the
+    first status poll; otherwise something else has to write it.
+    """
+
+    def __init__(self, directory: str = BATCH_DIR, responder: Optional[Callable[[dict], dict]] = None):
+        self.directory = Path(directory)
+        self.responder = responder
+
+    def _path(self, batch_id: str) -> Path:
+        return self.directory / batch_id
+
+    def submit(self, requests_path: str) -> str:
+        batch_id = f"local_{uuid.uuid4().hex}"
+        path = self._path(batch_id)
+        path.mkdir(parents=True)
+        shutil.copyfile(requests_path, path / "input.jsonl")
+        return batch_id
+
+    def status(self, batch_id: str) -> str:
+        path = self._path(batch_id)
+        if not (path / "input.jsonl").exists():
+            return "failed"
+        if not (path / "output.jsonl").exists():
+            if self.responder is None:
+                return "in_progress"
+            self._respond(path)
+        return "completed"
+
+    def _respond(self, path: Path) -> None:
+        with open(path / "input.jsonl") as fin, open(path / "output.jsonl.tmp", "w") as fout:
+            for line in fin:
+                if not line.strip():
+                    continue
+                request = json.loads(line)
+                try:
+                    response = {"status_code": 200, "body": self.responder(request["body"])}
+                    error = None
+                except Exception as e:
+                    response, error = None, {"message": str(e)}
+                fout.write(json.dumps({
+                    "id": f"resp_{uuid.uuid4().hex}",
+                    "custom_id": request["custom_id"],
+                    "response": response,
+                    "error": error,
+                }) + "\n")
+        os.replace(path / "output.jsonl.tmp", path / "output.jsonl")
+
+    def results(self, batch_id: str) -> list:
+        with open(self._path(batch_id) / "output.jsonl") as f:
+            return [json.loads(l) for l in f if l.strip()]
+
+
+def wait_for_batch(backend: BatchBackend, batch_id: str, poll_interval: float = BATCH_POLL_INTERVAL) -> str:
+    """
+    Poll until the batch reaches a final status and return it.
+    """
+    while True:
+        status = backend.status(batch_id)
+        if status in FINAL_STATUSES:
+            return status
+        print(f"Batch {batch_id}: {status}")
+        time.sleep(poll_interval)
+
+
+async def apply_results(
+    lines: list,
+    replace: bool = True,
+    concurrency: int = BATCH_APPLY_CONCURRENCY,
+) -> dict:
+    """
+    Write parsed batch results through the vision tool handlers.
+
+    With replace, each photo's previous classification is removed first (in
+    UNWIND chunks); a photo whose new result then fails to persist is left
+    unclassified and can be picked up again with --unclassified.
+
+    :return: Summary with applied/failed counts, counts per kind and deleted_events.
+    """
+    parsed = [parse_result(line) for line in lines]
+    summary = {"applied": 0, "failed": 0, "kinds": {}, "deleted_events": 0}
+    results = []
+    for photo_id, result, error in parsed:
+        if error is not None:
+            summary["failed"] += 1
+            print(f"Photo {photo_id}: {error}")
+        else:
+            results.append((photo_id, result))
+
+    if replace:
+        for chunk in chunked([photo_id for photo_id, _ in results], BULK_CHUNK_SIZE):
+            summary["deleted_events"] += await aio.detach_photo_events(chunk)
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def apply(photo_id, result):
+        async with semaphore:
+            return await persist_result(result)
+
+    outcomes = await asyncio.gather(*(apply(p, r) for p, r in results), return_exceptions=True)
+    for (photo_id, _), outcome in zip(results, outcomes):
+        if isinstance(outcome, Exception) or outcome[1].get("status") == "error":
+            summary["failed"] += 1
+            print(f"Photo {photo_id}: could not apply result: {outcome if isinstance(outcome, Exception) else outcome[1]}")
+            continue
+        kind = outcome[0]
+        summary["applied"] += 1
+        summary["kinds"][kind] = summary["kinds"].get(kind, 0) + 1
+    return summary
@@ -1,24 +1,26 @@
 import json
+import uuid
 from pathlib import Path
-import instructor
-from openai import OpenAI
 from pydantic import BaseModel, Field
 from typing import Optional, Literal, Union, List
 from aiv2.tools.vision.report_issue import run_iss_function, run_mai_function, run_irrelevant_function
 import asyncio
-from db.crud.read_nodes import read_nodes, search_node
-from db.crud.create_nodes import add_city, add_user, add_photo
-from db.crud.create_edges import add_uploaded_photo
-from datetime import datetime
-import uuid
+from db.crud.categories import get_category_names
+from ai.schemas.registry import ToolSchemaRegistry
+from db.crud.aio import ingest_photo_context, link_photo_to_event, set_photo_content_hash
+from utils.dedup_cache import DEDUP_ENABLED, geo_cell, get_dedup_cache
+from utils.images import Image, fetch_image_bytes, content_hash, perceptual_hash
+from utils.image_preprocess import IMAGE_PREPROCESS, prepare_model_image, run_in_pool
+from db.neo4j import close_async_driver
+from utils.timing import stage
+from utils.logs import get_logger
+from utils.tracing import traced
+from aiv2.openai_client import acreate, close_async_client
 
 # Directory containing JSON schema files
 _SCHEMA_DIR = Path(__file__).parents[3] / ".." / ".." / "ai" / "schemas"
 
-from db.crud.read_nodes import read_nodes
-
-# Patch the OpenAI client with instructor
-client = instructor.from_openai(OpenAI())
+log = get_logger("vision")
 
 # --- Category helpers ---
 def get_category_enum(event_type: str) -> List[str]:
@@ -26,8 +28,7 @@ def get_category_enum(event_type: str) -> List[str]:
     Query the database for categories of the given event_type ('issue' or 'maintenance').
     Returns a list of category names.
     """
-    nodes = read_nodes("Category") or []
-    return [n.get("name") for n in nodes if n.get("event_type") == event_type and n.get("name")]
+    return get_category_names(event_type)
 
 def get_issue_categories() -> List[str]:
     """
@@ -145,6 +146,8 @@ def irrelevant_image(
         confidence=confidence,
     )
 
+VISION_MODEL = "gpt-4o"
+
 # --- System prompt for the agent ---
 VISION_AGENT_SYSTEM_PROMPT = (
     "You are a computer-vision assistant for civic infrastructure. "
@@ -170,50 +173,11 @@ VISION_AGENT_SYSTEM_PROMPT = (
 )
 
 # --- Main entry point ---
-def analyze_vision_image(image_url: str, user: dict, location: dict) -> Union[IssueReport, WellMaintainedReport, IrrelevantImage]:
-    # Extract IDs and generate photo_id
-    city_id = location["city"]
-    user_id = user["id"]
-    photo_id = str(uuid.uuid4())
-
-    # --- Ensure user, city, and photo nodes exist and are connected ---
-    city_node = search_node('City', 'city_id', city_id)
-    if not city_node:
-        city_node = add_city({
-            'city_id': city_id,
-            'name': city_id,
-            'country': location.get('country'),
-            'location': {
-                'latitude': location.get('latitude'),
-                'longitude': location.get('longitude')
-            }
-        })
-    user_node = search_node('User', 'user_id', user_id)
-    if not user_node:
-        user_node = add_user({
-            'user_id': user_id,
-            'name': user.get('name', user_id)
-        })
-    # Always create a photo node (or check if exists if you want idempotency)
-    add_photo({
-        'photo_id': photo_id,
-        'url': image_url,
-        'created_at': datetime.now().isoformat(),
-        'location': {
-            'latitude': location.get('latitude'),
-            'longitude': location.get('longitude')
-        }
-    })
-    add_uploaded_photo({
-        'user_id': user_id,
-        'photo_id': photo_id,
-        'uploadedAt': datetime.now().isoformat(),
-        'device': 'api',
-        'userNotes': ''
-    })
-    # --- End node creation logic ---
-
-    messages = [
+def build_classify_messages(image_url: str, city_id: str, photo_id: str) -> list:
+    """
+    Chat messages asking the vision model to classify one image.
+    """
+    return [
         {"role": "system", "content": VISION_AGENT_SYSTEM_PROMPT},
         {"role": "user", "content": f"city_id: {city_id}"},
         {"role": "user", "content": f"photo_id: {photo_id}"},
@@ -230,53 +194,194 @@ def analyze_vision_image(image_url: str, user: dict, location: dict) -> Union[Is
             ]
         },
     ]
-    # Use instructor to call the correct function
-    result = client.chat.completions.create(
-        model="gpt-4o",
-        tools=[report_issue_schema, log_well_maintained_schema, irrelevant_image_schema],
-        messages=messages,
+
+async def classify_image(image_url: str, city_id: str, photo_id: str) -> Union[IssueReport, WellMaintainedReport, IrrelevantImage]:
+    """
+    Ask the vision model for exactly one tool call describing the image.
+    """
+    # Use instructor (via the shared client) to call the correct function
+    toolset = await tool_registry.asnapshot()
+    return await acreate(
+        model=VISION_MODEL,
+        tools=toolset.payloads(),
+        messages=build_classify_messages(image_url, city_id, photo_id),
         response_model=Union[IssueReport, WellMaintainedReport, IrrelevantImage],
     )
-    print()
-    print()
-    print()
-    print()
-    print("--------------------------------")
-    print()
-    print()
-    print(result)
-    print()
-    # Call the appropriate handler from report_issue.py
+
+async def fetch_source_image(image_url: str) -> Optional[bytes]:
+    """
+    Fetch the image once for hashing and preprocessing.
+    Returns None when neither is enabled or the fetch fails, so analysis continues with the URL.
+    """
+    if not DEDUP_ENABLED and IMAGE_PREPROCESS == "off":
+        return None
+    try:
+        return await fetch_image_bytes(image_url)
+    except Exception as e:
+        log.warning("vision.fetch_failed", image_url=image_url, error=str(e))
+        return None
+
+async def fingerprint_image(data: Optional[bytes]) -> tuple:
+    """
+    Return (sha256, perceptual_hash) of the image bytes, or (None, None) without bytes or with dedup off.
+    """
+    if data is None or not DEDUP_ENABLED:
+        return None, None
+    if Image is None:
+        # perceptual_hash needs Pillow; skip the process pool round trip
+        return content_hash(data), None
+    return content_hash(data), await run_in_pool(perceptual_hash, data)
+
+async def record_content_hash(photo_id: str, sha256: Optional[str]) -> None:
+    """
+    Store the image hash on the ingested Photo. A failure only costs bulk-ingest
+    dedup, so it is logged instead of failing the analysis.
+    """
+    if not sha256:
+        return
+    try:
+        await set_photo_content_hash(photo_id, sha256)
+    except Exception as e:
+        log.warning("vision.content_hash_failed", photo_id=photo_id, error=str(e))
+
+async def persist_result(result) -> tuple:
+    """
+    Call the appropriate handler from report_issue.py for a model result.
+
+    :return: Tuple of (kind, handler response).
+    """
     if isinstance(result, IssueReport):
-        print("Running report_issue")
         data = result.dict()
         if not data.get("category") and data.get("suggested_category"):
             # Use the suggested_category as the category
             data["category"] = data["suggested_category"]
-        return asyncio.run(run_iss_function(None, data))
+        return "issue", await run_iss_function(None, data)
     elif isinstance(result, WellMaintainedReport):
-        print("Running log_well_maintained")
-        return asyncio.run(run_mai_function(None, result.dict()))
+        return "maintenance", await run_mai_function(None, result.dict())
     elif isinstance(result, IrrelevantImage):
-        print("Running irrelevant_image")
-        return asyncio.run(run_irrelevant_function(None, result.dict()))
+        return "irrelevant", await run_irrelevant_function(None, result.dict())
     else:
         raise ValueError("Unknown result type from vision agent")
 
-report_issue_schema = {
-    "name": "report_issue",
-    "description": "Report a new ISSUE detected in the civic infrastructure (problems, damage, disrepair, etc.)",
-    "parameters": IssueReport.schema()
-}
-
-log_well_maintained_schema = {
-    "name": "log_well_maintained",
-    "description": "Log a WELL-MAINTAINED element in the civic infrastructure (good condition, properly functioning facilities, etc.)",
-    "parameters": WellMaintainedReport.schema()
-}
-
-irrelevant_image_schema = {
-    "name": "irrelevant_image",
-    "description": "Indicate the image does not contain any relevant city issue or well-maintained element.",
-    "parameters": IrrelevantImage.schema()
-}
+@traced("agent.vision")
+async def analyze_vision_image_async(
+    image_url: str,
+    user: dict,
+    location: dict,
+    image_bytes: Optional[bytes] = None,
+) -> Union[IssueReport, WellMaintainedReport, IrrelevantImage]:
+    # Extract IDs
+    city_id = location["city"]
+    # Dedup matches are limited to this city and the area around the photo
+    cell = geo_cell(location.get("latitude"), location.get("longitude"))
+    # The photo_id is generated here so the model call does not have to wait for the ingest
+    photo_id = str(uuid.uuid4())
+
+    # --- Start the graph ingest (user, city, photo) right away; the hash is written once known ---
+    async def _ingest():
+        with stage("ingest"):
+            return await ingest_photo_context(image_url, user, location, photo_id=photo_id)
+
+    ingest = asyncio.create_task(_ingest())
+
+    # Uploads hand over their bytes; URLs are fetched once here, concurrently with the ingest
+    data = image_bytes
+    try:
+        if data is None:
+            with stage("fetch"):
+                data = await fetch_source_image(image_url)
+        with stage("fingerprint"):
+            sha256, phash = await fingerprint_image(data)
+    except BaseException:
+        ingest.cancel()
+        await asyncio.gather(ingest, return_exceptions=True)
+        raise
+    unrecorded_hash = sha256
+
+    # --- Same or near-identical image seen before: link to its event, skip the model ---
+    with stage("dedup"):
+        cached = await asyncio.to_thread(get_dedup_cache().lookup, sha256, phash, city_id, cell) if sha256 else None
+    if cached:
+        await ingest
+        linked, _ = await asyncio.gather(
+            link_photo_to_event(cached.kind, photo_id, cached.event_id),
+            record_content_hash(photo_id, sha256),
+        )
+        if linked:
+            log.info("vision.deduplicated", sample=True, photo_id=photo_id, kind=cached.kind, event_id=cached.event_id)
+            return {
+                **cached.response,
+                "photo_id": photo_id,
+                "deduplicated": True,
+                "classification": cached.classification,
+            }
+        # The cached event no longer exists
+        await asyncio.to_thread(get_dedup_cache().discard, cached.event_id)
+        unrecorded_hash = None
+
+    # --- Preprocess and run the model call concurrently with the ingest ---
+    async def _classify():
+        with stage("preprocess"):
+            model_image = await prepare_model_image(image_url, data, derivative_name=f"derivatives/{photo_id}.jpg")
+        with stage("model"):
+            return await classify_image(model_image, city_id, photo_id)
+
+    classify = asyncio.create_task(_classify())
+    try:
+        await ingest
+    except BaseException:
+        # Without the Photo node the tool result cannot be linked, so skip the model call
+        classify.cancel()
+        await asyncio.gather(classify, return_exceptions=True)
+        raise
+    # The hash write runs next to the model call
+    hashed = asyncio.create_task(record_content_hash(photo_id, unrecorded_hash))
+    try:
+        result = await classify
+    finally:
+        await hashed
+    # --- Both done: the Photo exists before the tool result is persisted ---
+
+    log.debug("vision.result", sample=True, photo_id=photo_id, result=result.model_dump())
+    with stage("persist"):
+        kind, response = await persist_result(result)
+
+    event_id = response.get("event_id") or response.get("irrelevant_id")
+    if sha256 and event_id and response.get("status") != "error":
+        await asyncio.to_thread(
+            get_dedup_cache().store, sha256, phash, kind, event_id, result.model_dump(), response, city_id, cell
+        )
+    return {**response, "photo_id": photo_id}
+
+def analyze_vision_image(image_url: str, user: dict, location: dict) -> Union[IssueReport, WellMaintainedReport, IrrelevantImage]:
+    """
+    Synchronous wrapper around analyze_vision_image_async for scripts and demos.
+    """
+    async def _run():
+        try:
+            return await analyze_vision_image_async(image_url, user, location)
+        finally:
+            # The async driver and OpenAI client are bound to this short-lived event loop
+            await close_async_client()
+            await close_async_driver()
+    return asyncio.run(_run())
+
+# --- Tool schemas (built once per category set) ---
+tool_registry = ToolSchemaRegistry()
+tool_registry.register_model(
+    "report_issue",
+    "Report a new ISSUE detected in the civic infrastructure (problems, damage, disrepair, etc.)",
+    IssueReport,
+    event_type="issue",
+)
+tool_registry.register_model(
+    "log_well_maintained",
+    "Log a WELL-MAINTAINED element in the civic infrastructure (good condition, properly functioning facilities, etc.)",
+    WellMaintainedReport,
+    event_type="maintenance",
+)
+tool_registry.register_model(
+    "irrelevant_image",
+    "Indicate the image does not contain any relevant city issue or well-maintained element.",
+    IrrelevantImage,
+)
@@ -0,0 +1,211 @@
+"""
+Shared OpenAI clients for the vision and message agents.
+
+All calls go through one keep-alive HTTP connection pool (per event loop for
+the async client). Each call has a deadline that covers every attempt, 429,
+5xx, timeout and connection errors are retried a bounded number of times with
+jittered backoff, and a semaphore caps the number of requests in flight.
+Agents call create() / acreate() with the usual instructor arguments.
+"""
+import asyncio
+import os
+import threading
+import time
+import weakref
+from typing import Optional
+
+import httpx
+import instructor
+import openai
+from openai import OpenAI, AsyncOpenAI
+from tenacity import AsyncRetrying, Retrying, retry_if_not_exception_type, stop_after_attempt
+
+from utils.env_loader import load_dotenv
+from utils.job_queue import backoff_delay
+from utils.logs import get_logger
+from utils.tracing import KIND_CLIENT, start_span
+
+load_dotenv()
+
+# Seconds one call may take in total, retries and backoff included
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "60"))
+OPENAI_CONNECT_TIMEOUT = float(os.getenv("OPENAI_CONNECT_TIMEOUT", "5"))
+# Retries after the first attempt for 429/5xx/timeouts
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "3"))
+OPENAI_BACKOFF_BASE = float(os.getenv("OPENAI_BACKOFF_BASE", "0.5"))
+OPENAI_BACKOFF_MAX = float(os.getenv("OPENAI_BACKOFF_MAX", "8"))
+# Attempts instructor makes when the model output fails validation (re-asks)
+OPENAI_VALIDATION_ATTEMPTS = int(os.getenv("OPENAI_VALIDATION_ATTEMPTS", "3"))
+# Connection pool shared by all calls (per event loop for async)
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "32"))
+OPENAI_KEEPALIVE_EXPIRY = float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", "60"))
+# Maximum concurrent model requests (per event loop for async, per process for sync)
+OPENAI_CONCURRENCY = int(os.getenv("OPENAI_CONCURRENCY", "16"))
+
+
+def _http_options() -> dict:
+    return {
+        "timeout": httpx.Timeout(OPENAI_TIMEOUT, connect=OPENAI_CONNECT_TIMEOUT),
+        "limits": httpx.Limits(
+            max_connections=OPENAI_MAX_CONNECTIONS,
+            max_keepalive_connections=OPENAI_MAX_CONNECTIONS,
+            keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY,
+        ),
+    }
+
+
+_client = None
+_client_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(OPENAI_CONCURRENCY)
+
+log = get_logger("openai")
+
+def get_client():
+    """
+    Return the process-wide instructor-patched OpenAI client, creating it on first use.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            # Retries are handled by create(), so the SDK's own are disabled
+            _client = instructor.from_openai(OpenAI(http_client=httpx.Client(**_http_options()), max_retries=0))
+        return _client
+
+
+class _LoopClient:
+    def __init__(self):
+        self.http = httpx.AsyncClient(**_http_options())
+        self.client = instructor.from_openai(AsyncOpenAI(http_client=self.http, max_retries=0))
+        self.slots = asyncio.Semaphore(OPENAI_CONCURRENCY)
+
+
+# Async HTTP pools are bound to the event loop they were created on, so keep one per loop
+_async_clients = weakref.WeakKeyDictionary()
+
+def _loop_client() -> _LoopClient:
+    loop = asyncio.get_running_loop()
+    state = _async_clients.get(loop)
+    if state is None:
+        state = _async_clients[loop] = _LoopClient()
+    return state
+
+def get_async_client():
+    """
+    Return the instructor-patched AsyncOpenAI client of the running event loop.
+    """
+    return _loop_client().client
+
+async def close_async_client() -> None:
+    """
+    Close the async client of the running event loop, if one was created.
+    """
+    state = _async_clients.pop(asyncio.get_running_loop(), None)
+    if state is not None:
+        await state.http.aclose()
+
+
+def _unwrap(error: BaseException) -> BaseException:
+    # instructor wraps API errors in InstructorRetryException(original, ...)
+    for _ in range(3):
+        if isinstance(error, openai.OpenAIError):
+            break
+        inner = error.args[0] if error.args and isinstance(error.args[0], BaseException) else error.__cause__
+        if inner is None:
+            break
+        error = inner
+    return error
+
+def is_retryable(error: BaseException) -> bool:
+    """
+    True for rate limits, server errors, timeouts and connection failures.
+    """
+    error = _unwrap(error)
+    if isinstance(error, (openai.APITimeoutError, openai.APIConnectionError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    return False
+
+def _retry_after(error: BaseException) -> Optional[float]:
+    response = getattr(_unwrap(error), "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+def retry_delay(error: BaseException, attempt: int, deadline: float) -> Optional[float]:
+    """
+    Seconds to wait before the next attempt, or None if the call should fail now
+    (error not retryable, retries used up, or the deadline would pass).
+    """
+    if attempt > OPENAI_MAX_RETRIES or not is_retryable(error):
+        return None
+    delay = max(backoff_delay(attempt, OPENAI_BACKOFF_BASE, OPENAI_BACKOFF_MAX), _retry_after(error) or 0)
+    if time.monotonic() + delay >= deadline:
+        return None
+    return delay
+
+
+def _validation_retries(retrying_cls):
+    # instructor would otherwise also retry API errors, multiplying the attempts made by create()/acreate()
+    return retrying_cls(
+        stop=stop_after_attempt(OPENAI_VALIDATION_ATTEMPTS),
+        retry=retry_if_not_exception_type(openai.OpenAIError),
+    )
+
+
+def create(deadline: float = OPENAI_TIMEOUT, **kwargs):
+    """
+    Structured chat completion on the shared sync client.
+
+    :param deadline: Seconds the call may take across all attempts.
+    :param kwargs: Arguments for client.chat.completions.create (model, messages, response_model, ...).
+    """
+    client = get_client()
+    kwargs.setdefault("max_retries", _validation_retries(Retrying))
+    expires = time.monotonic() + deadline
+    attempt = 0
+    with start_span("openai.chat.completions.create", KIND_CLIENT, model=kwargs.get("model")) as span:
+        while True:
+            with _slots:
+                try:
+                    return client.chat.completions.create(timeout=max(expires - time.monotonic(), 0.1), **kwargs)
+                except Exception as e:
+                    attempt += 1
+                    delay = retry_delay(e, attempt, expires)
+                    if delay is None:
+                        raise
+                    log.warning("openai.retry", attempt=attempt, delay_s=round(delay, 2), error=str(e))
+                    if span is not None:
+                        span.set(retries=attempt)
+            time.sleep(delay)
+
+async def acreate(deadline: float = OPENAI_TIMEOUT, **kwargs):
+    """
+    Structured chat completion on the shared async client of the running loop.
+
+    :param deadline: Seconds the call may take across all attempts.
+    :param kwargs: Arguments for client.chat.completions.create (model, messages, response_model, ...).
+    """
+    state = _loop_client()
+    kwargs.setdefault("max_retries", _validation_retries(AsyncRetrying))
+    expires = time.monotonic() + deadline
+    attempt = 0
+    with start_span("openai.chat.completions.create", KIND_CLIENT, model=kwargs.get("model")) as span:
+        while True:
+            async with state.slots:
+                try:
+                    return await state.client.chat.completions.create(
+                        timeout=max(expires - time.monotonic(), 0.1), **kwargs
+                    )
+                except Exception as e:
+                    attempt += 1
+                    delay = retry_delay(e, attempt, expires)
+                    if delay is None:
+                        raise
+                    log.warning("openai.retry", attempt=attempt, delay_s=round(delay, 2), error=str(e))
+                    if span is not None:
+                        span.set(retries=attempt)
+            await asyncio.sleep(delay)
@@ -0,0 +1,3 @@
+"""
+Benchmark tools: an OpenAI-compatible mock server, a load generator and its report.
+"""
@@ -0,0 +1,137 @@
+"""
+Micro-benchmarks of the crud layer against the in-memory graph backend.
+
+Seeds a graph of --nodes nodes (cities, users, photos and the issues some
+photos trigger) through the bulk helpers, then times --ops calls each of
+add_node, add_relationship and get_photo_and_event on it. No database is
+needed: NEO4J_URI is forced to memory:// before the db package is imported,
+so the numbers are the app's query building plus the backend's Cypher
+execution, with index lookups on the id properties.
+
+Usage:
+  python -m bench.crud [--nodes 1000000] [--ops 2000] [--seed 1]
+                       [--json out.json] [--baseline base.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+
+os.environ["NEO4J_URI"] = "memory://"
+
+from bench.report import format_report, summarize  # noqa: E402
+from db import crud  # noqa: E402
+from db.crud import aio  # noqa: E402
+from db.memory import get_graph, reset_graph  # noqa: E402
+
+# Share of the seeded nodes per label; photos take the rest
+_USER_SHARE = 0.1
+_ISSUE_SHARE = 0.1
+_CITIES = 100
+
+
+def seed_graph(nodes: int, rng: random.Random) -> dict:
+    """
+    Fill the (reset) memory graph with about `nodes` nodes.
+
+    :return: Counts per label plus the ids used to pick benchmark targets.
+    """
+    reset_graph()
+    users = max(1, int(nodes * _USER_SHARE))
+    issues = max(1, int(nodes * _ISSUE_SHARE))
+    photos = max(1, nodes - users - issues - _CITIES)
+    crud.add_nodes_bulk("City", "city_id", [
+        {"city_id": f"city-{i}", "name": f"City {i}", "location": {"latitude": 46 + i / 100, "longitude": 23.5}}
+        for i in range(_CITIES)
+    ])
+    crud.add_nodes_bulk("User", "user_id", [{"user_id": f"user-{i}", "name": f"User {i}"} for i in range(users)])
+    crud.add_nodes_bulk("Photo", "photo_id", [
+        {"photo_id": f"photo-{i}", "url": f"https://img/{i}.jpg", "score": 0}
+        for i in range(photos)
+    ])
+    crud.add_nodes_bulk("Issue", "event_id", [
+        {"event_id": f"issue-{i}", "severity": rng.choice(["low", "medium", "high"])}
+        for i in range(issues)
+    ])
+    crud.add_relationships_bulk("User", "user_id", "UPLOADED", "Photo", "photo_id", [
+        {"start": f"user-{rng.randrange(users)}", "end": f"photo-{i}", "props": None} for i in range(photos)
+    ])
+    crud.add_relationships_bulk("Photo", "photo_id", "TRIGGERS_EVENT", "Issue", "event_id", [
+        {"start": f"photo-{i}", "end": f"issue-{i}", "props": None} for i in range(min(photos, issues))
+    ])
+    return {"users": users, "photos": photos, "issues": issues}
+
+
+def time_calls(call, ops: int) -> dict:
+    """
+    Run call(i) ops times and summarize the per-call latencies.
+    """
+    samples = []
+    started = time.perf_counter()
+    for i in range(ops):
+        t0 = time.perf_counter()
+        try:
+            call(i)
+            status = 200
+        except Exception as e:
+            print(f"call {i} failed: {e}")
+            status = 500
+        samples.append({"status": status, "latency_ms": (time.perf_counter() - t0) * 1000, "stages": {}})
+    return summarize(samples, time.perf_counter() - started)
+
+
+def run_benchmark(nodes: int, ops: int, seed: int = None) -> dict:
+    """
+    Seed the graph and time each operation.
+
+    :return: Report with one summary per operation and the graph's size.
+    """
+    rng = random.Random(seed)
+    started = time.perf_counter()
+    seeded = seed_graph(nodes, rng)
+    seed_s = time.perf_counter() - started
+    print(f"Seeded {nodes} nodes in {seed_s:.1f}s")
+
+    def add_node(i):
+        crud.add_node("User", "user_id", {"user_id": f"user-{rng.randrange(seeded['users'] * 2)}", "seen": i})
+
+    def add_relationship(i):
+        crud.add_relationship("User", "user_id", f"user-{rng.randrange(seeded['users'])}", "UPLOADED",
+                              "Photo", "photo_id", f"photo-{rng.randrange(seeded['photos'])}", {"bench": i})
+
+    loop = asyncio.new_event_loop()
+
+    def get_photo_and_event(i):
+        loop.run_until_complete(aio.get_photo_and_event(f"photo-{rng.randrange(seeded['photos'])}"))
+
+    scenarios = {}
+    for name, call in (("add_node", add_node), ("add_relationship", add_relationship),
+                       ("get_photo_and_event", get_photo_and_event)):
+        scenarios[name] = time_calls(call, ops)
+    loop.close()
+    return {"scenarios": scenarios, "seed_s": round(seed_s, 2), "graph": get_graph().stats()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark crud calls against the in-memory graph.')
+    parser.add_argument('--nodes', type=int, default=100_000, help='Nodes to seed before timing')
+    parser.add_argument('--ops', type=int, default=2000, help='Calls per operation')
+    parser.add_argument('--seed', type=int, help='Random seed for reproducible runs')
+    parser.add_argument('--json', help='Write the report to this file')
+    parser.add_argument('--baseline', help='Compare against a report saved with --json')
+    args = parser.parse_args()
+
+    report = run_benchmark(args.nodes, args.ops, args.seed)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print(format_report(report, baseline))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,286 @@
+"""
+Asyncio load generator for the API.
+
+Sends /analyze, /analyze/batch and /relevance-analyze requests to a running
+server (--url) or to the app in-process through httpx's ASGI transport
+(--in-process, runs the app's startup and shutdown hooks on this loop).
+Requests are closed-loop with --concurrency workers, or open-loop at --rate
+requests per second. Per-stage durations come from each response's
+Server-Timing header. Image URLs point at the mock server's /images endpoint,
+and --start-mock runs the mock in this process and points the in-process app
+at it.
+
+The report (throughput, p50/p95/p99 latency, per-stage percentiles and the
+mock model's own latency) is printed and can be saved with --json, then
+passed back as --baseline to compare runs.
+
+Usage:
+  python -m bench.load --in-process --start-mock [--scenario analyze,relevance,batch]
+                       [--requests 200] [--concurrency 16 | --rate 20] [--batch-size 10]
+                       [--duplicate-ratio 0.1] [--warmup 10] [--json out.json] [--baseline base.json]
+  python -m bench.load --url http://127.0.0.1:8000 --mock-url http://127.0.0.1:8100 ...
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+
+import httpx
+
+from bench.report import format_report, summarize
+from utils.timing import parse_server_timing
+
+SCENARIOS = ("analyze", "relevance", "batch")
+MESSAGES = (
+    "The pothole is getting bigger after the rain",
+    "This was fixed last week",
+    "Nice photo",
+    "Cars are swerving around it, someone will get hurt",
+)
+
+
+class LoadGenerator:
+    """
+    Builds the requests of each scenario and records one sample per request.
+
+    :param client: httpx.AsyncClient pointed at the API.
+    :param mock_url: Base URL of the mock server, used for image URLs.
+    :param duplicate_ratio: Fraction of analyze requests that reuse an earlier image.
+    :param batch_size: Items per /analyze/batch request.
+    """
+
+    def __init__(self, client: httpx.AsyncClient, mock_url: str, duplicate_ratio: float = 0.0,
+                 batch_size: int = 10, users: int = 50, seed: int = None):
+        self.client = client
+        self.mock_url = mock_url.rstrip("/")
+        self.duplicate_ratio = duplicate_ratio
+        self.batch_size = batch_size
+        self.users = users
+        self.rng = random.Random(seed)
+        self.run_id = uuid.uuid4().hex[:8]
+        self.images = []
+        # Photos with an event, usable as relevance targets
+        self.photo_ids = []
+
+    def _item(self, i: int) -> dict:
+        if self.images and self.rng.random() < self.duplicate_ratio:
+            name = self.rng.choice(self.images)
+        else:
+            name = f"{self.run_id}-{len(self.images)}"
+            self.images.append(name)
+        return {
+            "image_url": f"{self.mock_url}/images/{name}.jpg",
+            "user_id": f"bench-user-{i % self.users}",
+            "location": {"city": "bench-city", "country": "bench-country", "latitude": 46.77, "longitude": 23.59},
+        }
+
+    def _remember(self, result) -> None:
+        if isinstance(result, dict) and result.get("photo_id") and result.get("event_id"):
+            self.photo_ids.append(result["photo_id"])
+
+    async def analyze(self, i: int) -> tuple:
+        item = self._item(i)
+        response = await self.client.post("/analyze", data={**item, "location": json.dumps(item["location"])})
+        if response.status_code == 200:
+            self._remember(response.json().get("result"))
+        return response.status_code, parse_server_timing(response.headers.get("server-timing"))
+
+    async def batch(self, i: int) -> tuple:
+        items = [self._item(i * self.batch_size + k) for k in range(self.batch_size)]
+        status = 0
+        async with self.client.stream("POST", "/analyze/batch", json={"items": items}) as response:
+            status = response.status_code
+            if status != 200:
+                await response.aread()
+                return status, {}
+            async for line in response.aiter_lines():
+                if not line:
+                    continue
+                outcome = json.loads(line)
+                if outcome.get("success"):
+                    self._remember(outcome.get("result"))
+                elif status == 200:
+                    # Report the batch with the status of its first failed item
+                    status = outcome.get("status") or 500
+        return status, {}
+
+    async def relevance(self, i: int) -> tuple:
+        params = {
+            "photo_id": self.rng.choice(self.photo_ids),
+            "user_id": f"bench-user-{i % self.users}",
+            "message": self.rng.choice(MESSAGES),
+            "submit_type": "report" if i % 5 == 0 else "message",
+        }
+        response = await self.client.post("/relevance-analyze", params=params)
+        return response.status_code, parse_server_timing(response.headers.get("server-timing"))
+
+
+async def _sample(send, i: int) -> dict:
+    start = time.perf_counter()
+    try:
+        status, stages = await send(i)
+    except httpx.HTTPError as e:
+        print(f"Request {i} failed: {e}", file=sys.stderr)
+        status, stages = 0, {}
+    return {"status": status, "latency_ms": (time.perf_counter() - start) * 1000, "stages": stages}
+
+
+async def run_requests(send, total: int, concurrency: int = 16, rate: float = None) -> tuple:
+    """
+    Send `total` requests and return (samples, elapsed seconds).
+
+    :param send: Coroutine function taking the request index, returning (status, stages).
+    :param concurrency: Closed-loop workers, each sending its next request when the last one finished.
+    :param rate: Open-loop requests per second instead; requests are sent on schedule however many are in flight.
+    """
+    start = time.perf_counter()
+    if rate:
+        async def scheduled(i):
+            await asyncio.sleep(max(0.0, start + i / rate - time.perf_counter()))
+            return await _sample(send, i)
+        samples = await asyncio.gather(*(scheduled(i) for i in range(total)))
+        return list(samples), time.perf_counter() - start
+
+    samples = []
+    counter = iter(range(total))
+
+    async def worker():
+        for i in counter:
+            samples.append(await _sample(send, i))
+
+    await asyncio.gather(*(worker() for _ in range(min(concurrency, total))))
+    return samples, time.perf_counter() - start
+
+
+async def _mock_stats(mock_url: str, reset: bool = False) -> dict:
+    async with httpx.AsyncClient(base_url=mock_url) as mock:
+        try:
+            if reset:
+                await mock.post("/stats/reset")
+                return {}
+            return (await mock.get("/stats")).json()
+        except httpx.HTTPError as e:
+            print(f"Mock stats unavailable: {e}", file=sys.stderr)
+            return {}
+
+
+async def run_benchmark(client: httpx.AsyncClient, args) -> dict:
+    """
+    Run the selected scenarios one after another and return the report.
+    """
+    generator = LoadGenerator(client, args.mock_url, args.duplicate_ratio, args.batch_size, args.users, args.seed)
+    if args.warmup:
+        # Warms connection pools and gives the relevance scenario photos to comment on
+        await run_requests(generator.analyze, args.warmup, args.concurrency)
+    await _mock_stats(args.mock_url, reset=True)
+
+    report = {"scenarios": {}, "config": {
+        k: getattr(args, k) for k in ("requests", "concurrency", "rate", "batch_size", "duplicate_ratio")
+    }}
+    for name in args.scenarios:
+        if name == "relevance" and not generator.photo_ids:
+            print("Skipping relevance: no analyzed photo with an event (use --warmup or run analyze first)",
+                  file=sys.stderr)
+            continue
+        samples, elapsed = await run_requests(getattr(generator, name), args.requests, args.concurrency, args.rate)
+        report["scenarios"][name] = summarize(samples, elapsed)
+    report["model"] = await _mock_stats(args.mock_url)
+    return report
+
+
+def start_mock(port: int, latency: str, seed: int = None):
+    """
+    Run the mock server on a background thread; returns the uvicorn server (set should_exit to stop it).
+    """
+    import uvicorn
+    from bench.mock_openai import create_app
+
+    server = uvicorn.Server(uvicorn.Config(create_app(latency, seed=seed), host="127.0.0.1", port=port,
+                                           log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+async def main_async(args) -> dict:
+    timeout = httpx.Timeout(args.timeout)
+    limits = httpx.Limits(max_connections=max(args.concurrency, 100))
+    if not args.in_process:
+        async with httpx.AsyncClient(base_url=args.url, timeout=timeout, limits=limits) as client:
+            return await run_benchmark(client, args)
+
+    # Imported late so OPENAI_BASE_URL and friends are set before the app reads them
+    import server
+    await server.app.router.startup()
+    try:
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://app", timeout=timeout) as client:
+            return await run_benchmark(client, args)
+    finally:
+        await server.app.router.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the API against the mock model server.')
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument('--url', default='http://127.0.0.1:8000', help='Base URL of a running API server')
+    target.add_argument('--in-process', action='store_true', help='Drive the FastAPI app in this process')
+    parser.add_argument('--mock-url', default='http://127.0.0.1:8100', help='Base URL of the mock server')
+    parser.add_argument('--start-mock', action='store_true', help='Start the mock server in this process')
+    parser.add_argument('--mock-latency', default='lognormal:800:0.4', help='Latency spec for --start-mock')
+    parser.add_argument('--scenario', default='analyze,relevance',
+                        help=f'Comma-separated scenarios to run in order ({", ".join(SCENARIOS)})')
+    parser.add_argument('--requests', type=int, default=200, help='Requests per scenario')
+    parser.add_argument('--concurrency', type=int, default=16, help='Closed-loop concurrent requests')
+    parser.add_argument('--rate', type=float, help='Open-loop requests per second (overrides --concurrency)')
+    parser.add_argument('--batch-size', type=int, default=10, help='Items per /analyze/batch request')
+    parser.add_argument('--duplicate-ratio', type=float, default=0.0,
+                        help='Fraction of images that repeat an earlier one (exercises dedup)')
+    parser.add_argument('--users', type=int, default=50, help='Distinct user ids')
+    parser.add_argument('--warmup', type=int, default=10, help='Analyze requests sent before measuring')
+    parser.add_argument('--timeout', type=float, default=120, help='Per-request timeout in seconds')
+    parser.add_argument('--seed', type=int, help='Random seed for reproducible runs')
+    parser.add_argument('--json', help='Write the report to this file')
+    parser.add_argument('--baseline', help='Compare against a report saved with --json')
+    args = parser.parse_args()
+
+    args.scenarios = [s.strip() for s in args.scenario.split(',') if s.strip()]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"Unknown scenario(s): {', '.join(sorted(unknown))}")
+
+    mock = None
+    if args.start_mock:
+        port = httpx.URL(args.mock_url).port or 8100
+        mock = start_mock(port, args.mock_latency, args.seed)
+    if args.in_process:
+        os.environ.setdefault("OPENAI_BASE_URL", f"{args.mock_url.rstrip('/')}/v1")
+        os.environ.setdefault("OPENAI_API_KEY", "bench")
+        # The mock's /images are on a loopback address the app refuses to fetch otherwise
+        os.environ.setdefault("IMAGE_FETCH_ALLOWED_HOSTS", httpx.URL(args.mock_url).host)
+        # No separate relevance_worker.py runs alongside the in-process app
+        os.environ.setdefault("RELEVANCE_WORKER", "embedded")
+
+    try:
+        report = asyncio.run(main_async(args))
+    finally:
+        if mock is not None:
+            mock.should_exit = True
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print(format_report(report, baseline))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == '__main__':
+    main()
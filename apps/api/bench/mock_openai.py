@@ -0,0 +1,294 @@
+"""
+OpenAI-compatible mock server for benchmarks.
+
+POST /v1/chat/completions answers with valid tool calls for the vision agent
+(IssueReport, WellMaintainedReport or IrrelevantImage, through instructor's
+"Response" wrapper or the named report_issue/log_well_maintained/
+irrelevant_image tools used by batch requests) and for the relevance agent
+(RelevanceAnalysis), after a delay drawn from a configurable latency
+distribution. GET /images/<name> serves deterministic fake image bytes so the
+fetch, dedup and preprocessing path runs without S3 (real JPEGs when Pillow
+is installed), and GET /stats reports what the mock saw.
+
+Point the app at it with OPENAI_BASE_URL=http://127.0.0.1:8100/v1.
+
+Usage:
+  python -m bench.mock_openai [--port 8100] [--latency lognormal:800:0.4]
+                              [--mix issue=6,maintenance=3,irrelevant=1] [--error-rate 0.01]
+                              [--image-size 1600x1200] [--seed N]
+
+Latency specs (milliseconds): fixed:MS, uniform:LO:HI, normal:MEAN:SD, lognormal:MEDIAN:SIGMA.
+"""
+import argparse
+import asyncio
+import hashlib
+import io
+import json
+import math
+import random
+import time
+import uuid
+from datetime import datetime
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+
+from bench.report import latency_summary
+
+try:
+    from PIL import Image, ImageDraw
+except ImportError:  # Pillow is optional; the app then skips preprocessing too
+    Image = None
+
+# Tool names the vision agent's batch requests use, per result kind
+VISION_TOOLS = {"issue": "report_issue", "maintenance": "log_well_maintained", "irrelevant": "irrelevant_image"}
+ISSUE_CATEGORIES = ("pothole", "graffiti", "broken_streetlight", "overflowing_bin")
+MAINTENANCE_CATEGORIES = ("bench", "pedestrian_crossing", "playground")
+
+
+class LatencyDistribution:
+    """
+    Samples response delays in milliseconds from a spec such as 'lognormal:800:0.4'.
+    """
+
+    def __init__(self, spec: str):
+        kind, *params = spec.split(":")
+        try:
+            values = [float(p) for p in params]
+        except ValueError:
+            raise ValueError(f"Invalid latency spec: {spec}")
+        expected = {"fixed": 1, "uniform": 2, "normal": 2, "lognormal": 2}
+        if kind not in expected or len(values) != expected[kind]:
+            raise ValueError(f"Invalid latency spec: {spec}")
+        self.spec = spec
+        self.kind = kind
+        self.values = values
+
+    def sample(self, rng: random.Random) -> float:
+        if self.kind == "fixed":
+            return self.values[0]
+        if self.kind == "uniform":
+            return rng.uniform(*self.values)
+        if self.kind == "normal":
+            return max(0.0, rng.gauss(*self.values))
+        median, sigma = self.values
+        return rng.lognormvariate(math.log(median), sigma) if median > 0 else 0.0
+
+
+def parse_mix(spec: str) -> dict:
+    """
+    Parse 'issue=6,maintenance=3,irrelevant=1' into relative weights.
+    """
+    mix = {}
+    for part in spec.split(","):
+        kind, _, weight = part.partition("=")
+        if kind not in VISION_TOOLS:
+            raise ValueError(f"Unknown result kind in mix: {kind}")
+        mix[kind] = float(weight or 1)
+    return mix
+
+
+def _message_field(messages: list, field: str) -> str:
+    prefix = f"{field}: "
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, str) and content.startswith(prefix):
+            return content[len(prefix):]
+    return ""
+
+
+def _tool_names(body: dict) -> list:
+    choice = body.get("tool_choice")
+    if isinstance(choice, dict):
+        return [choice["function"]["name"]]
+    return [tool["function"]["name"] for tool in body.get("tools") or []]
+
+
+class MockModel:
+    """
+    Builds completions and keeps the statistics reported by /stats.
+    """
+
+    def __init__(self, latency: str = "fixed:0", mix: dict = None, error_rate: float = 0.0, seed: int = None):
+        self.latency = LatencyDistribution(latency)
+        self.mix = mix or {"issue": 6, "maintenance": 3, "irrelevant": 1}
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.reset()
+
+    def reset(self) -> None:
+        self.requests = 0
+        self.errors = 0
+        self.kinds = {}
+        self.latencies = []
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "kinds": dict(self.kinds),
+            "latency_ms": latency_summary(self.latencies),
+        }
+
+    def _vision_arguments(self, kind: str, messages: list) -> dict:
+        photo_id = _message_field(messages, "photo_id")
+        city_id = _message_field(messages, "city_id")
+        now = datetime.now().isoformat()
+        if kind == "issue":
+            category = self.rng.choice(ISSUE_CATEGORIES)
+            return {
+                "type": "issue", "city_id": city_id, "photo_id": photo_id,
+                "name": category.replace("_", " ").title(), "description": f"Benchmark {category}",
+                "inspected_at": now, "category": category,
+                "category_description": f"Benchmark category {category}",
+                "severity": self.rng.choice(("low", "medium", "high")),
+                "severity_score": round(self.rng.random(), 2), "reported_at": now, "status": "open",
+            }
+        if kind == "maintenance":
+            return {
+                "type": "well_maintained", "city_id": city_id, "photo_id": photo_id,
+                "event_id": str(uuid.uuid4()), "description": "Benchmark well-maintained element",
+                "inspected_at": now, "status": "good", "condition_score": round(self.rng.random(), 2),
+                "category": self.rng.choice(MAINTENANCE_CATEGORIES),
+            }
+        return {"type": "irrelevant", "photo_id": photo_id, "reason": "No civic infrastructure visible",
+                "confidence": round(self.rng.uniform(0.6, 1.0), 2)}
+
+    def _relevance_arguments(self, messages: list) -> dict:
+        try:
+            request = json.loads(messages[-1]["content"])
+        except (KeyError, IndexError, TypeError, ValueError):
+            request = {}
+        return {
+            "reason": "Benchmark relevance score", "additional_info": request.get("additional_info") or "",
+            "delta_score": self.rng.randint(-10, 10), "confidence": round(self.rng.random(), 2),
+            "message": request.get("message") or "", "submit_type": request.get("submit_type") or "message",
+        }
+
+    def complete(self, body: dict) -> tuple:
+        """
+        Return (status_code, response body) for a chat completion request.
+        """
+        if self.error_rate and self.rng.random() < self.error_rate:
+            status = self.rng.choice((429, 500))
+            return status, {"error": {"message": f"mock {status}", "type": "mock_error", "code": str(status)}}
+        names = _tool_names(body)
+        messages = body.get("messages") or []
+        if "RelevanceAnalysis" in names:
+            kind, name, arguments = "relevance", "RelevanceAnalysis", self._relevance_arguments(messages)
+        else:
+            kind = self.rng.choices(list(self.mix), weights=list(self.mix.values()))[0]
+            arguments = self._vision_arguments(kind, messages)
+            if VISION_TOOLS[kind] in names:
+                name = VISION_TOOLS[kind]
+            elif names:
+                # instructor wraps a Union response model in a single tool with a 'content' field
+                name, arguments = names[0], {"content": arguments}
+            else:
+                return 400, {"error": {"message": "mock expects a tool call request", "type": "invalid_request_error"}}
+        self.kinds[kind] = self.kinds.get(kind, 0) + 1
+        prompt_tokens = len(json.dumps(messages)) // 4
+        return 200, {
+            "id": f"chatcmpl-mock-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "mock"),
+            "choices": [{
+                "index": 0,
+                "finish_reason": "tool_calls",
+                "message": {
+                    "role": "assistant",
+                    "content": None,
+                    "tool_calls": [{
+                        "id": f"call_{uuid.uuid4().hex[:24]}",
+                        "type": "function",
+                        "function": {"name": name, "arguments": json.dumps(arguments)},
+                    }],
+                },
+            }],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": 80, "total_tokens": prompt_tokens + 80},
+        }
+
+
+def fake_image(name: str, size: tuple = (1600, 1200)) -> bytes:
+    """
+    Deterministic image for a name: the same name gives the same bytes, different
+    names give visually different JPEGs (or opaque bytes without Pillow).
+    """
+    digest = hashlib.sha256(name.encode()).digest()
+    if Image is None:
+        return b"\xff\xd8\xff\xe0" + digest * (size[0] * size[1] // 256)
+    width, height = size
+    image = Image.new("RGB", size, tuple(digest[:3]))
+    draw = ImageDraw.Draw(image)
+    for i in range(3, 30, 6):
+        x, y = digest[i] * width // 256, digest[i + 1] * height // 256
+        draw.rectangle((x, y, x + width // 4, y + height // 4), fill=tuple(digest[i + 2:i + 5]))
+    out = io.BytesIO()
+    image.save(out, "JPEG", quality=85)
+    return out.getvalue()
+
+
+def create_app(
+    latency: str = "fixed:0",
+    mix: dict = None,
+    error_rate: float = 0.0,
+    image_size: tuple = (1600, 1200),
+    seed: int = None,
+) -> FastAPI:
+    """
+    Build the mock server app.
+    """
+    app = FastAPI(title="Mock OpenAI")
+    model = app.state.model = MockModel(latency, mix, error_rate, seed)
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        started = time.perf_counter()
+        body = await request.json()
+        await asyncio.sleep(model.latency.sample(model.rng) / 1000)
+        status, payload = model.complete(body)
+        model.requests += 1
+        if status != 200:
+            model.errors += 1
+        model.latencies.append((time.perf_counter() - started) * 1000)
+        return JSONResponse(payload, status_code=status)
+
+    @app.get("/images/{name}")
+    async def image(name: str):
+        return Response(fake_image(name, image_size), media_type="image/jpeg")
+
+    @app.get("/stats")
+    async def stats():
+        return model.stats()
+
+    @app.post("/stats/reset")
+    async def reset_stats():
+        model.reset()
+        return {"reset": True}
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run an OpenAI-compatible mock server for benchmarks.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8100)
+    parser.add_argument('--latency', default='lognormal:800:0.4',
+                        help='Latency distribution in ms (fixed:MS, uniform:LO:HI, normal:MEAN:SD, lognormal:MEDIAN:SIGMA)')
+    parser.add_argument('--mix', default='issue=6,maintenance=3,irrelevant=1',
+                        help='Relative weights of vision results')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='Fraction of requests answered with 429/500')
+    parser.add_argument('--image-size', default='1600x1200',
+                        help='WIDTHxHEIGHT of the fake images served under /images')
+    parser.add_argument('--seed', type=int, help='Random seed for reproducible runs')
+    args = parser.parse_args()
+
+    import uvicorn
+    image_size = tuple(int(v) for v in args.image_size.lower().split("x"))
+    app = create_app(args.latency, parse_mix(args.mix), args.error_rate, image_size, args.seed)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+if __name__ == '__main__':
+    main()
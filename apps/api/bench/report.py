@@ -0,0 +1,101 @@
+"""
+Summaries and text reports for benchmark runs.
+
+A run is summarized into a plain dict (throughput, latency percentiles,
+status counts and per-stage percentiles) so it can be saved as JSON and used
+as the baseline for later runs.
+"""
+import math
+from typing import Optional
+
+
+def percentile(values: list, q: float) -> Optional[float]:
+    """
+    Nearest-rank percentile (q in 0..100) of the values, or None if empty.
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def latency_summary(values: list) -> dict:
+    """
+    Count, mean and p50/p95/p99/max of a list of milliseconds.
+    """
+    return {
+        "count": len(values),
+        "mean": round(sum(values) / len(values), 1) if values else None,
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "max": max(values) if values else None,
+    }
+
+
+def summarize(samples: list, elapsed: float) -> dict:
+    """
+    Summarize request samples of one scenario.
+
+    :param samples: Dicts with 'status' (HTTP status or 0 for transport errors),
+                    'latency_ms' and 'stages' ({stage: ms} from Server-Timing).
+    :param elapsed: Wall-clock seconds of the run.
+    """
+    statuses = {}
+    for sample in samples:
+        statuses[str(sample["status"])] = statuses.get(str(sample["status"]), 0) + 1
+    ok = [s for s in samples if 200 <= s["status"] < 300]
+    stage_values = {}
+    for sample in ok:
+        for name, ms in sample.get("stages", {}).items():
+            stage_values.setdefault(name, []).append(ms)
+    return {
+        "requests": len(samples),
+        "ok": len(ok),
+        "errors": len(samples) - len(ok),
+        "elapsed_s": round(elapsed, 2),
+        "throughput_rps": round(len(ok) / elapsed, 2) if elapsed > 0 else None,
+        "statuses": statuses,
+        "latency_ms": latency_summary([s["latency_ms"] for s in ok]),
+        "stages_ms": {name: latency_summary(values) for name, values in sorted(stage_values.items())},
+    }
+
+
+def _fmt(value) -> str:
+    if value is None:
+        return "-"
+    if isinstance(value, float):
+        return f"{value:.1f}" if abs(value) >= 1 else f"{value:.3f}"
+    return str(value)
+
+
+def _delta(value, base) -> str:
+    if value is None or not base:
+        return ""
+    return f" ({(value - base) / base * 100:+.0f}%)"
+
+
+def format_report(report: dict, baseline: dict = None) -> str:
+    """
+    Render a run report (one summary per scenario) as text, with relative
+    changes against a baseline report when given.
+    """
+    lines = []
+    for scenario, summary in report["scenarios"].items():
+        base = (baseline or {}).get("scenarios", {}).get(scenario, {})
+        lat, base_lat = summary["latency_ms"], base.get("latency_ms", {})
+        lines.append(f"== {scenario}: {summary['ok']}/{summary['requests']} ok in {summary['elapsed_s']}s, "
+                     f"{_fmt(summary['throughput_rps'])} req/s{_delta(summary['throughput_rps'], base.get('throughput_rps'))}")
+        lines.append(f"   statuses: {summary['statuses']}")
+        lines.append("   latency ms   " + "  ".join(
+            f"{k}={_fmt(lat[k])}{_delta(lat[k], base_lat.get(k))}" for k in ("p50", "p95", "p99", "max")))
+        for name, stage in summary["stages_ms"].items():
+            base_stage = base.get("stages_ms", {}).get(name, {})
+            lines.append(f"   {name:<12} " + "  ".join(
+                f"{k}={_fmt(stage[k])}{_delta(stage[k], base_stage.get(k))}" for k in ("p50", "p95", "p99")))
+    model = report.get("model")
+    if model:
+        lines.append(f"== mock model: {model.get('requests')} requests, latency ms "
+                     + "  ".join(f"{k}={_fmt(model['latency_ms'].get(k))}" for k in ("p50", "p95", "p99")))
+    return "\n".join(lines)
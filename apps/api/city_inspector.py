@@ -16,10 +16,10 @@ _SCHEMA_DIR = Path(__file__).parents[1] / "schemas"
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
 
-from db.crud.read_nodes import read_nodes
+from db.crud.categories import get_categories
 
 def _load(name, etype):
-    nodes = read_nodes("Category")
+    nodes = get_categories()
     schema = json.loads((_SCHEMA_DIR/name).read_text())
     # Filter by event_type if needed
     filtered_nodes = [n for n in nodes if n.get("event_type") == etype] if etype else nodes
@@ -1,28 +1,41 @@
 """
 Utility functions for interacting with the Neo4j database.
 """
-from db.neo4j import get_session
+from db.neo4j import get_session, get_async_session
 from db.crud.create_nodes import (
-    add_node, add_city, add_detection_event, add_photo, add_analyzer,
+    add_node, add_nodes_bulk, add_city, add_detection_event, add_photo, add_analyzer,
     add_category, add_department, add_solution, add_user, add_message, add_report
 )
 from db.crud.create_edges import (
-    add_relationship, add_uploaded_photo, add_captured_in, add_analyzed,
+    add_relationship, add_relationships_bulk, add_uploaded_photo, add_captured_in, add_analyzed,
     add_triggers_event, add_in_category, add_handled_by,
     add_operates_in, add_has_solution, add_proposed_by, add_message_for, add_report_for
 )
 from db.crud.read_nodes import read_nodes
-from db.crud.update_nodes import update_photo_relevance_score, delete_photo_and_event, export_high_score
+from db.crud.update_nodes import (
+    update_photo_relevance_score, delete_photo_and_event, export_high_score, update_message_analyses
+)
+from db.crud.ingest import ingest_photo_context, ingest_photos_bulk, set_photo_content_hash
+from db.crud.events import record_issue, record_maintenance, record_irrelevant, link_photo_to_event
+from db.crud.query_cache import query_cache
+from db.crud.categories import get_categories, get_category_names, invalidate_categories
+from db.crud import aio
 
 __all__ = [
-    "get_session",
-    "add_node", "add_city", "add_detection_event", "add_photo", "add_analyzer",
+    "get_session", "get_async_session",
+    "add_node", "add_nodes_bulk", "add_city", "add_detection_event", "add_photo", "add_analyzer",
     "add_category", "add_department", "add_solution", "add_user", "add_message", "add_report",
-    "add_relationship", "add_uploaded_photo", "add_captured_in", "add_analyzed",
+    "add_relationship", "add_relationships_bulk", "add_uploaded_photo", "add_captured_in", "add_analyzed",
     "add_triggers_event", "add_in_category", "add_handled_by",
     "add_operates_in", "add_has_solution", "add_proposed_by", "add_message_for", "add_report_for",
     "read_nodes",
     "update_photo_relevance_score",
     "delete_photo_and_event",
     "export_high_score",
+    "update_message_analyses",
+    "ingest_photo_context", "ingest_photos_bulk", "set_photo_content_hash",
+    "record_issue", "record_maintenance", "record_irrelevant", "link_photo_to_event",
+    "query_cache",
+    "get_categories", "get_category_names", "invalidate_categories",
+    "aio",
 ]
\ No newline at end of file
@@ -0,0 +1,443 @@
+"""
+Async counterparts of the db.crud functions, built on the shared async Neo4j driver.
+
+The functions mirror the synchronous API (same names, arguments and return
+values) so FastAPI endpoints and tool handlers can await them directly on the
+event loop instead of pushing blocking driver calls into worker threads.
+"""
+from datetime import datetime
+from typing import Optional, Any
+
+import db.crud as crud
+from db.crud.categories import category_cache
+from db.crud.create_nodes import build_node_query, photo_props_with_score
+from db.crud.create_edges import build_relationship_query
+from db.crud import events, reprocess
+from db.crud.ingest import _CONTENT_HASH_QUERY, _INGEST_QUERY, build_ingest_params
+from db.crud.update_nodes import _MESSAGE_ANALYSES_QUERY
+from utils.metrics import crud_call
+
+# --- Generic helpers ---
+
+@crud_call
+async def add_node(label: str, id_prop: str, props: dict) -> dict:
+    """
+    Create or update a node with the given label and properties.
+
+    :param label: The Neo4j node label.
+    :param id_prop: The name of the unique identifier property.
+    :param props: A dict of properties, must include id_prop.
+    :return: The created or updated node.
+    """
+    query_str, parameters = build_node_query(label, id_prop, props)
+    async with crud.get_async_session() as s:
+        result = await s.run(query_str, **parameters)
+        record = await result.single()
+        return record.get("n") if record else None
+
+@crud_call
+async def add_relationship(
+    start_label: str,
+    start_id_prop: str,
+    start_id: str,
+    rel_type: str,
+    end_label: str,
+    end_id_prop: str,
+    end_id: str,
+    props: dict = None,
+) -> dict:
+    """
+    Create or update a relationship of given type between two existing nodes.
+
+    :return: The created or updated relationship, or None if nodes not found.
+    """
+    query_str, parameters = build_relationship_query(
+        start_label, start_id_prop, start_id,
+        rel_type,
+        end_label, end_id_prop, end_id,
+        props,
+    )
+    async with crud.get_async_session() as s:
+        result = await s.run(query_str, **parameters)
+        record = await result.single()
+        return record.get("r") if record else None
+
+@crud_call
+async def read_nodes(label: str) -> list:
+    """
+    Retrieve all nodes with the given label.
+
+    :param label: The Neo4j node label to query.
+    :return: List of matching node records.
+    """
+    async with crud.get_async_session() as s:
+        result = await s.run(f"MATCH (n:{label}) RETURN n")
+        if result is None:
+            return []
+        return [record.get("n") async for record in result]
+
+@crud_call
+async def search_node(label: str,
+                      property_name: str,
+                      property_value: str) -> Optional[Any]:
+    """
+    Find a single node whose <property_name> equals <property_value>.
+    Returns the node or None if no match is found.
+    """
+    cypher = f"MATCH (n:{label}) WHERE n.{property_name} = $value RETURN n"
+    async with crud.get_async_session() as s:
+        result = await s.run(cypher, value=property_value)
+        record = await result.single()
+        return record["n"] if record else None
+
+# --- Nodes ---
+
+async def add_city(props: dict) -> dict:
+    return await add_node("City", "city_id", props)
+
+async def add_detection_event(props: dict) -> dict:
+    return await add_node("DetectionEvent", "event_id", props)
+
+async def add_issue(props: dict) -> dict:
+    return await add_node("Issue", "event_id", props)
+
+async def add_maintenance(props: dict) -> dict:
+    return await add_node("Maintenance", "event_id", props)
+
+async def add_photo(props: dict) -> dict:
+    return await add_node("Photo", "photo_id", photo_props_with_score(props))
+
+async def add_analyzer(props: dict) -> dict:
+    return await add_node("Analyzer", "analyzer_id", props)
+
+async def add_category(props: dict) -> dict:
+    node = await add_node("Category", "category_id", props)
+    # Keep the in-process category catalogue in sync
+    category_cache.put(dict(node) if node else props)
+    return node
+
+async def add_department(props: dict) -> dict:
+    return await add_node("Department", "department_id", props)
+
+async def add_solution(props: dict) -> dict:
+    return await add_node("Solution", "solution_id", props)
+
+async def add_user(props: dict) -> dict:
+    return await add_node("User", "user_id", props)
+
+async def add_message(props: dict) -> dict:
+    return await add_node("Message", "message_id", props)
+
+async def add_report(props: dict) -> dict:
+    return await add_node("Report", "report_id", props)
+
+# --- Relationships ---
+
+def _require(props: dict, required: list, rel_type: str) -> None:
+    for key in required:
+        if key not in props:
+            raise ValueError(f"Property '{key}' is required for {rel_type} relationship")
+
+async def add_uploaded_photo(props: dict) -> dict:
+    _require(props, ["user_id", "photo_id", "uploadedAt", "device", "userNotes"], "UPLOADED_PHOTO")
+    rel_props = {k: props[k] for k in ["uploadedAt", "device", "userNotes"]}
+    return await add_relationship(
+        "User", "user_id", props["user_id"],
+        "UPLOADED_PHOTO",
+        "Photo", "photo_id", props["photo_id"],
+        rel_props
+    )
+
+async def add_captured_in(props: dict) -> dict:
+    _require(props, ["photo_id", "city_id"], "CAPTURED_IN")
+    return await add_relationship(
+        "Photo", "photo_id", props["photo_id"],
+        "CAPTURED_IN",
+        "City", "city_id", props["city_id"],
+        None
+    )
+
+async def add_analyzed(props: dict) -> dict:
+    _require(props, ["analyzer_id", "photo_id", "notes", "method", "confidence", "reasoning", "analyzedAt"], "ANALYZED")
+    rel_props = {k: props[k] for k in ["notes", "method", "confidence", "reasoning", "analyzedAt"]}
+    return await add_relationship(
+        "Analyzer", "analyzer_id", props["analyzer_id"],
+        "ANALYZED",
+        "Photo", "photo_id", props["photo_id"],
+        rel_props
+    )
+
+async def add_triggers_event(props: dict) -> dict:
+    _require(props, ["photo_id", "event_id", "triggeredAt"], "TRIGGERS_EVENT")
+    return await add_relationship(
+        "Photo", "photo_id", props["photo_id"],
+        "TRIGGERS_EVENT",
+        "DetectionEvent", "event_id", props["event_id"],
+        {"triggeredAt": props["triggeredAt"]}
+    )
+
+async def add_in_category(props: dict) -> dict:
+    _require(props, ["event_id", "category_id"], "IN_CATEGORY")
+    return await add_relationship(
+        "DetectionEvent", "event_id", props["event_id"],
+        "IN_CATEGORY",
+        "Category", "category_id", props["category_id"],
+        None
+    )
+
+async def add_handled_by(props: dict) -> dict:
+    _require(props, ["category_id", "department_id"], "HANDLED_BY")
+    return await add_relationship(
+        "Category", "category_id", props["category_id"],
+        "HANDLED_BY",
+        "Department", "department_id", props["department_id"],
+        None
+    )
+
+async def add_operates_in(props: dict) -> dict:
+    _require(props, ["department_id", "city_id"], "OPERATES_IN")
+    return await add_relationship(
+        "Department", "department_id", props["department_id"],
+        "OPERATES_IN",
+        "City", "city_id", props["city_id"],
+        None
+    )
+
+async def add_has_solution(props: dict) -> dict:
+    _require(props, ["event_id", "solution_id", "proposedAt", "rank"], "HAS_SOLUTION")
+    rel_props = {k: props[k] for k in ["proposedAt", "rank"]}
+    return await add_relationship(
+        "DetectionEvent", "event_id", props["event_id"],
+        "HAS_SOLUTION",
+        "Solution", "solution_id", props["solution_id"],
+        rel_props
+    )
+
+async def add_proposed_by(props: dict) -> dict:
+    _require(props, ["solution_id", "user_id", "proposedAt"], "PROPOSED_BY")
+    return await add_relationship(
+        "Solution", "solution_id", props["solution_id"],
+        "PROPOSED_BY",
+        "User", "user_id", props["user_id"],
+        {"proposedAt": props["proposedAt"]}
+    )
+
+async def add_message_for(props: dict) -> dict:
+    """
+    Create relationships from a Message node to a Photo and a User.
+    The WROTE_MESSAGE edge is only created when 'user_id' is provided.
+    """
+    rel1 = await add_relationship(
+        "Message", "message_id", props["message_id"],
+        "ABOUT_PHOTO",
+        "Photo", "photo_id", props["photo_id"],
+        None
+    )
+    rel2 = None
+    if props.get("user_id"):
+        rel2 = await add_relationship(
+            "User", "user_id", props["user_id"],
+            "WROTE_MESSAGE",
+            "Message", "message_id", props["message_id"],
+            None
+        )
+    return {"about_photo": rel1, "wrote_message": rel2}
+
+async def add_report_for(props: dict) -> dict:
+    """
+    Create relationships from a Report node to a Photo and a User.
+    """
+    rel1 = await add_relationship(
+        "Report", "report_id", props["report_id"],
+        "REPORTS_PHOTO",
+        "Photo", "photo_id", props["photo_id"],
+        None
+    )
+    rel2 = await add_relationship(
+        "User", "user_id", props["user_id"],
+        "SUBMITTED_REPORT",
+        "Report", "report_id", props["report_id"],
+        None
+    )
+    return {"reports_photo": rel1, "submitted_report": rel2}
+
+# --- Updates and lookups ---
+
+@crud_call
+async def update_photo_relevance_score(photo_id: str, new_score: float) -> None:
+    """
+    Update the relevance_score property of a Photo node.
+    """
+    async with crud.get_async_session() as s:
+        await s.run(
+            "MATCH (p:Photo {photo_id: $photo_id}) "
+            "SET p.relevance_score = $new_score",
+            photo_id=photo_id,
+            new_score=new_score,
+        )
+
+@crud_call
+async def update_message_analyses(rows: list) -> None:
+    """
+    Write analyzer results to many Message nodes in one transaction and add
+    their delta_score to the score of the Photo each message is about.
+
+    :param rows: List of {"id": message_id, "props": {...}} dicts.
+    """
+    if not rows:
+        return
+    async with crud.get_async_session() as s:
+        await s.run(_MESSAGE_ANALYSES_QUERY, rows=rows)
+
+@crud_call
+async def delete_photo_and_event(photo_id: str) -> None:
+    """
+    Delete a Photo node and its linked Issue or Maintenance event.
+    """
+    async with crud.get_async_session() as s:
+        await s.run(
+            "MATCH (p:Photo {photo_id: $photo_id})-[:TRIGGERS_EVENT]->(e:Issue) "
+            "DETACH DELETE e",
+            photo_id=photo_id,
+        )
+        await s.run(
+            "MATCH (p:Photo {photo_id: $photo_id})-[:CONTAINS]->(e:Maintenance) "
+            "DETACH DELETE e",
+            photo_id=photo_id,
+        )
+        await s.run(
+            "MATCH (p:Photo {photo_id: $photo_id}) DETACH DELETE p",
+            photo_id=photo_id,
+        )
+
+@crud_call
+async def get_photo_and_event(photo_id: str):
+    """
+    Fetch the photo node and its connected Issue or Maintenance node in one query.
+    Returns a tuple: (photo_dict, event_dict, event_type) or (None, None, None) if not found.
+    """
+    async with crud.get_async_session() as s:
+        result = await s.run(
+            "MATCH (p:Photo {photo_id: $photo_id}) "
+            "OPTIONAL MATCH (p)-[:TRIGGERS_EVENT]->(i:Issue) "
+            "OPTIONAL MATCH (p)-[:CONTAINS]->(m:Maintenance) "
+            "RETURN p, i, m LIMIT 1",
+            photo_id=photo_id,
+        )
+        rec = await result.single()
+    if not rec:
+        return None, None, None
+    if rec["i"] is not None:
+        return dict(rec["p"]), dict(rec["i"]), "issue"
+    if rec["m"] is not None:
+        return dict(rec["p"]), dict(rec["m"]), "maintenance"
+    return dict(rec["p"]), None, None
+
+@crud_call
+async def ingest_photo_context(
+    image_url: str,
+    user: dict,
+    location: dict,
+    photo_id: str = None,
+    device: str = "api",
+    user_notes: str = "",
+    content_hash: str = None,
+) -> dict:
+    """
+    Upsert City, User and Photo and link them with UPLOADED_PHOTO in one transaction.
+
+    :return: Dict with keys 'city', 'user', 'photo', 'uploaded_photo' and 'photo_id'.
+    """
+    params = build_ingest_params(image_url, user, location, photo_id, device, user_notes, content_hash)
+    async with crud.get_async_session() as s:
+        result = await s.run(_INGEST_QUERY, **params)
+        record = await result.single()
+    return {
+        "city": record.get("c") if record else None,
+        "user": record.get("u") if record else None,
+        "photo": record.get("p") if record else None,
+        "uploaded_photo": record.get("r") if record else None,
+        "photo_id": params["photo_id"],
+    }
+
+@crud_call
+async def set_photo_content_hash(photo_id: str, content_hash: str) -> bool:
+    """
+    Record the SHA-256 of an ingested Photo's image.
+
+    :return: True if the Photo exists.
+    """
+    async with crud.get_async_session() as s:
+        result = await s.run(_CONTENT_HASH_QUERY, photo_id=photo_id, content_hash=content_hash)
+        record = await result.single()
+    return bool(record and record.get("count"))
+
+# --- Vision tool results ---
+
+@crud_call
+async def record_issue(params: dict) -> dict:
+    """
+    Create an Issue, merge its Category and link the Photo and City in one transaction.
+
+    :return: Dict with event_id, category_id, category_created, photo_linked and city_linked.
+    """
+    query_params = events.build_issue_params(params)
+    async with crud.get_async_session() as s:
+        result = await s.run(events._ISSUE_QUERY, **query_params)
+        record = await result.single()
+    return events.issue_result(query_params, record)
+
+@crud_call
+async def record_maintenance(params: dict) -> dict:
+    """
+    Create a Maintenance event and link the Photo and City in one transaction.
+
+    :return: Dict with event_id, photo_linked and city_linked.
+    """
+    query_params = events.build_maintenance_params(params)
+    async with crud.get_async_session() as s:
+        result = await s.run(events._MAINTENANCE_QUERY, **query_params)
+        record = await result.single()
+    return events.link_result("event_id", query_params, record)
+
+@crud_call
+async def record_irrelevant(params: dict) -> dict:
+    """
+    Create an Irrelevant node linked to its Photo in one transaction.
+
+    :return: Dict with irrelevant_id and photo_linked.
+    """
+    query_params = events.build_irrelevant_params(params)
+    async with crud.get_async_session() as s:
+        result = await s.run(events._IRRELEVANT_QUERY, **query_params)
+        record = await result.single()
+    return events.link_result("irrelevant_id", query_params, record)
+
+@crud_call
+async def link_photo_to_event(kind: str, photo_id: str, event_id: str) -> bool:
+    """
+    Link a Photo to an existing Issue, Maintenance or Irrelevant node.
+
+    :return: True if both nodes exist and were linked.
+    """
+    async with crud.get_async_session() as s:
+        result = await s.run(
+            events._LINK_QUERIES[kind], photo_id=photo_id, event_id=event_id,
+            linked_at=datetime.now().isoformat(),
+        )
+        record = await result.single()
+    return bool(record and record.get("linked"))
+
+@crud_call
+async def detach_photo_events(photo_ids: list) -> int:
+    """
+    Remove the current classification of the given photos before they are reprocessed.
+
+    :return: Number of events deleted because no photo referenced them anymore.
+    """
+    if not photo_ids:
+        return 0
+    async with crud.get_async_session() as s:
+        result = await s.run(reprocess._DETACH_EVENTS_QUERY, photo_ids=list(photo_ids))
+        record = await result.single()
+    return record.get("deleted") if record else 0
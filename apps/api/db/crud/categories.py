@@ -0,0 +1,142 @@
+"""
+In-process cache of the Category catalogue.
+
+Categories change rarely but are needed to build tool schemas for every
+analysis, so the full label scan is cached with a TTL. add_category updates the
+cache in place and invalidate_categories() drops it explicitly. Each reload or
+update bumps the cache generation; the per-event-type name lists are built once
+per generation.
+"""
+import os
+import threading
+import time
+from typing import Optional
+
+from db.crud.read_nodes import read_nodes
+from utils.metrics import record_cache
+
+# Seconds before the cached catalogue is re-read from Neo4j
+CATEGORY_CACHE_TTL = float(os.getenv("CATEGORY_CACHE_TTL", "300"))
+
+
+class CategoryCache:
+    """
+    Thread-safe TTL cache of Category nodes (stored as plain dicts).
+    """
+
+    def __init__(self, ttl: float = CATEGORY_CACHE_TTL):
+        self.ttl = ttl
+        self.generation = 0
+        self._lock = threading.Lock()
+        self._categories = None
+        self._names_by_type = {}
+        self._loaded_at = 0.0
+
+    def _is_fresh(self) -> bool:
+        return self._categories is not None and (time.monotonic() - self._loaded_at) < self.ttl
+
+    def _store(self, categories: dict, reset_clock: bool) -> None:
+        # Caller holds the lock
+        names_by_type = {}
+        for category in categories.values():
+            name = category.get("name") or category.get("category_id")
+            if name:
+                names_by_type.setdefault(category.get("event_type"), []).append(name)
+        self._categories = categories
+        self._names_by_type = {k: tuple(v) for k, v in names_by_type.items()}
+        self.generation += 1
+        if reset_clock:
+            self._loaded_at = time.monotonic()
+
+    @staticmethod
+    def _index(nodes: list) -> dict:
+        categories = {}
+        for node in nodes or []:
+            category = dict(node)
+            categories[category.get("category_id") or category.get("name")] = category
+        return categories
+
+    def get(self) -> list:
+        """
+        Return all cached categories, reloading them when the TTL has expired.
+        """
+        with self._lock:
+            fresh = self._is_fresh()
+            record_cache("category", fresh)
+            if not fresh:
+                self._store(self._index(read_nodes("Category")), reset_clock=True)
+            return list(self._categories.values())
+
+    async def aget(self) -> list:
+        """
+        Async variant of get() that reloads through the async CRUD layer.
+        """
+        fresh = self._is_fresh()
+        record_cache("category", fresh)
+        if not fresh:
+            from db.crud import aio
+            nodes = await aio.read_nodes("Category")
+            with self._lock:
+                self._store(self._index(nodes), reset_clock=True)
+        return list(self._categories.values())
+
+    def names(self, event_type: str) -> tuple:
+        """
+        Return the category names for an event type ('issue' or 'maintenance').
+        """
+        self.get()
+        return self._names_by_type.get(event_type, ())
+
+    def find(self, category_id: str) -> Optional[dict]:
+        """
+        Look up a category by id in the current snapshot without touching Neo4j.
+        Returns None when the category is unknown or the cache is not loaded.
+        """
+        categories = self._categories if self._is_fresh() else None
+        return categories.get(category_id) if categories else None
+
+    def put(self, category: dict) -> None:
+        """
+        Insert or replace a category after it was written to Neo4j.
+        Does nothing until the catalogue has been loaded once.
+        """
+        with self._lock:
+            if self._categories is None:
+                return
+            categories = dict(self._categories)
+            category = dict(category)
+            categories[category.get("category_id") or category.get("name")] = category
+            self._store(categories, reset_clock=False)
+
+    def invalidate(self) -> None:
+        """
+        Drop the cached catalogue so the next access reloads it.
+        """
+        with self._lock:
+            self._categories = None
+            self._names_by_type = {}
+            self.generation += 1
+
+
+category_cache = CategoryCache()
+
+
+def get_categories() -> list:
+    """
+    Return all Category nodes from the in-process cache.
+    """
+    return category_cache.get()
+
+
+def get_category_names(event_type: str) -> list:
+    """
+    Return the names of the categories for the given event type.
+    """
+    return list(category_cache.names(event_type))
+
+
+def invalidate_categories() -> None:
+    """
+    Evict the cached Category catalogue.
+    """
+    category_cache.invalidate()
@@ -4,13 +4,56 @@ CLI tool to create Neo4j relationships via db.crud.
 
 Usage:
   create_edges.py <rel_type> <properties_json_or_file>
+  create_edges.py --bulk <rel_type> <edges.jsonl> [--chunk-size N]
 """
 import argparse
 import json
 import sys
 
 import db.crud as crud
+from db.crud.create_nodes import BULK_CHUNK_SIZE, chunked, load_jsonl
+from db.crud.query_cache import query_cache
+from utils.metrics import crud_call
 
+def _relationship_query_text(
+    start_label: str, start_id_prop: str, rel_type: str, end_label: str, end_id_prop: str, bulk: bool
+) -> str:
+    source = "row." if bulk else "$"
+    query = []
+    if bulk:
+        query.append("UNWIND $rows AS row")
+    query += [
+        f"MATCH (a:{start_label} {{{start_id_prop}: {source}start}}),",
+        f"      (b:{end_label} {{{end_id_prop}: {source}end}})",
+        f"MERGE (a)-[r:{rel_type}]->(b)",
+        f"SET r += {source}props",
+        "RETURN count(r) AS count" if bulk else "RETURN r",
+    ]
+    return "\n".join(query)
+
+def build_relationship_query(
+    start_label: str,
+    start_id_prop: str,
+    start_id: str,
+    rel_type: str,
+    end_label: str,
+    end_id_prop: str,
+    end_id: str,
+    props: dict = None,
+) -> tuple:
+    """
+    Build the MATCH/MERGE statement and parameters used by add_relationship.
+    The query text only depends on the labels and relationship type.
+
+    :return: Tuple of (query string, parameters dict).
+    """
+    query = query_cache.get(
+        ("rel", start_label, start_id_prop, rel_type, end_label, end_id_prop),
+        lambda: _relationship_query_text(start_label, start_id_prop, rel_type, end_label, end_id_prop, False),
+    )
+    return query, {"start": start_id, "end": end_id, "props": dict(props or {})}
+
+@crud_call
 def add_relationship(
     start_label: str,
     start_id_prop: str,
@@ -34,30 +77,63 @@ def add_relationship(
     :param props: Optional dict of relationship properties.
     :return: The created or updated relationship, or None if nodes not found.
     """
-    parameters = {
-        f"start_{start_id_prop}": start_id,
-        f"end_{end_id_prop}": end_id,
-    }
-    set_clauses = []
-    if props:
-        for key, val in props.items():
-            set_clauses.append(f"r.{key} = ${key}")
-            parameters[key] = val
-    query = [
-        f"MATCH (a:{start_label} {{{start_id_prop}: $start_{start_id_prop}}}),",
-        f"      (b:{end_label} {{{end_id_prop}: $end_{end_id_prop}}})",
-        f"MERGE (a)-[r:{rel_type}]->(b)",
-    ]
-    if set_clauses:
-        query.append("SET " + ", ".join(set_clauses))
-    query.append("RETURN r")
-    query_str = "\n".join(query)
+    query_str, parameters = build_relationship_query(
+        start_label, start_id_prop, start_id,
+        rel_type,
+        end_label, end_id_prop, end_id,
+        props,
+    )
     session = crud.get_session()
     with session as s:
         result = s.run(query_str, **parameters)
         record = result.single()
         return record.get("r") if record else None
 
+def build_bulk_relationship_query(
+    start_label: str,
+    start_id_prop: str,
+    rel_type: str,
+    end_label: str,
+    end_id_prop: str,
+) -> str:
+    """
+    Return the UNWIND/MATCH/MERGE statement used by add_relationships_bulk.
+    Each row is {"start": id, "end": id, "props": {...}}.
+    """
+    return query_cache.get(
+        ("bulk_rel", start_label, start_id_prop, rel_type, end_label, end_id_prop),
+        lambda: _relationship_query_text(start_label, start_id_prop, rel_type, end_label, end_id_prop, True),
+    )
+
+@crud_call
+def add_relationships_bulk(
+    start_label: str,
+    start_id_prop: str,
+    rel_type: str,
+    end_label: str,
+    end_id_prop: str,
+    rows: list,
+    chunk_size: int = BULK_CHUNK_SIZE,
+) -> int:
+    """
+    Create or update many relationships with one UNWIND statement per chunk.
+
+    :param rows: List of {"start": start_id, "end": end_id, "props": dict or None}.
+    :param chunk_size: Maximum rows per statement.
+    :return: Number of relationships written (rows whose nodes were not found are skipped).
+    """
+    if not rows:
+        return 0
+    rows = [{"start": r["start"], "end": r["end"], "props": r.get("props") or {}} for r in rows]
+    query_str = build_bulk_relationship_query(start_label, start_id_prop, rel_type, end_label, end_id_prop)
+    written = 0
+    session = crud.get_session()
+    with session as s:
+        for chunk in chunked(rows, chunk_size):
+            record = s.run(query_str, rows=chunk).single()
+            written += record.get("count") if record else 0
+    return written
+
 def add_uploaded_photo(props: dict) -> dict:
     required = ["user_id", "photo_id", "uploadedAt", "device", "userNotes"]
     for key in required:
@@ -227,6 +303,55 @@ _FUNCTIONS = {
     'report_for': add_report_for,
 }
 
+# Relationship type -> edges written per input row, as
+# (start label, start id prop, start key, type, end label, end id prop, end key, relationship props)
+_BULK_SPECS = {
+    'uploaded_photo': [("User", "user_id", "user_id", "UPLOADED_PHOTO", "Photo", "photo_id", "photo_id",
+                        ["uploadedAt", "device", "userNotes"])],
+    'captured_in': [("Photo", "photo_id", "photo_id", "CAPTURED_IN", "City", "city_id", "city_id", [])],
+    'analyzed': [("Analyzer", "analyzer_id", "analyzer_id", "ANALYZED", "Photo", "photo_id", "photo_id",
+                  ["notes", "method", "confidence", "reasoning", "analyzedAt"])],
+    'triggers_event': [("Photo", "photo_id", "photo_id", "TRIGGERS_EVENT", "DetectionEvent", "event_id", "event_id",
+                        ["triggeredAt"])],
+    'in_category': [("DetectionEvent", "event_id", "event_id", "IN_CATEGORY", "Category", "category_id", "category_id", [])],
+    'handled_by': [("Category", "category_id", "category_id", "HANDLED_BY", "Department", "department_id", "department_id", [])],
+    'operates_in': [("Department", "department_id", "department_id", "OPERATES_IN", "City", "city_id", "city_id", [])],
+    'has_solution': [("DetectionEvent", "event_id", "event_id", "HAS_SOLUTION", "Solution", "solution_id", "solution_id",
+                      ["proposedAt", "rank"])],
+    'proposed_by': [("Solution", "solution_id", "solution_id", "PROPOSED_BY", "User", "user_id", "user_id",
+                     ["proposedAt"])],
+    'message_for': [
+        ("Message", "message_id", "message_id", "ABOUT_PHOTO", "Photo", "photo_id", "photo_id", []),
+        ("User", "user_id", "user_id", "WROTE_MESSAGE", "Message", "message_id", "message_id", []),
+    ],
+    'report_for': [
+        ("Report", "report_id", "report_id", "REPORTS_PHOTO", "Photo", "photo_id", "photo_id", []),
+        ("User", "user_id", "user_id", "SUBMITTED_REPORT", "Report", "report_id", "report_id", []),
+    ],
+}
+
+def add_bulk(rel_type: str, rows: list, chunk_size: int = BULK_CHUNK_SIZE) -> int:
+    """
+    Bulk-create relationships of a CLI relationship type from rows shaped like
+    the single creators' props.
+    """
+    written = 0
+    for start_label, start_id_prop, start_key, rel, end_label, end_id_prop, end_key, rel_keys in _BULK_SPECS[rel_type]:
+        edge_rows = []
+        for i, props in enumerate(rows):
+            for key in [start_key, end_key, *rel_keys]:
+                if key not in props:
+                    raise ValueError(f"Property '{key}' is required for {rel} relationship (row {i})")
+            edge_rows.append({
+                "start": props[start_key],
+                "end": props[end_key],
+                "props": {k: props[k] for k in rel_keys},
+            })
+        written += add_relationships_bulk(
+            start_label, start_id_prop, rel, end_label, end_id_prop, edge_rows, chunk_size
+        )
+    return written
+
 def load_props(arg: str) -> dict:
     """
     Load JSON properties from a string or file path.
@@ -251,10 +376,23 @@ def main():
     )
     parser.add_argument(
         'props',
-        help='JSON string or path to JSON file with relationship properties'
+        help='JSON string or path to JSON file with relationship properties (JSONL file with --bulk)'
+    )
+    parser.add_argument(
+        '--bulk', action='store_true',
+        help='Import one relationship per line from a JSONL file'
+    )
+    parser.add_argument(
+        '--chunk-size', type=int, default=BULK_CHUNK_SIZE,
+        help='Rows per UNWIND statement in bulk mode'
     )
     args = parser.parse_args()
 
+    if args.bulk:
+        written = add_bulk(args.rel_type, load_jsonl(args.props), args.chunk_size)
+        print(f"Wrote {written} {args.rel_type} relationship(s)")
+        return
+
     props = load_props(args.props)
     creator = _FUNCTIONS[args.rel_type]
     rel = creator(props)
@@ -4,12 +4,59 @@ CLI tool to create Neo4j nodes via db.crud.
 
 Usage:
   create_nodes.py <node_type> <properties_json_or_file>
+  create_nodes.py --bulk <node_type> <nodes.jsonl> [--chunk-size N]
 """
 import argparse
 import json
+import os
 import sys
 import db.crud as crud
+from db.crud.categories import category_cache
+from db.crud.query_cache import query_cache
+from utils.metrics import crud_call
 
+# Rows sent per UNWIND statement by the bulk helpers
+BULK_CHUNK_SIZE = int(os.getenv("NEO4J_BULK_CHUNK_SIZE", "1000"))
+
+def split_node_props(id_prop: str, props: dict) -> tuple:
+    """
+    Split node properties into the id value, the plain properties applied with
+    SET n += $props, and the location (or None) that needs point() conversion.
+    """
+    if id_prop not in props:
+        raise ValueError(f"Property '{id_prop}' is required in props")
+    plain = {k: v for k, v in sorted(props.items()) if k not in (id_prop, "location")}
+    return props[id_prop], plain, props.get("location"), "location" in props
+
+def _node_query_text(label: str, id_prop: str, has_location: bool) -> str:
+    query = [f"MERGE (n:{label} {{{id_prop}: ${id_prop}}})", "SET n += $props"]
+    if has_location:
+        query.append("SET n.location = point($location)")
+    query.append("RETURN n")
+    return "\n".join(query)
+
+def build_node_query(label: str, id_prop: str, props: dict) -> tuple:
+    """
+    Build the MERGE statement and parameters used by add_node.
+    The query text depends only on the label, id property and whether a
+    location is present, and is served from the query cache.
+
+    :param label: The Neo4j node label.
+    :param id_prop: The name of the unique identifier property.
+    :param props: A dict of properties, must include id_prop.
+    :return: Tuple of (query string, parameters dict).
+    """
+    id_value, plain, location, has_location = split_node_props(id_prop, props)
+    query = query_cache.get(
+        ("node", label, id_prop, has_location),
+        lambda: _node_query_text(label, id_prop, has_location),
+    )
+    parameters = {id_prop: id_value, "props": plain}
+    if has_location:
+        parameters["location"] = location
+    return query, parameters
+
+@crud_call
 def add_node(label: str, id_prop: str, props: dict) -> dict:
     """
     Create or update a node with the given label and properties.
@@ -19,31 +66,71 @@ def add_node(label: str, id_prop: str, props: dict) -> dict:
     :param props: A dict of properties, must include id_prop.
     :return: The created or updated node.
     """
-    if id_prop not in props:
-        raise ValueError(f"Property '{id_prop}' is required in props")
-    id_value = props[id_prop]
-    parameters = {id_prop: id_value}
-    set_clauses = []
-    for key, value in props.items():
-        if key == id_prop:
-            continue
-        if key == "location":
-            set_clauses.append(f"n.{key} = point(${key})")
-            parameters[key] = value
-        else:
-            set_clauses.append(f"n.{key} = ${key}")
-            parameters[key] = value
-    query = [f"MERGE (n:{label} {{{id_prop}: ${id_prop}}})"]
-    if set_clauses:
-        query.append("SET " + ", ".join(set_clauses))
-    query.append("RETURN n")
-    query_str = "\n".join(query)
+    query_str, parameters = build_node_query(label, id_prop, props)
     session = crud.get_session()
     with session as s:
         result = s.run(query_str, **parameters)
         record = result.single()
         return record.get("n") if record else None
 
+def chunked(rows: list, size: int):
+    """
+    Yield successive slices of at most `size` rows.
+    """
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+def _bulk_node_query_text(label: str, id_prop: str, has_location: bool) -> str:
+    query = ["UNWIND $rows AS row", f"MERGE (n:{label} {{{id_prop}: row.id}})", "SET n += row.props"]
+    if has_location:
+        query.append("SET n.location = point(row.location)")
+    query.append("RETURN count(n) AS count")
+    return "\n".join(query)
+
+def build_bulk_node_query(label: str, id_prop: str, has_location: bool) -> str:
+    """
+    Return the UNWIND/MERGE statement used by add_nodes_bulk.
+    Rows are passed as $rows, each {"id": ..., "props": {...}, "location": ...}.
+    """
+    return query_cache.get(
+        ("bulk_node", label, id_prop, has_location),
+        lambda: _bulk_node_query_text(label, id_prop, has_location),
+    )
+
+@crud_call
+def add_nodes_bulk(label: str, id_prop: str, rows: list, chunk_size: int = BULK_CHUNK_SIZE) -> int:
+    """
+    Create or update many nodes with one UNWIND statement per chunk.
+    Rows with and without a location are sent separately so each group
+    reuses a fixed query text.
+
+    :param label: The Neo4j node label.
+    :param id_prop: The name of the unique identifier property.
+    :param rows: List of property dicts, each must include id_prop.
+    :param chunk_size: Maximum rows per statement.
+    :return: Number of nodes written.
+    """
+    groups = {}
+    for i, props in enumerate(rows):
+        if id_prop not in props:
+            raise ValueError(f"Property '{id_prop}' is required in row {i}")
+        id_value, plain, location, has_location = split_node_props(id_prop, props)
+        row = {"id": id_value, "props": plain}
+        if has_location:
+            row["location"] = location
+        groups.setdefault(has_location, []).append(row)
+    if not groups:
+        return 0
+    written = 0
+    session = crud.get_session()
+    with session as s:
+        for has_location, group_rows in groups.items():
+            query_str = build_bulk_node_query(label, id_prop, has_location)
+            for chunk in chunked(group_rows, chunk_size):
+                record = s.run(query_str, rows=chunk).single()
+                written += record.get("count") if record else 0
+    return written
+
 def add_city(props: dict) -> dict:
     return add_node("City", "city_id", props)
 
@@ -64,17 +151,23 @@ def add_maintenance(props: dict) -> dict:
     """
     return add_node("Maintenance", "event_id", props)
 
-def add_photo(props: dict) -> dict:
+def photo_props_with_score(props: dict) -> dict:
     # Ensure a default score property for new Photo nodes
     props_with_score = props.copy()
     props_with_score["score"] = 50
-    return add_node("Photo", "photo_id", props_with_score)
+    return props_with_score
+
+def add_photo(props: dict) -> dict:
+    return add_node("Photo", "photo_id", photo_props_with_score(props))
 
 def add_analyzer(props: dict) -> dict:
     return add_node("Analyzer", "analyzer_id", props)
 
 def add_category(props: dict) -> dict:
-    return add_node("Category", "category_id", props)
+    node = add_node("Category", "category_id", props)
+    # Keep the in-process category catalogue in sync
+    category_cache.put(dict(node) if node else props)
+    return node
 
 def add_department(props: dict) -> dict:
     return add_node("Department", "department_id", props)
@@ -110,6 +203,50 @@ _FUNCTIONS = {
     'event': add_detection_event,
 }
 
+# Node type -> (label, id property, row preparation) for bulk imports
+_BULK_SPECS = {
+    'city': ("City", "city_id", None),
+    'user': ("User", "user_id", None),
+    'photo': ("Photo", "photo_id", photo_props_with_score),
+    'analyzer': ("Analyzer", "analyzer_id", None),
+    'category': ("Category", "category_id", None),
+    'department': ("Department", "department_id", None),
+    'solution': ("Solution", "solution_id", None),
+    'event': ("DetectionEvent", "event_id", None),
+}
+
+def add_bulk(node_type: str, rows: list, chunk_size: int = BULK_CHUNK_SIZE) -> int:
+    """
+    Bulk-create nodes of a CLI node type, applying the same defaults as the single creators.
+    """
+    label, id_prop, prepare = _BULK_SPECS[node_type]
+    if prepare:
+        rows = [prepare(props) for props in rows]
+    written = add_nodes_bulk(label, id_prop, rows, chunk_size)
+    if node_type == 'category':
+        category_cache.invalidate()
+    return written
+
+def load_jsonl(path: str) -> list:
+    """
+    Load one JSON object per line from a file, skipping blank lines.
+    """
+    rows = []
+    try:
+        with open(path, 'r') as f:
+            for line_no, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    rows.append(json.loads(line))
+                except json.JSONDecodeError as e:
+                    print(f"Error parsing {path} line {line_no}: {e}", file=sys.stderr)
+                    sys.exit(1)
+    except OSError as e:
+        print(f"Error loading {path}: {e}", file=sys.stderr)
+        sys.exit(1)
+    return rows
+
 def load_props(arg: str) -> dict:
     """
     Load JSON properties from a string or file path.
@@ -134,10 +271,23 @@ def main():
     )
     parser.add_argument(
         'props',
-        help='JSON string or path to JSON file with node properties'
+        help='JSON string or path to JSON file with node properties (JSONL file with --bulk)'
+    )
+    parser.add_argument(
+        '--bulk', action='store_true',
+        help='Import one node per line from a JSONL file'
+    )
+    parser.add_argument(
+        '--chunk-size', type=int, default=BULK_CHUNK_SIZE,
+        help='Rows per UNWIND statement in bulk mode'
     )
     args = parser.parse_args()
 
+    if args.bulk:
+        written = add_bulk(args.node_type, load_jsonl(args.props), args.chunk_size)
+        print(f"Wrote {written} {args.node_type} node(s)")
+        return
+
     props = load_props(args.props)
     creator = _FUNCTIONS[args.node_type]
     node = creator(props)
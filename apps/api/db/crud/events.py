@@ -0,0 +1,233 @@
+"""
+Single-statement persistence for vision tool results.
+
+Each tool handler (report_issue, log_well_maintained, irrelevant_image) writes
+its event node, the category it belongs to and its Photo/City links with one
+parameterized Cypher statement. The whole result is committed atomically, so a
+failure can no longer leave an Issue without its category or photo link.
+Photo and City links are optional: missing ids or nodes are reported in the
+returned flags instead of failing the write.
+"""
+import uuid
+from datetime import datetime
+
+import db.crud as crud
+from db.crud.categories import category_cache
+from utils.metrics import crud_call
+
+_ISSUE_QUERY = """
+OPTIONAL MATCH (existing:Category {category_id: $category_id})
+WITH existing IS NULL AS category_created
+MERGE (cat:Category {category_id: $category_id})
+  ON CREATE SET cat.name = $category_id, cat.event_type = 'issue', cat.description = $category_description
+CREATE (e:Issue {event_id: $event_id})
+SET e += $props
+MERGE (e)-[:IN_CATEGORY]->(cat)
+WITH e, cat, category_created
+OPTIONAL MATCH (p:Photo {photo_id: $photo_id})
+FOREACH (_ IN CASE WHEN p IS NULL THEN [] ELSE [1] END |
+  MERGE (p)-[t:TRIGGERS_EVENT]->(e) SET t.triggeredAt = $linked_at)
+WITH e, cat, category_created, p
+OPTIONAL MATCH (c:City {city_id: $city_id})
+FOREACH (_ IN CASE WHEN c IS NULL THEN [] ELSE [1] END |
+  MERGE (e)-[:IN_CITY]->(c))
+RETURN e.event_id AS event_id, cat AS category, category_created,
+       p IS NOT NULL AS photo_linked, c IS NOT NULL AS city_linked
+""".strip()
+
+_MAINTENANCE_QUERY = """
+CREATE (e:Maintenance {event_id: $event_id})
+SET e += $props
+WITH e
+OPTIONAL MATCH (p:Photo {photo_id: $photo_id})
+FOREACH (_ IN CASE WHEN p IS NULL THEN [] ELSE [1] END |
+  MERGE (p)-[:CONTAINS]->(e))
+WITH e, p
+OPTIONAL MATCH (c:City {city_id: $city_id})
+FOREACH (_ IN CASE WHEN c IS NULL THEN [] ELSE [1] END |
+  MERGE (e)-[:IN_CITY]->(c))
+RETURN e.event_id AS event_id, p IS NOT NULL AS photo_linked, c IS NOT NULL AS city_linked
+""".strip()
+
+_IRRELEVANT_QUERY = """
+CREATE (i:Irrelevant {irrelevant_id: $irrelevant_id})
+SET i += $props
+WITH i
+OPTIONAL MATCH (p:Photo {photo_id: $photo_id})
+FOREACH (_ IN CASE WHEN p IS NULL THEN [] ELSE [1] END |
+  MERGE (p)-[:MARKED_IRRELEVANT]->(i))
+RETURN i.irrelevant_id AS irrelevant_id, p IS NOT NULL AS photo_linked
+""".strip()
+
+
+# Link a new Photo to the event an earlier identical photo produced
+_LINK_QUERIES = {
+    "issue": """
+MATCH (p:Photo {photo_id: $photo_id}), (e:Issue {event_id: $event_id})
+MERGE (p)-[t:TRIGGERS_EVENT]->(e)
+SET t.triggeredAt = $linked_at, t.deduplicated = true
+RETURN count(t) AS linked
+""".strip(),
+    "maintenance": """
+MATCH (p:Photo {photo_id: $photo_id}), (e:Maintenance {event_id: $event_id})
+MERGE (p)-[r:CONTAINS]->(e)
+SET r.deduplicated = true
+RETURN count(r) AS linked
+""".strip(),
+    "irrelevant": """
+MATCH (p:Photo {photo_id: $photo_id}), (e:Irrelevant {irrelevant_id: $event_id})
+MERGE (p)-[r:MARKED_IRRELEVANT]->(e)
+SET r.deduplicated = true
+RETURN count(r) AS linked
+""".strip(),
+}
+
+def build_issue_params(params: dict) -> dict:
+    """
+    Build the parameter map for the issue statement from report_issue tool arguments.
+
+    :raises ValueError: if no category is given.
+    """
+    category_name = params.get('category')
+    if not category_name:
+        raise ValueError("Property 'category' is required for an Issue")
+    now = datetime.now().isoformat()
+    return {
+        "event_id": uuid.uuid4().hex[:8],
+        "category_id": category_name,
+        "category_description": params.get('category_description', f"Issue category: {category_name}"),
+        "props": {
+            'type': 'issue',
+            'name': params.get('name'),
+            'description': params.get('description'),
+            'inspected_at': now,
+            'reported_at': now,
+            'severity': params.get('severity'),
+            'severity_score': params.get('severity_score'),
+            'status': params.get('status'),
+        },
+        "photo_id": params.get('photo_id'),
+        "city_id": params.get('city_id'),
+        "linked_at": now,
+    }
+
+
+def build_maintenance_params(params: dict) -> dict:
+    """
+    Build the parameter map for the maintenance statement from log_well_maintained tool arguments.
+    """
+    now = datetime.now().isoformat()
+    return {
+        "event_id": uuid.uuid4().hex[:8],
+        "props": {
+            'type': 'maintenance',
+            'description': params.get('description'),
+            'inspected_at': now,
+            'reported_at': now,
+            'condition_score': params.get('condition_score', 10),
+            'status': params.get('status', 'good'),
+        },
+        "photo_id": params.get('photo_id'),
+        "city_id": params.get('city_id'),
+    }
+
+
+def build_irrelevant_params(params: dict) -> dict:
+    """
+    Build the parameter map for the irrelevant statement from irrelevant_image tool arguments.
+    """
+    return {
+        "irrelevant_id": uuid.uuid4().hex,
+        "props": {"reason": params.get("reason"), "confidence": params.get("confidence")},
+        "photo_id": params.get("photo_id"),
+    }
+
+
+def issue_result(params: dict, record) -> dict:
+    """
+    Shape the issue statement's record into the returned ids and link flags,
+    keeping the category cache in sync when a category was created.
+    """
+    category = record.get("category") if record else None
+    created = bool(record and record.get("category_created"))
+    if created and category is not None:
+        category_cache.put(dict(category))
+    return {
+        "event_id": params["event_id"],
+        "category_id": params["category_id"],
+        "category_created": created,
+        "photo_linked": bool(record and record.get("photo_linked")),
+        "city_linked": bool(record and record.get("city_linked")),
+    }
+
+
+def link_result(id_key: str, params: dict, record) -> dict:
+    """
+    Shape a maintenance/irrelevant record into the returned id and link flags.
+    """
+    result = {id_key: params[id_key], "photo_linked": bool(record and record.get("photo_linked"))}
+    if "city_id" in params:
+        result["city_linked"] = bool(record and record.get("city_linked"))
+    return result
+
+
+@crud_call
+def record_issue(params: dict) -> dict:
+    """
+    Create an Issue, merge its Category and link the Photo and City in one transaction.
+
+    :param params: report_issue tool arguments.
+    :return: Dict with event_id, category_id, category_created, photo_linked and city_linked.
+    """
+    query_params = build_issue_params(params)
+    session = crud.get_session()
+    with session as s:
+        record = s.run(_ISSUE_QUERY, **query_params).single()
+    return issue_result(query_params, record)
+
+
+@crud_call
+def record_maintenance(params: dict) -> dict:
+    """
+    Create a Maintenance event and link the Photo and City in one transaction.
+
+    :param params: log_well_maintained tool arguments.
+    :return: Dict with event_id, photo_linked and city_linked.
+    """
+    query_params = build_maintenance_params(params)
+    session = crud.get_session()
+    with session as s:
+        record = s.run(_MAINTENANCE_QUERY, **query_params).single()
+    return link_result("event_id", query_params, record)
+
+
+@crud_call
+def record_irrelevant(params: dict) -> dict:
+    """
+    Create an Irrelevant node linked to its Photo in one transaction.
+
+    :param params: irrelevant_image tool arguments.
+    :return: Dict with irrelevant_id and photo_linked.
+    """
+    query_params = build_irrelevant_params(params)
+    session = crud.get_session()
+    with session as s:
+        record = s.run(_IRRELEVANT_QUERY, **query_params).single()
+    return link_result("irrelevant_id", query_params, record)
+
+
+@crud_call
+def link_photo_to_event(kind: str, photo_id: str, event_id: str) -> bool:
+    """
+    Link a Photo to an existing Issue, Maintenance or Irrelevant node.
+
+    :param kind: 'issue', 'maintenance' or 'irrelevant'.
+    :return: True if both nodes exist and were linked.
+    """
+    session = crud.get_session()
+    with session as s:
+        record = s.run(
+            _LINK_QUERIES[kind], photo_id=photo_id, event_id=event_id,
+            linked_at=datetime.now().isoformat(),
+        ).single()
+    return bool(record and record.get("linked"))
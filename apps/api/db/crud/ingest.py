@@ -0,0 +1,158 @@
+"""
+Batched ingest helpers for the photo upload path.
+
+Upserts the City, User and Photo nodes and the UPLOADED_PHOTO edge for a new
+upload in a single parameterized Cypher statement, so the analysis pipeline
+needs one session and one round trip instead of one per node.
+"""
+import uuid
+from datetime import datetime
+
+import db.crud as crud
+from db.crud.create_nodes import BULK_CHUNK_SIZE, chunked
+from utils.metrics import crud_call
+
+_INGEST_QUERY = """
+MERGE (c:City {city_id: $city_id})
+  ON CREATE SET c.name = $city_name, c.country = $country, c.location = point($location)
+MERGE (u:User {user_id: $user_id})
+  ON CREATE SET u.name = $user_name
+MERGE (p:Photo {photo_id: $photo_id})
+SET p.url = $url, p.created_at = $created_at, p.location = point($location), p.score = 50,
+    p.content_hash = $content_hash, p.city_id = $city_id
+MERGE (u)-[r:UPLOADED_PHOTO]->(p)
+SET r.uploadedAt = $uploaded_at, r.device = $device, r.userNotes = $user_notes
+RETURN c, u, p, r
+""".strip()
+
+# Re-running a bulk import must not reset the score or timestamp of photos
+# that were already ingested (and possibly analyzed), hence the coalesce().
+_BULK_INGEST_QUERY = """
+UNWIND $rows AS row
+MERGE (c:City {city_id: row.city_id})
+  ON CREATE SET c.name = row.city_name, c.country = row.country, c.location = point(row.location)
+MERGE (u:User {user_id: row.user_id})
+  ON CREATE SET u.name = row.user_name
+MERGE (p:Photo {photo_id: row.photo_id})
+SET p.url = row.url, p.created_at = coalesce(p.created_at, row.created_at),
+    p.location = point(row.location), p.score = coalesce(p.score, 50),
+    p.content_hash = row.content_hash, p.city_id = row.city_id
+MERGE (u)-[r:UPLOADED_PHOTO]->(p)
+SET r.uploadedAt = coalesce(r.uploadedAt, row.uploaded_at), r.device = row.device, r.userNotes = row.user_notes
+RETURN count(p) AS count
+""".strip()
+
+# The analysis path ingests the Photo before the image is downloaded and hashed
+_CONTENT_HASH_QUERY = """
+MATCH (p:Photo {photo_id: $photo_id})
+SET p.content_hash = $content_hash
+RETURN count(p) AS count
+""".strip()
+
+
+def build_ingest_params(
+    image_url: str,
+    user: dict,
+    location: dict,
+    photo_id: str = None,
+    device: str = "api",
+    user_notes: str = "",
+    content_hash: str = None,
+) -> dict:
+    """
+    Build the parameter map for the ingest statement.
+
+    :param image_url: Public URL of the uploaded image.
+    :param user: Dict with 'id' and optional 'name'.
+    :param location: Dict with 'city', 'country', 'latitude' and 'longitude'.
+    :param photo_id: Photo identifier; a new UUID is generated when omitted.
+    :param device: Device recorded on the UPLOADED_PHOTO edge.
+    :param user_notes: Notes recorded on the UPLOADED_PHOTO edge.
+    :param content_hash: SHA-256 of the image bytes, if known.
+    :return: Parameters for the ingest query.
+    """
+    city_id = location["city"]
+    user_id = user["id"]
+    now = datetime.now().isoformat()
+    return {
+        "city_id": city_id,
+        "city_name": city_id,
+        "country": location.get("country"),
+        "location": {
+            "latitude": location.get("latitude"),
+            "longitude": location.get("longitude"),
+        },
+        "user_id": user_id,
+        "user_name": user.get("name") or user_id,
+        "photo_id": photo_id or str(uuid.uuid4()),
+        "url": image_url,
+        "created_at": now,
+        "uploaded_at": now,
+        "device": device,
+        "user_notes": user_notes,
+        "content_hash": content_hash,
+    }
+
+
+@crud_call
+def ingest_photo_context(
+    image_url: str,
+    user: dict,
+    location: dict,
+    photo_id: str = None,
+    device: str = "api",
+    user_notes: str = "",
+    content_hash: str = None,
+) -> dict:
+    """
+    Upsert City, User and Photo and link them with UPLOADED_PHOTO in one transaction.
+
+    Existing City and User nodes are left untouched; the Photo node always gets
+    the URL, timestamp, location and default score.
+
+    :return: Dict with keys 'city', 'user', 'photo', 'uploaded_photo' and 'photo_id'.
+    """
+    params = build_ingest_params(image_url, user, location, photo_id, device, user_notes, content_hash)
+    session = crud.get_session()
+    with session as s:
+        record = s.run(_INGEST_QUERY, **params).single()
+    return {
+        "city": record.get("c") if record else None,
+        "user": record.get("u") if record else None,
+        "photo": record.get("p") if record else None,
+        "uploaded_photo": record.get("r") if record else None,
+        "photo_id": params["photo_id"],
+    }
+
+
+@crud_call
+def ingest_photos_bulk(rows: list, chunk_size: int = BULK_CHUNK_SIZE) -> int:
+    """
+    Ingest many uploaded photos with one UNWIND statement per chunk.
+
+    :param rows: Parameter maps built with build_ingest_params.
+    :param chunk_size: Maximum rows per statement.
+    :return: Number of Photo nodes written.
+    """
+    if not rows:
+        return 0
+    written = 0
+    session = crud.get_session()
+    with session as s:
+        for chunk in chunked(rows, chunk_size):
+            record = s.run(_BULK_INGEST_QUERY, rows=chunk).single()
+            written += record.get("count") if record else 0
+    return written
+
+
+@crud_call
+def set_photo_content_hash(photo_id: str, content_hash: str) -> bool:
+    """
+    Record the SHA-256 of an ingested Photo's image.
+
+    :return: True if the Photo exists.
+    """
+    session = crud.get_session()
+    with session as s:
+        record = s.run(_CONTENT_HASH_QUERY, photo_id=photo_id, content_hash=content_hash).single()
+    return bool(record and record.get("count"))
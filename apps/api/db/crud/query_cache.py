@@ -0,0 +1,66 @@
+"""
+LRU cache of generated Cypher text, keyed by query shape.
+
+The CRUD builders describe a statement by a small shape tuple (label, id
+property, whether a point() conversion is needed, ...) instead of the concrete
+property names, so logically identical writes share one query string. That
+saves rebuilding the text in Python and lets Neo4j reuse its cached plan.
+"""
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Hashable
+
+from utils.metrics import record_cache
+
+# Maximum number of distinct query shapes kept
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "256"))
+
+
+class QueryCache:
+    """
+    Thread-safe LRU mapping a shape key to its query text, with hit/miss counters.
+    """
+
+    def __init__(self, maxsize: int = QUERY_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._queries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, build: Callable[[], str]) -> str:
+        """
+        Return the query text for a shape, calling build() on a miss.
+        """
+        with self._lock:
+            query = self._queries.get(key)
+            if query is not None:
+                self._queries.move_to_end(key)
+                self.hits += 1
+                record_cache("query", True)
+                return query
+            self.misses += 1
+        record_cache("query", False)
+        query = build()
+        with self._lock:
+            self._queries[key] = query
+            self._queries.move_to_end(key)
+            while len(self._queries) > self.maxsize:
+                self._queries.popitem(last=False)
+        return query
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and the current size."""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._queries), "maxsize": self.maxsize}
+
+    def clear(self) -> None:
+        """Drop all cached queries and reset the counters."""
+        with self._lock:
+            self._queries.clear()
+            self.hits = self.misses = 0
+
+
+# Shared by the sync and async CRUD layers
+query_cache = QueryCache()
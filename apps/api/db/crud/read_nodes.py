@@ -3,7 +3,9 @@ Utility for reading nodes from the Neo4j database.
 """
 from db.neo4j import get_session
 from typing import Optional, Any
+from utils.metrics import crud_call
 
+@crud_call
 def read_nodes(label: str) -> list:
     """
     Retrieve all nodes with the given label.
@@ -19,6 +21,7 @@ def read_nodes(label: str) -> list:
         return [record.get("n") for record in records]
     
 
+@crud_call
 def search_node(label: str,
                 property_name: str,
                 property_value: str) -> Optional[Any]:
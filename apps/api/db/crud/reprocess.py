@@ -0,0 +1,95 @@
+"""
+Queries for re-running the vision classification over stored photos.
+
+select_photos picks the Photos to reprocess with their city, which the model
+prompt needs: the city recorded at ingest, else the CAPTURED_IN City, else the
+City of their current event. detach_photo_events removes a photo's current
+classification before the new one is written, deleting events that no other
+photo still points to.
+"""
+import db.crud as crud
+from utils.metrics import crud_call
+
+_EVENT_RELS = "TRIGGERS_EVENT|CONTAINS|MARKED_IRRELEVANT"
+
+_SELECT_PHOTOS_QUERY = """
+MATCH (p:Photo)
+WHERE p.url IS NOT NULL
+  AND ($since IS NULL OR p.created_at >= $since)
+  AND ($unclassified = false OR NOT (p)-[:{rels}]->())
+  AND ($category IS NULL OR (p)-[:TRIGGERS_EVENT]->(:Issue)-[:IN_CATEGORY]->(:Category {{category_id: $category}}))
+OPTIONAL MATCH (p)-[:{rels}]->(e)-[:IN_CITY]->(c:City)
+WITH p, head(collect(c.city_id)) AS event_city
+OPTIONAL MATCH (p)-[:CAPTURED_IN]->(cap:City)
+WITH p, coalesce(p.city_id, head(collect(cap.city_id)), event_city) AS city_id
+WHERE $city_id IS NULL OR city_id = $city_id
+RETURN p.photo_id AS photo_id, p.url AS url, city_id
+ORDER BY p.photo_id
+LIMIT $limit
+""".format(rels=_EVENT_RELS).strip()
+
+_DETACH_EVENTS_QUERY = """
+UNWIND $photo_ids AS photo_id
+MATCH (p:Photo {{photo_id: photo_id}})-[r:{rels}]->(e)
+DELETE r
+WITH DISTINCT e
+WHERE NOT (e)<-[:{rels}]-(:Photo)
+DETACH DELETE e
+RETURN count(e) AS deleted
+""".format(rels=_EVENT_RELS).strip()
+
+# Upper bound used when no limit is given
+_NO_LIMIT = 2 ** 62
+
+
+def build_select_params(
+    since: str = None,
+    city_id: str = None,
+    category: str = None,
+    unclassified: bool = False,
+    limit: int = None,
+) -> dict:
+    """
+    Build the parameters of the photo selection query.
+
+    :param since: Only photos created at or after this ISO timestamp.
+    :param city_id: Only photos in this city.
+    :param category: Only photos whose Issue is in this category.
+    :param unclassified: Only photos without any event.
+    :param limit: Maximum number of photos.
+    """
+    return {
+        "since": since,
+        "city_id": city_id,
+        "category": category,
+        "unclassified": unclassified,
+        "limit": limit if limit is not None else _NO_LIMIT,
+    }
+
+
+@crud_call
+def select_photos(**filters) -> list:
+    """
+    Return [{"photo_id", "url", "city_id"}] for the photos matching the filters
+    (see build_select_params).
+    """
+    params = build_select_params(**filters)
+    session = crud.get_session()
+    with session as s:
+        result = s.run(_SELECT_PHOTOS_QUERY, **params)
+        return [dict(record) for record in result] if result is not None else []
+
+
+@crud_call
+def detach_photo_events(photo_ids: list) -> int:
+    """
+    Remove the current classification of the given photos.
+
+    :return: Number of events deleted because no photo referenced them anymore.
+    """
+    if not photo_ids:
+        return 0
+    session = crud.get_session()
+    with session as s:
+        record = s.run(_DETACH_EVENTS_QUERY, photo_ids=list(photo_ids)).single()
+    return record.get("deleted") if record else 0
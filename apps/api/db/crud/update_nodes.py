@@ -5,7 +5,9 @@ Utility functions to update existing nodes in Neo4j.
 from db.neo4j import get_session
 import json
 import os
+from utils.metrics import crud_call
 
+@crud_call
 def update_photo_relevance_score(photo_id: str, new_score: float) -> None:
     """
     Update the relevance_score property of a Photo node.
@@ -23,6 +25,34 @@ def update_photo_relevance_score(photo_id: str, new_score: float) -> None:
         )
     # return nothing
 
+# Messages that already carry a delta_score were applied before (e.g. a retried
+# job), so only first-time results move the parent Photo's score.
+_MESSAGE_ANALYSES_QUERY = (
+    "UNWIND $rows AS row "
+    "MATCH (m:Message {message_id: row.id}) "
+    "WITH m, row, m.delta_score IS NULL AS first_time "
+    "SET m += row.props "
+    "WITH m, row, first_time WHERE first_time "
+    "MATCH (m)-[:ABOUT_PHOTO]->(p:Photo) "
+    "WITH p, sum(coalesce(row.props.delta_score, 0)) AS delta "
+    "SET p.score = coalesce(p.score, 0) + delta"
+)
+
+@crud_call
+def update_message_analyses(rows: list) -> None:
+    """
+    Write analyzer results to many Message nodes in one transaction and add
+    their delta_score to the score of the Photo each message is about.
+
+    :param rows: List of {"id": message_id, "props": {...}} dicts.
+    """
+    if not rows:
+        return
+    session = get_session()
+    with session as s:
+        s.run(_MESSAGE_ANALYSES_QUERY, rows=rows)
+
+@crud_call
 def delete_photo_and_event(photo_id: str) -> None:
     """
     Delete a Photo node and its linked Issue or Maintenance event.
@@ -47,6 +77,7 @@ def delete_photo_and_event(photo_id: str) -> None:
             photo_id=photo_id,
         )
 
+@crud_call
 def export_high_score(photo_id: str) -> dict:
     """
     Export the photo URL and linked event properties to a JSONL file when relevance score exceeds threshold.
@@ -108,6 +139,7 @@ def export_high_score(photo_id: str) -> dict:
         pass
     return record
 
+@crud_call
 def get_photo_and_event(photo_id: str):
     """
     Fetch the photo node and its connected Issue or Maintenance node.
@@ -141,7 +173,4 @@ def get_photo_and_event(photo_id: str):
                 event_type = "maintenance"
             else:
                 return dict(photo_node), None, None
-    print(f"photo_node: {photo_node}")
-    print(f"event_node: {event_node}")
-    print(f"event_type: {event_type}")
     return dict(photo_node), dict(event_node), event_type
\ No newline at end of file
@@ -0,0 +1,87 @@
+"""
+Buffered write-back of message analysis results.
+
+Results are collected and written with a single UNWIND transaction once
+WRITE_BACK_FLUSH_SIZE rows are pending or WRITE_BACK_FLUSH_INTERVAL seconds
+after the first pending row, whichever comes first. The same statement applies
+each message's delta_score to its Photo's score, so a burst of comments on one
+photo costs one transaction instead of one per comment.
+"""
+import asyncio
+import os
+
+from db.crud import aio
+
+WRITE_BACK_FLUSH_SIZE = int(os.getenv("WRITE_BACK_FLUSH_SIZE", "100"))
+WRITE_BACK_FLUSH_INTERVAL = float(os.getenv("WRITE_BACK_FLUSH_INTERVAL", "0.5"))
+
+
+class MessageWriteBuffer:
+    """
+    Collects {"id", "props"} rows for Message nodes and flushes them in batches.
+    """
+
+    def __init__(self, flush_size: int = WRITE_BACK_FLUSH_SIZE, flush_interval: float = WRITE_BACK_FLUSH_INTERVAL):
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self._rows = []
+        self._futures = []
+        self._timer = None
+        self._flushes = set()
+
+    @property
+    def pending(self) -> int:
+        """Number of rows waiting to be written."""
+        return len(self._rows)
+
+    async def add(self, message_id: str, props: dict) -> None:
+        """
+        Queue a result and wait until the flush containing it has committed.
+
+        :raises Exception: whatever the write raised, if the flush failed.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._rows.append({"id": message_id, "props": props})
+        self._futures.append(future)
+        if len(self._rows) >= self.flush_size:
+            self._start_flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.flush_interval, self._start_flush)
+        await asyncio.shield(future)
+
+    def _start_flush(self) -> None:
+        task = asyncio.ensure_future(self.flush())
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    async def flush(self) -> int:
+        """
+        Write all pending rows now.
+
+        :return: Number of rows written.
+        """
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        rows, futures = self._rows, self._futures
+        self._rows, self._futures = [], []
+        if not rows:
+            return 0
+        try:
+            await aio.update_message_analyses(rows)
+        except Exception as e:
+            for future in futures:
+                if not future.done():
+                    future.set_exception(e)
+            return 0
+        for future in futures:
+            if not future.done():
+                future.set_result(None)
+        return len(rows)
+
+    async def close(self) -> None:
+        """Flush pending rows and wait for in-flight flushes."""
+        await self.flush()
+        if self._flushes:
+            await asyncio.gather(*self._flushes, return_exceptions=True)
@@ -0,0 +1,47 @@
+"""
+In-process graph backend selected with NEO4J_URI=memory://.
+
+It runs the Cypher the app sends (a subset: MATCH, OPTIONAL MATCH, MERGE,
+CREATE, SET, DELETE, UNWIND, FOREACH, WITH, RETURN and schema statements)
+against an in-memory store, for local development without a database and
+for benchmarking the crud layer at scale. Data lives as long as the process.
+"""
+import threading
+
+from db.memory.cypher import CypherSyntaxError
+from db.memory.executor import CypherError
+from db.memory.graph import ConstraintError, GraphError, MemoryGraph
+from db.memory.session import AsyncMemorySession, MemorySession
+from db.memory.values import Node, Point, Record, Relationship
+
+_graph = None
+_graph_lock = threading.Lock()
+
+
+def get_graph() -> MemoryGraph:
+    """
+    Return the process-wide graph, creating it on first use.
+    """
+    global _graph
+    if _graph is None:
+        with _graph_lock:
+            if _graph is None:
+                _graph = MemoryGraph()
+    return _graph
+
+
+def reset_graph() -> MemoryGraph:
+    """
+    Drop all data, indexes and constraints of the process-wide graph.
+    """
+    graph = get_graph()
+    graph.clear()
+    return graph
+
+
+__all__ = [
+    "get_graph", "reset_graph",
+    "MemoryGraph", "MemorySession", "AsyncMemorySession",
+    "GraphError", "ConstraintError", "CypherError", "CypherSyntaxError",
+    "Node", "Relationship", "Point", "Record",
+]
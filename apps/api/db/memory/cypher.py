@@ -0,0 +1,512 @@
+"""
+Parser for the Cypher subset used by db.crud, db.schema and server.py.
+
+Supported clauses: MATCH / OPTIONAL MATCH (with WHERE), MERGE (with ON CREATE /
+ON MATCH SET), CREATE, SET (=, +=), [DETACH] DELETE, UNWIND, WITH, RETURN
+(DISTINCT, ORDER BY, SKIP, LIMIT) and FOREACH. Expressions cover literals,
+parameters, property access, maps and lists, boolean logic, comparisons,
+IS [NOT] NULL, IN, STARTS WITH / ENDS WITH / CONTAINS, arithmetic, CASE,
+function calls (aggregates included) and pattern predicates such as
+NOT (p)-[:R]->(). Anything else raises CypherSyntaxError rather than being
+silently misread.
+
+Statements parse to tuples; expressions are ('kind', ...) tuples as well.
+"""
+import re
+from functools import lru_cache
+
+from db.memory.graph import GraphError
+
+
+class CypherSyntaxError(GraphError):
+    """The statement is not valid Cypher or uses a feature the memory backend does not support."""
+
+
+_TOKEN_RE = re.compile(r"""
+    (?P<ws>\s+|//[^\n]*)
+  | (?P<number>\d+\.\d*(?:[eE][-+]?\d+)?|\d+(?:[eE][-+]?\d+)?|\.\d+)
+  | (?P<string>'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*")
+  | (?P<param>\$[A-Za-z_][A-Za-z_0-9]*)
+  | (?P<name>[A-Za-z_][A-Za-z_0-9]*)
+  | (?P<quoted>`[^`]+`)
+  | (?P<op>\+=|<>|!=|<=|>=|[-+*/%=<>(){}\[\],.:|;^])
+""", re.VERBOSE)
+
+_ESCAPES = {"n": "\n", "t": "\t", "r": "\r", "\\": "\\", "'": "'", '"': '"'}
+
+AGGREGATES = frozenset({"count", "sum", "collect", "avg", "min", "max"})
+
+
+def tokenize(text: str) -> list:
+    """
+    Split a statement into (kind, value, start, end) tokens.
+    """
+    tokens = []
+    pos = 0
+    while pos < len(text):
+        match = _TOKEN_RE.match(text, pos)
+        if not match:
+            raise CypherSyntaxError(f"Unexpected character {text[pos]!r} at {pos}")
+        kind = match.lastgroup
+        value = match.group()
+        if kind == "number":
+            value = float(value) if any(c in value for c in ".eE") else int(value)
+        elif kind == "string":
+            value = re.sub(r"\\(.)", lambda m: _ESCAPES.get(m.group(1), m.group(1)), value[1:-1])
+        elif kind == "param":
+            value = value[1:]
+        elif kind == "quoted":
+            kind, value = "name", value[1:-1]
+        if kind != "ws":
+            tokens.append((kind, value, match.start(), match.end()))
+        pos = match.end()
+    tokens.append(("eof", None, len(text), len(text)))
+    return tokens
+
+
+class _Parser:
+    def __init__(self, text: str):
+        self.text = text
+        self.tokens = tokenize(text)
+        self.pos = 0
+
+    # --- Token helpers ---
+
+    def peek(self, offset: int = 0):
+        return self.tokens[min(self.pos + offset, len(self.tokens) - 1)]
+
+    def error(self, message: str):
+        kind, value, start, _ = self.peek()
+        near = self.text[start:start + 30] or "end of statement"
+        return CypherSyntaxError(f"{message} near {near!r}")
+
+    def at_keyword(self, *words, offset: int = 0) -> bool:
+        for i, word in enumerate(words):
+            kind, value, _, _ = self.peek(offset + i)
+            if kind != "name" or value.upper() != word:
+                return False
+        return True
+
+    def keyword(self, *words) -> bool:
+        if self.at_keyword(*words):
+            self.pos += len(words)
+            return True
+        return False
+
+    def expect_keyword(self, *words) -> None:
+        if not self.keyword(*words):
+            raise self.error(f"Expected {' '.join(words)}")
+
+    def at_op(self, op: str, offset: int = 0) -> bool:
+        kind, value, _, _ = self.peek(offset)
+        return kind == "op" and value == op
+
+    def op(self, op: str) -> bool:
+        if self.at_op(op):
+            self.pos += 1
+            return True
+        return False
+
+    def expect_op(self, op: str) -> None:
+        if not self.op(op):
+            raise self.error(f"Expected {op!r}")
+
+    def name(self) -> str:
+        kind, value, _, _ = self.peek()
+        if kind != "name":
+            raise self.error("Expected a name")
+        self.pos += 1
+        return value
+
+    # --- Statement ---
+
+    def statement(self) -> tuple:
+        clauses = self.clauses(stop=("eof",))
+        self.op(";")
+        if self.peek()[0] != "eof":
+            raise self.error("Unexpected input")
+        return tuple(clauses)
+
+    def clauses(self, stop) -> list:
+        clauses = []
+        while not (self.peek()[0] in stop or (self.peek()[0] == "op" and self.peek()[1] in stop)):
+            clauses.append(self.clause())
+        if not clauses:
+            raise self.error("Expected a clause")
+        return clauses
+
+    def clause(self) -> tuple:
+        if self.keyword("OPTIONAL", "MATCH"):
+            return self.match(optional=True)
+        if self.keyword("MATCH"):
+            return self.match(optional=False)
+        if self.keyword("UNWIND"):
+            expr = self.expr()
+            self.expect_keyword("AS")
+            return ("unwind", expr, self.name())
+        if self.keyword("MERGE"):
+            pattern = self.pattern()
+            on_create, on_match = [], []
+            while self.at_keyword("ON"):
+                if self.keyword("ON", "CREATE", "SET"):
+                    on_create += self.set_items()
+                elif self.keyword("ON", "MATCH", "SET"):
+                    on_match += self.set_items()
+                else:
+                    raise self.error("Expected ON CREATE SET or ON MATCH SET")
+            return ("merge", pattern, tuple(on_create), tuple(on_match))
+        if self.keyword("CREATE"):
+            return ("create", self.patterns())
+        if self.keyword("SET"):
+            return ("set", tuple(self.set_items()))
+        if self.keyword("DETACH", "DELETE"):
+            return ("delete", tuple(self.expr_list()), True)
+        if self.keyword("DELETE"):
+            return ("delete", tuple(self.expr_list()), False)
+        if self.keyword("WITH"):
+            projection = self.projection()
+            where = self.expr() if self.keyword("WHERE") else None
+            return ("with", projection, where)
+        if self.keyword("RETURN"):
+            return ("return", self.projection())
+        if self.keyword("FOREACH"):
+            self.expect_op("(")
+            var = self.name()
+            self.expect_keyword("IN")
+            source = self.expr()
+            self.expect_op("|")
+            body = self.clauses(stop=(")",))
+            self.expect_op(")")
+            return ("foreach", var, source, tuple(body))
+        raise self.error("Unsupported clause")
+
+    def match(self, optional: bool) -> tuple:
+        patterns = self.patterns()
+        where = self.expr() if self.keyword("WHERE") else None
+        return ("match", patterns, where, optional)
+
+    def set_items(self) -> list:
+        items = []
+        while True:
+            var = self.name()
+            if self.op("+="):
+                items.append(("merge_props", var, self.expr()))
+            elif self.op("="):
+                items.append(("replace_props", var, self.expr()))
+            elif self.op("."):
+                key = self.name()
+                self.expect_op("=")
+                items.append(("prop", var, key, self.expr()))
+            else:
+                raise self.error("Expected =, += or a property in SET")
+            if not self.op(","):
+                return items
+
+    def expr_list(self) -> list:
+        exprs = [self.expr()]
+        while self.op(","):
+            exprs.append(self.expr())
+        return exprs
+
+    def projection(self) -> tuple:
+        distinct = self.keyword("DISTINCT")
+        items = []
+        if self.op("*"):
+            items.append(("*", None))
+        else:
+            while True:
+                start = self.peek()[2]
+                expr = self.expr()
+                end = self.tokens[self.pos - 1][3]
+                if self.keyword("AS"):
+                    alias = self.name()
+                elif expr[0] == "var":
+                    alias = expr[1]
+                else:
+                    alias = self.text[start:end]
+                items.append((alias, expr))
+                if not self.op(","):
+                    break
+        order = []
+        if self.keyword("ORDER", "BY"):
+            while True:
+                expr = self.expr()
+                descending = self.keyword("DESC") or self.keyword("DESCENDING")
+                if not descending:
+                    self.keyword("ASC") or self.keyword("ASCENDING")
+                order.append((expr, descending))
+                if not self.op(","):
+                    break
+        skip = self.expr() if self.keyword("SKIP") else None
+        limit = self.expr() if self.keyword("LIMIT") else None
+        return (tuple(items), distinct, tuple(order), skip, limit)
+
+    # --- Patterns ---
+
+    def patterns(self) -> tuple:
+        patterns = [self.pattern()]
+        while self.op(","):
+            patterns.append(self.pattern())
+        return tuple(patterns)
+
+    def pattern(self) -> tuple:
+        elements = [self.node_pattern()]
+        while self.at_op("-") or (self.at_op("<") and self.at_op("-", 1)):
+            elements.append(self.rel_pattern())
+            elements.append(self.node_pattern())
+        return tuple(elements)
+
+    def properties(self):
+        if self.at_op("{"):
+            return self.map_literal()
+        kind, value, _, _ = self.peek()
+        if kind == "param":
+            self.pos += 1
+            return ("param", value)
+        return None
+
+    def node_pattern(self) -> tuple:
+        self.expect_op("(")
+        var = self.name() if self.peek()[0] == "name" else None
+        labels = []
+        while self.op(":"):
+            labels.append(self.name())
+        props = self.properties()
+        self.expect_op(")")
+        return ("node", var, tuple(labels), props)
+
+    def rel_pattern(self) -> tuple:
+        incoming = self.op("<")
+        self.expect_op("-")
+        var, types, props = None, (), None
+        if self.op("["):
+            var = self.name() if self.peek()[0] == "name" else None
+            if self.op(":"):
+                types = [self.name()]
+                while self.op("|"):
+                    self.op(":")
+                    types.append(self.name())
+                types = tuple(types)
+            if self.at_op("*"):
+                raise self.error("Variable-length relationships are not supported")
+            props = self.properties()
+            self.expect_op("]")
+        self.expect_op("-")
+        outgoing = self.op(">")
+        if incoming and outgoing:
+            raise self.error("A relationship cannot point both ways")
+        direction = "out" if outgoing else "in" if incoming else "both"
+        return ("rel", var, types, props, direction)
+
+    # --- Expressions ---
+
+    def expr(self) -> tuple:
+        return self.or_expr()
+
+    def or_expr(self) -> tuple:
+        left = self.xor_expr()
+        while self.keyword("OR"):
+            left = ("or", left, self.xor_expr())
+        return left
+
+    def xor_expr(self) -> tuple:
+        left = self.and_expr()
+        while self.keyword("XOR"):
+            left = ("xor", left, self.and_expr())
+        return left
+
+    def and_expr(self) -> tuple:
+        left = self.not_expr()
+        while self.keyword("AND"):
+            left = ("and", left, self.not_expr())
+        return left
+
+    def not_expr(self) -> tuple:
+        if self.keyword("NOT"):
+            return ("not", self.not_expr())
+        return self.comparison()
+
+    def comparison(self) -> tuple:
+        left = self.additive()
+        while True:
+            kind, value, _, _ = self.peek()
+            if kind == "op" and value in ("=", "<>", "!=", "<", ">", "<=", ">="):
+                self.pos += 1
+                left = ("cmp", "<>" if value == "!=" else value, left, self.additive())
+            elif self.keyword("IS", "NOT", "NULL"):
+                left = ("isnull", left, True)
+            elif self.keyword("IS", "NULL"):
+                left = ("isnull", left, False)
+            elif self.keyword("IN"):
+                left = ("in", left, self.additive())
+            elif self.keyword("STARTS", "WITH"):
+                left = ("strop", "starts", left, self.additive())
+            elif self.keyword("ENDS", "WITH"):
+                left = ("strop", "ends", left, self.additive())
+            elif self.keyword("CONTAINS"):
+                left = ("strop", "contains", left, self.additive())
+            else:
+                return left
+
+    def additive(self) -> tuple:
+        left = self.multiplicative()
+        while self.at_op("+") or self.at_op("-"):
+            op = self.tokens[self.pos][1]
+            self.pos += 1
+            left = ("arith", op, left, self.multiplicative())
+        return left
+
+    def multiplicative(self) -> tuple:
+        left = self.unary()
+        while self.at_op("*") or self.at_op("/") or self.at_op("%"):
+            op = self.tokens[self.pos][1]
+            self.pos += 1
+            left = ("arith", op, left, self.unary())
+        return left
+
+    def unary(self) -> tuple:
+        if self.op("-"):
+            return ("neg", self.unary())
+        if self.op("+"):
+            return self.unary()
+        return self.postfix()
+
+    def postfix(self) -> tuple:
+        expr = self.atom()
+        while True:
+            if self.op("."):
+                expr = ("prop", expr, self.name())
+            elif self.op("["):
+                index = self.expr()
+                self.expect_op("]")
+                expr = ("index", expr, index)
+            else:
+                return expr
+
+    def atom(self) -> tuple:
+        kind, value, _, _ = self.peek()
+        if kind in ("number", "string"):
+            self.pos += 1
+            return ("lit", value)
+        if kind == "param":
+            self.pos += 1
+            return ("param", value)
+        if kind == "op" and value == "[":
+            self.pos += 1
+            items = [] if self.at_op("]") else self.expr_list()
+            self.expect_op("]")
+            return ("list", tuple(items))
+        if kind == "op" and value == "{":
+            return self.map_literal()
+        if kind == "op" and value == "(":
+            return self.paren_or_pattern()
+        if kind == "name":
+            upper = value.upper()
+            if upper in ("TRUE", "FALSE"):
+                self.pos += 1
+                return ("lit", upper == "TRUE")
+            if upper == "NULL":
+                self.pos += 1
+                return ("lit", None)
+            if upper == "CASE":
+                self.pos += 1
+                return self.case()
+            if self.at_op("(", 1):
+                return self.call()
+            self.pos += 1
+            return ("var", value)
+        raise self.error("Expected an expression")
+
+    def map_literal(self) -> tuple:
+        self.expect_op("{")
+        entries = []
+        if not self.at_op("}"):
+            while True:
+                key = self.name() if self.peek()[0] == "name" else self._string_key()
+                self.expect_op(":")
+                entries.append((key, self.expr()))
+                if not self.op(","):
+                    break
+        self.expect_op("}")
+        return ("map", tuple(entries))
+
+    def _string_key(self) -> str:
+        kind, value, _, _ = self.peek()
+        if kind != "string":
+            raise self.error("Expected a map key")
+        self.pos += 1
+        return value
+
+    def paren_or_pattern(self) -> tuple:
+        start = self.pos
+        try:
+            pattern = self.pattern()
+            if len(pattern) > 1:
+                return ("pattern", pattern)
+        except CypherSyntaxError:
+            pass
+        self.pos = start
+        self.expect_op("(")
+        expr = self.expr()
+        self.expect_op(")")
+        return expr
+
+    def case(self) -> tuple:
+        subject = None if self.at_keyword("WHEN") else self.expr()
+        branches = []
+        while self.keyword("WHEN"):
+            condition = self.expr()
+            self.expect_keyword("THEN")
+            branches.append((condition, self.expr()))
+        if not branches:
+            raise self.error("CASE needs at least one WHEN")
+        default = self.expr() if self.keyword("ELSE") else ("lit", None)
+        self.expect_keyword("END")
+        return ("case", subject, tuple(branches), default)
+
+    def call(self) -> tuple:
+        name = self.name().lower()
+        self.expect_op("(")
+        if name == "count" and self.op("*"):
+            self.expect_op(")")
+            return ("agg", "count", None, False)
+        distinct = self.keyword("DISTINCT")
+        args = [] if self.at_op(")") else self.expr_list()
+        self.expect_op(")")
+        if name in AGGREGATES:
+            if len(args) != 1:
+                raise self.error(f"{name}() takes one argument")
+            return ("agg", name, args[0], distinct)
+        if distinct:
+            raise self.error(f"DISTINCT is only valid in aggregate functions, not {name}()")
+        return ("call", name, tuple(args))
+
+
+_SCHEMA_RE = re.compile(
+    r"^\s*CREATE\s+(?:(?P<index_type>\w+)\s+)?(?P<kind>CONSTRAINT|INDEX)\s+(?P<name>\w+)\s+IF\s+NOT\s+EXISTS\s+"
+    r"FOR\s+\((?P<var>\w+):(?P<label>\w+)\)\s+(?:REQUIRE|ON)\s+\(?\s*(?P=var)\.(?P<prop>\w+)\s*\)?"
+    r"(?:\s+IS\s+(?P<rule>UNIQUE|NOT\s+NULL))?\s*;?\s*$",
+    re.IGNORECASE,
+)
+_SHOW_RE = re.compile(r"^\s*SHOW\s+(?P<kind>CONSTRAINTS|INDEXES)\s+YIELD\s+name\s*;?\s*$", re.IGNORECASE)
+
+
+@lru_cache(maxsize=512)
+def parse(text: str) -> tuple:
+    """
+    Parse a statement (cached by text, since db.crud reuses a small set of query strings).
+
+    :return: ('query', clauses), ('schema', kind, name, label, prop, unique) or ('show', kind).
+    """
+    match = _SCHEMA_RE.match(text)
+    if match:
+        kind = match.group("kind").lower()
+        unique = (match.group("rule") or "").upper() == "UNIQUE"
+        # Existence constraints and point indexes do not need a hash index
+        hashed = unique or (kind == "index" and not match.group("index_type"))
+        return ("schema", kind, match.group("name"), match.group("label"),
+                match.group("prop") if hashed else None, unique)
+    match = _SHOW_RE.match(text)
+    if match:
+        return ("show", "constraint" if match.group("kind").upper() == "CONSTRAINTS" else "index")
+    return ("query", _Parser(text).statement())
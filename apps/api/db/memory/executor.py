@@ -0,0 +1,951 @@
+"""
+Executes parsed Cypher against a MemoryGraph.
+
+Statements are compiled once per query text into a list of clause steps,
+each taking and returning a list of rows (dicts of variable -> value), with
+expressions compiled to closures. Clauses run one after another over all
+rows, like Neo4j's eager plans, so a MERGE sees what earlier rows created.
+Null handling follows Cypher: comparisons with null are null and WHERE keeps
+only rows whose predicate is true.
+"""
+import math
+import operator
+from functools import lru_cache
+
+from db.memory.cypher import parse
+from db.memory.graph import GraphError, GraphNode, GraphRelationship, MemoryGraph, index_key
+from db.memory.values import Node, Point, Record, Relationship
+
+# Row key holding the finished aggregate values while an aggregating projection is evaluated
+_AGGS = "\x00aggs"
+
+
+class CypherError(GraphError):
+    """A statement failed while running (missing parameter, wrong type, null in MERGE, ...)."""
+
+
+class _Context:
+    __slots__ = ("graph", "params")
+
+    def __init__(self, graph: MemoryGraph, params: dict):
+        self.graph = graph
+        self.params = params
+
+
+# --- Values ---
+
+def _hashable(value):
+    if isinstance(value, (list, dict)):
+        return index_key(value)
+    return value
+
+
+def _equals(a, b) -> bool:
+    if isinstance(a, bool) != isinstance(b, bool):
+        return False
+    if isinstance(a, list) and isinstance(b, list):
+        return len(a) == len(b) and all(_equals(x, y) for x, y in zip(a, b))
+    return a == b
+
+
+def _check_property_value(value):
+    if value is None or isinstance(value, (bool, int, float, str, Point)):
+        return value
+    if isinstance(value, (list, tuple)):
+        for item in value:
+            if item is None or isinstance(item, (dict, list, tuple, GraphNode, GraphRelationship)) and not isinstance(item, Point):
+                raise CypherError("Property values can only be primitive types or lists of them")
+        return list(value)
+    raise CypherError(f"Property values can only be primitive types or lists of them, got {type(value).__name__}")
+
+
+def _properties_of(value) -> dict:
+    if isinstance(value, (GraphNode, GraphRelationship)):
+        return dict(value.props)
+    if isinstance(value, dict):
+        return value
+    raise CypherError(f"Expected a map of properties, got {type(value).__name__}")
+
+
+def _snapshot_node(node: GraphNode) -> Node:
+    return Node(str(node.id), node.labels, dict(node.props))
+
+
+def to_output(value):
+    """
+    Convert a runtime value to what the session returns (snapshots instead of live graph objects).
+    """
+    if isinstance(value, GraphNode):
+        return _snapshot_node(value)
+    if isinstance(value, GraphRelationship):
+        return Relationship(str(value.id), value.type, _snapshot_node(value.start),
+                            _snapshot_node(value.end), dict(value.props))
+    if isinstance(value, list):
+        return [to_output(v) for v in value]
+    if isinstance(value, dict):
+        return {k: to_output(v) for k, v in value.items()}
+    return value
+
+
+def _get_property(value, key):
+    if value is None:
+        return None
+    if isinstance(value, (GraphNode, GraphRelationship)):
+        return value.props.get(key)
+    if isinstance(value, dict):
+        return value.get(key)
+    if isinstance(value, Point):
+        return getattr(value, key, None)
+    raise CypherError(f"Cannot read property {key!r} of {type(value).__name__}")
+
+
+# --- Functions ---
+
+def _point(value):
+    if value is None:
+        return None
+    if not isinstance(value, dict):
+        raise CypherError("point() expects a map")
+    if "latitude" in value or "longitude" in value:
+        lat, lon = value.get("latitude"), value.get("longitude")
+        return None if lat is None or lon is None else Point(float(lon), float(lat), 4326)
+    x, y = value.get("x"), value.get("y")
+    return None if x is None or y is None else Point(float(x), float(y), 7203)
+
+
+def _size(value):
+    return None if value is None else len(value)
+
+
+def _to_integer(value):
+    if value is None:
+        return None
+    try:
+        return int(float(value)) if isinstance(value, str) else int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_float(value):
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _null_safe(fn):
+    return lambda value: None if value is None else fn(value)
+
+
+_FUNCTIONS = {
+    "point": _point,
+    "coalesce": lambda *args: next((a for a in args if a is not None), None),
+    "head": lambda value: value[0] if value else None,
+    "last": lambda value: value[-1] if value else None,
+    "size": _size,
+    "length": _size,
+    "tolower": _null_safe(str.lower),
+    "toupper": _null_safe(str.upper),
+    "trim": _null_safe(str.strip),
+    "tostring": lambda value: None if value is None else (str(value).lower() if isinstance(value, bool) else str(value)),
+    "tointeger": _to_integer,
+    "tofloat": _to_float,
+    "abs": _null_safe(abs),
+    "keys": lambda value: None if value is None else list(_properties_of(value)),
+    "properties": lambda value: None if value is None else _properties_of(value),
+    "labels": lambda node: None if node is None else sorted(node.labels),
+    "type": lambda rel: None if rel is None else rel.type,
+    "id": lambda entity: None if entity is None else entity.id,
+    "elementid": lambda entity: None if entity is None else str(entity.id),
+    "range": lambda start, end, step=1: list(range(start, end + (1 if step > 0 else -1), step)),
+}
+
+
+# --- Expressions ---
+
+_COMPARE = {"<": operator.lt, ">": operator.gt, "<=": operator.le, ">=": operator.ge}
+
+
+def _compare(op, a, b):
+    if a is None or b is None:
+        return None
+    if op == "=":
+        return _equals(a, b)
+    if op == "<>":
+        return not _equals(a, b)
+    try:
+        return _COMPARE[op](a, b)
+    except TypeError:
+        return None
+
+
+def _arith(op, a, b):
+    if a is None or b is None:
+        return None
+    if op == "+":
+        if isinstance(a, list):
+            return a + (b if isinstance(b, list) else [b])
+        if isinstance(b, list):
+            return [a] + b
+        if isinstance(a, str) or isinstance(b, str):
+            return f"{a}{b}"
+        return a + b
+    if op == "-":
+        return a - b
+    if op == "*":
+        return a * b
+    if op == "/":
+        if isinstance(a, int) and isinstance(b, int):
+            if b == 0:
+                raise CypherError("/ by zero")
+            return int(a / b)
+        return a / b if b else (math.nan if a == 0 else math.copysign(math.inf, a))
+    if op == "%":
+        return math.fmod(a, b) if isinstance(a, float) or isinstance(b, float) else int(math.fmod(a, b))
+    raise CypherError(f"Unsupported operator {op}")
+
+
+def compile_expr(expr, aggs: list = None):
+    """
+    Compile an expression to fn(row, ctx). Aggregate calls are registered in
+    `aggs` (and read back from the row when evaluated); without it they are an error.
+    """
+    kind = expr[0]
+    if kind == "lit":
+        value = expr[1]
+        return lambda row, ctx: value
+    if kind == "param":
+        name = expr[1]
+
+        def param(row, ctx):
+            try:
+                return ctx.params[name]
+            except KeyError:
+                raise CypherError(f"Expected parameter: ${name}")
+        return param
+    if kind == "var":
+        name = expr[1]
+
+        def variable(row, ctx):
+            try:
+                return row[name]
+            except KeyError:
+                raise CypherError(f"Variable `{name}` not defined")
+        return variable
+    if kind == "prop":
+        target, key = compile_expr(expr[1], aggs), expr[2]
+        return lambda row, ctx: _get_property(target(row, ctx), key)
+    if kind == "index":
+        target, index = compile_expr(expr[1], aggs), compile_expr(expr[2], aggs)
+
+        def subscript(row, ctx):
+            value, i = target(row, ctx), index(row, ctx)
+            if value is None or i is None:
+                return None
+            if isinstance(value, list):
+                return value[i] if -len(value) <= i < len(value) else None
+            return _get_property(value, i)
+        return subscript
+    if kind == "list":
+        items = [compile_expr(e, aggs) for e in expr[1]]
+        return lambda row, ctx: [fn(row, ctx) for fn in items]
+    if kind == "map":
+        entries = [(k, compile_expr(e, aggs)) for k, e in expr[1]]
+        return lambda row, ctx: {k: fn(row, ctx) for k, fn in entries}
+    if kind == "not":
+        inner = compile_expr(expr[1], aggs)
+
+        def negate(row, ctx):
+            value = inner(row, ctx)
+            return None if value is None else not value
+        return negate
+    if kind == "and":
+        left, right = compile_expr(expr[1], aggs), compile_expr(expr[2], aggs)
+
+        def conjunction(row, ctx):
+            a = left(row, ctx)
+            if a is False:
+                return False
+            b = right(row, ctx)
+            if b is False:
+                return False
+            return None if a is None or b is None else True
+        return conjunction
+    if kind == "or":
+        left, right = compile_expr(expr[1], aggs), compile_expr(expr[2], aggs)
+
+        def disjunction(row, ctx):
+            a = left(row, ctx)
+            if a is True:
+                return True
+            b = right(row, ctx)
+            if b is True:
+                return True
+            return None if a is None or b is None else False
+        return disjunction
+    if kind == "xor":
+        left, right = compile_expr(expr[1], aggs), compile_expr(expr[2], aggs)
+
+        def exclusive(row, ctx):
+            a, b = left(row, ctx), right(row, ctx)
+            return None if a is None or b is None else a != b
+        return exclusive
+    if kind == "cmp":
+        op, left, right = expr[1], compile_expr(expr[2], aggs), compile_expr(expr[3], aggs)
+        return lambda row, ctx: _compare(op, left(row, ctx), right(row, ctx))
+    if kind == "isnull":
+        inner, negated = compile_expr(expr[1], aggs), expr[2]
+        return lambda row, ctx: (inner(row, ctx) is None) != negated
+    if kind == "in":
+        left, right = compile_expr(expr[1], aggs), compile_expr(expr[2], aggs)
+
+        def membership(row, ctx):
+            value, values = left(row, ctx), right(row, ctx)
+            if values is None:
+                return None
+            if not isinstance(values, list):
+                raise CypherError("IN expects a list")
+            if value is None:
+                return None if values else False
+            if any(_equals(value, v) for v in values if v is not None):
+                return True
+            return None if any(v is None for v in values) else False
+        return membership
+    if kind == "strop":
+        op, left, right = expr[1], compile_expr(expr[2], aggs), compile_expr(expr[3], aggs)
+
+        def string_predicate(row, ctx):
+            a, b = left(row, ctx), right(row, ctx)
+            if not isinstance(a, str) or not isinstance(b, str):
+                return None
+            return a.startswith(b) if op == "starts" else a.endswith(b) if op == "ends" else b in a
+        return string_predicate
+    if kind == "arith":
+        op, left, right = expr[1], compile_expr(expr[2], aggs), compile_expr(expr[3], aggs)
+        return lambda row, ctx: _arith(op, left(row, ctx), right(row, ctx))
+    if kind == "neg":
+        inner = compile_expr(expr[1], aggs)
+
+        def minus(row, ctx):
+            value = inner(row, ctx)
+            return None if value is None else -value
+        return minus
+    if kind == "case":
+        subject = compile_expr(expr[1], aggs) if expr[1] is not None else None
+        branches = [(compile_expr(c, aggs), compile_expr(v, aggs)) for c, v in expr[2]]
+        default = compile_expr(expr[3], aggs)
+
+        def case(row, ctx):
+            if subject is not None:
+                value = subject(row, ctx)
+                for condition, result in branches:
+                    if value is not None and _equals(value, condition(row, ctx)):
+                        return result(row, ctx)
+            else:
+                for condition, result in branches:
+                    if condition(row, ctx) is True:
+                        return result(row, ctx)
+            return default(row, ctx)
+        return case
+    if kind == "call":
+        name = expr[1]
+        fn = _FUNCTIONS.get(name)
+        if fn is None:
+            raise CypherError(f"Unknown function {name}()")
+        args = [compile_expr(a, aggs) for a in expr[2]]
+        return lambda row, ctx: fn(*[a(row, ctx) for a in args])
+    if kind == "agg":
+        if aggs is None:
+            raise CypherError(f"Aggregate {expr[1]}() is only allowed in WITH and RETURN")
+        arg = compile_expr(expr[2]) if expr[2] is not None else None
+        slot = len(aggs)
+        aggs.append((expr[1], arg, expr[3]))
+        return lambda row, ctx: row[_AGGS][slot]
+    if kind == "pattern":
+        pattern = _PatternMatcher(expr[1])
+        return lambda row, ctx: next(pattern.matches(row, ctx), None) is not None
+    raise CypherError(f"Unsupported expression {kind}")
+
+
+# --- Aggregation ---
+
+class _Accumulator:
+    __slots__ = ("name", "distinct", "seen", "count", "total", "values", "best")
+
+    def __init__(self, name: str, distinct: bool):
+        self.name = name
+        self.distinct = distinct
+        self.seen = set() if distinct else None
+        self.count = 0
+        self.total = 0
+        self.values = []
+        self.best = None
+
+    def add(self, value) -> None:
+        if value is None:
+            return
+        if self.distinct:
+            key = _hashable(value)
+            if key in self.seen:
+                return
+            self.seen.add(key)
+        self.count += 1
+        if self.name in ("sum", "avg"):
+            self.total += value
+        elif self.name == "collect":
+            self.values.append(value)
+        elif self.name == "min":
+            if self.best is None or value < self.best:
+                self.best = value
+        elif self.name == "max":
+            if self.best is None or value > self.best:
+                self.best = value
+
+    def result(self):
+        if self.name == "count":
+            return self.count
+        if self.name == "sum":
+            return self.total
+        if self.name == "avg":
+            return self.total / self.count if self.count else None
+        if self.name == "collect":
+            return self.values
+        return self.best
+
+
+# --- Patterns ---
+
+class _NodeSpec:
+    __slots__ = ("var", "labels", "props", "hints")
+
+    def __init__(self, element):
+        _, self.var, self.labels, props = element
+        self.props = compile_expr(props) if props is not None else None
+        # Equality conjuncts from the MATCH's WHERE usable for index lookups
+        self.hints = []
+
+
+class _RelSpec:
+    __slots__ = ("var", "types", "props", "direction")
+
+    def __init__(self, element):
+        _, self.var, self.types, props, self.direction = element
+        self.props = compile_expr(props) if props is not None else None
+
+
+def _props_match(entity, props: dict) -> bool:
+    for key, value in props.items():
+        if value is None or not _equals(entity.props.get(key), value):
+            return False
+    return True
+
+
+def _neighbours(node: GraphNode, types: tuple, outgoing: bool):
+    adjacency = node.out if outgoing else node.inn
+    if not adjacency:
+        return
+    groups = [adjacency.get(t) for t in types] if types else list(adjacency.values())
+    for rels in groups:
+        if rels:
+            for rel in list(rels):
+                yield rel, (rel.end if outgoing else rel.start)
+
+
+class _PatternMatcher:
+    """
+    Enumerates the bindings of one path pattern, starting from the most
+    selective node (bound variable, indexed property, label) and walking the
+    adjacency lists in both directions from there.
+    """
+
+    def __init__(self, pattern: tuple):
+        self.nodes = [_NodeSpec(e) for e in pattern[0::2]]
+        self.rels = [_RelSpec(e) for e in pattern[1::2]]
+        self.variables = [s.var for s in self.nodes + self.rels if s.var]
+
+    def add_hints(self, where) -> None:
+        """
+        Use `var.prop = $param/literal` conjuncts of a WHERE clause for index lookups.
+        """
+        by_var = {spec.var: spec for spec in self.nodes if spec.var and spec.labels}
+        for conjunct in _conjuncts(where):
+            if conjunct[0] != "cmp" or conjunct[1] != "=":
+                continue
+            for left, right in ((conjunct[2], conjunct[3]), (conjunct[3], conjunct[2])):
+                if (left[0] == "prop" and left[1][0] == "var" and left[1][1] in by_var
+                        and right[0] in ("param", "lit")):
+                    by_var[left[1][1]].hints.append((left[2], compile_expr(right)))
+
+    def _node_ok(self, node, spec: _NodeSpec, row: dict, ctx) -> bool:
+        if spec.var and spec.var in row and row[spec.var] is not node:
+            return False
+        for label in spec.labels:
+            if label not in node.labels:
+                return False
+        if spec.props is not None:
+            props = spec.props(row, ctx)
+            if not isinstance(props, dict) or not _props_match(node, props):
+                return False
+        return True
+
+    def _candidates(self, spec: _NodeSpec, row: dict, ctx):
+        if spec.var and spec.var in row:
+            node = row[spec.var]
+            return [node] if isinstance(node, GraphNode) and not node.deleted else []
+        graph = ctx.graph
+        if spec.labels:
+            lookups = dict(spec.props(row, ctx) or {}) if spec.props is not None else {}
+            for key, fn in spec.hints:
+                lookups.setdefault(key, fn(row, ctx))
+            lookups = {k: v for k, v in lookups.items() if v is not None}
+            if lookups:
+                for label in spec.labels:
+                    indexed = [k for k in lookups if (label, k) in graph._indexes]
+                    key = indexed[0] if indexed else next(iter(lookups))
+                    return graph.lookup(label, key, lookups[key])
+            return list(graph.nodes_with_label(spec.labels[0]))
+        return list(graph.nodes.values())
+
+    def _anchor(self, row: dict) -> int:
+        def score(spec):
+            if spec.var and spec.var in row:
+                return 3
+            if spec.labels and (spec.props is not None or spec.hints):
+                return 2
+            return 1 if spec.labels else 0
+        scores = [score(spec) for spec in self.nodes]
+        return scores.index(max(scores))
+
+    def matches(self, row: dict, ctx):
+        """
+        Yield row extended with the pattern's variables, once per match.
+        """
+        anchor = self._anchor(row)
+        spec = self.nodes[anchor]
+        # Walk right from the anchor, then left
+        steps = [(i, True) for i in range(anchor, len(self.rels))] + [(i, False) for i in range(anchor - 1, -1, -1)]
+        for node in self._candidates(spec, row, ctx):
+            if not self._node_ok(node, spec, row, ctx):
+                continue
+            bound = dict(row)
+            if spec.var:
+                bound[spec.var] = node
+            yield from self._walk(bound, ctx, steps, 0, {anchor: node}, ())
+
+    def _walk(self, row: dict, ctx, steps: list, step: int, placed: dict, used: tuple):
+        if step == len(steps):
+            yield row
+            return
+        rel_index, rightwards = steps[step]
+        rel_spec = self.rels[rel_index]
+        source_index, target_index = (rel_index, rel_index + 1) if rightwards else (rel_index + 1, rel_index)
+        source = placed[source_index]
+        target_spec = self.nodes[target_index]
+        directions = []
+        if rel_spec.direction in ("out", "both"):
+            directions.append(rightwards)
+        if rel_spec.direction in ("in", "both"):
+            directions.append(not rightwards)
+        rel_props = rel_spec.props(row, ctx) if rel_spec.props is not None else None
+        for outgoing in directions:
+            for rel, other in _neighbours(source, rel_spec.types, outgoing):
+                if rel.id in used:
+                    continue
+                if rel_spec.var and rel_spec.var in row and row[rel_spec.var] is not rel:
+                    continue
+                if rel_props is not None and not _props_match(rel, rel_props):
+                    continue
+                if target_index in placed and placed[target_index] is not other:
+                    continue
+                if not self._node_ok(other, target_spec, row, ctx):
+                    continue
+                bound = dict(row)
+                if rel_spec.var:
+                    bound[rel_spec.var] = rel
+                if target_spec.var:
+                    bound[target_spec.var] = other
+                yield from self._walk(bound, ctx, steps, step + 1, {**placed, target_index: other}, used + (rel.id,))
+
+    def create(self, row: dict, ctx) -> dict:
+        """
+        Create the pattern's unbound nodes and all its relationships; return the extended row.
+        """
+        graph = ctx.graph
+        row = dict(row)
+        nodes = []
+        for spec in self.nodes:
+            if spec.var and spec.var in row:
+                node = row[spec.var]
+                if not isinstance(node, GraphNode) or node.deleted:
+                    raise CypherError(f"Cannot create a relationship to null or deleted node `{spec.var}`")
+            else:
+                props = spec.props(row, ctx) if spec.props is not None else {}
+                node = graph.create_node(spec.labels, {k: _check_property_value(v) for k, v in props.items()})
+                if spec.var:
+                    row[spec.var] = node
+            nodes.append(node)
+        for i, spec in enumerate(self.rels):
+            if len(spec.types) != 1:
+                raise CypherError("A created relationship needs exactly one type")
+            start, end = (nodes[i + 1], nodes[i]) if spec.direction == "in" else (nodes[i], nodes[i + 1])
+            props = spec.props(row, ctx) if spec.props is not None else {}
+            rel = graph.create_relationship(spec.types[0], start, end,
+                                            {k: _check_property_value(v) for k, v in props.items()})
+            if spec.var:
+                row[spec.var] = rel
+        return row
+
+
+def _conjuncts(expr):
+    if expr is None:
+        return []
+    if expr[0] == "and":
+        return _conjuncts(expr[1]) + _conjuncts(expr[2])
+    return [expr]
+
+
+# --- Clauses ---
+
+def _match_all(matchers: list, row: dict, ctx, index: int = 0):
+    if index == len(matchers):
+        yield row
+        return
+    for bound in matchers[index].matches(row, ctx):
+        yield from _match_all(matchers, bound, ctx, index + 1)
+
+
+def _compile_match(clause):
+    _, patterns, where, optional = clause
+    matchers = [_PatternMatcher(p) for p in patterns]
+    for matcher in matchers:
+        matcher.add_hints(where)
+    condition = compile_expr(where) if where is not None else None
+    variables = [v for m in matchers for v in m.variables]
+
+    def step(rows, ctx):
+        out = []
+        for row in rows:
+            matched = False
+            for bound in _match_all(matchers, row, ctx):
+                if condition is None or condition(bound, ctx) is True:
+                    out.append(bound)
+                    matched = True
+            if optional and not matched:
+                out.append({**{v: None for v in variables}, **row})
+        return out
+    return step
+
+
+def _compile_unwind(clause):
+    _, expr, var = clause
+    source = compile_expr(expr)
+
+    def step(rows, ctx):
+        out = []
+        for row in rows:
+            values = source(row, ctx)
+            if values is None:
+                continue
+            for value in values if isinstance(values, list) else [values]:
+                out.append({**row, var: value})
+        return out
+    return step
+
+
+def _compile_set_items(items):
+    compiled = [(item[0], item[1], item[2] if item[0] == "prop" else None,
+                 compile_expr(item[-1])) for item in items]
+
+    def apply(row, ctx):
+        graph = ctx.graph
+        for kind, var, key, value_fn in compiled:
+            target = row.get(var)
+            if target is None:
+                continue
+            if not isinstance(target, (GraphNode, GraphRelationship)):
+                raise CypherError(f"SET expects a node or relationship in `{var}`")
+            value = value_fn(row, ctx)
+            if kind == "prop":
+                graph.set_property(target, key, _check_property_value(value))
+                continue
+            props = _properties_of(value) if value is not None else {}
+            if kind == "replace_props":
+                for existing in [k for k in target.props if k not in props]:
+                    graph.set_property(target, existing, None)
+            for k, v in props.items():
+                graph.set_property(target, k, _check_property_value(v))
+    return apply
+
+
+def _compile_set(clause):
+    apply = _compile_set_items(clause[1])
+
+    def step(rows, ctx):
+        for row in rows:
+            apply(row, ctx)
+        return rows
+    return step
+
+
+def _compile_merge(clause):
+    _, pattern, on_create, on_match = clause
+    matcher = _PatternMatcher(pattern)
+    create_set = _compile_set_items(on_create) if on_create else None
+    match_set = _compile_set_items(on_match) if on_match else None
+
+    def step(rows, ctx):
+        out = []
+        for row in rows:
+            for spec in matcher.nodes:
+                if spec.props is not None and not (spec.var and spec.var in row):
+                    props = spec.props(row, ctx) or {}
+                    if any(v is None for v in props.values()):
+                        raise CypherError("Cannot merge a node using a null property value")
+            matches = list(matcher.matches(row, ctx))
+            if matches:
+                for bound in matches:
+                    if match_set:
+                        match_set(bound, ctx)
+                    out.append(bound)
+            else:
+                bound = matcher.create(row, ctx)
+                if create_set:
+                    create_set(bound, ctx)
+                out.append(bound)
+        return out
+    return step
+
+
+def _compile_create(clause):
+    matchers = [_PatternMatcher(p) for p in clause[1]]
+
+    def step(rows, ctx):
+        out = []
+        for row in rows:
+            for matcher in matchers:
+                row = matcher.create(row, ctx)
+            out.append(row)
+        return out
+    return step
+
+
+def _compile_delete(clause):
+    _, exprs, detach = clause
+    targets = [compile_expr(e) for e in exprs]
+
+    def step(rows, ctx):
+        nodes, rels = [], []
+        for row in rows:
+            for target in targets:
+                value = target(row, ctx)
+                for entity in value if isinstance(value, list) else [value]:
+                    if isinstance(entity, GraphNode):
+                        nodes.append(entity)
+                    elif isinstance(entity, GraphRelationship):
+                        rels.append(entity)
+                    elif entity is not None:
+                        raise CypherError("DELETE expects nodes or relationships")
+        for rel in rels:
+            ctx.graph.delete_relationship(rel)
+        for node in nodes:
+            ctx.graph.delete_node(node, detach=detach)
+        return rows
+    return step
+
+
+def _compile_foreach(clause):
+    _, var, source_expr, body = clause
+    source = compile_expr(source_expr)
+    steps = [_compile_clause(c) for c in body]
+
+    def step(rows, ctx):
+        for row in rows:
+            values = source(row, ctx)
+            for value in values or []:
+                inner = [{**row, var: value}]
+                for inner_step in steps:
+                    inner = inner_step(inner, ctx)
+        return rows
+    return step
+
+
+def _sort_key(value):
+    # Nulls last; numbers, strings and the rest ordered within their own group
+    if value is None:
+        return (3, 0)
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return (0, value)
+    if isinstance(value, str):
+        return (1, value)
+    return (2, str(value))
+
+
+def _compile_projection(projection, where=None):
+    """
+    Compile WITH/RETURN items into fn(rows, ctx) -> projected rows.
+    """
+    items, distinct, order, skip, limit = projection
+    aggs = []
+    compiled = []
+    for alias, expr in items:
+        if alias == "*":
+            compiled.append(("*", None, False))
+            continue
+        before = len(aggs)
+        fn = compile_expr(expr, aggs)
+        compiled.append((alias, fn, len(aggs) > before))
+    aggregating = bool(aggs)
+    keys = [(alias, fn) for alias, fn, is_agg in compiled if not is_agg and alias != "*"]
+    order_fns = [(compile_expr(e), descending) for e, descending in order]
+    skip_fn = compile_expr(skip) if skip is not None else None
+    limit_fn = compile_expr(limit) if limit is not None else None
+    condition = compile_expr(where) if where is not None else None
+
+    def project(row, ctx):
+        out = {}
+        for alias, fn, _ in compiled:
+            if alias == "*":
+                out.update(row)
+            else:
+                out[alias] = fn(row, ctx)
+        return out
+
+    def aggregate(rows, ctx):
+        groups = {}
+        for row in rows:
+            key_values = [(alias, fn(row, ctx)) for alias, fn in keys]
+            group_key = tuple(_hashable(v) for _, v in key_values)
+            group = groups.get(group_key)
+            if group is None:
+                group = groups[group_key] = (row, key_values, [_Accumulator(n, d) for n, _, d in aggs])
+            for accumulator, (name, arg, _) in zip(group[2], aggs):
+                accumulator.add(1 if arg is None else arg(row, ctx))
+        if not groups and not keys:
+            groups[()] = ({}, [], [_Accumulator(n, d) for n, _, d in aggs])
+        out = []
+        for first_row, key_values, accumulators in groups.values():
+            synthetic = {**first_row, **dict(key_values), _AGGS: [a.result() for a in accumulators]}
+            projected = {}
+            for alias, fn, is_agg in compiled:
+                projected[alias] = fn(synthetic, ctx)
+            out.append((projected, projected))
+        return out
+
+    def step(rows, ctx):
+        if aggregating:
+            pairs = aggregate(rows, ctx)
+        else:
+            pairs = [(project(row, ctx), row) for row in rows]
+        if distinct:
+            seen = set()
+            unique = []
+            for projected, source in pairs:
+                key = tuple((k, _hashable(v)) for k, v in projected.items())
+                if key not in seen:
+                    seen.add(key)
+                    unique.append((projected, projected))
+            pairs = unique
+        if condition is not None:
+            pairs = [(p, s) for p, s in pairs if condition({**s, **p}, ctx) is True]
+        for fn, descending in reversed(order_fns):
+            pairs.sort(key=lambda pair: _sort_key(fn({**pair[1], **pair[0]}, ctx)), reverse=descending)
+        if skip_fn is not None:
+            pairs = pairs[skip_fn({}, ctx):]
+        if limit_fn is not None:
+            pairs = pairs[:limit_fn({}, ctx)]
+        return [projected for projected, _ in pairs]
+
+    columns = [alias for alias, _, _ in compiled if alias != "*"]
+    return step, columns
+
+
+def _compile_clause(clause):
+    kind = clause[0]
+    if kind == "match":
+        return _compile_match(clause)
+    if kind == "unwind":
+        return _compile_unwind(clause)
+    if kind == "merge":
+        return _compile_merge(clause)
+    if kind == "create":
+        return _compile_create(clause)
+    if kind == "set":
+        return _compile_set(clause)
+    if kind == "delete":
+        return _compile_delete(clause)
+    if kind == "foreach":
+        return _compile_foreach(clause)
+    if kind == "with":
+        return _compile_projection(clause[1], clause[2])[0]
+    raise CypherError(f"Unsupported clause {kind}")
+
+
+def _parameter_names(node, found: set) -> set:
+    if isinstance(node, (tuple, list)):
+        if len(node) == 2 and node[0] == "param" and isinstance(node[1], str):
+            found.add(node[1])
+        else:
+            for child in node:
+                _parameter_names(child, found)
+    return found
+
+
+class _Plan:
+    __slots__ = ("kind", "steps", "columns", "schema", "parameters")
+
+    def __init__(self, parsed: tuple):
+        self.kind = parsed[0]
+        self.steps = []
+        self.columns = []
+        self.schema = parsed[1:]
+        self.parameters = _parameter_names(parsed, set())
+        if self.kind != "query":
+            return
+        clauses = parsed[1]
+        for clause in clauses:
+            if clause[0] == "return":
+                if clause is not clauses[-1]:
+                    raise CypherError("RETURN must be the last clause")
+                step, self.columns = _compile_projection(clause[1])
+                self.steps.append(step)
+            else:
+                self.steps.append(_compile_clause(clause))
+
+
+@lru_cache(maxsize=512)
+def compile_statement(text: str) -> _Plan:
+    """
+    Parse and compile a statement (cached by text).
+    """
+    return _Plan(parse(text))
+
+
+def execute(graph: MemoryGraph, text: str, params: dict) -> tuple:
+    """
+    Run one statement atomically.
+
+    :return: (column names, list of Records, counters dict).
+    """
+    plan = compile_statement(text)
+    missing = plan.parameters.difference(params)
+    if missing:
+        raise CypherError(f"Expected parameter(s): {', '.join('$' + name for name in sorted(missing))}")
+    with graph.statement() as counters:
+        if plan.kind == "schema":
+            kind, name, label, prop, unique = plan.schema
+            graph.add_schema(name, kind, label, prop, unique)
+            return [], [], dict(counters)
+        if plan.kind == "show":
+            kind = plan.schema[0]
+            names = sorted(name for name, (k, _, _) in graph.schema.items() if k == kind)
+            return ["name"], [Record(name=name) for name in names], {}
+        ctx = _Context(graph, params)
+        rows = [{}]
+        for step in plan.steps:
+            rows = step(rows, ctx)
+        if not plan.columns:
+            return [], [], dict(counters)
+        records = [Record((c, to_output(row[c])) for c in plan.columns) for row in rows]
+        return plan.columns, records, dict(counters)
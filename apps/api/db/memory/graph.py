@@ -0,0 +1,310 @@
+"""
+In-process property graph used by the memory:// backend.
+
+Nodes and relationships live in plain Python objects with per-type adjacency
+lists. Label scans go through a per-label dict, and (label, property) lookups
+through hash indexes that are built on first use (or by CREATE CONSTRAINT /
+CREATE INDEX) and kept up to date on every write. Each statement runs under
+one lock with an undo log, so a failing statement leaves no partial writes.
+"""
+import itertools
+import threading
+
+
+class GraphError(Exception):
+    """Base class of the memory backend's errors."""
+
+
+class ConstraintError(GraphError):
+    """A write would break a uniqueness constraint or delete a connected node."""
+
+
+def index_key(value):
+    """
+    Hashable form of a property value (lists become tuples, maps sorted item tuples).
+    """
+    if isinstance(value, list):
+        return tuple(index_key(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, index_key(v)) for k, v in value.items()))
+    return value
+
+
+class GraphNode:
+    __slots__ = ("id", "labels", "props", "out", "inn", "deleted")
+
+    def __init__(self, node_id: int, labels: frozenset, props: dict):
+        self.id = node_id
+        self.labels = labels
+        self.props = props
+        # Adjacency by relationship type, created on the first relationship
+        self.out = None
+        self.inn = None
+        self.deleted = False
+
+    def degree(self) -> int:
+        return sum(len(rels) for rels in (self.out or {}).values()) + sum(len(rels) for rels in (self.inn or {}).values())
+
+
+class GraphRelationship:
+    __slots__ = ("id", "type", "start", "end", "props", "deleted")
+
+    def __init__(self, rel_id: int, rel_type: str, start: GraphNode, end: GraphNode, props: dict):
+        self.id = rel_id
+        self.type = rel_type
+        self.start = start
+        self.end = end
+        self.props = props
+        self.deleted = False
+
+
+class MemoryGraph:
+    """
+    The store. All mutations go through its methods so indexes, counters and
+    the undo log stay consistent; run statements through statement().
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.nodes = {}
+        self.relationship_count = 0
+        self._by_label = {}
+        # (label, property) -> {index_key(value): {node id: node}}
+        self._indexes = {}
+        self._unique = set()
+        # Constraint/index name -> (kind, label, property)
+        self.schema = {}
+        self._ids = itertools.count()
+        self._undo = None
+        self.counters = None
+
+    # --- Statements ---
+
+    def statement(self):
+        """
+        Context manager for one atomic statement: holds the lock, collects
+        counters and rolls back every write if the block raises.
+        """
+        return _Statement(self)
+
+    def _log(self, undo, *args) -> None:
+        if self._undo is not None:
+            self._undo.append((undo, args))
+
+    def _count(self, counter: str, n: int = 1) -> None:
+        if self.counters is not None:
+            self.counters[counter] = self.counters.get(counter, 0) + n
+
+    # --- Lookups ---
+
+    def nodes_with_label(self, label: str):
+        return (self._by_label.get(label) or {}).values()
+
+    def lookup(self, label: str, prop: str, value) -> list:
+        """
+        Nodes with a label whose property equals value, through the hash index
+        (built from a label scan the first time the pair is looked up).
+        """
+        index = self._indexes.get((label, prop))
+        if index is None:
+            index = self.create_index(label, prop)
+        try:
+            bucket = index.get(index_key(value))
+        except TypeError:
+            return [n for n in self.nodes_with_label(label) if n.props.get(prop) == value]
+        return list(bucket.values()) if bucket else []
+
+    def create_index(self, label: str, prop: str) -> dict:
+        index = self._indexes.get((label, prop))
+        if index is not None:
+            return index
+        index = {}
+        for node in self.nodes_with_label(label):
+            if prop in node.props:
+                index.setdefault(index_key(node.props[prop]), {})[node.id] = node
+        self._indexes[(label, prop)] = index
+        return index
+
+    def add_schema(self, name: str, kind: str, label: str, prop: str = None, unique: bool = False) -> None:
+        """
+        Register a named constraint or index; single-property ones get a hash index.
+        """
+        if name in self.schema:
+            return
+        if prop is not None:
+            if unique:
+                values = [index_key(n.props[prop]) for n in self.nodes_with_label(label) if prop in n.props]
+                if len(values) != len(set(values)):
+                    raise ConstraintError(f"Existing :{label}.{prop} values are not unique")
+                self._unique.add((label, prop))
+            self.create_index(label, prop)
+        self.schema[name] = (kind, label, prop)
+
+    # --- Index maintenance ---
+
+    def _index_add(self, node: GraphNode, prop: str, value) -> None:
+        for label in node.labels:
+            index = self._indexes.get((label, prop))
+            if index is None:
+                continue
+            key = index_key(value)
+            bucket = index.setdefault(key, {})
+            if (label, prop) in self._unique and bucket and node.id not in bucket:
+                raise ConstraintError(f"Node with :{label}.{prop} = {value!r} already exists")
+            bucket[node.id] = node
+
+    def _index_remove(self, node: GraphNode, prop: str, value) -> None:
+        for label in node.labels:
+            index = self._indexes.get((label, prop))
+            if index is None:
+                continue
+            key = index_key(value)
+            bucket = index.get(key)
+            if bucket is not None:
+                bucket.pop(node.id, None)
+                if not bucket:
+                    del index[key]
+
+    # --- Writes ---
+
+    def create_node(self, labels, props: dict) -> GraphNode:
+        node = GraphNode(next(self._ids), frozenset(labels), {})
+        self.nodes[node.id] = node
+        for label in node.labels:
+            self._by_label.setdefault(label, {})[node.id] = node
+        self._log(self._drop_node, node)
+        self._count("nodes_created")
+        for key, value in props.items():
+            self.set_property(node, key, value)
+        return node
+
+    def _drop_node(self, node: GraphNode) -> None:
+        for key, value in node.props.items():
+            self._index_remove(node, key, value)
+        for label in node.labels:
+            self._by_label[label].pop(node.id, None)
+        self.nodes.pop(node.id, None)
+        node.deleted = True
+
+    def _restore_node(self, node: GraphNode) -> None:
+        node.deleted = False
+        self.nodes[node.id] = node
+        for label in node.labels:
+            self._by_label.setdefault(label, {})[node.id] = node
+        for key, value in node.props.items():
+            self._index_add(node, key, value)
+
+    def delete_node(self, node: GraphNode, detach: bool = False) -> None:
+        if node.deleted:
+            return
+        if node.degree():
+            if not detach:
+                raise ConstraintError(f"Node {node.id} still has relationships; use DETACH DELETE")
+            for rels in list((node.out or {}).values()) + list((node.inn or {}).values()):
+                for rel in list(rels):
+                    self.delete_relationship(rel)
+        self._drop_node(node)
+        self._log(self._restore_node, node)
+        self._count("nodes_deleted")
+
+    def set_property(self, entity, key: str, value) -> None:
+        """
+        Set (or with None, remove) a property of a node or relationship.
+        """
+        old = entity.props.get(key)
+        had = key in entity.props
+        if value is None and not had:
+            return
+        if isinstance(entity, GraphNode):
+            if had:
+                self._index_remove(entity, key, old)
+            if value is not None:
+                try:
+                    self._index_add(entity, key, value)
+                except ConstraintError:
+                    if had:
+                        self._index_add(entity, key, old)
+                    raise
+        if value is None:
+            del entity.props[key]
+        else:
+            entity.props[key] = value
+        self._log(self._reset_property, entity, key, had, old)
+        self._count("properties_set")
+
+    def _reset_property(self, entity, key: str, had: bool, old) -> None:
+        if isinstance(entity, GraphNode) and key in entity.props:
+            self._index_remove(entity, key, entity.props[key])
+        if had:
+            entity.props[key] = old
+            if isinstance(entity, GraphNode):
+                self._index_add(entity, key, old)
+        else:
+            entity.props.pop(key, None)
+
+    def create_relationship(self, rel_type: str, start: GraphNode, end: GraphNode, props: dict) -> GraphRelationship:
+        rel = GraphRelationship(next(self._ids), rel_type, start, end, {})
+        self._link(rel)
+        self._log(self._unlink, rel)
+        self._count("relationships_created")
+        for key, value in props.items():
+            self.set_property(rel, key, value)
+        return rel
+
+    def _link(self, rel: GraphRelationship) -> None:
+        rel.deleted = False
+        if rel.start.out is None:
+            rel.start.out = {}
+        if rel.end.inn is None:
+            rel.end.inn = {}
+        rel.start.out.setdefault(rel.type, []).append(rel)
+        rel.end.inn.setdefault(rel.type, []).append(rel)
+        self.relationship_count += 1
+
+    def _unlink(self, rel: GraphRelationship) -> None:
+        rel.start.out[rel.type].remove(rel)
+        rel.end.inn[rel.type].remove(rel)
+        self.relationship_count -= 1
+        rel.deleted = True
+
+    def delete_relationship(self, rel: GraphRelationship) -> None:
+        if rel.deleted:
+            return
+        self._unlink(rel)
+        self._log(self._link, rel)
+        self._count("relationships_deleted")
+
+    def clear(self) -> None:
+        with self.lock:
+            self.__init__()
+
+    def stats(self) -> dict:
+        return {
+            "nodes": len(self.nodes),
+            "relationships": self.relationship_count,
+            "labels": {label: len(nodes) for label, nodes in self._by_label.items() if nodes},
+            "indexes": sorted(f"{label}.{prop}" for label, prop in self._indexes),
+        }
+
+
+class _Statement:
+    def __init__(self, graph: MemoryGraph):
+        self.graph = graph
+
+    def __enter__(self) -> dict:
+        self.graph.lock.acquire()
+        self.graph._undo = []
+        self.graph.counters = {}
+        return self.graph.counters
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        graph = self.graph
+        try:
+            if exc_type is not None:
+                undo, graph._undo = graph._undo, None
+                for fn, args in reversed(undo):
+                    fn(*args)
+        finally:
+            graph._undo = None
+            graph.counters = None
+            graph.lock.release()
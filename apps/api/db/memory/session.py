@@ -0,0 +1,139 @@
+"""
+Session and result objects of the memory backend, mirroring the parts of the
+neo4j driver API the app uses: run(), single(), data(), consume(), iteration
+and the (async) context managers.
+"""
+from db.memory.executor import execute
+from db.memory.graph import MemoryGraph
+
+
+class Summary:
+    """
+    What result.consume() returns; counters holds nodes_created, properties_set, ...
+    """
+
+    def __init__(self, query: str, parameters: dict, counters: dict):
+        self.query = query
+        self.parameters = parameters
+        self.counters = counters
+
+
+class Result:
+    """
+    Records of one statement. The statement has already run, so the result
+    stays usable after the session closes.
+    """
+
+    def __init__(self, keys: list, records: list, summary: Summary):
+        self._keys = keys
+        self._records = records
+        self._position = 0
+        self._summary = summary
+
+    def keys(self) -> list:
+        return list(self._keys)
+
+    def __iter__(self):
+        while self._position < len(self._records):
+            record = self._records[self._position]
+            self._position += 1
+            yield record
+
+    def single(self, strict: bool = False):
+        """
+        The next record, or None if there is none. With strict=True exactly one record must remain.
+        """
+        remaining = self._records[self._position:]
+        self._position = len(self._records)
+        if strict and len(remaining) != 1:
+            raise ValueError(f"Expected exactly one record, got {len(remaining)}")
+        return remaining[0] if remaining else None
+
+    def data(self, *keys) -> list:
+        rows = [record.data() for record in self]
+        if keys:
+            rows = [{k: row.get(k) for k in keys} for row in rows]
+        return rows
+
+    def consume(self) -> Summary:
+        self._position = len(self._records)
+        return self._summary
+
+
+class AsyncResult:
+    """
+    Async view of a Result for AsyncMemorySession.
+    """
+
+    def __init__(self, result: Result):
+        self._result = result
+
+    def keys(self) -> list:
+        return self._result.keys()
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for record in self._result:
+            yield record
+
+    async def single(self, strict: bool = False):
+        return self._result.single(strict)
+
+    async def data(self, *keys) -> list:
+        return self._result.data(*keys)
+
+    async def consume(self) -> Summary:
+        return self._result.consume()
+
+
+def _run(graph: MemoryGraph, query: str, parameters: dict, kwargs: dict) -> Result:
+    params = {**(parameters or {}), **kwargs}
+    keys, records, counters = execute(graph, query, params)
+    return Result(keys, records, Summary(query, params, counters))
+
+
+class MemorySession:
+    """
+    Synchronous session on a MemoryGraph. Each run() is its own atomic statement.
+    """
+
+    def __init__(self, graph: MemoryGraph):
+        self.graph = graph
+        self.closed = False
+
+    def run(self, query: str, parameters: dict = None, **kwargs) -> Result:
+        return _run(self.graph, query, parameters, kwargs)
+
+    def close(self) -> None:
+        self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class AsyncMemorySession:
+    """
+    Async session on a MemoryGraph. Statements run inline: they hold the graph
+    lock only for the in-memory work, which is shorter than a thread hop.
+    """
+
+    def __init__(self, graph: MemoryGraph):
+        self.graph = graph
+        self.closed = False
+
+    async def run(self, query: str, parameters: dict = None, **kwargs) -> AsyncResult:
+        return AsyncResult(_run(self.graph, query, parameters, kwargs))
+
+    async def close(self) -> None:
+        self.closed = True
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
@@ -0,0 +1,88 @@
+"""
+Values returned by the memory backend, shaped like the neo4j driver's.
+
+Nodes and relationships are read-only snapshots taken when the statement
+returns them: dict(node), node.get(key), node["key"], node.labels and
+rel.type work as with the driver. Records are dicts with the driver's data()
+and value() helpers.
+"""
+from collections.abc import Mapping
+
+
+class Node(Mapping):
+    __slots__ = ("element_id", "labels", "_properties")
+
+    def __init__(self, element_id: str, labels: frozenset, properties: dict):
+        self.element_id = element_id
+        self.labels = labels
+        self._properties = properties
+
+    def __getitem__(self, key):
+        return self._properties[key]
+
+    def __iter__(self):
+        return iter(self._properties)
+
+    def __len__(self):
+        return len(self._properties)
+
+    def __repr__(self):
+        return f"<Node element_id={self.element_id!r} labels={set(self.labels)!r} properties={self._properties!r}>"
+
+
+class Relationship(Mapping):
+    __slots__ = ("element_id", "type", "start_node", "end_node", "_properties")
+
+    def __init__(self, element_id: str, rel_type: str, start_node: Node, end_node: Node, properties: dict):
+        self.element_id = element_id
+        self.type = rel_type
+        self.start_node = start_node
+        self.end_node = end_node
+        self._properties = properties
+
+    def __getitem__(self, key):
+        return self._properties[key]
+
+    def __iter__(self):
+        return iter(self._properties)
+
+    def __len__(self):
+        return len(self._properties)
+
+    def __repr__(self):
+        return f"<Relationship element_id={self.element_id!r} type={self.type!r} properties={self._properties!r}>"
+
+
+class Point(tuple):
+    """
+    Spatial point as returned by point(): a (x, y) tuple with its SRID
+    (4326 for latitude/longitude, 7203 for cartesian x/y).
+    """
+
+    def __new__(cls, x: float, y: float, srid: int):
+        point = super().__new__(cls, (x, y))
+        point.srid = srid
+        return point
+
+    x = property(lambda self: self[0])
+    y = property(lambda self: self[1])
+    longitude = property(lambda self: self[0] if self.srid == 4326 else None)
+    latitude = property(lambda self: self[1] if self.srid == 4326 else None)
+
+    def __repr__(self):
+        return f"Point(x={self[0]}, y={self[1]}, srid={self.srid})"
+
+
+class Record(dict):
+    """
+    One result row, keyed by the RETURN column names.
+    """
+
+    def data(self) -> dict:
+        return dict(self)
+
+    def value(self, key=0, default=None):
+        if isinstance(key, int):
+            values = list(self.values())
+            return values[key] if key < len(values) else default
+        return self.get(key, default)
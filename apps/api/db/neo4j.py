@@ -1,9 +1,12 @@
 """Neo4j driver initialization module."""
 import os
+import asyncio
+import weakref
 try:
-    from neo4j import GraphDatabase
+    from neo4j import GraphDatabase, AsyncGraphDatabase
 except ImportError:
     GraphDatabase = None
+    AsyncGraphDatabase = None
 from utils.env_loader import load_dotenv
 
 # Load environment variables from .env at project root
@@ -13,9 +16,13 @@ load_dotenv()
 NEO4J_URI = os.getenv("NEO4J_URI", "bolt://localhost:7687")
 NEO4J_USER = os.getenv("NEO4J_USER", "neo4j")
 NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD", "")
+# Connection pool size for the async driver (one pool per event loop)
+NEO4J_MAX_POOL_SIZE = int(os.getenv("NEO4J_MAX_POOL_SIZE", "200"))
+# NEO4J_URI=memory:// runs against the in-process graph in db.memory instead of a server
+USE_MEMORY_GRAPH = NEO4J_URI.startswith("memory://")
 
 # Initialize the Neo4j driver if available
-if GraphDatabase is not None:
+if GraphDatabase is not None and not USE_MEMORY_GRAPH:
     driver = GraphDatabase.driver(
         NEO4J_URI,
         auth=(NEO4J_USER, NEO4J_PASSWORD)
@@ -35,16 +42,10 @@ def get_session(**kwargs):
 
     :param kwargs: Optional parameters for session creation (e.g., database name).
     """
-    # If no real driver, return a dummy session
+    # Without a real driver, use the in-process graph
     if driver is None:
-        class DummySession:
-            def run(self, *args, **kwargs):
-                return None
-            def __enter__(self):
-                return self
-            def __exit__(self, exc_type, exc_val, exc_tb):
-                pass
-        return DummySession()
+        from db.memory import MemorySession, get_graph
+        return MemorySession(get_graph())
     return driver.session(**kwargs)
 
 def close_driver():
@@ -53,3 +54,44 @@ def close_driver():
     """
     if driver is not None:
         driver.close()
+
+# Async drivers are bound to the event loop they were created on, so keep one per loop
+_async_drivers = weakref.WeakKeyDictionary()
+
+def get_async_driver():
+    """
+    Returns the async Neo4j driver for the running event loop, creating it on first use.
+    """
+    if AsyncGraphDatabase is None or USE_MEMORY_GRAPH:
+        return None
+    loop = asyncio.get_running_loop()
+    driver = _async_drivers.get(loop)
+    if driver is None:
+        driver = AsyncGraphDatabase.driver(
+            NEO4J_URI,
+            auth=(NEO4J_USER, NEO4J_PASSWORD),
+            max_connection_pool_size=NEO4J_MAX_POOL_SIZE,
+        )
+        _async_drivers[loop] = driver
+    return driver
+
+def get_async_session(**kwargs):
+    """
+    Returns a new async Neo4j session on the shared async driver.
+
+    :param kwargs: Optional parameters for session creation (e.g., database name).
+    """
+    async_driver = get_async_driver()
+    # Without a real driver, use the in-process graph
+    if async_driver is None:
+        from db.memory import AsyncMemorySession, get_graph
+        return AsyncMemorySession(get_graph())
+    return async_driver.session(**kwargs)
+
+async def close_async_driver():
+    """
+    Closes the async Neo4j driver of the running event loop, if one was created.
+    """
+    async_driver = _async_drivers.pop(asyncio.get_running_loop(), None)
+    if async_driver is not None:
+        await async_driver.close()
@@ -1,11 +1,30 @@
+#!/usr/bin/env python3
 """
-Cypher statements to create constraints and indexes in Neo4j.
+Versioned Neo4j schema migrations (constraints and indexes).
 
-Safe to run multiple times (uses IF NOT EXISTS).
+Each migration is a list of idempotent statements (IF NOT EXISTS). Applied
+versions are recorded on (:SchemaMigration {version}) nodes so the runner only
+executes pending ones; re-running is always safe.
+
+Usage:
+  python -m db.schema            # apply pending migrations
+  python -m db.schema --status   # list applied and pending versions
+  python -m db.schema --check    # report missing constraints/indexes (exit 1 if any)
 """
+import argparse
+import asyncio
+import re
+import sys
+from datetime import datetime, timezone
+
 from neo4j import AsyncGraphDatabase
 
-# Constraint and index creation queries
+from db.neo4j import get_async_session, close_async_driver
+from utils.logs import get_logger
+
+log = get_logger("schema")
+
+# Baseline constraint and index creation queries
 _SCHEMA_QUERIES = [
     # 1. Uniqueness constraints
     """
@@ -58,9 +77,148 @@ _SCHEMA_QUERIES = [
     """,
 ]
 
+# Labels written by the API and tool handlers, keyed as in db.crud
+_EVENT_QUERIES = [
+    """
+    CREATE CONSTRAINT issue_pk IF NOT EXISTS
+      FOR (i:Issue) REQUIRE i.event_id IS UNIQUE;
+    """,
+    """
+    CREATE CONSTRAINT maintenance_pk IF NOT EXISTS
+      FOR (m:Maintenance) REQUIRE m.event_id IS UNIQUE;
+    """,
+    """
+    CREATE CONSTRAINT message_pk IF NOT EXISTS
+      FOR (m:Message) REQUIRE m.message_id IS UNIQUE;
+    """,
+    """
+    CREATE CONSTRAINT irrelevant_pk IF NOT EXISTS
+      FOR (i:Irrelevant) REQUIRE i.irrelevant_id IS UNIQUE;
+    """,
+    """
+    CREATE CONSTRAINT report_pk IF NOT EXISTS
+      FOR (r:Report) REQUIRE r.report_id IS UNIQUE;
+    """,
+]
+
+# Properties the web app filters and sorts on
+_LOOKUP_QUERIES = [
+    """
+    CREATE INDEX photo_score IF NOT EXISTS
+      FOR (p:Photo) ON (p.score);
+    """,
+    """
+    CREATE INDEX issue_severity IF NOT EXISTS
+      FOR (i:Issue) ON (i.severity);
+    """,
+    """
+    CREATE INDEX issue_reported_at IF NOT EXISTS
+      FOR (i:Issue) ON (i.reported_at);
+    """,
+    """
+    CREATE INDEX message_photo_id IF NOT EXISTS
+      FOR (m:Message) ON (m.photo_id);
+    """,
+]
+
+# Duplicate-upload lookups by image hash
+_CONTENT_HASH_QUERIES = [
+    """
+    CREATE INDEX photo_content_hash IF NOT EXISTS
+      FOR (p:Photo) ON (p.content_hash);
+    """,
+]
+
+# (version, description, statements); append new migrations, never edit applied ones
+MIGRATIONS = [
+    (1, "baseline constraints and point indexes", _SCHEMA_QUERIES),
+    (2, "uniqueness constraints for Issue, Maintenance, Message, Irrelevant, Report", _EVENT_QUERIES),
+    (3, "lookup indexes for Photo.score, Issue.severity, Issue.reported_at, Message.photo_id", _LOOKUP_QUERIES),
+    (4, "index for Photo.content_hash", _CONTENT_HASH_QUERIES),
+]
+
+_NAME_RE = re.compile(r"CREATE\s+(?:\w+\s+)?(CONSTRAINT|INDEX)\s+(\w+)", re.IGNORECASE)
+
+def expected_schema(migrations: list = None) -> dict:
+    """
+    Return {"constraints": set_of_names, "indexes": set_of_names} defined by the migrations.
+    """
+    expected = {"constraints": set(), "indexes": set()}
+    for _, _, statements in migrations or MIGRATIONS:
+        for statement in statements:
+            match = _NAME_RE.search(statement)
+            if match:
+                kind = "constraints" if match.group(1).upper() == "CONSTRAINT" else "indexes"
+                expected[kind].add(match.group(2))
+    return expected
+
+async def applied_versions(session) -> set:
+    """
+    Return the migration versions recorded in the database.
+    """
+    result = await session.run("MATCH (m:SchemaMigration) RETURN m.version AS version")
+    return {row["version"] for row in await result.data()}
+
+async def migrate(session_factory=get_async_session, migrations: list = None, dry_run: bool = False) -> list:
+    """
+    Apply pending migrations in version order.
+
+    :param session_factory: Callable returning an async Neo4j session.
+    :param dry_run: Only report what would be applied.
+    :return: List of versions applied (or pending, with dry_run).
+    """
+    migrations = sorted(migrations or MIGRATIONS, key=lambda m: m[0])
+    applied = []
+    async with session_factory() as session:
+        done = await applied_versions(session)
+        for version, description, statements in migrations:
+            if version in done:
+                continue
+            applied.append(version)
+            if dry_run:
+                continue
+            for statement in statements:
+                await session.run(statement)
+            # Schema and data changes cannot share a transaction, so record separately
+            await session.run(
+                "MERGE (m:SchemaMigration {version: $version}) "
+                "SET m.description = $description, m.applied_at = $applied_at",
+                version=version,
+                description=description,
+                applied_at=datetime.now(timezone.utc).isoformat(),
+            )
+    return applied
+
+async def missing_schema(session_factory=get_async_session, migrations: list = None) -> list:
+    """
+    Return the names of expected constraints and indexes that do not exist.
+    """
+    expected = expected_schema(migrations)
+    async with session_factory() as session:
+        result = await session.run("SHOW CONSTRAINTS YIELD name")
+        constraints = {row["name"] for row in await result.data()}
+        result = await session.run("SHOW INDEXES YIELD name")
+        indexes = {row["name"] for row in await result.data()}
+    return sorted((expected["constraints"] - constraints) | (expected["indexes"] - indexes))
+
+async def check_schema(session_factory=get_async_session) -> list:
+    """
+    Log missing constraints and indexes instead of failing, e.g. at server startup.
+
+    :return: The missing names (empty if the check could not run).
+    """
+    try:
+        missing = await missing_schema(session_factory)
+    except Exception as e:
+        log.warning("schema.check_skipped", error=str(e))
+        return []
+    if missing:
+        log.warning("schema.missing", missing=missing, hint="run `python -m db.schema` to apply pending migrations")
+    return missing
+
 async def init_db_schema(uri: str, user: str, password: str) -> None:
     """
-    Create all constraints and indexes in Neo4j.
+    Apply all pending schema migrations in Neo4j.
 
     :param uri:       URI for Neo4j connection (e.g., bolt://localhost:7687)
     :param user:      Username for authentication
@@ -68,7 +226,37 @@ async def init_db_schema(uri: str, user: str, password: str) -> None:
     """
     driver = AsyncGraphDatabase.driver(uri, auth=(user, password))
     async with driver:
-        async with driver.session() as session:
-            for query in _SCHEMA_QUERIES:
-                await session.run(query)
-    await driver.close()
\ No newline at end of file
+        await migrate(driver.session)
+
+def main():
+    parser = argparse.ArgumentParser(description='Apply or inspect Neo4j schema migrations.')
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('--status', action='store_true', help='List applied and pending migrations')
+    group.add_argument('--check', action='store_true', help='Report missing constraints and indexes')
+    group.add_argument('--dry-run', action='store_true', help='Show pending migrations without applying them')
+    args = parser.parse_args()
+
+    async def _run():
+        try:
+            if args.check:
+                missing = await missing_schema()
+                for name in missing:
+                    print(f"missing: {name}")
+                return 1 if missing else 0
+            if args.status:
+                async with get_async_session() as session:
+                    done = await applied_versions(session)
+                for version, description, _ in MIGRATIONS:
+                    print(f"{version:>3} {'applied' if version in done else 'pending'}  {description}")
+                return 0
+            versions = await migrate(dry_run=args.dry_run)
+            verb = "Pending" if args.dry_run else "Applied"
+            print(f"{verb} migrations: {versions}" if versions else "Schema is up to date")
+            return 0
+        finally:
+            await close_async_driver()
+
+    sys.exit(asyncio.run(_run()))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Worker that drains the relevance-analysis job queue.
+
+Claims batches of queued messages, runs the relevance analyzer on them with a
+concurrency cap, and hands the results to a MessageWriteBuffer, which writes
+them to their Message nodes (and the parent Photo scores) in batched Neo4j
+transactions. A job is acknowledged only after its result is written. Failed jobs are retried with backoff by the queue
+and dead-lettered after JOB_MAX_ATTEMPTS.
+
+Usage:
+  relevance_worker.py [--batch-size N] [--concurrency N] [--poll-interval S] [--once]
+  relevance_worker.py --dead-letters
+"""
+import argparse
+import asyncio
+import json
+import os
+
+from aiv2.agents.messages.agent import analyze_message_async
+from aiv2.openai_client import close_async_client
+from db.crud.write_back import MessageWriteBuffer, WRITE_BACK_FLUSH_SIZE
+from db.neo4j import close_async_driver
+from utils.job_queue import get_job_queue, JobQueue
+from utils.logs import get_logger
+from utils.tracing import KIND_CONSUMER, start_trace
+
+# Queue name used by /relevance-analyze
+RELEVANCE_QUEUE = "relevance"
+RELEVANCE_BATCH_SIZE = int(os.getenv("RELEVANCE_BATCH_SIZE", "50"))
+RELEVANCE_CONCURRENCY = int(os.getenv("RELEVANCE_CONCURRENCY", "8"))
+RELEVANCE_POLL_INTERVAL = float(os.getenv("RELEVANCE_POLL_INTERVAL", "1.0"))
+
+log = get_logger("relevance")
+
+
+async def _process(job, semaphore: asyncio.Semaphore, buffer: MessageWriteBuffer) -> None:
+    # Continue the trace of the /relevance-analyze request that queued the job
+    with start_trace(
+        "relevance.job", job.payload.get("traceparent"), sample_new=False, kind=KIND_CONSUMER,
+        job_id=job.id, message_id=job.payload["message_id"], attempt=job.attempts,
+    ):
+        async with semaphore:
+            result = await analyze_message_async(job.payload["ai_payload"])
+    result_dict = result.model_dump()
+    await buffer.add(job.payload["message_id"], {
+        "reason": result_dict.get("reason"),
+        "delta_score": result_dict.get("delta_score"),
+        "confidence": result_dict.get("confidence"),
+        "additional_info": result_dict.get("additional_info"),
+    })
+
+
+async def process_batch(
+    queue: JobQueue,
+    jobs: list,
+    concurrency: int = RELEVANCE_CONCURRENCY,
+    buffer: MessageWriteBuffer = None,
+) -> int:
+    """
+    Analyze a batch of claimed jobs and write their results through the buffer.
+
+    :return: Number of jobs acknowledged.
+    """
+    buffer = buffer or MessageWriteBuffer()
+    semaphore = asyncio.Semaphore(concurrency)
+    outcomes = await asyncio.gather(*(_process(job, semaphore, buffer) for job in jobs), return_exceptions=True)
+    done = []
+    for job, outcome in zip(jobs, outcomes):
+        if isinstance(outcome, Exception):
+            log.warning("relevance.job_failed", job_id=job.id, attempts=job.attempts, error=str(outcome))
+            await asyncio.to_thread(queue.fail, job, str(outcome))
+        else:
+            done.append(job.id)
+    await asyncio.to_thread(queue.ack, done)
+    return len(done)
+
+
+async def run_worker(
+    queue: JobQueue = None,
+    batch_size: int = RELEVANCE_BATCH_SIZE,
+    concurrency: int = RELEVANCE_CONCURRENCY,
+    poll_interval: float = RELEVANCE_POLL_INTERVAL,
+    once: bool = False,
+) -> None:
+    """
+    Drain the relevance queue until cancelled (or until it is empty when once=True).
+    """
+    queue = queue or get_job_queue()
+    buffer = MessageWriteBuffer(flush_size=min(batch_size, WRITE_BACK_FLUSH_SIZE))
+    try:
+        while True:
+            jobs = await asyncio.to_thread(queue.claim, RELEVANCE_QUEUE, batch_size)
+            if jobs:
+                await process_batch(queue, jobs, concurrency, buffer)
+                continue
+            if once:
+                return
+            await asyncio.sleep(poll_interval)
+    finally:
+        await buffer.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Drain the relevance-analysis job queue.')
+    parser.add_argument('--batch-size', type=int, default=RELEVANCE_BATCH_SIZE,
+                        help='Jobs claimed and written back per batch')
+    parser.add_argument('--concurrency', type=int, default=RELEVANCE_CONCURRENCY,
+                        help='Maximum concurrent analyzer calls')
+    parser.add_argument('--poll-interval', type=float, default=RELEVANCE_POLL_INTERVAL,
+                        help='Seconds to wait when the queue is empty')
+    parser.add_argument('--once', action='store_true',
+                        help='Exit once the queue is empty')
+    parser.add_argument('--dead-letters', action='store_true',
+                        help='Print dead-lettered jobs and exit')
+    args = parser.parse_args()
+
+    queue = get_job_queue()
+    if args.dead_letters:
+        for job in queue.dead_letters(RELEVANCE_QUEUE):
+            print(json.dumps({"id": job.id, "attempts": job.attempts, "error": job.last_error, "payload": job.payload}))
+        return
+
+    async def _run():
+        try:
+            await run_worker(queue, args.batch_size, args.concurrency, args.poll_interval, args.once)
+        finally:
+            await close_async_client()
+            await close_async_driver()
+
+    try:
+        asyncio.run(_run())
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
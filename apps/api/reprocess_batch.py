@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Reclassify stored photos through the batch completion service.
+
+Selects Photos with Cypher, writes one vision request per photo (same prompt
+and tool schemas as /analyze), submits them as a batch job, waits for it and
+applies the results through the vision tool handlers. By default each photo's
+previous classification is replaced.
+
+Usage:
+  reprocess_batch.py run [--since ISO] [--city ID] [--category ID] [--unclassified] [--limit N]
+  reprocess_batch.py submit [filters...]
+  reprocess_batch.py apply <batch_id> [--keep-existing]
+  reprocess_batch.py status <batch_id>
+
+Add --backend local to use the file-based stand-in in BATCH_DIR instead of the provider.
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+
+from aiv2.agents.vision.batch import (
+    BATCH_DIR, BATCH_POLL_INTERVAL, LocalBatchBackend, OpenAIBatchBackend,
+    apply_results, wait_for_batch, write_requests,
+)
+from aiv2.openai_client import close_async_client
+from db.crud.reprocess import select_photos
+from db.neo4j import close_async_driver
+
+
+def get_backend(name: str):
+    return LocalBatchBackend(BATCH_DIR) if name == "local" else OpenAIBatchBackend()
+
+
+def submit(backend, args) -> str:
+    photos = select_photos(
+        since=args.since, city_id=args.city, category=args.category,
+        unclassified=args.unclassified, limit=args.limit,
+    )
+    # Without a city the model would write city-less events
+    unlocated = [photo["photo_id"] for photo in photos if not photo["city_id"]]
+    if unlocated:
+        print(f"Skipping {len(unlocated)} photo(s) with no known city: {', '.join(unlocated)}")
+        photos = [photo for photo in photos if photo["city_id"]]
+    if not photos:
+        print("No photos match the filters")
+        sys.exit(0)
+    path = Path(BATCH_DIR) / f"requests-{time.strftime('%Y%m%d-%H%M%S')}.jsonl"
+    count = write_requests(photos, str(path))
+    batch_id = backend.submit(str(path))
+    print(f"Submitted {count} photo(s) as batch {batch_id} (requests in {path})")
+    return batch_id
+
+
+def apply(backend, batch_id: str, replace: bool) -> dict:
+    status = wait_for_batch(backend, batch_id, BATCH_POLL_INTERVAL)
+    if status != "completed":
+        print(f"Batch {batch_id} ended with status {status}", file=sys.stderr)
+        sys.exit(1)
+
+    async def _run():
+        try:
+            return await apply_results(backend.results(batch_id), replace=replace)
+        finally:
+            await close_async_client()
+            await close_async_driver()
+
+    summary = asyncio.run(_run())
+    print(json.dumps(summary))
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Reclassify stored photos with the batch completion service.')
+    parser.add_argument('command', choices=['run', 'submit', 'apply', 'status'])
+    parser.add_argument('batch_id', nargs='?', help='Batch id for apply/status')
+    parser.add_argument('--backend', choices=['openai', 'local'], default='openai',
+                        help='Batch service (local is the file-based stand-in in BATCH_DIR)')
+    parser.add_argument('--since', help='Only photos created at or after this ISO timestamp')
+    parser.add_argument('--city', help='Only photos in this city')
+    parser.add_argument('--category', help='Only photos whose Issue is in this category')
+    parser.add_argument('--unclassified', action='store_true', help='Only photos without any event')
+    parser.add_argument('--limit', type=int, help='Maximum number of photos')
+    parser.add_argument('--keep-existing', action='store_true',
+                        help='Add the new classification instead of replacing the current one')
+    args = parser.parse_args()
+
+    backend = get_backend(args.backend)
+    if args.command in ('apply', 'status') and not args.batch_id:
+        parser.error(f"{args.command} needs a batch id")
+    if args.command == 'status':
+        print(backend.status(args.batch_id))
+    elif args.command == 'submit':
+        submit(backend, args)
+    elif args.command == 'apply':
+        apply(backend, args.batch_id, replace=not args.keep_existing)
+    else:
+        apply(backend, submit(backend, args), replace=not args.keep_existing)
+
+if __name__ == '__main__':
+    main()
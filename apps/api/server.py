@@ -1,19 +1,34 @@
 #!/usr/bin/env python3
 """FastAPI server for City-Vision-Inspector."""
-from fastapi import FastAPI, Form, HTTPException, BackgroundTasks, Request, Query
+from fastapi import FastAPI, Form, HTTPException, Request, Query, UploadFile, File
 from fastapi.middleware.cors import CORSMiddleware
 import os
 import asyncio
 import json
 import uuid
+from typing import List, Optional
 from pydantic import BaseModel
-from aiv2.agents.vision.vision_agent import analyze_vision_image
-from aiv2.agents.messages.agent import analyze_message
-from db.crud.read_nodes import search_node
-from db.neo4j import get_session
-from db.crud.update_nodes import get_photo_and_event
-from fastapi.responses import JSONResponse
-from db.crud import add_message, add_message_for
+from aiv2.agents.vision.vision_agent import analyze_vision_image_async
+from aiv2.openai_client import close_async_client
+from db.neo4j import close_async_driver
+from db.schema import check_schema, migrate
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from db.crud.aio import add_message, add_message_for, get_photo_and_event
+from utils.analysis_scheduler import AnalysisScheduler, QueueFull
+from utils.batch_analysis import ANALYZE_BATCH_CONCURRENCY, ANALYZE_BATCH_MAX_ITEMS, iter_batch, ndjson
+from utils.job_queue import get_job_queue
+from relevance_worker import RELEVANCE_QUEUE, run_worker as run_relevance_worker
+from utils import image_preprocess
+from utils.dedup_cache import get_dedup_cache
+from utils.images import IMAGE_MAX_BYTES, Image
+from utils.s3 import stream_upload_to_s3
+from utils.timing import record_stages, server_timing, stage
+from utils.logs import get_logger
+from utils.metrics import registry as metrics_registry
+from utils.tracing import TraceMiddleware, current_traceparent
+from utils.profiler import ProfileMiddleware
+from utils.body_limit import BodyLimitMiddleware
 
 app = FastAPI(
     title="City-Vision-Inspector API",
@@ -39,21 +54,95 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# One trace per request when TRACE_FILE is set (continues an incoming traceparent header)
+app.add_middleware(TraceMiddleware)
+# Requests with a valid X-Profile-Token header run under the sampling profiler (see PROFILE_TOKEN)
+app.add_middleware(ProfileMiddleware)
+# Uploads larger than UPLOAD_MAX_BYTES get 413 before they are spooled to disk
+app.add_middleware(BodyLimitMiddleware, paths=["/upload-and-analyze"])
 
-@app.post("/analyze", summary="Receive image URL, user, and location for analysis")
-async def analyze(
-    image_url: str = Form(...),
-    user_id: str = Form(...),
-    location: str = Form(...),
-):
-    """Analyze endpoint accepting an image URL, user ID, and location info. Returns the agent result."""
-    print(f"Received image URL: {image_url}")
-    print(f"User ID: {user_id}")
-    # Parse and validate location JSON
+# Bounded worker pool for /analyze (see ANALYZE_WORKERS / ANALYZE_QUEUE_SIZE)
+analysis_scheduler = AnalysisScheduler(analyze_vision_image_async)
+
+log = get_logger("server")
+
+# Relevance jobs are drained by a separate relevance_worker.py; "embedded" drains them in-process (local development)
+RELEVANCE_WORKER = os.getenv("RELEVANCE_WORKER", "external")
+_relevance_worker_task = None
+
+# Startup schema handling: "warn" reports missing indexes, "migrate" applies pending migrations, "off" skips
+NEO4J_SCHEMA_CHECK = os.getenv("NEO4J_SCHEMA_CHECK", "warn")
+
+@app.on_event("startup")
+async def startup():
+    """Start the analysis workers (and the embedded relevance worker) on the server's event loop."""
+    global _relevance_worker_task
+    if NEO4J_SCHEMA_CHECK == "migrate":
+        try:
+            applied = await migrate()
+            if applied:
+                log.info("schema.migrated", applied=applied)
+        except Exception as e:
+            log.error("schema.migrate_failed", error=str(e))
+    elif NEO4J_SCHEMA_CHECK == "warn":
+        await check_schema()
+    if Image is None:
+        log.warning("server.pillow_missing", detail="image preprocessing and near-duplicate dedup are off")
+    await analysis_scheduler.start()
+    if RELEVANCE_WORKER == "embedded":
+        _relevance_worker_task = asyncio.create_task(run_relevance_worker())
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Stop the workers and close the async Neo4j driver and OpenAI client owned by the server's event loop."""
+    await analysis_scheduler.stop()
+    if _relevance_worker_task is not None:
+        _relevance_worker_task.cancel()
+        await asyncio.gather(_relevance_worker_task, return_exceptions=True)
+    image_preprocess.shutdown_pool()
+    await close_async_client()
+    await close_async_driver()
+
+_queue_depth = metrics_registry.gauge("analysis_queue_depth", "Analyses waiting for a worker")
+_queue_running = metrics_registry.gauge("analysis_jobs_running", "Analyses being processed")
+_job_counts = metrics_registry.gauge("job_queue_jobs", "Background jobs by queue and status", ("queue", "status"))
+
+def collect_queue_metrics():
+    """Read queue depths at scrape time."""
+    _queue_depth.set(analysis_scheduler.depth)
+    _queue_running.set(analysis_scheduler.running)
+    _job_counts.clear()
+    for status, count in get_job_queue().stats(RELEVANCE_QUEUE).items():
+        _job_counts.set(count, queue=RELEVANCE_QUEUE, status=status)
+
+metrics_registry.add_collector(collect_queue_metrics)
+
+@app.get("/metrics", summary="Prometheus metrics", include_in_schema=False)
+async def metrics():
+    """Stage and CRUD latency histograms, cache hit counters and queue depths in the Prometheus text format."""
+    body = await asyncio.to_thread(metrics_registry.render)
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/analyze/stats", summary="Image preprocessing savings and dedup cache statistics")
+async def analyze_stats():
+    return {
+        "preprocess": image_preprocess.metrics.snapshot(),
+        "dedup": await asyncio.to_thread(get_dedup_cache().stats),
+        "queue": {"depth": analysis_scheduler.depth, "running": analysis_scheduler.running},
+    }
+
+def parse_location(location: str) -> dict:
+    """Parse and validate the location form field; raises 400 on bad input."""
     try:
         loc = json.loads(location)
     except json.JSONDecodeError:
         raise HTTPException(status_code=400, detail="location must be a JSON object string with keys latitude, longitude, city, country")
+    return validate_location(loc)
+
+def validate_location(loc) -> dict:
+    """Validate a location object; raises 400 on bad input."""
+    if not isinstance(loc, dict):
+        raise HTTPException(status_code=400, detail="location must be an object with keys latitude, longitude, city, country")
     required_fields = ("latitude", "longitude", "city", "country")
     missing = [field for field in required_fields if field not in loc]
     if missing:
@@ -65,27 +154,146 @@ async def analyze(
         country = str(loc["country"])
     except (TypeError, ValueError):
         raise HTTPException(status_code=400, detail="Invalid types for location fields")
-    print(f"Location: latitude={latitude}, longitude={longitude}, city={city}, country={country}")
-
-    user = {"id": user_id, "name": user_id}
-    location_dict = {
+    return {
         "latitude": latitude,
         "longitude": longitude,
         "city": city,
         "country": country,
     }
-    # Call the vision agent (sync wrapper for async if needed)
+
+async def run_analysis(user_id: str, async_mode: bool, extra: dict = None, **kwargs):
+    """
+    Queue an analysis and either return its job id (async mode) or wait for the result.
+    Keys in `extra` are added to the response body. Synchronous responses carry the
+    job's stage durations in a Server-Timing header.
+    """
+    extra = extra or {}
+    # Queue the analysis; reject with 429 when the queue is full
     try:
-        result = await asyncio.to_thread(
-            analyze_vision_image,
-            image_url=image_url,
-            user=user,
-            location=location_dict,
+        job = analysis_scheduler.submit(user_id, **kwargs)
+    except QueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    if async_mode:
+        return JSONResponse(
+            status_code=202,
+            content={"success": True, "job_id": job.job_id, "status": job.status, "status_url": f"/analyze/{job.job_id}", **extra},
         )
+    try:
+        # Shield the job so a client disconnect does not cancel the shared future
+        result = await asyncio.shield(job.future)
     except Exception as e:
-        print(f"Analysis error: {e}")
+        log.error("analyze.failed", job_id=job.job_id, user_id=user_id, error=str(e))
         raise HTTPException(status_code=500, detail=f"Agent error: {e}")
-    return {"success": True, "result": result}
+    return JSONResponse(
+        content=jsonable_encoder({"success": True, "result": result, **extra}),
+        headers={"Server-Timing": server_timing(job.timings)},
+    )
+
+@app.post("/analyze", summary="Receive image URL, user, and location for analysis")
+async def analyze(
+    image_url: str = Form(...),
+    user_id: str = Form(...),
+    location: str = Form(...),
+    async_mode: bool = Query(False, description="Return a job id immediately instead of waiting for the result"),
+):
+    """Analyze endpoint accepting an image URL, user ID, and location info. Returns the agent result."""
+    location_dict = parse_location(location)
+    log.info("analyze.request", sample=True, image_url=image_url, user_id=user_id, city=location_dict["city"])
+    user = {"id": user_id, "name": user_id}
+    return await run_analysis(user_id, async_mode, image_url=image_url, user=user, location=location_dict)
+
+@app.post("/upload-and-analyze", summary="Upload an image file to S3 and analyze it")
+async def upload_and_analyze(
+    file: UploadFile = File(...),
+    user_id: str = Form(...),
+    location: str = Form(...),
+    async_mode: bool = Query(False, description="Return a job id immediately instead of waiting for the result"),
+):
+    """
+    Upload a multipart image to S3 part by part, then analyze it.
+    Starlette spools the request body to a temporary file before this runs, so the
+    S3 upload reads from that file rather than directly from the request; bodies
+    over UPLOAD_MAX_BYTES are refused with 413 while they are being read.
+    The uploaded bytes are handed to the analysis so the image is not downloaded again.
+    """
+    location_dict = parse_location(location)
+    content_type = file.content_type or "application/octet-stream"
+    if not content_type.startswith("image/"):
+        raise HTTPException(status_code=415, detail=f"Expected an image upload, got {content_type}")
+    bucket = os.getenv("AWS_S3_BUCKET")
+    if not bucket:
+        raise HTTPException(status_code=500, detail="AWS_S3_BUCKET environment variable is not set")
+
+    ext = os.path.splitext(file.filename or "")[1]
+    object_name = f"{uuid.uuid4().hex}{ext}"
+    try:
+        uploaded = await stream_upload_to_s3(file.read, bucket, object_name, content_type)
+    except Exception as e:
+        log.error("upload.failed", object_name=object_name, error=str(e))
+        raise HTTPException(status_code=502, detail=f"Upload failed: {e}")
+    log.info("upload.done", sample=True, url=uploaded["url"], size=uploaded["size"], user_id=user_id)
+
+    # Starlette spools the body to a temp file, so re-reading it costs no network round trip
+    image_bytes = None
+    if uploaded["size"] <= IMAGE_MAX_BYTES:
+        await file.seek(0)
+        image_bytes = await file.read()
+
+    user = {"id": user_id, "name": user_id}
+    return await run_analysis(
+        user_id, async_mode, extra={"image_url": uploaded["url"]},
+        image_url=uploaded["url"], user=user, location=location_dict, image_bytes=image_bytes,
+    )
+
+class BatchItem(BaseModel):
+    image_url: str
+    user_id: str
+    location: dict
+    # Optional client reference echoed back with the item's result
+    ref: Optional[str] = None
+
+class BatchRequest(BaseModel):
+    items: List[BatchItem]
+
+@app.post("/analyze/batch", summary="Analyze several images and stream per-item results as NDJSON")
+async def analyze_batch(
+    batch: BatchRequest,
+    concurrency: int = Query(ANALYZE_BATCH_CONCURRENCY, ge=1, le=ANALYZE_BATCH_CONCURRENCY,
+                             description="Items of this batch analyzed at the same time"),
+):
+    """
+    Analyze a list of images, each with its own user and location.
+    One JSON line is streamed per item as soon as it finishes (completion order, not request order),
+    with its index, success flag and either the result or an error and status code.
+    """
+    if not batch.items:
+        raise HTTPException(status_code=400, detail="items must not be empty")
+    if len(batch.items) > ANALYZE_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {ANALYZE_BATCH_MAX_ITEMS} items per batch")
+
+    async def run_item(item: BatchItem):
+        location_dict = validate_location(item.location)
+        user = {"id": item.user_id, "name": item.user_id}
+        # Items go through the shared scheduler, so batches stay fair to other users
+        job = analysis_scheduler.submit(item.user_id, image_url=item.image_url, user=user, location=location_dict)
+        return await asyncio.shield(job.future)
+
+    async def outcomes():
+        async for outcome in iter_batch(batch.items, run_item, concurrency):
+            ref = batch.items[outcome["index"]].ref
+            if ref is not None:
+                outcome["ref"] = ref
+            yield outcome
+
+    return StreamingResponse(ndjson(outcomes()), media_type="application/x-ndjson")
+
+@app.get("/analyze/{job_id}", summary="Get the status and result of a queued analysis")
+async def analyze_status(job_id: str):
+    """Return the state of an analysis job submitted with async_mode=true."""
+    job = analysis_scheduler.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    return job.to_dict()
 
 @app.post("/relevance-analyze", summary="Analyze relevance and get delta_score using the agent")
 async def relevance_analyze(
@@ -93,9 +301,15 @@ async def relevance_analyze(
     user_id: str = Query(..., description="User ID submitting the message or report"),
     message: str = Query(..., description="User message/comment for the photo/event"),
     submit_type: str = Query('message', regex="^(message|report)$", description="Type of submit: 'message' or 'report'"),
-    background_tasks: BackgroundTasks = None
 ):
-    photo, event, event_type = get_photo_and_event(photo_id)
+    with record_stages() as timings:
+        response = await _relevance_analyze(photo_id, user_id, message, submit_type)
+    response.headers["Server-Timing"] = server_timing(timings)
+    return response
+
+async def _relevance_analyze(photo_id: str, user_id: str, message: str, submit_type: str) -> JSONResponse:
+    with stage("lookup"):
+        photo, event, event_type = await get_photo_and_event(photo_id)
     if not photo:
         raise HTTPException(status_code=404, detail="Photo not found")
     if not event:
@@ -103,20 +317,21 @@ async def relevance_analyze(
 
     # --- Create Message node and connect to Photo and User at the start ---
     message_id = str(uuid.uuid4())
-    add_message({
-        "message_id": message_id,
-        "text": message,
-        "type": submit_type,
-        "user_id": user_id,
-        "photo_id": photo_id,
-        "created_at": photo.get("created_at"),
-    })
-    # Only create the relationship between message and photo
-    add_message_for({
-        "message_id": message_id,
-        "photo_id": photo_id,
-        # user_id is not needed for the edge
-    })
+    with stage("write"):
+        await add_message({
+            "message_id": message_id,
+            "text": message,
+            "type": submit_type,
+            "user_id": user_id,
+            "photo_id": photo_id,
+            "created_at": photo.get("created_at"),
+        })
+        # Only create the relationship between message and photo
+        await add_message_for({
+            "message_id": message_id,
+            "photo_id": photo_id,
+            # user_id is not needed for the edge
+        })
 
     # Prepare the response to return immediately
     response_data = {
@@ -170,30 +385,13 @@ async def relevance_analyze(
         "submit_type": submit_type
     }
 
-    # Define the background task for AI analysis and updating the Message node
-    def process_ai_and_update():
-        try:
-            result = analyze_message(ai_payload)
-            result_dict = result.model_dump()
-            session = get_session()
-            with session as s:
-                update_fields = {
-                    "reason": result_dict.get("reason"),
-                    "delta_score": result_dict.get("delta_score"),
-                    "confidence": result_dict.get("confidence"),
-                    "additional_info": result_dict.get("additional_info"),
-                }
-                set_clause = ", ".join([f"m.{k} = ${k}" for k in update_fields])
-                params = {"message_id": message_id, **update_fields}
-                s.run(
-                    f"MATCH (m:Message {{message_id: $message_id}}) SET {set_clause}",
-                    **params
-                )
-        except Exception as e:
-            print(f"Background AI analysis error: {e}")
-
-
-    background_tasks.add_task(process_ai_and_update)
+    # Queue the AI analysis; a relevance worker updates the Message node later
+    with stage("enqueue"):
+        await asyncio.to_thread(
+            get_job_queue().enqueue,
+            RELEVANCE_QUEUE,
+            {"message_id": message_id, "ai_payload": ai_payload, "traceparent": current_traceparent()},
+        )
 
     return JSONResponse(content=response_data, media_type="application/json", status_code=201)
 
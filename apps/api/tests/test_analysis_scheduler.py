@@ -0,0 +1,91 @@
+import asyncio
+import unittest
+from utils.analysis_scheduler import AnalysisScheduler, QueueFull
+
+
+class TestAnalysisScheduler(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.order = []
+        self.gate = asyncio.Event()
+
+        async def handler(name):
+            await self.gate.wait()
+            self.order.append(name)
+            if name == "fail":
+                raise ValueError("boom")
+            return {"name": name}
+
+        self.scheduler = AnalysisScheduler(handler, workers=1, max_queue=4, job_ttl=60)
+        await self.scheduler.start()
+
+    async def asyncTearDown(self):
+        await self.scheduler.stop()
+
+    async def test_round_robin_between_users(self):
+        # The first job occupies the single worker while the rest queue up
+        first = self.scheduler.submit("alice", name="a0")
+        await asyncio.sleep(0)
+        jobs = [
+            self.scheduler.submit("alice", name="a1"),
+            self.scheduler.submit("alice", name="a2"),
+            self.scheduler.submit("bob", name="b1"),
+        ]
+        self.gate.set()
+        await asyncio.gather(first.future, *(j.future for j in jobs))
+        self.assertEqual(self.order, ["a0", "a1", "b1", "a2"])
+        self.assertEqual(self.scheduler.get(first.job_id).to_dict()["result"], {"name": "a0"})
+        self.assertTrue(all(job.kwargs is None for job in [first, *jobs]))
+
+    async def test_queue_full_and_errors(self):
+        self.scheduler.submit("alice", name="a0")
+        await asyncio.sleep(0)
+        for i in range(4):
+            self.scheduler.submit("alice", name="fail" if i == 0 else f"a{i}")
+        with self.assertRaises(QueueFull) as ctx:
+            self.scheduler.submit("bob", name="b1")
+        self.assertGreaterEqual(ctx.exception.retry_after, 1)
+
+        self.gate.set()
+        while self.scheduler.depth or self.scheduler.running:
+            await asyncio.sleep(0.01)
+        failed = [j for j in self.scheduler._jobs.values() if j.status == "error"]
+        self.assertEqual(len(failed), 1)
+        self.assertEqual(failed[0].to_dict()["error"], "boom")
+
+    async def test_one_user_cannot_fill_the_queue(self):
+        self.scheduler.max_per_user = 2
+        self.scheduler.submit("alice", name="a0")
+        await asyncio.sleep(0)
+        # The running job does not count towards alice's share
+        self.scheduler.submit("alice", name="a1")
+        self.scheduler.submit("alice", name="a2")
+        with self.assertRaises(QueueFull) as ctx:
+            self.scheduler.submit("alice", name="a3")
+        self.assertIn("this user", str(ctx.exception))
+        self.scheduler.submit("bob", name="b1")
+        self.assertEqual(self.scheduler.depth, 3)
+
+    async def test_prune_passes_running_jobs_and_caps_finished(self):
+        async def handler(name):
+            if name == "hung":
+                await self.gate.wait()
+            return {"name": name}
+
+        scheduler = AnalysisScheduler(handler, workers=2, max_queue=10, job_ttl=600, max_finished=2)
+        await scheduler.start()
+        try:
+            hung = scheduler.submit("alice", name="hung")
+            done = [scheduler.submit("bob", name=f"b{i}") for i in range(3)]
+            await asyncio.gather(*(job.future for job in done))
+            # Over the cap: the oldest finished job goes although a running job is ahead of it
+            self.assertIsNone(scheduler.get(done[0].job_id))
+            self.assertIs(scheduler.get(done[2].job_id), done[2])
+            scheduler.job_ttl = 0
+            self.assertIsNone(scheduler.get(done[2].job_id))
+            self.assertIs(scheduler.get(hung.job_id), hung)
+        finally:
+            self.gate.set()
+            await scheduler.stop()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+from utils.database import crud
+
+
+class FakeAsyncResult:
+    def __init__(self, record):
+        self._record = record
+    async def single(self):
+        return self._record
+
+
+class FakeAsyncSession:
+    def __init__(self, record=None):
+        self.runs = []
+        self.record = record
+    async def run(self, query, **params):
+        self.runs.append((query.strip(), params))
+        # Nodes are written with SET n += $props, so the node carries the merged properties
+        node = {k: v for k, v in params.items() if k != "props"}
+        node.update(params.get("props", {}))
+        return FakeAsyncResult(self.record if self.record is not None else {"n": node, "r": params})
+    async def __aenter__(self):
+        return self
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+
+class TestAsyncCrud(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.fake_session = FakeAsyncSession()
+        self._orig_get_async_session = crud.get_async_session
+        crud.get_async_session = lambda **kwargs: self.fake_session
+
+    def tearDown(self):
+        crud.get_async_session = self._orig_get_async_session
+
+    async def test_add_node_matches_sync_query(self):
+        city_props = {
+            'city_id': 'city123',
+            'name': 'Testopolis',
+            'location': {'latitude': 10.0, 'longitude': 20.0}
+        }
+        self.assertEqual(await crud.aio.add_city(city_props), city_props)
+        query, _ = self.fake_session.runs[0]
+        self.assertIn("MERGE (n:City {city_id: $city_id})", query)
+        self.assertIn("n.location = point($location)", query)
+
+    async def test_add_uploaded_photo_requires_props(self):
+        with self.assertRaises(ValueError):
+            await crud.aio.add_uploaded_photo({"user_id": "u1"})
+        self.assertEqual(self.fake_session.runs, [])
+
+    async def test_get_photo_and_event_single_query(self):
+        self.fake_session.record = {
+            "p": {"photo_id": "photo123"},
+            "i": None,
+            "m": {"event_id": "event123"},
+        }
+        photo, event, event_type = await crud.aio.get_photo_and_event("photo123")
+        self.assertEqual(len(self.fake_session.runs), 1)
+        self.assertEqual(photo, {"photo_id": "photo123"})
+        self.assertEqual(event, {"event_id": "event123"})
+        self.assertEqual(event_type, "maintenance")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import asyncio
+import json
+import unittest
+
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+import server
+from utils.analysis_scheduler import QueueFull
+from utils.batch_analysis import iter_batch
+
+
+async def collect(agen):
+    return [item async for item in agen]
+
+
+class TestIterBatch(unittest.TestCase):
+    def test_results_stream_in_completion_order_with_bounded_concurrency(self):
+        running = 0
+        peak = 0
+
+        async def run_item(delay):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(delay)
+            running -= 1
+            return delay
+
+        outcomes = asyncio.run(collect(iter_batch([0.06, 0.01, 0.02, 0.0], run_item, concurrency=2)))
+        self.assertEqual(peak, 2)
+        self.assertEqual([o["index"] for o in outcomes], [1, 2, 3, 0])
+        self.assertTrue(all(o["success"] for o in outcomes))
+
+    def test_failures_are_reported_per_item(self):
+        async def run_item(item):
+            if item == "bad":
+                raise HTTPException(status_code=400, detail="Missing location field(s): city")
+            if item == "full":
+                raise QueueFull(7)
+            if item == "boom":
+                raise RuntimeError("model timeout")
+            return {"ok": item}
+
+        outcomes = asyncio.run(collect(iter_batch(["a", "bad", "full", "boom"], run_item)))
+        by_index = {o["index"]: o for o in outcomes}
+        self.assertEqual(by_index[0], {"index": 0, "success": True, "result": {"ok": "a"}})
+        self.assertEqual(by_index[1]["status"], 400)
+        self.assertEqual(by_index[1]["error"], "Missing location field(s): city")
+        self.assertEqual((by_index[2]["status"], by_index[2]["retry_after"]), (429, 7))
+        self.assertEqual((by_index[3]["status"], by_index[3]["error"]), (500, "model timeout"))
+
+
+class FakeJob:
+    def __init__(self, result):
+        self.future = asyncio.get_running_loop().create_future()
+        self.future.set_result(result)
+
+
+class FakeScheduler:
+    def __init__(self):
+        self.submitted = []
+    def submit(self, user_id, **kwargs):
+        self.submitted.append((user_id, kwargs))
+        return FakeJob({"photo_id": f"p{len(self.submitted)}", "image_url": kwargs["image_url"]})
+
+
+class TestBatchEndpoint(unittest.TestCase):
+    def setUp(self):
+        self._orig_scheduler = server.analysis_scheduler
+        self.scheduler = server.analysis_scheduler = FakeScheduler()
+        self.client = TestClient(server.app)
+
+    def tearDown(self):
+        server.analysis_scheduler = self._orig_scheduler
+
+    def test_streams_one_line_per_item(self):
+        location = {"latitude": 1, "longitude": 2, "city": "Cluj", "country": "RO"}
+        response = self.client.post("/analyze/batch", json={"items": [
+            {"image_url": "https://img/1.jpg", "user_id": "u1", "location": location, "ref": "local-1"},
+            {"image_url": "https://img/2.jpg", "user_id": "u1", "location": {"city": "Cluj"}},
+        ]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["content-type"], "application/x-ndjson")
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        by_index = {o["index"]: o for o in lines}
+        self.assertEqual(by_index[0]["ref"], "local-1")
+        self.assertEqual(by_index[0]["result"]["image_url"], "https://img/1.jpg")
+        self.assertEqual(by_index[1]["status"], 400)
+        self.assertEqual(len(self.scheduler.submitted), 1)
+
+    def test_rejects_empty_batch(self):
+        response = self.client.post("/analyze/batch", json={"items": []})
+        self.assertEqual(response.status_code, 400)
+
+
+if __name__ == "__main__":
+    unittest.main()
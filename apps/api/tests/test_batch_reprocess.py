@@ -0,0 +1,128 @@
+import asyncio
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from utils.database import crud
+from db.crud.categories import category_cache
+from aiv2.agents.vision import batch
+
+
+class FakeAsyncResult:
+    def __init__(self, record):
+        self._record = record
+    async def single(self):
+        return self._record
+
+
+class FakeAsyncSession:
+    def __init__(self):
+        self.runs = []
+    async def run(self, query, **params):
+        self.runs.append((query, params))
+        if "photo_ids" in params:
+            return FakeAsyncResult({"deleted": len(params["photo_ids"])})
+        record = {"photo_linked": True, "city_linked": True}
+        if "category_id" in params:
+            record["category_created"] = False
+            record["category"] = {"category_id": params["category_id"], "name": params["category_id"],
+                                  "event_type": "issue"}
+        return FakeAsyncResult(record)
+    async def __aenter__(self):
+        return self
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+
+def tool_call_response(name: str, arguments: dict) -> dict:
+    return {"choices": [{"message": {"role": "assistant", "tool_calls": [
+        {"id": "call_1", "type": "function", "function": {"name": name, "arguments": json.dumps(arguments)}},
+    ]}}]}
+
+
+def responder(body: dict) -> dict:
+    photo_id = body["messages"][2]["content"].split(": ", 1)[1]
+    if photo_id == "p1":
+        return tool_call_response("report_issue", {
+            "city_id": "Cluj", "photo_id": "echoed-wrong-id", "name": "Pothole", "description": "Deep pothole",
+            "inspected_at": "2024-01-01", "category": "pothole", "category_description": "Road damage",
+            "severity": "high", "severity_score": 0.9, "reported_at": "2024-01-01", "status": "open",
+        })
+    if photo_id == "p2":
+        return tool_call_response("irrelevant_image", {"photo_id": "p2", "reason": "selfie", "confidence": 0.95})
+    if photo_id == "p3":
+        return {"choices": [{"message": {"role": "assistant", "content": "I cannot tell"}}]}
+    raise RuntimeError("model overloaded")
+
+
+class TestBatchReprocess(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.session = FakeAsyncSession()
+        self._orig_get_async_session = crud.get_async_session
+        crud.get_async_session = lambda **kwargs: self.session
+        category_cache._store({}, reset_clock=True)
+
+    def tearDown(self):
+        crud.get_async_session = self._orig_get_async_session
+        category_cache.invalidate()
+        self.tmp.cleanup()
+
+    def submit(self, photos):
+        requests_path = Path(self.tmp.name) / "requests.jsonl"
+        batch.write_requests(photos, str(requests_path))
+        backend = batch.LocalBatchBackend(Path(self.tmp.name) / "batches", responder)
+        return backend, backend.submit(str(requests_path)), requests_path
+
+    def test_requests_use_the_vision_tools(self):
+        _, _, path = self.submit([{"photo_id": "p1", "url": "https://img/p1.jpg", "city_id": "Cluj"}])
+        request = json.loads(path.read_text())
+        self.assertEqual(request["custom_id"], "p1")
+        self.assertEqual(request["url"], "/v1/chat/completions")
+        names = [tool["function"]["name"] for tool in request["body"]["tools"]]
+        self.assertEqual(names, ["report_issue", "log_well_maintained", "irrelevant_image"])
+        self.assertEqual(request["body"]["messages"][-1]["content"][0]["image_url"]["url"], "https://img/p1.jpg")
+
+    def test_results_are_applied_through_the_handlers(self):
+        photos = [{"photo_id": p, "url": f"https://img/{p}.jpg", "city_id": "Cluj"} for p in ("p1", "p2", "p3", "p4")]
+        backend, batch_id, _ = self.submit(photos)
+        self.assertEqual(batch.wait_for_batch(backend, batch_id, poll_interval=0), "completed")
+
+        summary = asyncio.run(batch.apply_results(backend.results(batch_id)))
+        self.assertEqual(summary["applied"], 2)
+        self.assertEqual(summary["failed"], 2)
+        self.assertEqual(summary["kinds"], {"issue": 1, "irrelevant": 1})
+
+        detach, *writes = self.session.runs
+        self.assertEqual(sorted(detach[1]["photo_ids"]), ["p1", "p2"])
+        issue_params = next(params for query, params in writes if "CREATE (e:Issue" in query)
+        # The photo comes from custom_id, not from the model's arguments
+        self.assertEqual(issue_params["photo_id"], "p1")
+
+    def test_keep_existing_skips_detach(self):
+        backend, batch_id, _ = self.submit([{"photo_id": "p2", "url": "https://img/p2.jpg", "city_id": None}])
+        batch.wait_for_batch(backend, batch_id, poll_interval=0)
+        asyncio.run(batch.apply_results(backend.results(batch_id), replace=False))
+        self.assertFalse(any("photo_ids" in params for _, params in self.session.runs))
+
+    def test_local_backend_waits_for_output_without_responder(self):
+        requests_path = Path(self.tmp.name) / "requests.jsonl"
+        requests_path.write_text("")
+        backend = batch.LocalBatchBackend(Path(self.tmp.name) / "batches")
+        batch_id = backend.submit(str(requests_path))
+        self.assertEqual(backend.status(batch_id), "in_progress")
+        (Path(self.tmp.name) / "batches" / batch_id / "output.jsonl").write_text("")
+        self.assertEqual(backend.status(batch_id), "completed")
+
+    def test_incomplete_backend_fails_on_creation(self):
+        class Partial(batch.BatchBackend):
+            def submit(self, requests_path):
+                return "b1"
+
+        with self.assertRaises(TypeError):
+            Partial()
+
+
+if __name__ == "__main__":
+    unittest.main()
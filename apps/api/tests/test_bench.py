@@ -0,0 +1,170 @@
+import asyncio
+import json
+import random
+import unittest
+
+import httpx
+import instructor
+from fastapi.testclient import TestClient
+from openai import AsyncOpenAI
+
+from aiv2 import openai_client
+from aiv2.agents.messages.agent import RelevanceAnalysis, analyze_message_async
+from aiv2.agents.vision import batch
+from aiv2.agents.vision.vision_agent import IrrelevantImage, IssueReport, WellMaintainedReport, classify_image
+from bench import load
+from db.crud.categories import category_cache
+from bench.mock_openai import LatencyDistribution, MockModel, create_app, fake_image, parse_mix
+from bench.report import format_report, percentile, summarize
+from utils.timing import parse_server_timing, record_stages, server_timing, stage
+
+
+class MockLoopClient:
+    """Routes the shared async client to the mock app without a network."""
+    def __init__(self, app):
+        self.http = httpx.AsyncClient(transport=httpx.ASGITransport(app=app))
+        self.client = instructor.from_openai(
+            AsyncOpenAI(api_key="test", base_url="http://mock/v1", http_client=self.http, max_retries=0)
+        )
+        self.slots = asyncio.Semaphore(4)
+
+
+class TestMockOpenAI(unittest.TestCase):
+    def setUp(self):
+        self._orig_loop_client = openai_client._loop_client
+        category_cache._store({}, reset_clock=True)
+
+    def tearDown(self):
+        openai_client._loop_client = self._orig_loop_client
+        category_cache.invalidate()
+
+    def call(self, app, make_call):
+        async def main():
+            state = MockLoopClient(app)
+            openai_client._loop_client = lambda: state
+            try:
+                return await make_call()
+            finally:
+                await state.http.aclose()
+        return asyncio.run(main())
+
+    def test_vision_results_parse_for_each_kind(self):
+        expected = {"issue": IssueReport, "maintenance": WellMaintainedReport, "irrelevant": IrrelevantImage}
+        for kind, cls in expected.items():
+            app = create_app(mix={kind: 1}, seed=1)
+            result = self.call(app, lambda: classify_image("https://img/1.jpg", "Cluj", "photo-1"))
+            self.assertIsInstance(result, cls)
+            self.assertEqual(result.photo_id, "photo-1")
+            self.assertEqual(app.state.model.kinds, {kind: 1})
+
+    def test_relevance_result_parses(self):
+        app = create_app(seed=1)
+        result = self.call(app, lambda: analyze_message_async({"message": "Still broken", "submit_type": "report"}))
+        self.assertIsInstance(result, RelevanceAnalysis)
+        self.assertTrue(-10 <= result.delta_score <= 10)
+
+    def test_batch_requests_get_named_tools(self):
+        photo = {"photo_id": "p1", "url": "https://img/p1.jpg", "city_id": "Cluj"}
+        request = batch.build_request(photo, batch.tool_registry.snapshot())
+        status, body = MockModel(mix={"irrelevant": 1}).complete(request["body"])
+        self.assertEqual(status, 200)
+        call = body["choices"][0]["message"]["tool_calls"][0]["function"]
+        self.assertEqual(call["name"], "irrelevant_image")
+        self.assertEqual(json.loads(call["arguments"])["photo_id"], "p1")
+
+    def test_error_rate_and_stats(self):
+        model = MockModel(error_rate=1.0, seed=3)
+        status, body = model.complete({"tool_choice": {"type": "function", "function": {"name": "Response"}}})
+        self.assertIn(status, (429, 500))
+        self.assertIn("error", body)
+
+    def test_stats_endpoint_counts_requests(self):
+        app = create_app(mix={"issue": 1})
+        client = TestClient(app)
+        body = {"tool_choice": {"type": "function", "function": {"name": "Response"}}, "messages": []}
+        self.assertEqual(client.post("/v1/chat/completions", json=body).status_code, 200)
+        stats = client.get("/stats").json()
+        self.assertEqual(stats["requests"], 1)
+        self.assertEqual(stats["kinds"], {"issue": 1})
+        client.post("/stats/reset")
+        self.assertEqual(client.get("/stats").json()["requests"], 0)
+
+    def test_images_are_deterministic_per_name(self):
+        self.assertEqual(fake_image("a", (64, 48)), fake_image("a", (64, 48)))
+        self.assertNotEqual(fake_image("a", (64, 48)), fake_image("b", (64, 48)))
+
+    def test_latency_specs(self):
+        rng = random.Random(0)
+        self.assertEqual(LatencyDistribution("fixed:5").sample(rng), 5)
+        self.assertTrue(10 <= LatencyDistribution("uniform:10:20").sample(rng) <= 20)
+        self.assertGreater(LatencyDistribution("lognormal:100:0.5").sample(rng), 0)
+        for spec in ("fixed", "gamma:1:2", "uniform:a:b"):
+            with self.assertRaises(ValueError):
+                LatencyDistribution(spec)
+        self.assertEqual(parse_mix("issue=2,irrelevant"), {"issue": 2.0, "irrelevant": 1.0})
+
+
+class TestReport(unittest.TestCase):
+    def test_percentile_is_nearest_rank(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([7], 95), 7)
+        self.assertIsNone(percentile([], 50))
+
+    def test_summarize_counts_only_successes_in_latency(self):
+        samples = [
+            {"status": 200, "latency_ms": 10.0, "stages": {"model": 8.0}},
+            {"status": 200, "latency_ms": 30.0, "stages": {"model": 20.0, "fetch": 5.0}},
+            {"status": 429, "latency_ms": 1.0, "stages": {}},
+        ]
+        summary = summarize(samples, elapsed=2.0)
+        self.assertEqual(summary["ok"], 2)
+        self.assertEqual(summary["statuses"], {"200": 2, "429": 1})
+        self.assertEqual(summary["throughput_rps"], 1.0)
+        self.assertEqual(summary["latency_ms"]["p50"], 10.0)
+        self.assertEqual(summary["stages_ms"]["model"]["max"], 20.0)
+        self.assertEqual(summary["stages_ms"]["fetch"]["count"], 1)
+
+        text = format_report({"scenarios": {"analyze": summary}}, baseline={"scenarios": {"analyze": {
+            **summary, "throughput_rps": 2.0}}})
+        self.assertIn("(-50%)", text)
+
+    def test_server_timing_round_trip(self):
+        with record_stages() as timings:
+            with stage("model"):
+                pass
+            with stage("model"):
+                pass
+        self.assertEqual(list(timings), ["model"])
+        header = server_timing({"queue": 1.25, "model": 812.0})
+        self.assertEqual(header, "queue;dur=1.2, model;dur=812.0")
+        self.assertEqual(parse_server_timing(header + ", cache;desc=hit"), {"queue": 1.2, "model": 812.0})
+
+
+class TestLoadRunner(unittest.TestCase):
+    def test_closed_loop_caps_concurrency(self):
+        state = {"running": 0, "peak": 0}
+
+        async def send(i):
+            state["running"] += 1
+            state["peak"] = max(state["peak"], state["running"])
+            await asyncio.sleep(0.001)
+            state["running"] -= 1
+            return (500 if i == 3 else 200), {"model": 1.0}
+
+        samples, elapsed = asyncio.run(load.run_requests(send, 10, concurrency=3))
+        self.assertEqual(len(samples), 10)
+        self.assertEqual(state["peak"], 3)
+        self.assertEqual(sum(1 for s in samples if s["status"] == 500), 1)
+
+    def test_transport_errors_are_recorded_as_status_zero(self):
+        async def send(i):
+            raise httpx.ConnectError("refused")
+
+        samples, _ = asyncio.run(load.run_requests(send, 2, rate=1000))
+        self.assertEqual([s["status"] for s in samples], [0, 0])
+
+
+if __name__ == "__main__":
+    unittest.main()
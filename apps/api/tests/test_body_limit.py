@@ -0,0 +1,56 @@
+import unittest
+
+from fastapi import FastAPI, File, UploadFile
+from fastapi.testclient import TestClient
+
+from utils.body_limit import BodyLimitMiddleware
+
+
+class TestBodyLimit(unittest.TestCase):
+    def setUp(self):
+        self.handled = []
+        app = FastAPI()
+        app.add_middleware(BodyLimitMiddleware, paths=["/upload"], max_bytes=1000)
+
+        @app.post("/upload")
+        async def upload(file: UploadFile = File(...)):
+            data = await file.read()
+            self.handled.append(len(data))
+            return {"size": len(data)}
+
+        @app.post("/other")
+        async def other(file: UploadFile = File(...)):
+            return {"size": len(await file.read())}
+
+        self.client = TestClient(app)
+
+    def test_small_upload_passes(self):
+        response = self.client.post("/upload", files={"file": ("a.jpg", b"x" * 500, "image/jpeg")})
+        self.assertEqual(response.json(), {"size": 500})
+
+    def test_declared_length_over_limit(self):
+        response = self.client.post("/upload", files={"file": ("a.jpg", b"x" * 5000, "image/jpeg")})
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(self.handled, [])
+        # Other paths are not limited
+        response = self.client.post("/other", files={"file": ("a.jpg", b"x" * 5000, "image/jpeg")})
+        self.assertEqual(response.json(), {"size": 5000})
+
+    def test_chunked_body_stops_at_limit(self):
+        boundary = b"limit"
+
+        def body():
+            yield b"--" + boundary + b'\r\nContent-Disposition: form-data; name="file"; filename="a.jpg"\r\n'
+            yield b"Content-Type: image/jpeg\r\n\r\n"
+            for _ in range(100):
+                yield b"x" * 500
+            yield b"\r\n--" + boundary + b"--\r\n"
+
+        response = self.client.post("/upload", content=body(),
+                                    headers={"content-type": "multipart/form-data; boundary=limit"})
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(self.handled, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+import unittest
+from utils.database import crud
+from db.crud import create_edges
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self._rows = rows
+    def single(self):
+        return {"count": len(self._rows)}
+
+
+class FakeSession:
+    def __init__(self):
+        self.runs = []
+    def run(self, query, **params):
+        self.runs.append((query, params))
+        return FakeResult(params["rows"])
+    def __enter__(self):
+        return self
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+
+class TestBulkCrud(unittest.TestCase):
+    def setUp(self):
+        self.fake_session = FakeSession()
+        self._orig_get_session = crud.get_session
+        crud.get_session = lambda **kwargs: self.fake_session
+
+    def tearDown(self):
+        crud.get_session = self._orig_get_session
+
+    def test_nodes_grouped_by_shape_and_chunked(self):
+        rows = [
+            {"city_id": "c1", "name": "A", "location": {"latitude": 1.0, "longitude": 2.0}},
+            {"city_id": "c2", "location": {"latitude": 3.0, "longitude": 4.0}, "name": "B"},
+            {"city_id": "c3", "name": "C", "location": {"latitude": 5.0, "longitude": 6.0}},
+            {"city_id": "c4", "name": "D"},
+        ]
+        written = crud.add_nodes_bulk("City", "city_id", rows, chunk_size=2)
+
+        self.assertEqual(written, 4)
+        # Two chunks for rows with a location, one for the row without
+        self.assertEqual([len(p["rows"]) for _, p in self.fake_session.runs], [2, 1, 1])
+        first, second, third = (q for q, _ in self.fake_session.runs)
+        self.assertEqual(first, second)
+        self.assertIn("UNWIND $rows AS row", first)
+        self.assertIn("SET n += row.props", first)
+        self.assertIn("n.location = point(row.location)", first)
+        self.assertNotIn("location", third)
+        self.assertEqual(
+            self.fake_session.runs[0][1]["rows"][1],
+            {"id": "c2", "props": {"name": "B"}, "location": {"latitude": 3.0, "longitude": 4.0}},
+        )
+
+        with self.assertRaises(ValueError):
+            crud.add_nodes_bulk("City", "city_id", [{"name": "no id"}])
+
+    def test_relationships_from_cli_rows(self):
+        rows = [
+            {"message_id": "m1", "photo_id": "p1", "user_id": "u1"},
+            {"message_id": "m2", "photo_id": "p1", "user_id": "u2"},
+        ]
+        written = create_edges.add_bulk("message_for", rows)
+
+        self.assertEqual(written, 4)
+        about, wrote = self.fake_session.runs
+        self.assertIn("MERGE (a)-[r:ABOUT_PHOTO]->(b)", about[0])
+        self.assertEqual(about[1]["rows"][0], {"start": "m1", "end": "p1", "props": {}})
+        self.assertIn("WROTE_MESSAGE", wrote[0])
+        self.assertEqual(wrote[1]["rows"][1]["start"], "u2")
+
+
+class TestQueryCache(unittest.TestCase):
+    def setUp(self):
+        crud.query_cache.clear()
+
+    def test_query_text_independent_of_key_order_and_optional_keys(self):
+        q1, p1 = crud.create_nodes.build_node_query("User", "user_id", {"user_id": "u1", "name": "A", "email": "a@x"})
+        q2, p2 = crud.create_nodes.build_node_query("User", "user_id", {"email": "b@x", "user_id": "u2"})
+        q3, p3 = crud.create_nodes.build_node_query("User", "user_id", {"user_id": "u3", "location": {"latitude": 1, "longitude": 2}})
+
+        self.assertEqual(q1, q2)
+        self.assertIn("SET n += $props", q1)
+        self.assertNotEqual(q1, q3)
+        self.assertIn("SET n.location = point($location)", q3)
+        self.assertEqual(p2, {"user_id": "u2", "props": {"email": "b@x"}})
+        self.assertEqual(p3["props"], {})
+        self.assertEqual(crud.query_cache.stats()["hits"], 1)
+        self.assertEqual(crud.query_cache.stats()["misses"], 2)
+
+    def test_lru_eviction(self):
+        cache = crud.query_cache.__class__(maxsize=2)
+        cache.get("a", lambda: "A")
+        cache.get("b", lambda: "B")
+        cache.get("a", lambda: "A")
+        cache.get("c", lambda: "C")
+        self.assertEqual(cache.get("b", lambda: "B2"), "B2")
+        self.assertEqual(cache.get("a", lambda: "A2"), "A2")
+        self.assertEqual(cache.stats()["size"], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
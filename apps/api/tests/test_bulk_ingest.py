@@ -0,0 +1,115 @@
+import io
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from utils import bulk_ingest, s3
+from utils.database import crud
+
+
+class FakeS3Client:
+    def __init__(self):
+        self.objects = set()
+        self.uploads = []
+    def head_object(self, Bucket, Key):
+        if Key not in self.objects:
+            raise s3.ClientError({"Error": {"Code": "404", "Message": "Not Found"}}, "HeadObject")
+        return {}
+    def upload_file(self, filename, bucket, key, **kwargs):
+        self.uploads.append(key)
+        self.objects.add(key)
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self._rows = rows
+    def single(self):
+        return {"count": len(self._rows)}
+
+
+class FakeSession:
+    def __init__(self):
+        self.runs = []
+    def run(self, query, **params):
+        self.runs.append((query, params))
+        return FakeResult(params["rows"])
+    def __enter__(self):
+        return self
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+
+class TestBulkIngest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name) / "photos"
+        (self.root / "day1").mkdir(parents=True)
+        (self.root / "day1" / "a.jpg").write_bytes(b"image-a")
+        (self.root / "day1" / "b.JPG").write_bytes(b"image-b")
+        (self.root / "c.png").write_bytes(b"image-a")  # same content as a.jpg
+        (self.root / "notes.txt").write_text("not an image")
+        self.client = FakeS3Client()
+        self.session = FakeSession()
+        self._orig_get_s3_client = s3.get_s3_client
+        self._orig_get_session = crud.get_session
+        s3.get_s3_client = lambda: self.client
+        crud.get_session = lambda **kwargs: self.session
+
+    def tearDown(self):
+        s3.get_s3_client = self._orig_get_s3_client
+        crud.get_session = self._orig_get_session
+        self.tmp.cleanup()
+
+    def run_ingest(self, **kwargs):
+        progress = bulk_ingest.Progress(0, out=io.StringIO())
+        kwargs.setdefault("defaults", {"user_id": "crew1", "city": "Cluj"})
+        return bulk_ingest.run_bulk_ingest(self.root, "bucket", workers=2, batch_size=2, progress=progress, **kwargs)
+
+    def rows(self):
+        return [row for _, params in self.session.runs for row in params["rows"]]
+
+    def test_uploads_batches_and_checkpoints(self):
+        sidecar = {"day1/a.jpg": {"user_id": "u7", "latitude": "46.77", "longitude": "23.6", "city": "Cluj"}}
+        summary = self.run_ingest(sidecar=sidecar)
+        self.assertEqual(summary["ingested"], 3)
+        self.assertEqual(len(self.session.runs), 2)
+        # c.png has the same bytes as a.jpg but a different extension, so it gets its own key
+        self.assertEqual(len(self.client.uploads), 3)
+        by_url = {row["url"].rsplit("/", 1)[-1]: row for row in self.rows()}
+        a_row = next(row for key, row in by_url.items() if key.endswith(".jpg") and row["user_id"] == "u7")
+        self.assertEqual(a_row["location"], {"latitude": 46.77, "longitude": 23.6})
+        self.assertEqual(a_row["photo_id"], bulk_ingest.photo_id_for(a_row["content_hash"]))
+        checkpoint = (self.root / bulk_ingest.CHECKPOINT_NAME).read_text().splitlines()
+        self.assertEqual(sorted(json.loads(l)["file"] for l in checkpoint), ["c.png", "day1/a.jpg", "day1/b.JPG"])
+
+    def test_rerun_skips_checkpointed_files(self):
+        self.run_ingest()
+        self.session.runs.clear()
+        summary = self.run_ingest()
+        self.assertEqual(summary["ingested"], 0)
+        self.assertEqual(self.session.runs, [])
+
+    def test_existing_objects_are_not_uploaded_again(self):
+        self.run_ingest()
+        (self.root / bulk_ingest.CHECKPOINT_NAME).unlink()
+        self.client.uploads.clear()
+        summary = self.run_ingest()
+        self.assertEqual(self.client.uploads, [])
+        self.assertEqual(summary["existing"], 3)
+        self.assertEqual(summary["ingested"], 3)
+
+    def test_missing_metadata_fails_file_without_checkpoint(self):
+        summary = self.run_ingest(defaults={})
+        self.assertEqual(summary["failed"], 3)
+        self.assertFalse((self.root / bulk_ingest.CHECKPOINT_NAME).exists())
+
+    def test_load_sidecar_csv(self):
+        path = Path(self.tmp.name) / "meta.csv"
+        path.write_text("file,user_id,latitude,longitude,city\nday1/a.jpg,u1,1.5,2.5,Cluj\n")
+        sidecar = bulk_ingest.load_sidecar(str(path))
+        self.assertEqual(sidecar["day1/a.jpg"]["user_id"], "u1")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+import db.crud.categories as categories
+from db.crud.categories import CategoryCache
+
+
+class TestCategoryCache(unittest.TestCase):
+    def setUp(self):
+        self.reads = 0
+        self.nodes = [
+            {"category_id": "pothole", "name": "pothole", "event_type": "issue"},
+            {"category_id": "graffiti", "name": "graffiti", "event_type": "issue"},
+            {"category_id": "bench", "name": "bench", "event_type": "maintenance"},
+        ]
+
+        def fake_read_nodes(label):
+            self.reads += 1
+            return list(self.nodes)
+
+        self._orig_read_nodes = categories.read_nodes
+        categories.read_nodes = fake_read_nodes
+        self.cache = CategoryCache(ttl=60)
+
+    def tearDown(self):
+        categories.read_nodes = self._orig_read_nodes
+
+    def test_reads_once_within_ttl(self):
+        self.assertEqual(self.cache.names("issue"), ("pothole", "graffiti"))
+        self.assertEqual(self.cache.names("maintenance"), ("bench",))
+        self.cache.get()
+        self.assertEqual(self.reads, 1)
+
+    def test_put_updates_without_reload(self):
+        self.cache.get()
+        generation = self.cache.generation
+        self.cache.put({"category_id": "litter", "name": "litter", "event_type": "issue"})
+        self.assertEqual(self.cache.names("issue"), ("pothole", "graffiti", "litter"))
+        self.assertEqual(self.cache.find("litter")["event_type"], "issue")
+        self.assertGreater(self.cache.generation, generation)
+        self.assertEqual(self.reads, 1)
+
+    def test_put_before_load_is_ignored(self):
+        self.cache.put({"category_id": "litter", "name": "litter", "event_type": "issue"})
+        self.assertIsNone(self.cache.find("litter"))
+        self.assertEqual(self.cache.names("issue"), ("pothole", "graffiti"))
+
+    def test_invalidate_and_ttl_reload(self):
+        self.cache.get()
+        self.cache.invalidate()
+        self.cache.get()
+        self.assertEqual(self.reads, 2)
+
+        expired = CategoryCache(ttl=0)
+        expired.get()
+        expired.get()
+        self.assertEqual(self.reads, 4)
+
+if __name__ == '__main__':
+    unittest.main()
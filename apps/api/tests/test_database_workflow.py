@@ -17,7 +17,10 @@ class FakeSession:
     def run(self, query, **params):
         # Record the query and parameters
         self.runs.append((query.strip(), params))
-        return FakeResult(params)
+        # Nodes are written with SET n += $props, so the node carries the merged properties
+        node = {k: v for k, v in params.items() if k != "props"}
+        node.update(params.get("props", {}))
+        return FakeResult(node)
     def __enter__(self):
         return self
     def __exit__(self, exc_type, exc_val, exc_tb):
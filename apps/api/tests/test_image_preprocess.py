@@ -0,0 +1,49 @@
+import asyncio
+import unittest
+
+from utils import image_preprocess
+
+
+class TestImagePreprocess(unittest.TestCase):
+    def test_token_estimate(self):
+        # 512x512 is a single tile; a 4032x3024 phone photo is scaled to 1024x768 (4 tiles)
+        self.assertEqual(image_preprocess.estimate_image_tokens(512, 512), 85 + 170)
+        self.assertEqual(image_preprocess.estimate_image_tokens(4032, 3024), 85 + 170 * 4)
+
+    def test_metrics_report_savings(self):
+        metrics = image_preprocess.PreprocessMetrics()
+        metrics.record({"bytes_in": 4_000_000, "bytes_out": 300_000,
+                        "size_in": (4032, 3024), "size_out": (683, 512)})
+        snapshot = metrics.snapshot()
+        self.assertEqual(snapshot["bytes_saved"], 3_700_000)
+        self.assertEqual(snapshot["tokens_in"], 85 + 170 * 4)
+        self.assertEqual(snapshot["tokens_saved"], 170 * 2)
+
+    def test_default_size_saves_tokens(self):
+        # What preprocess_image produces for a phone photo with the default limits
+        scale = min(1.0, image_preprocess.IMAGE_MAX_EDGE / 4032, image_preprocess.IMAGE_MAX_SHORT_EDGE / 3024)
+        saved = (image_preprocess.estimate_image_tokens(4032, 3024)
+                 - image_preprocess.estimate_image_tokens(round(4032 * scale), round(3024 * scale)))
+        self.assertGreater(saved, 0)
+
+    def test_passthrough_without_bytes_or_when_off(self):
+        url = "http://example.com/photo.jpg"
+        self.assertEqual(asyncio.run(image_preprocess.prepare_model_image(url, None)), url)
+        self.assertEqual(asyncio.run(image_preprocess.prepare_model_image(url, b"data", mode="off")), url)
+
+    @unittest.skipIf(image_preprocess.Image is None, "Pillow is not installed")
+    def test_downscale_and_strip(self):
+        import io
+        from PIL import Image
+        buf = io.BytesIO()
+        Image.new("RGB", (3000, 2000), "red").save(buf, format="JPEG")
+        output, info = image_preprocess.preprocess_image(buf.getvalue(), max_edge=1000, quality=80)
+        self.assertEqual(info["size_out"], (768, 512))
+        self.assertLess(image_preprocess.estimate_image_tokens(*info["size_out"]),
+                        image_preprocess.estimate_image_tokens(*info["size_in"]))
+        with Image.open(io.BytesIO(output)) as img:
+            self.assertFalse(img.info.get("exif"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+import asyncio
+import unittest
+
+import httpx
+
+from utils import images
+
+
+class TestFetchImageBytes(unittest.TestCase):
+    def setUp(self):
+        self._orig = (images.httpx.AsyncClient, images.IMAGE_FETCH_ALLOWED_HOSTS)
+        self.requests = []
+
+        def handler(request):
+            self.requests.append(str(request.url))
+            if request.url.path == "/redirect":
+                return httpx.Response(302, headers={"location": "http://169.254.169.254/latest/meta-data/"})
+            if request.url.path == "/moved":
+                return httpx.Response(301, headers={"location": "/photo.jpg"})
+            return httpx.Response(200, content=b"jpeg")
+
+        client = self._orig[0]
+        images.httpx.AsyncClient = lambda **kwargs: client(transport=httpx.MockTransport(handler), **kwargs)
+        images.IMAGE_FETCH_ALLOWED_HOSTS = {"images.test"}
+
+    def tearDown(self):
+        images.httpx.AsyncClient, images.IMAGE_FETCH_ALLOWED_HOSTS = self._orig
+
+    def test_internal_addresses_and_schemes_are_refused(self):
+        for url in ("http://169.254.169.254/latest/meta-data/", "http://127.0.0.1:8000/metrics",
+                    "http://10.0.0.5/photo.jpg", "http://[::1]/photo.jpg", "file:///etc/passwd"):
+            with self.assertRaises(ValueError, msg=url):
+                asyncio.run(images.fetch_image_bytes(url))
+        self.assertEqual(self.requests, [])
+
+    def test_redirects_are_checked(self):
+        self.assertEqual(asyncio.run(images.fetch_image_bytes("http://images.test/moved")), b"jpeg")
+        with self.assertRaises(ValueError):
+            asyncio.run(images.fetch_image_bytes("http://images.test/redirect"))
+        self.assertEqual(self.requests, ["http://images.test/moved", "http://images.test/photo.jpg",
+                                         "http://images.test/redirect"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import unittest
+from utils.database import crud
+
+
+class FakeRecord:
+    def __init__(self, params):
+        self._params = params
+    def get(self, key):
+        return {"c": self._params["city_id"], "u": self._params["user_id"],
+                "p": self._params["photo_id"], "r": self._params["device"]}[key]
+
+
+class FakeResult:
+    def __init__(self, params):
+        self._params = params
+    def single(self):
+        return FakeRecord(self._params)
+
+
+class FakeSession:
+    def __init__(self):
+        self.runs = []
+    def run(self, query, **params):
+        self.runs.append((query, params))
+        return FakeResult(params)
+    def __enter__(self):
+        return self
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+
+class TestIngestContext(unittest.TestCase):
+    def setUp(self):
+        self.fake_session = FakeSession()
+        self._orig_get_session = crud.get_session
+        crud.get_session = lambda **kwargs: self.fake_session
+
+    def tearDown(self):
+        crud.get_session = self._orig_get_session
+
+    def test_single_round_trip(self):
+        context = crud.ingest_photo_context(
+            "http://example.com/photo.jpg",
+            {"id": "user123", "name": "Tester"},
+            {"city": "Testopolis", "country": "Testland", "latitude": 10.0, "longitude": 20.0},
+        )
+
+        # City, User, Photo and UPLOADED_PHOTO are written by one statement
+        self.assertEqual(len(self.fake_session.runs), 1)
+        query, params = self.fake_session.runs[0]
+        for clause in ("MERGE (c:City", "MERGE (u:User", "MERGE (p:Photo", "UPLOADED_PHOTO"):
+            self.assertIn(clause, query)
+
+        self.assertEqual(params["city_id"], "Testopolis")
+        self.assertEqual(params["user_id"], "user123")
+        self.assertEqual(params["location"], {"latitude": 10.0, "longitude": 20.0})
+        self.assertEqual(context["photo_id"], params["photo_id"])
+        self.assertEqual(context["city"], "Testopolis")
+        self.assertEqual(context["uploaded_photo"], "api")
+
+    def test_explicit_photo_id(self):
+        context = crud.ingest_photo_context(
+            "http://example.com/photo.jpg",
+            {"id": "user123"},
+            {"city": "Testopolis", "latitude": 1.0, "longitude": 2.0},
+            photo_id="photo123",
+        )
+        _, params = self.fake_session.runs[0]
+        self.assertEqual(params["photo_id"], "photo123")
+        self.assertEqual(params["user_name"], "user123")
+        self.assertEqual(context["photo_id"], "photo123")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+import asyncio
+import unittest
+from unittest import mock
+
+import relevance_worker
+from db.crud import aio
+from utils.job_queue import JobQueue, SQLiteJobQueue
+
+
+class TestSQLiteJobQueue(unittest.TestCase):
+    def setUp(self):
+        self.queue = SQLiteJobQueue(":memory:", max_attempts=2)
+
+    def tearDown(self):
+        self.queue.close()
+
+    def test_retry_then_dead_letter(self):
+        job_id = self.queue.enqueue("q", {"n": 1})
+        job, = self.queue.claim("q")
+        self.assertEqual((job.id, job.attempts, job.payload), (job_id, 1, {"n": 1}))
+        # Leased jobs are not handed out twice
+        self.assertEqual(self.queue.claim("q"), [])
+
+        with mock.patch("utils.job_queue.backoff_delay", return_value=0):
+            self.queue.fail(job, "boom")
+        job, = self.queue.claim("q")
+        self.assertEqual((job.attempts, job.last_error), (2, "boom"))
+
+        self.queue.fail(job, "boom again")
+        self.assertEqual(self.queue.claim("q"), [])
+        dead, = self.queue.dead_letters("q")
+        self.assertEqual(dead.last_error, "boom again")
+
+        self.queue.requeue_dead([dead.id])
+        self.assertEqual(self.queue.stats("q"), {"pending": 1})
+
+    def test_expired_lease_is_reclaimed(self):
+        self.queue.enqueue("q", {"n": 1})
+        self.queue.claim("q", lease_seconds=-1)
+        job, = self.queue.claim("q")
+        self.assertEqual(job.attempts, 2)
+        self.queue.ack([job.id])
+        self.assertEqual(self.queue.stats("q"), {})
+
+    def test_incomplete_backend_fails_on_creation(self):
+        class Partial(JobQueue):
+            def enqueue(self, queue, payload, delay=0):
+                return 1
+
+        with self.assertRaises(TypeError):
+            Partial()
+
+    def test_expired_lease_dead_letters_after_max_attempts(self):
+        # The worker never calls fail(): it crashed or hung on this payload
+        self.queue.enqueue("q", {"n": 1})
+        self.queue.claim("q", lease_seconds=-1)
+        self.queue.claim("q", lease_seconds=-1)
+        self.assertEqual(self.queue.claim("q"), [])
+        dead, = self.queue.dead_letters("q")
+        self.assertEqual((dead.attempts, dead.last_error), (2, "lease expired after 2 attempts"))
+
+
+class TestRelevanceWorker(unittest.TestCase):
+    def setUp(self):
+        self.queue = SQLiteJobQueue(":memory:", max_attempts=3)
+        self._orig_analyze = relevance_worker.analyze_message_async
+        self._orig_update = aio.update_message_analyses
+        self.written = []
+
+        class Result:
+            def __init__(self, text):
+                self.text = text
+
+            def model_dump(self):
+                return {"reason": self.text, "delta_score": 1, "confidence": 0.9, "additional_info": None}
+
+        async def analyze(payload):
+            if payload == "bad":
+                raise ValueError("model error")
+            return Result(payload)
+
+        async def update(rows):
+            self.written.append(rows)
+
+        relevance_worker.analyze_message_async = analyze
+        aio.update_message_analyses = update
+
+    def tearDown(self):
+        relevance_worker.analyze_message_async = self._orig_analyze
+        aio.update_message_analyses = self._orig_update
+        self.queue.close()
+
+    def test_batch_writes_successes_and_retries_failures(self):
+        self.queue.enqueue(relevance_worker.RELEVANCE_QUEUE, {"message_id": "m1", "ai_payload": "ok"})
+        self.queue.enqueue(relevance_worker.RELEVANCE_QUEUE, {"message_id": "m2", "ai_payload": "bad"})
+        jobs = self.queue.claim(relevance_worker.RELEVANCE_QUEUE, limit=10)
+
+        acked = asyncio.run(relevance_worker.process_batch(self.queue, jobs, concurrency=2))
+
+        self.assertEqual(acked, 1)
+        self.assertEqual(len(self.written), 1)
+        self.assertEqual([row["id"] for row in self.written[0]], ["m1"])
+        self.assertEqual(self.written[0][0]["props"]["reason"], "ok")
+        self.assertEqual(self.queue.stats(relevance_worker.RELEVANCE_QUEUE), {"pending": 1})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,153 @@
+import asyncio
+import unittest
+
+from utils.database import crud
+from db import schema
+from db.crud import aio, reprocess, update_nodes
+from db.crud.categories import category_cache
+from db.memory import (
+    AsyncMemorySession, ConstraintError, CypherError, CypherSyntaxError, MemoryGraph, MemorySession, Point
+)
+
+
+class MemoryGraphTestCase(unittest.TestCase):
+    """Runs the real crud functions against a fresh in-memory graph."""
+    def setUp(self):
+        self.graph = MemoryGraph()
+        self._orig = (crud.get_session, crud.get_async_session, update_nodes.get_session)
+        crud.get_session = lambda **kwargs: MemorySession(self.graph)
+        crud.get_async_session = lambda **kwargs: AsyncMemorySession(self.graph)
+        update_nodes.get_session = crud.get_session
+        category_cache._store({}, reset_clock=True)
+
+    def tearDown(self):
+        crud.get_session, crud.get_async_session, update_nodes.get_session = self._orig
+        category_cache.invalidate()
+
+    def run_query(self, query, **params):
+        return MemorySession(self.graph).run(query, **params)
+
+    def ingest(self, photo_id, city="Cluj"):
+        location = {"city": city, "country": "RO", "latitude": 46.77, "longitude": 23.59}
+        return crud.ingest_photo_context(f"https://img/{photo_id}.jpg", {"id": "u1"}, location, photo_id=photo_id)
+
+
+class TestMemoryCrud(MemoryGraphTestCase):
+    def test_add_node_upserts_on_id(self):
+        crud.add_node("City", "city_id", {"city_id": "Cluj", "name": "Cluj",
+                                          "location": {"latitude": 46.77, "longitude": 23.59}})
+        node = crud.add_node("City", "city_id", {"city_id": "Cluj", "population": 300000})
+        self.assertEqual(node["population"], 300000)
+        self.assertEqual(node["name"], "Cluj")
+        self.assertEqual(node["location"], Point(23.59, 46.77, 4326))
+        self.assertEqual(len(self.graph.nodes), 1)
+
+    def test_relationships_merge_between_existing_nodes(self):
+        crud.add_nodes_bulk("User", "user_id", [{"user_id": "u1"}, {"user_id": "u2"}])
+        crud.add_nodes_bulk("Photo", "photo_id", [{"photo_id": "p1"}, {"photo_id": "p2"}])
+        rows = [{"start": "u1", "end": "p1", "props": {"device": "ios"}}, {"start": "u2", "end": "p2", "props": None}]
+        self.assertEqual(crud.add_relationships_bulk("User", "user_id", "UPLOADED", "Photo", "photo_id", rows), 2)
+        crud.add_relationship("User", "user_id", "u1", "UPLOADED", "Photo", "photo_id", "p1", {"device": "web"})
+        self.assertIsNone(crud.add_relationship("User", "user_id", "u1", "UPLOADED", "Photo", "photo_id", "missing"))
+        self.assertEqual(self.graph.relationship_count, 2)
+        record = self.run_query("MATCH (:User {user_id: 'u1'})-[r:UPLOADED]->(p) RETURN r.device AS device, p").single()
+        self.assertEqual(record["device"], "web")
+        self.assertEqual(record["p"]["photo_id"], "p1")
+
+    def test_ingest_issue_and_photo_lookup(self):
+        self.ingest("p1")
+        self.ingest("p1")
+        self.assertEqual(self.graph.stats()["labels"], {"City": 1, "User": 1, "Photo": 1})
+        result = crud.record_issue({"category": "pothole", "severity": "high", "photo_id": "p1", "city_id": "Cluj"})
+        self.assertTrue(result["category_created"])
+        self.assertTrue(result["photo_linked"])
+        self.assertTrue(result["city_linked"])
+        self.assertFalse(crud.record_issue({"category": "pothole", "photo_id": "nope"})["photo_linked"])
+
+        photo, event, kind = asyncio.run(aio.get_photo_and_event("p1"))
+        self.assertEqual(kind, "issue")
+        self.assertEqual(photo["score"], 50)
+        self.assertEqual(event["event_id"], result["event_id"])
+        self.assertEqual(asyncio.run(aio.get_photo_and_event("missing")), (None, None, None))
+
+    def test_message_scores_apply_only_once(self):
+        self.ingest("p1")
+        self.run_query("MATCH (p:Photo {photo_id: 'p1'}) "
+                       "CREATE (:Message {message_id: 'm1'})-[:ABOUT_PHOTO]->(p), "
+                       "(:Message {message_id: 'm2'})-[:ABOUT_PHOTO]->(p)")
+        rows = [{"id": "m1", "props": {"delta_score": 5}}, {"id": "m2", "props": {"delta_score": -2}}]
+        crud.update_message_analyses(rows)
+        crud.update_message_analyses(rows)
+        score = self.run_query("MATCH (p:Photo) RETURN p.score AS score").single()["score"]
+        self.assertEqual(score, 53)
+
+    def test_reprocess_selects_and_detaches_events(self):
+        for photo_id in ("p1", "p2", "p3"):
+            self.ingest(photo_id)
+        event_id = crud.record_issue({"category": "pothole", "photo_id": "p1", "city_id": "Cluj"})["event_id"]
+        crud.link_photo_to_event("issue", "p2", event_id)
+
+        self.assertEqual([p["photo_id"] for p in reprocess.select_photos(unclassified=True)], ["p3"])
+        selected = reprocess.select_photos(category="pothole", limit=1)
+        self.assertEqual(selected, [{"photo_id": "p1", "url": "https://img/p1.jpg", "city_id": "Cluj"}])
+        # The event is only deleted once no photo points to it anymore
+        self.assertEqual(reprocess.detach_photo_events(["p1"]), 0)
+        self.assertEqual(reprocess.detach_photo_events(["p2"]), 1)
+        # Unclassified photos keep the city they were ingested in
+        self.assertEqual([p["city_id"] for p in reprocess.select_photos(unclassified=True)], ["Cluj"] * 3)
+
+    def test_reprocess_city_falls_back_to_captured_in(self):
+        self.run_query("CREATE (:Photo {photo_id: 'p1', url: 'u1'})-[:CAPTURED_IN]->(:City {city_id: 'Oradea'}), "
+                       "(:Photo {photo_id: 'p2', url: 'u2'})")
+        selected = reprocess.select_photos(unclassified=True)
+        self.assertEqual([(p["photo_id"], p["city_id"]) for p in selected], [("p1", "Oradea"), ("p2", None)])
+        self.assertEqual([p["photo_id"] for p in reprocess.select_photos(city_id="Oradea")], ["p1"])
+
+    def test_schema_migrations_and_constraints(self):
+        factory = lambda: AsyncMemorySession(self.graph)
+        self.assertTrue(asyncio.run(schema.migrate(factory)))
+        self.assertEqual(asyncio.run(schema.migrate(factory)), [])
+        self.assertEqual(asyncio.run(schema.missing_schema(factory)), [])
+        self.assertIn("Photo.photo_id", self.graph.stats()["indexes"])
+
+        self.run_query("CREATE (:City {city_id: 'Cluj'})")
+        with self.assertRaises(ConstraintError):
+            self.run_query("CREATE (:City {city_id: 'Oradea'}) CREATE (:City {city_id: 'Cluj'})")
+        # The failed statement left nothing behind
+        self.assertEqual(self.run_query("MATCH (c:City) RETURN count(c) AS n").single()["n"], 1)
+
+
+class TestMemoryCypher(MemoryGraphTestCase):
+    def test_null_semantics_and_aggregation(self):
+        self.run_query("UNWIND range(1, 5) AS i CREATE (:N {i: i, odd: i % 2 = 1})")
+        record = self.run_query(
+            "MATCH (n:N) WHERE n.missing IS NULL AND NOT n.missing = 1 RETURN count(n) AS n").single()
+        self.assertEqual(record["n"], 0)
+        rows = self.run_query("MATCH (n:N) RETURN n.odd AS odd, collect(n.i) AS values, sum(n.i) AS total "
+                              "ORDER BY total DESC").data()
+        self.assertEqual(rows, [{"odd": True, "values": [1, 3, 5], "total": 9},
+                                {"odd": False, "values": [2, 4], "total": 6}])
+        self.assertEqual(self.run_query("MATCH (n:Nope) RETURN count(n) AS n").single()["n"], 0)
+        self.assertIsNone(self.run_query("MATCH (n:Nope) RETURN n").single())
+        record = self.run_query("MATCH (n:N {i: 1}) OPTIONAL MATCH (n)-[:X]->(m) RETURN n.i AS i, m").single()
+        self.assertEqual((record["i"], record["m"]), (1, None))
+
+    def test_errors(self):
+        with self.assertRaises(CypherSyntaxError):
+            self.run_query("MATCH (n RETURN n")
+        with self.assertRaises(CypherError):
+            self.run_query("MATCH (n) RETURN n.x = $missing")
+        with self.assertRaises(CypherError):
+            self.run_query("MERGE (n:N {i: $i})", i=None)
+        with self.assertRaises(CypherError):
+            self.run_query("CREATE (n:N) SET n.map = {a: 1}")
+        self.assertEqual(len(self.graph.nodes), 0)
+        self.run_query("CREATE (:A)-[:R]->(:B)")
+        with self.assertRaises(ConstraintError):
+            self.run_query("MATCH (a:A) DELETE a")
+        self.run_query("MATCH (a:A) DETACH DELETE a")
+        self.assertEqual((len(self.graph.nodes), self.graph.relationship_count), (1, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
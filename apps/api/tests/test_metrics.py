@@ -0,0 +1,136 @@
+import asyncio
+import json
+import unittest
+
+from fastapi.testclient import TestClient
+
+import server
+from db.crud.query_cache import QueryCache
+from utils import logs
+from utils.metrics import CACHE_REQUESTS, CRUD_SECONDS, STAGE_SECONDS, MetricsRegistry, crud_call, registry
+from utils.timing import stage
+
+
+class FakeJobQueue:
+    def stats(self, queue):
+        return {"pending": 3, "dead": 1}
+
+
+class TestMetricsRegistry(unittest.TestCase):
+    def test_text_format(self):
+        metrics = MetricsRegistry()
+        requests = metrics.counter("requests_total", "Requests", ("path",))
+        latency = metrics.histogram("latency_seconds", "Latency", buckets=(0.1, 1.0))
+        requests.inc(path='/a"b')
+        requests.inc(2, path='/a"b')
+        for value in (0.05, 0.5, 5.0):
+            latency.observe(value)
+        text = metrics.render()
+        self.assertIn("# TYPE requests_total counter", text)
+        self.assertIn('requests_total{path="/a\\"b"} 3', text)
+        self.assertIn('latency_seconds_bucket{le="0.1"} 1', text)
+        self.assertIn('latency_seconds_bucket{le="1"} 2', text)
+        self.assertIn('latency_seconds_bucket{le="+Inf"} 3', text)
+        self.assertIn("latency_seconds_sum 5.55", text)
+        self.assertIn("latency_seconds_count 3", text)
+        self.assertIs(metrics.counter("requests_total", "Requests", ("path",)), requests)
+        with self.assertRaises(ValueError):
+            metrics.gauge("requests_total", "Requests")
+        with self.assertRaises(ValueError):
+            requests.inc(method="GET")
+
+    def test_failing_collector_is_skipped(self):
+        metrics = MetricsRegistry()
+        depth = metrics.gauge("depth", "Depth")
+        metrics.add_collector(lambda: 1 / 0)
+        metrics.add_collector(lambda: depth.set(4))
+        self.assertIn("depth 4", metrics.render())
+
+
+class TestInstrumentation(unittest.TestCase):
+    def setUp(self):
+        registry.reset()
+
+    def tearDown(self):
+        registry.reset()
+
+    def test_stages_are_observed_without_a_recorder(self):
+        with stage("model"):
+            pass
+        self.assertEqual(STAGE_SECONDS.snapshot(stage="model")["count"], 1)
+
+    def test_crud_calls_record_outcome(self):
+        @crud_call
+        def write(fail=False):
+            if fail:
+                raise RuntimeError("boom")
+            return 1
+
+        @crud_call
+        async def read():
+            return 2
+
+        self.assertEqual(write(), 1)
+        with self.assertRaises(RuntimeError):
+            write(fail=True)
+        self.assertEqual(asyncio.run(read()), 2)
+        self.assertEqual(CRUD_SECONDS.snapshot(function="test_metrics.write", outcome="ok")["count"], 1)
+        self.assertEqual(CRUD_SECONDS.snapshot(function="test_metrics.write", outcome="error")["count"], 1)
+        self.assertEqual(CRUD_SECONDS.snapshot(function="test_metrics.read", outcome="ok")["count"], 1)
+
+    def test_cache_lookups_are_counted(self):
+        cache = QueryCache()
+        cache.get("shape", lambda: "MATCH (n) RETURN n")
+        cache.get("shape", lambda: "MATCH (n) RETURN n")
+        self.assertEqual(CACHE_REQUESTS.value(cache="query", result="hit"), 1)
+        self.assertEqual(CACHE_REQUESTS.value(cache="query", result="miss"), 1)
+
+    def test_metrics_endpoint(self):
+        orig = server.get_job_queue
+        server.get_job_queue = lambda: FakeJobQueue()
+        try:
+            with stage("ingest"):
+                pass
+            response = TestClient(server.app).get("/metrics")
+        finally:
+            server.get_job_queue = orig
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["content-type"].startswith("text/plain; version=0.0.4"))
+        self.assertIn('analysis_stage_seconds_count{stage="ingest"} 1', response.text)
+        self.assertIn("analysis_queue_depth 0", response.text)
+        self.assertIn('job_queue_jobs{queue="relevance",status="pending"} 3', response.text)
+
+
+class TestEventLogs(unittest.TestCase):
+    def setUp(self):
+        self._orig_rate = logs.LOG_SAMPLE_RATE
+
+    def tearDown(self):
+        logs.LOG_SAMPLE_RATE = self._orig_rate
+
+    def test_json_lines_and_sampling(self):
+        log = logs.get_logger("test")
+        records = []
+
+        class Capture:
+            level = 0
+            def handle(self, record):
+                records.append(record)
+
+        logs.configure_logging()
+        log._logger.addHandler(Capture())
+        try:
+            logs.LOG_SAMPLE_RATE = 0.0
+            log.info("dropped", sample=True)
+            log.warning("kept", photo_id="p1")
+            logs.LOG_SAMPLE_RATE = 1.0
+            log.info("sampled", sample=True, n=1)
+        finally:
+            log._logger.handlers.clear()
+        self.assertEqual([r.getMessage() for r in records], ["kept", "sampled"])
+        entry = json.loads(logs.JsonFormatter().format(records[0]))
+        self.assertEqual((entry["event"], entry["level"], entry["photo_id"]), ("kept", "warning", "p1"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+import asyncio
+import unittest
+
+import httpx
+import openai
+from instructor.core.exceptions import InstructorRetryException
+
+from aiv2 import openai_client
+
+
+def api_error(status: int, retry_after: str = None):
+    headers = {"retry-after": retry_after} if retry_after else {}
+    response = httpx.Response(status, headers=headers, request=httpx.Request("POST", "https://api.openai.com/v1/chat/completions"))
+    cls = openai.RateLimitError if status == 429 else openai.InternalServerError if status >= 500 else openai.BadRequestError
+    return cls(f"status {status}", response=response, body=None)
+
+
+class FakeCompletions:
+    def __init__(self, outcomes, delay=0):
+        self.outcomes = list(outcomes)
+        self.delay = delay
+        self.timeouts = []
+        self.running = 0
+        self.peak = 0
+    async def create(self, timeout=None, **kwargs):
+        self.timeouts.append(timeout)
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        try:
+            await asyncio.sleep(self.delay)
+            outcome = self.outcomes.pop(0) if self.outcomes else "ok"
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+        finally:
+            self.running -= 1
+
+
+class FakeLoopClient:
+    def __init__(self, completions, concurrency=16):
+        self.client = type("C", (), {})()
+        self.client.chat = type("Chat", (), {})()
+        self.client.chat.completions = completions
+        self.slots = asyncio.Semaphore(concurrency)
+
+
+class TestAsyncCreate(unittest.TestCase):
+    def setUp(self):
+        self._orig = (openai_client._loop_client, openai_client.OPENAI_BACKOFF_BASE, openai_client.OPENAI_MAX_RETRIES)
+        openai_client.OPENAI_BACKOFF_BASE = 0.001
+        openai_client.OPENAI_MAX_RETRIES = 2
+
+    def tearDown(self):
+        openai_client._loop_client, openai_client.OPENAI_BACKOFF_BASE, openai_client.OPENAI_MAX_RETRIES = self._orig
+
+    def run_create(self, completions, concurrency=16, calls=1, deadline=30):
+        async def main():
+            state = FakeLoopClient(completions, concurrency)
+            openai_client._loop_client = lambda: state
+            return await asyncio.gather(*(openai_client.acreate(deadline=deadline, model="m") for _ in range(calls)))
+        return asyncio.run(main())
+
+    def test_rate_limit_and_server_errors_are_retried(self):
+        completions = FakeCompletions([api_error(429), api_error(503), "result"])
+        self.assertEqual(self.run_create(completions), ["result"])
+        self.assertEqual(len(completions.timeouts), 3)
+        # Each attempt gets what is left of the deadline
+        self.assertTrue(all(t <= 30 for t in completions.timeouts))
+
+    def test_client_errors_are_not_retried(self):
+        completions = FakeCompletions([api_error(400), "result"])
+        with self.assertRaises(openai.BadRequestError):
+            self.run_create(completions)
+        self.assertEqual(len(completions.timeouts), 1)
+
+    def test_retries_are_bounded(self):
+        completions = FakeCompletions([api_error(500)] * 5)
+        with self.assertRaises(openai.InternalServerError):
+            self.run_create(completions)
+        self.assertEqual(len(completions.timeouts), 3)
+
+    def test_retry_after_past_deadline_fails_fast(self):
+        completions = FakeCompletions([api_error(429, retry_after="120"), "result"])
+        with self.assertRaises(openai.RateLimitError):
+            self.run_create(completions, deadline=5)
+        self.assertEqual(len(completions.timeouts), 1)
+
+    def test_concurrency_is_capped(self):
+        completions = FakeCompletions([], delay=0.01)
+        self.run_create(completions, concurrency=2, calls=6)
+        self.assertEqual(completions.peak, 2)
+
+    def test_wrapped_instructor_errors_are_classified(self):
+        wrapped = InstructorRetryException(api_error(429), n_attempts=1, total_usage=0)
+        self.assertTrue(openai_client.is_retryable(wrapped))
+        self.assertFalse(openai_client.is_retryable(ValueError("bad output")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+import asyncio
+import os
+import tempfile
+import time
+import unittest
+
+from fastapi.testclient import TestClient
+
+import server
+from utils import profiler
+
+
+def blocking_call():
+    time.sleep(0.05)
+
+
+def busy(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+async def profiled_child():
+    busy(0.03)
+    await asyncio.sleep(0.03)
+
+
+async def unrelated_request():
+    busy(0.03)
+
+
+def functions(profile, lane):
+    return {frame[0] for stack in profile.samples if stack[0][0] == lane for frame in stack}
+
+
+class TestProfiler(unittest.TestCase):
+    def test_samples_only_the_profiled_work(self):
+        async def run():
+            other = asyncio.create_task(unrelated_request())
+            with profiler.profiling("POST /analyze", interval=0.002) as profile:
+                await asyncio.to_thread(blocking_call)
+                await asyncio.create_task(profiled_child())
+            await other
+            return profile
+
+        profile = asyncio.run(run())
+        self.assertIn("blocking_call", functions(profile, "thread"))
+        self.assertIn("profiled_child", functions(profile, "async"))
+        self.assertIn("busy", functions(profile, "async"))
+        self.assertNotIn("unrelated_request", functions(profile, "async"))
+
+    def test_formats_round_trip_and_aggregate(self):
+        profile = profiler.Profile("POST /analyze", interval=0.01)
+        stack = (("async", "", 0), ("analyze", "server.py", 10), ("validate", "pydantic/main.py", 5))
+        profile.samples[stack] = 3
+        profile.samples[stack[:2]] = 1
+        with tempfile.TemporaryDirectory() as tmp:
+            loaded = [profiler.load_profile(profile.write(tmp, fmt)) for fmt in ("speedscope", "collapsed")]
+        for weights in loaded:
+            self.assertAlmostEqual(weights[stack], 0.03)
+            self.assertAlmostEqual(weights[stack[:2]], 0.01)
+        merged = loaded[0] + loaded[1]
+        top = {frame[0]: (own, total) for frame, own, total in profiler.top_functions(merged)}
+        self.assertAlmostEqual(top["analyze"][0], 0.02)
+        self.assertAlmostEqual(top["analyze"][1], 0.08)
+        self.assertAlmostEqual(top["validate"][0], 0.06)
+
+
+class TestProfileMiddleware(unittest.TestCase):
+    def setUp(self):
+        self._orig = (profiler.PROFILE_TOKEN, profiler.PROFILE_DIR)
+        self.tmp = tempfile.TemporaryDirectory()
+        profiler.PROFILE_TOKEN = "secret"
+        profiler.PROFILE_DIR = self.tmp.name
+
+    def tearDown(self):
+        profiler.PROFILE_TOKEN, profiler.PROFILE_DIR = self._orig
+        self.tmp.cleanup()
+
+    def test_token_gates_profiling(self):
+        client = TestClient(server.app)
+        denied = client.get("/analyze/missing", headers={"X-Profile-Token": "wrong"})
+        self.assertNotIn("x-profile", denied.headers)
+        response = client.get("/analyze/missing", headers={"X-Profile-Token": "secret"})
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(os.listdir(self.tmp.name), [response.headers["x-profile"] + ".speedscope.json"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,131 @@
+import asyncio
+import io
+import unittest
+
+from utils import s3
+
+
+class FakeS3Client:
+    def __init__(self, fail_on_part=None):
+        self.calls = []
+        self.parts = {}
+        self.fail_on_part = fail_on_part
+    def put_object(self, **kwargs):
+        self.calls.append(("put_object", kwargs["Key"], len(kwargs["Body"])))
+    def create_multipart_upload(self, **kwargs):
+        self.calls.append(("create", kwargs["Key"]))
+        return {"UploadId": "up1"}
+    def upload_part(self, **kwargs):
+        if kwargs["PartNumber"] == self.fail_on_part:
+            raise s3.ClientError({"Error": {"Code": "500", "Message": "part failed"}}, "UploadPart")
+        self.parts[kwargs["PartNumber"]] = kwargs["Body"]
+        self.calls.append(("part", kwargs["PartNumber"], len(kwargs["Body"])))
+        return {"ETag": f"etag{kwargs['PartNumber']}"}
+    def complete_multipart_upload(self, **kwargs):
+        self.calls.append(("complete", [p["PartNumber"] for p in kwargs["MultipartUpload"]["Parts"]]))
+    def abort_multipart_upload(self, **kwargs):
+        self.calls.append(("abort", kwargs["UploadId"]))
+
+
+def reader(data: bytes):
+    stream = io.BytesIO(data)
+    async def read(n):
+        return stream.read(n)
+    return read
+
+
+class TestStreamUpload(unittest.TestCase):
+    def setUp(self):
+        self._orig_get_s3_client = s3.get_s3_client
+        self.client = FakeS3Client()
+        s3.get_s3_client = lambda: self.client
+
+    def tearDown(self):
+        s3.get_s3_client = self._orig_get_s3_client
+
+    def test_small_body_uses_single_put(self):
+        result = asyncio.run(s3.stream_upload_to_s3(reader(b"x" * 10), "bucket", "a.jpg", part_size=16))
+        self.assertEqual(result["size"], 10)
+        self.assertEqual(self.client.calls, [("put_object", "a.jpg", 10)])
+
+    def test_large_body_is_streamed_in_parts(self):
+        data = bytes(range(256)) * 2  # 512 bytes
+        result = asyncio.run(s3.stream_upload_to_s3(reader(data), "bucket", "b.jpg", part_size=200))
+        self.assertEqual(result["size"], 512)
+        self.assertEqual([c for c in self.client.calls if c[0] == "part"],
+                         [("part", 1, 200), ("part", 2, 200), ("part", 3, 112)])
+        self.assertEqual(self.client.calls[-1], ("complete", [1, 2, 3]))
+        self.assertEqual(b"".join(self.client.parts[i] for i in (1, 2, 3)), data)
+
+    def test_failed_part_aborts_upload(self):
+        self.client.fail_on_part = 2
+        with self.assertRaises(RuntimeError):
+            asyncio.run(s3.stream_upload_to_s3(reader(b"x" * 500), "bucket", "c.jpg", part_size=200))
+        self.assertEqual(self.client.calls[-1], ("abort", "up1"))
+
+
+
+class FakePresignClient:
+    def __init__(self):
+        self.calls = 0
+    def generate_presigned_url(self, op, Params, ExpiresIn):
+        self.calls += 1
+        return f"https://signed/{Params['Key']}?v={self.calls}"
+
+
+class TestPresignedUrlCache(unittest.TestCase):
+    def setUp(self):
+        self._orig_get_s3_client = s3.get_s3_client
+        self._orig_time = s3.time.time
+        self.now = 1000.0
+        s3.time.time = lambda: self.now
+        self.client = FakePresignClient()
+        s3.get_s3_client = lambda: self.client
+        s3.presigned_urls.clear()
+
+    def tearDown(self):
+        s3.get_s3_client = self._orig_get_s3_client
+        s3.time.time = self._orig_time
+        s3.presigned_urls.clear()
+
+    def test_url_is_reused_until_half_its_lifetime(self):
+        first = s3.generate_presigned_url("bucket", "a.jpg", expiration=100)
+        self.now += 40
+        self.assertEqual(s3.generate_presigned_url("bucket", "a.jpg", expiration=100), first)
+        self.assertEqual(self.client.calls, 1)
+        self.now += 20
+        self.assertNotEqual(s3.generate_presigned_url("bucket", "a.jpg", expiration=100), first)
+        self.assertEqual(self.client.calls, 2)
+
+    def test_url_never_outlives_the_requested_expiration(self):
+        week = s3.generate_presigned_url("bucket", "a.jpg", expiration=7 * 86400)
+        short = s3.generate_presigned_url("bucket", "a.jpg", expiration=60)
+        self.assertNotEqual(short, week)
+        self.assertEqual(s3.generate_presigned_url("bucket", "a.jpg", expiration=60), short)
+        self.assertEqual(s3.generate_presigned_url("bucket", "a.jpg", expiration=7 * 86400), week)
+        self.assertEqual(self.client.calls, 2)
+
+    def test_keys_are_cached_separately_and_bounded(self):
+        cache = s3.PresignedUrlCache(maxsize=2)
+        cache.put("b", "k1", "u1", 100)
+        cache.put("b", "k2", "u2", 100)
+        cache.get("b", "k1", 100)
+        cache.put("b", "k3", "u3", 100)
+        self.assertEqual(cache.get("b", "k1", 100), "u1")
+        self.assertIsNone(cache.get("b", "k2", 100))
+        self.assertEqual(cache.get("b", "k3", 100), "u3")
+
+
+class TestSharedClient(unittest.TestCase):
+    def tearDown(self):
+        s3.reset_s3_client()
+
+    def test_client_is_created_once(self):
+        s3.reset_s3_client()
+        first = s3.get_s3_client()
+        self.assertIs(s3.get_s3_client(), first)
+        self.assertEqual(first.meta.config.max_pool_connections, s3.S3_MAX_POOL_CONNECTIONS)
+
+
+if __name__ == '__main__':
+    unittest.main()
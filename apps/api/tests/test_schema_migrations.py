@@ -0,0 +1,74 @@
+import unittest
+
+from db import schema
+
+
+class FakeAsyncResult:
+    def __init__(self, rows):
+        self._rows = rows
+    async def data(self):
+        return self._rows
+
+
+class FakeAsyncSession:
+    def __init__(self, applied=(), constraints=(), indexes=()):
+        self.runs = []
+        self.applied = set(applied)
+        self.constraints = list(constraints)
+        self.indexes = list(indexes)
+    async def run(self, query, **params):
+        self.runs.append((query.strip(), params))
+        if "MATCH (m:SchemaMigration)" in query:
+            return FakeAsyncResult([{"version": v} for v in self.applied])
+        if "MERGE (m:SchemaMigration" in query:
+            self.applied.add(params["version"])
+        if query.startswith("SHOW CONSTRAINTS"):
+            return FakeAsyncResult([{"name": n} for n in self.constraints])
+        if query.startswith("SHOW INDEXES"):
+            return FakeAsyncResult([{"name": n} for n in self.indexes])
+        return FakeAsyncResult([])
+    async def __aenter__(self):
+        return self
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+
+class TestSchemaMigrations(unittest.IsolatedAsyncioTestCase):
+    async def test_applies_only_pending_versions(self):
+        session = FakeAsyncSession(applied={1})
+        applied = await schema.migrate(lambda: session)
+        self.assertEqual(applied, [2, 3, 4])
+        statements = [q for q, _ in session.runs]
+        self.assertFalse(any("city_pk" in q for q in statements))
+        self.assertTrue(any("CONSTRAINT message_pk" in q for q in statements))
+        self.assertTrue(any("INDEX photo_score" in q for q in statements))
+
+        # Re-running is a no-op once every version is recorded
+        session.runs.clear()
+        self.assertEqual(await schema.migrate(lambda: session), [])
+        self.assertEqual(len(session.runs), 1)
+
+    async def test_missing_schema_covers_written_labels(self):
+        expected = schema.expected_schema()
+        for name in ("issue_pk", "maintenance_pk", "message_pk", "irrelevant_pk", "report_pk"):
+            self.assertIn(name, expected["constraints"])
+        for name in ("photo_score", "issue_severity"):
+            self.assertIn(name, expected["indexes"])
+
+        session = FakeAsyncSession(
+            constraints=expected["constraints"] - {"report_pk"},
+            indexes=expected["indexes"] - {"issue_severity"},
+        )
+        self.assertEqual(await schema.missing_schema(lambda: session), ["issue_severity", "report_pk"])
+
+    async def test_check_schema_logs_missing_names(self):
+        expected = schema.expected_schema()
+        session = FakeAsyncSession(constraints=expected["constraints"], indexes=expected["indexes"] - {"photo_score"})
+        with self.assertLogs("city.schema", "WARNING") as captured:
+            self.assertEqual(await schema.check_schema(lambda: session), ["photo_score"])
+        self.assertEqual([r.getMessage() for r in captured.records], ["schema.missing"])
+        self.assertEqual(captured.records[0].fields["missing"], ["photo_score"])
+
+
+if __name__ == '__main__':
+    unittest.main()
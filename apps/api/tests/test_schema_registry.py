@@ -0,0 +1,54 @@
+import json
+import unittest
+import db.crud.categories as categories
+from ai.schemas.registry import ToolSchemaRegistry, load_schema_file
+
+
+class TestSchemaRegistry(unittest.TestCase):
+    def setUp(self):
+        self.nodes = [{"category_id": "pothole", "name": "pothole", "event_type": "issue"}]
+        self._orig_read_nodes = categories.read_nodes
+        categories.read_nodes = lambda label: list(self.nodes)
+        categories.category_cache.invalidate()
+
+        self.builds = 0
+        self.registry = ToolSchemaRegistry()
+
+        def build_issue(cats):
+            self.builds += 1
+            schema = load_schema_file("issue.json")
+            schema["properties"]["category"]["enum"] = list(cats.get("issue", ()))
+            return {"name": "report_issue", "parameters": schema}
+
+        self.registry.register("issue", build_issue)
+
+    def tearDown(self):
+        categories.read_nodes = self._orig_read_nodes
+        categories.category_cache.invalidate()
+
+    def test_rebuilds_only_when_category_set_changes(self):
+        first = self.registry.snapshot()
+        self.assertIs(self.registry.snapshot(), first)
+
+        # A reload with the same categories keeps the prebuilt payloads
+        categories.category_cache.invalidate()
+        self.assertIs(self.registry.snapshot(), first)
+        self.assertEqual(self.builds, 1)
+
+        categories.category_cache.put({"category_id": "litter", "name": "litter", "event_type": "issue"})
+        second = self.registry.snapshot()
+        self.assertNotEqual(second.version, first.version)
+        self.assertEqual(self.builds, 2)
+        self.assertEqual(
+            second.specs["issue"].payload["parameters"]["properties"]["category"]["enum"],
+            ("pothole", "litter"),
+        )
+
+    def test_payload_is_frozen_and_serialized(self):
+        spec = self.registry.snapshot().specs["issue"]
+        with self.assertRaises(TypeError):
+            spec.payload["name"] = "other"
+        self.assertEqual(json.loads(spec.json), json.loads(json.dumps(spec.payload)))
+
+if __name__ == '__main__':
+    unittest.main()
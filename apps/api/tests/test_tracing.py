@@ -0,0 +1,146 @@
+import asyncio
+import os
+import tempfile
+import unittest
+
+from fastapi.testclient import TestClient
+
+import server
+from utils import tracing
+from utils.analysis_scheduler import AnalysisScheduler
+from utils.metrics import crud_call
+from utils.timing import stage
+
+
+class ListExporter:
+    def __init__(self):
+        self.spans = []
+
+    def export(self, span):
+        self.spans.append(span)
+
+    def by_name(self, name):
+        return next(s for s in self.spans if s.name == name)
+
+
+class TracingTestCase(unittest.TestCase):
+    def setUp(self):
+        self._orig_exporter = tracing._exporter
+        self.exporter = ListExporter()
+        tracing.set_exporter(self.exporter)
+
+    def tearDown(self):
+        tracing.set_exporter(self._orig_exporter)
+
+
+class TestSpans(TracingTestCase):
+    def test_nesting_across_tasks_and_threads(self):
+        @crud_call
+        def write():
+            return tracing.current_span().name
+
+        @crud_call
+        async def read(fail=False):
+            await asyncio.sleep(0.01)
+            if fail:
+                raise RuntimeError("boom")
+
+        async def request():
+            with tracing.start_trace("POST /analyze") as root:
+                with stage("ingest"):
+                    name = await asyncio.to_thread(write)
+                results = await asyncio.gather(read(), read(fail=True), return_exceptions=True)
+            return root, name, results
+
+        root, name, results = asyncio.run(request())
+        self.assertEqual(name, "test_tracing.write")
+        self.assertIsInstance(results[1], RuntimeError)
+        ingest = self.exporter.by_name("stage.ingest")
+        write_span = self.exporter.by_name("test_tracing.write")
+        self.assertEqual(write_span.parent_id, ingest.span_id)
+        self.assertEqual(write_span.kind, tracing.KIND_CLIENT)
+        reads = [s for s in self.exporter.spans if s.name == "test_tracing.read"]
+        self.assertEqual([s.parent_id for s in reads], [root.span_id] * 2)
+        self.assertEqual(sorted(bool(s.error) for s in reads), [False, True])
+        # Concurrent reads overlap in time
+        self.assertLess(max(s.start_ns for s in reads), min(s.end_ns for s in reads))
+        self.assertEqual({s.trace_id for s in self.exporter.spans}, {root.trace_id})
+
+    def test_no_spans_outside_a_trace(self):
+        with stage("model"), tracing.start_span("orphan") as span:
+            pass
+        self.assertIsNone(span)
+        with tracing.start_trace("job", None, sample_new=False) as root:
+            pass
+        self.assertIsNone(root)
+        self.assertEqual(self.exporter.spans, [])
+
+    def test_traceparent(self):
+        header = "00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01"
+        self.assertEqual(tracing.parse_traceparent(header), ("4bf92f3577b34da6a3ce929d0e0e4736", "00f067aa0ba902b7", True))
+        self.assertIsNone(tracing.parse_traceparent("00-" + "0" * 32 + "-00f067aa0ba902b7-01"))
+        self.assertIsNone(tracing.parse_traceparent("garbage"))
+        # An unsampled caller is not traced
+        with tracing.start_trace("GET /", header[:-2] + "00") as span:
+            self.assertIsNone(span)
+
+    def test_scheduler_continues_the_request_trace(self):
+        async def handler(name):
+            with stage("model"):
+                return name
+
+        async def run():
+            scheduler = AnalysisScheduler(handler, workers=1, max_queue=2, job_ttl=60)
+            await scheduler.start()
+            try:
+                with tracing.start_trace("POST /analyze") as root:
+                    job = scheduler.submit("alice", name="a")
+                    await job.future
+            finally:
+                await scheduler.stop()
+            return root
+
+        root = asyncio.run(run())
+        job = self.exporter.by_name("analysis.job")
+        self.assertEqual((job.trace_id, job.parent_id), (root.trace_id, root.span_id))
+        self.assertEqual(self.exporter.by_name("stage.model").parent_id, job.span_id)
+
+
+class TestMiddleware(TracingTestCase):
+    def test_request_continues_incoming_trace(self):
+        trace_id = "4bf92f3577b34da6a3ce929d0e0e4736"
+        response = TestClient(server.app).get(
+            "/analyze/missing", headers={"traceparent": f"00-{trace_id}-00f067aa0ba902b7-01"}
+        )
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.headers["x-trace-id"], trace_id)
+        span = self.exporter.by_name("GET /analyze/missing")
+        self.assertEqual((span.trace_id, span.parent_id), (trace_id, "00f067aa0ba902b7"))
+        self.assertEqual(span.attributes["http.status_code"], 404)
+
+
+class TestFileExport(unittest.TestCase):
+    def test_otlp_lines_round_trip(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "traces.jsonl")
+            exporter = tracing.FileExporter(path, interval=0.05)
+            orig = tracing._exporter
+            tracing.set_exporter(exporter)
+            try:
+                with tracing.start_trace("POST /analyze") as root:
+                    with tracing.start_span("stage.model", model="gpt-4o", retries=1):
+                        pass
+            finally:
+                tracing.set_exporter(orig)
+                exporter.close()
+            spans = tracing.load_spans(path)
+        self.assertEqual([s["name"] for s in spans], ["stage.model", "POST /analyze"])
+        self.assertEqual(spans[0]["parent_id"], root.span_id)
+        self.assertEqual(spans[0]["attributes"], {"model": "gpt-4o", "retries": 1})
+        text = tracing.format_trace(spans)
+        self.assertIn(f"trace {root.trace_id}", text)
+        self.assertIn("  stage.model", text)
+
+
+if __name__ == "__main__":
+    unittest.main()
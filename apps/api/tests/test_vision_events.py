@@ -0,0 +1,77 @@
+import unittest
+from utils.database import crud
+from db.crud.categories import category_cache
+from aiv2.tools.vision.report_issue import run_iss_function, run_mai_function, run_irrelevant_function
+
+
+class FakeAsyncResult:
+    def __init__(self, record):
+        self._record = record
+    async def single(self):
+        return self._record
+
+
+class FakeAsyncSession:
+    def __init__(self):
+        self.runs = []
+    async def run(self, query, **params):
+        self.runs.append((query, params))
+        record = {"photo_linked": True, "city_linked": params.get("city_id") is not None}
+        if "category_id" in params:
+            record["category_created"] = True
+            record["category"] = {"category_id": params["category_id"], "name": params["category_id"],
+                                  "event_type": "issue"}
+        return FakeAsyncResult(record)
+    async def __aenter__(self):
+        return self
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+
+class TestVisionEvents(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.fake_session = FakeAsyncSession()
+        self._orig_get_async_session = crud.get_async_session
+        crud.get_async_session = lambda **kwargs: self.fake_session
+        # Start from a loaded, empty catalogue
+        category_cache._store({}, reset_clock=True)
+
+    def tearDown(self):
+        crud.get_async_session = self._orig_get_async_session
+        category_cache.invalidate()
+
+    async def test_issue_is_one_statement(self):
+        result = await run_iss_function(None, {
+            "category": "pothole", "name": "Pothole", "severity": "high",
+            "photo_id": "photo1", "city_id": "Testopolis",
+        })
+
+        self.assertEqual(len(self.fake_session.runs), 1)
+        query, params = self.fake_session.runs[0]
+        for clause in ("MERGE (cat:Category", "CREATE (e:Issue", "IN_CATEGORY", "TRIGGERS_EVENT", "IN_CITY"):
+            self.assertIn(clause, query)
+        self.assertEqual(params["props"]["severity"], "high")
+        self.assertEqual(result, {"status": "success", "event_id": params["event_id"], "category_id": "pothole"})
+        # A newly created category is visible to later tool calls without a reload
+        self.assertEqual(category_cache.find("pothole")["event_type"], "issue")
+
+    async def test_issue_without_category_fails_before_writing(self):
+        result = await run_iss_function(None, {"name": "Unknown"})
+        self.assertEqual(result["status"], "error")
+        self.assertEqual(self.fake_session.runs, [])
+
+    async def test_maintenance_and_irrelevant_are_one_statement_each(self):
+        result = await run_mai_function(None, {"description": "New bench", "photo_id": "photo1"})
+        self.assertEqual(result["status"], "success")
+        result = await run_irrelevant_function(None, {"photo_id": "photo1", "reason": "cat", "confidence": 0.9})
+        self.assertIsNotNone(result["irrelevant_id"])
+
+        (mai_query, mai_params), (irr_query, irr_params) = self.fake_session.runs
+        self.assertIn("CREATE (e:Maintenance", mai_query)
+        self.assertIn("CONTAINS", mai_query)
+        self.assertIn("MARKED_IRRELEVANT", irr_query)
+        self.assertEqual(irr_params["irrelevant_id"], result["irrelevant_id"])
+
+
+if __name__ == '__main__':
+    unittest.main()
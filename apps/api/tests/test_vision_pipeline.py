@@ -0,0 +1,174 @@
+import asyncio
+import unittest
+
+from aiv2.agents.vision import vision_agent
+from utils.dedup_cache import DedupCache
+
+
+class TestVisionPipeline(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self._orig = (vision_agent.ingest_photo_context, vision_agent.classify_image,
+                      vision_agent.run_irrelevant_function, vision_agent.fingerprint_image,
+                      vision_agent.get_dedup_cache, vision_agent.link_photo_to_event,
+                      vision_agent.fetch_source_image, vision_agent.set_photo_content_hash)
+        self.events = []
+        self.ingest_error = None
+        self.cache = DedupCache(":memory:")
+        self.fingerprint = (None, None)
+        self.ingest_started = False
+
+        async def fetch(image_url):
+            return None
+
+        async def fingerprint(data):
+            return self.fingerprint
+
+        async def link(kind, photo_id, event_id):
+            self.events.append(("link", photo_id))
+            return True
+
+        async def set_hash(photo_id, content_hash):
+            self.events.append(("hash", photo_id))
+            return True
+
+        async def ingest(image_url, user, location, photo_id=None, content_hash=None):
+            self.ingest_started = True
+            await asyncio.sleep(0.1)
+            if self.ingest_error:
+                raise self.ingest_error
+            self.events.append(("ingest", photo_id))
+            return {"photo_id": photo_id}
+
+        async def classify(image_url, city_id, photo_id):
+            self.events.append(("classify_started", photo_id))
+            try:
+                await asyncio.sleep(0.1)
+            except asyncio.CancelledError:
+                self.events.append(("classify_cancelled", photo_id))
+                raise
+            self.events.append(("classify", photo_id))
+            return vision_agent.IrrelevantImage(photo_id=photo_id, reason="cat", confidence=0.9)
+
+        async def handler(ctx, args):
+            self.events.append(("persist", args["photo_id"]))
+            return {"irrelevant_id": "irr1", "photo_id": args["photo_id"]}
+
+        vision_agent.ingest_photo_context = ingest
+        vision_agent.classify_image = classify
+        vision_agent.run_irrelevant_function = handler
+        vision_agent.fingerprint_image = fingerprint
+        vision_agent.get_dedup_cache = lambda: self.cache
+        vision_agent.link_photo_to_event = link
+        vision_agent.fetch_source_image = fetch
+        vision_agent.set_photo_content_hash = set_hash
+
+    def tearDown(self):
+        (vision_agent.ingest_photo_context, vision_agent.classify_image,
+         vision_agent.run_irrelevant_function, vision_agent.fingerprint_image,
+         vision_agent.get_dedup_cache, vision_agent.link_photo_to_event,
+         vision_agent.fetch_source_image, vision_agent.set_photo_content_hash) = self._orig
+        self.cache.close()
+
+    async def test_ingest_and_model_overlap(self):
+        result = await vision_agent.analyze_vision_image_async(
+            "http://example.com/photo.jpg", {"id": "u1"}, {"city": "Testopolis"}
+        )
+
+        # The model call starts while the ingest is still running
+        names = [name for name, _ in self.events]
+        self.assertLess(names.index("classify_started"), names.index("ingest"))
+        photo_ids = {photo_id for _, photo_id in self.events}
+        self.assertEqual(photo_ids, {result["photo_id"]})
+        # The tool result is persisted only after both branches finished
+        self.assertEqual(self.events[-1][0], "persist")
+
+    async def test_ingest_starts_before_the_download(self):
+        seen = []
+
+        async def fetch(image_url):
+            await asyncio.sleep(0.01)
+            seen.append(self.ingest_started)
+            return b"image"
+
+        vision_agent.fetch_source_image = fetch
+        self.fingerprint = ("a" * 64, None)
+        result = await vision_agent.analyze_vision_image_async(
+            "http://example.com/photo.jpg", {"id": "u1"}, {"city": "Testopolis"}
+        )
+        self.assertEqual(seen, [True])
+        self.assertIn(("hash", result["photo_id"]), self.events)
+
+    async def test_ingest_failure_cancels_model_call(self):
+        self.ingest_error = RuntimeError("neo4j down")
+        with self.assertRaises(RuntimeError):
+            await vision_agent.analyze_vision_image_async(
+                "http://example.com/photo.jpg", {"id": "u1"}, {"city": "Testopolis"}
+            )
+        self.assertNotIn("persist", [name for name, _ in self.events])
+
+
+    async def test_duplicate_image_skips_model(self):
+        self.fingerprint = ("a" * 64, "ffff0000ffff0000")
+        first = await vision_agent.analyze_vision_image_async(
+            "http://example.com/photo.jpg", {"id": "u1"}, {"city": "Testopolis", "latitude": 40.0, "longitude": 20.0}
+        )
+        # A re-encoded copy: different bytes, perceptual hash one bit away
+        self.fingerprint = ("b" * 64, "ffff0000ffff0001")
+        self.events.clear()
+        second = await vision_agent.analyze_vision_image_async(
+            "http://example.com/copy.jpg", {"id": "u2"}, {"city": "Testopolis", "latitude": 40.0, "longitude": 20.0}
+        )
+
+        self.assertEqual(sorted(name for name, _ in self.events), ["hash", "ingest", "link"])
+        self.assertTrue(second["deduplicated"])
+        self.assertEqual(second["irrelevant_id"], first["irrelevant_id"])
+        self.assertEqual(second["classification"]["reason"], "cat")
+        self.assertNotEqual(second["photo_id"], first["photo_id"])
+
+    async def test_duplicates_only_match_in_the_same_city_and_area(self):
+        self.fingerprint = ("a" * 64, "ffff0000ffff0000")
+        here = {"city": "Testopolis", "latitude": 40.0, "longitude": 20.0}
+        await vision_agent.analyze_vision_image_async("http://example.com/photo.jpg", {"id": "u1"}, here)
+        for location in (
+            {"city": "Elsewhere", "latitude": 40.0, "longitude": 20.0},
+            {"city": "Testopolis", "latitude": 40.5, "longitude": 20.0},
+        ):
+            self.events.clear()
+            result = await vision_agent.analyze_vision_image_async("http://example.com/photo.jpg", {"id": "u2"}, location)
+            self.assertNotIn("deduplicated", result)
+            self.assertIn("classify", [name for name, _ in self.events])
+        nearby = {"city": "Testopolis", "latitude": 40.001, "longitude": 20.001}
+        self.assertTrue((await vision_agent.analyze_vision_image_async(
+            "http://example.com/photo.jpg", {"id": "u3"}, nearby))["deduplicated"])
+
+
+class TestDedupCache(unittest.TestCase):
+    def test_lru_eviction(self):
+        cache = DedupCache(":memory:", max_entries=2)
+        for name in ("a", "b", "c"):
+            cache.store(name * 64, None, "issue", f"e-{name}", {}, {}, "Testopolis")
+        self.assertIsNone(cache.lookup("a" * 64, None, "Testopolis"))
+        self.assertEqual(cache.lookup("c" * 64, None, "Testopolis").event_id, "e-c")
+        self.assertEqual(cache.stats(), {"entries": 2, "hits": 1})
+        cache.close()
+
+
+class TestFingerprint(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self._orig = (vision_agent.Image, vision_agent.run_in_pool, vision_agent.DEDUP_ENABLED)
+
+    def tearDown(self):
+        vision_agent.Image, vision_agent.run_in_pool, vision_agent.DEDUP_ENABLED = self._orig
+
+    async def test_no_process_pool_without_pillow(self):
+        async def run_in_pool(fn, *args):
+            raise AssertionError("process pool used without Pillow")
+
+        vision_agent.Image, vision_agent.run_in_pool, vision_agent.DEDUP_ENABLED = None, run_in_pool, True
+        sha256, phash = await vision_agent.fingerprint_image(b"bytes")
+        self.assertEqual(sha256, vision_agent.content_hash(b"bytes"))
+        self.assertIsNone(phash)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import asyncio
+import unittest
+
+from db.crud import aio
+from db.crud import update_nodes
+from db.crud.write_back import MessageWriteBuffer
+from db.memory import MemoryGraph, MemorySession
+
+
+class TestMessageWriteBuffer(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self._orig_update = aio.update_message_analyses
+        self.flushes = []
+        self.write_fails = False
+
+        async def update(rows):
+            if self.write_fails:
+                raise RuntimeError("neo4j down")
+            self.flushes.append([row["id"] for row in rows])
+
+        aio.update_message_analyses = update
+
+    def tearDown(self):
+        aio.update_message_analyses = self._orig_update
+
+    async def test_flushes_by_size(self):
+        buffer = MessageWriteBuffer(flush_size=3, flush_interval=60)
+        await asyncio.gather(*(buffer.add(f"m{i}", {"delta_score": i}) for i in range(3)))
+        self.assertEqual(self.flushes, [["m0", "m1", "m2"]])
+        self.assertEqual(buffer.pending, 0)
+
+    async def test_flushes_by_time(self):
+        buffer = MessageWriteBuffer(flush_size=100, flush_interval=0.01)
+        await asyncio.gather(buffer.add("m1", {}), buffer.add("m2", {}))
+        self.assertEqual(self.flushes, [["m1", "m2"]])
+
+    async def test_write_errors_reach_every_caller(self):
+        self.write_fails = True
+        buffer = MessageWriteBuffer(flush_size=2, flush_interval=60)
+        results = await asyncio.gather(buffer.add("m1", {}), buffer.add("m2", {}), return_exceptions=True)
+        self.assertTrue(all(isinstance(r, RuntimeError) for r in results))
+
+    def test_query_applies_delta_to_photo_score_once(self):
+        session = MemorySession(MemoryGraph())
+        session.run("CREATE (:Message {message_id: 'm1'})-[:ABOUT_PHOTO]->(:Photo {photo_id: 'p1', score: 50})")
+        rows = [{"id": "m1", "props": {"delta_score": 5}}]
+        scores = [session.run("MATCH (p:Photo) RETURN p.score AS score").single()["score"]]
+        for _ in range(2):
+            session.run(update_nodes._MESSAGE_ANALYSES_QUERY, rows=rows)
+            scores.append(session.run("MATCH (p:Photo) RETURN p.score AS score").single()["score"])
+        self.assertEqual(scores, [50, 55, 55])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,242 @@
+"""
+Bounded, fair scheduler for image analysis jobs.
+
+Jobs are queued per user and dispatched round-robin across users to a fixed
+number of asyncio workers, which caps model and Neo4j concurrency. When the
+queue is full, or a user already has ANALYZE_MAX_PER_USER jobs queued,
+submit() raises QueueFull with a Retry-After estimate instead of letting work
+pile up.
+"""
+import asyncio
+import math
+import os
+import time
+import uuid
+from collections import deque, OrderedDict
+from typing import Awaitable, Callable, Optional
+
+from .metrics import STAGE_SECONDS
+from .profiler import attach as attach_profile, current_profile
+from .timing import record_stages
+from .tracing import KIND_CONSUMER, current_traceparent, start_trace
+
+# Number of concurrent analyses per server process
+ANALYZE_WORKERS = int(os.getenv("ANALYZE_WORKERS", "8"))
+# Maximum number of queued (not yet running) analyses
+ANALYZE_QUEUE_SIZE = int(os.getenv("ANALYZE_QUEUE_SIZE", "100"))
+# Maximum number of queued analyses per user, so one user cannot fill the queue
+ANALYZE_MAX_PER_USER = int(os.getenv("ANALYZE_MAX_PER_USER", "20"))
+# Seconds to keep finished jobs available for status lookups
+ANALYZE_JOB_TTL = float(os.getenv("ANALYZE_JOB_TTL", "600"))
+# Maximum number of finished jobs kept for status lookups (oldest dropped first)
+ANALYZE_MAX_FINISHED_JOBS = int(os.getenv("ANALYZE_MAX_FINISHED_JOBS", "10000"))
+
+
+class QueueFull(Exception):
+    """
+    Raised when the analysis queue, or the user's share of it, has no free slot.
+    """
+    status_code = 429
+
+    def __init__(self, retry_after: int, reason: str = "Analysis queue is full"):
+        super().__init__(f"{reason}, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class AnalysisJob:
+    """
+    A queued analysis request and its outcome.
+    """
+    def __init__(self, user_id: str, kwargs: dict):
+        self.job_id = uuid.uuid4().hex
+        self.user_id = user_id
+        self.kwargs = kwargs
+        self.status = "queued"
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        # Stage durations in ms (queue wait plus the stages the handler recorded)
+        self.timings = {}
+        # Trace of the submitting request, continued by the worker
+        self.traceparent = current_traceparent()
+        # Profile of the submitting request, if it is being profiled
+        self.profile = current_profile()
+        self.future = asyncio.get_running_loop().create_future()
+
+    def to_dict(self) -> dict:
+        data = {
+            "job_id": self.job_id,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+        if self.status == "done":
+            data["result"] = self.result
+        elif self.status == "error":
+            data["error"] = self.error
+        return data
+
+
+class AnalysisScheduler:
+    """
+    Runs analysis jobs on N workers from a bounded queue with per-user fairness.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[..., Awaitable],
+        workers: int = ANALYZE_WORKERS,
+        max_queue: int = ANALYZE_QUEUE_SIZE,
+        job_ttl: float = ANALYZE_JOB_TTL,
+        max_finished: int = ANALYZE_MAX_FINISHED_JOBS,
+        max_per_user: int = ANALYZE_MAX_PER_USER,
+    ):
+        self.handler = handler
+        self.workers = workers
+        self.max_queue = max_queue
+        self.max_per_user = max_per_user
+        self.job_ttl = job_ttl
+        self.max_finished = max_finished
+        self._queues = {}
+        self._ready_users = deque()
+        self._jobs = OrderedDict()
+        # Finished job ids in finishing order, so pruning never waits on a running job
+        self._finished = OrderedDict()
+        self._depth = 0
+        self._running = 0
+        self._available = None
+        self._tasks = []
+        # Exponential moving average of job duration, used for Retry-After
+        self._avg_duration = 5.0
+
+    @property
+    def depth(self) -> int:
+        """Number of queued jobs waiting for a worker."""
+        return self._depth
+
+    @property
+    def running(self) -> int:
+        """Number of jobs currently being processed."""
+        return self._running
+
+    async def start(self) -> None:
+        """Start the worker tasks on the running event loop."""
+        if self._tasks:
+            return
+        self._available = asyncio.Semaphore(0)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        """Cancel the workers; queued jobs are failed."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        for queue in self._queues.values():
+            for job in queue:
+                self._finish(job, error="scheduler stopped")
+        self._queues.clear()
+        self._ready_users.clear()
+        self._depth = 0
+
+    def retry_after(self) -> int:
+        """Estimate in seconds until a queue slot frees up."""
+        return max(1, math.ceil(self._avg_duration * (self._depth + 1) / max(self.workers, 1)))
+
+    def submit(self, user_id: str, **kwargs) -> AnalysisJob:
+        """
+        Queue an analysis for a user.
+
+        :raises QueueFull: if the queue already holds max_queue jobs, or max_per_user jobs of this user.
+        """
+        if self._available is None:
+            raise RuntimeError("AnalysisScheduler.start() has not been called")
+        self._prune()
+        if self._depth >= self.max_queue:
+            raise QueueFull(self.retry_after())
+        queue = self._queues.get(user_id)
+        if queue is not None and len(queue) >= self.max_per_user:
+            raise QueueFull(self.retry_after(), reason="Too many queued analyses for this user")
+        job = AnalysisJob(user_id, kwargs)
+        self._jobs[job.job_id] = job
+        if queue is None:
+            queue = self._queues[user_id] = deque()
+            self._ready_users.append(user_id)
+        queue.append(job)
+        self._depth += 1
+        self._available.release()
+        return job
+
+    def get(self, job_id: str) -> Optional[AnalysisJob]:
+        """Return a job by id, or None if unknown or expired."""
+        self._prune()
+        return self._jobs.get(job_id)
+
+    def _next_job(self) -> AnalysisJob:
+        # Round-robin over users that have pending jobs
+        user_id = self._ready_users.popleft()
+        queue = self._queues[user_id]
+        job = queue.popleft()
+        if queue:
+            self._ready_users.append(user_id)
+        else:
+            del self._queues[user_id]
+        self._depth -= 1
+        return job
+
+    def _finish(self, job: AnalysisJob, result=None, error: str = None) -> None:
+        job.finished_at = time.time()
+        self._finished[job.job_id] = job.finished_at
+        # The handler arguments can hold a whole upload body; finished jobs only keep their outcome
+        job.kwargs = None
+        if error is None:
+            job.status, job.result = "done", result
+            if not job.future.done():
+                job.future.set_result(result)
+        else:
+            job.status, job.error = "error", error
+            if not job.future.done():
+                job.future.set_exception(RuntimeError(error))
+                # Nobody may await the future in async mode
+                job.future.exception()
+
+    def _prune(self) -> None:
+        cutoff = time.time() - self.job_ttl
+        while self._finished:
+            job_id, finished_at = next(iter(self._finished.items()))
+            if finished_at > cutoff and len(self._finished) <= self.max_finished:
+                break
+            del self._finished[job_id]
+            self._jobs.pop(job_id, None)
+
+    async def _worker(self) -> None:
+        while True:
+            await self._available.acquire()
+            job = self._next_job()
+            job.status = "running"
+            job.started_at = time.time()
+            self._running += 1
+            try:
+                queued = job.started_at - job.created_at
+                with record_stages() as timings, attach_profile(job.profile), start_trace(
+                    "analysis.job", job.traceparent, sample_new=False, kind=KIND_CONSUMER,
+                    job_id=job.job_id, queue_ms=round(queued * 1000, 1),
+                ):
+                    STAGE_SECONDS.observe(queued, stage="queue")
+                    timings["queue"] = queued * 1000
+                    job.timings = timings
+                    result = await self.handler(**job.kwargs)
+            except asyncio.CancelledError:
+                self._finish(job, error="scheduler stopped")
+                raise
+            except Exception as e:
+                self._finish(job, error=str(e))
+            else:
+                self._finish(job, result=result)
+            finally:
+                self._running -= 1
+                duration = time.time() - job.started_at
+                self._avg_duration = 0.8 * self._avg_duration + 0.2 * duration
@@ -0,0 +1,75 @@
+"""
+Fan-out helper for batch analysis requests.
+
+Items run with at most `concurrency` in flight and their outcomes are yielded
+in completion order, so a client syncing many offline captures receives each
+result as soon as it is ready. A failing item yields an error outcome and does
+not affect the others.
+"""
+import asyncio
+import json
+import os
+from typing import AsyncIterator, Awaitable, Callable
+
+# Items of one batch analyzed concurrently (the scheduler still caps the process total)
+ANALYZE_BATCH_CONCURRENCY = int(os.getenv("ANALYZE_BATCH_CONCURRENCY", "4"))
+# Maximum number of items accepted in one batch request
+ANALYZE_BATCH_MAX_ITEMS = int(os.getenv("ANALYZE_BATCH_MAX_ITEMS", "100"))
+
+
+def item_error(index: int, error: Exception) -> dict:
+    """
+    Outcome for a failed item. Exceptions with a status_code (HTTPException,
+    QueueFull) keep it; anything else is reported as 500.
+    """
+    outcome = {
+        "index": index,
+        "success": False,
+        "status": getattr(error, "status_code", 500),
+        "error": str(getattr(error, "detail", None) or error),
+    }
+    retry_after = getattr(error, "retry_after", None)
+    if retry_after is not None:
+        outcome["retry_after"] = retry_after
+    return outcome
+
+
+async def iter_batch(
+    items: list,
+    run_item: Callable[[object], Awaitable],
+    concurrency: int = ANALYZE_BATCH_CONCURRENCY,
+) -> AsyncIterator[dict]:
+    """
+    Run run_item on every item and yield {"index", "success", "result"|"error"}
+    outcomes as they complete. Pending items are cancelled if the consumer stops early.
+
+    :param items: Items to process; the index in this list identifies each outcome.
+    :param run_item: Coroutine function called with one item.
+    :param concurrency: Maximum items in flight.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def run(index, item):
+        async with semaphore:
+            try:
+                result = await run_item(item)
+            except Exception as e:
+                return item_error(index, e)
+        return {"index": index, "success": True, "result": result}
+
+    tasks = [asyncio.create_task(run(i, item)) for i, item in enumerate(items)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def ndjson(outcomes: AsyncIterator[dict]) -> AsyncIterator[str]:
+    """
+    Serialize outcomes as newline-delimited JSON.
+    """
+    async for outcome in outcomes:
+        yield json.dumps(outcome, default=str) + "\n"
@@ -0,0 +1,50 @@
+"""
+Request body size limit for upload endpoints.
+
+Starlette spools a multipart body to a temporary file before the endpoint
+runs, so a size check inside the endpoint comes too late: the whole body has
+already been read. BodyLimitMiddleware answers 413 up front when the declared
+Content-Length is too large and stops reading a body (e.g. a chunked one)
+as soon as it grows past the limit.
+"""
+import os
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+
+# Maximum request body size accepted by /upload-and-analyze
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(25 * 1024 * 1024)))
+
+
+class BodyLimitMiddleware:
+    """
+    ASGI middleware rejecting request bodies larger than max_bytes on the given paths.
+    """
+
+    def __init__(self, app, paths, max_bytes: int = UPLOAD_MAX_BYTES):
+        self.app = app
+        self.paths = set(paths)
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope.get("path") not in self.paths:
+            return await self.app(scope, receive, send)
+        detail = f"Request body is larger than {self.max_bytes} bytes"
+        for key, value in scope.get("headers", ()):
+            if key == b"content-length" and value.isdigit() and int(value) > self.max_bytes:
+                response = JSONResponse({"detail": detail}, status_code=413)
+                return await response(scope, receive, send)
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # Raised inside form parsing; FastAPI passes HTTPException through as the response
+                    raise HTTPException(status_code=413, detail=detail)
+            return message
+
+        await self.app(scope, limited_receive, send)
@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+"""
+Bulk upload a directory of photos to S3 and ingest them into the graph.
+
+Files are uploaded by a bounded thread pool under content-addressed keys
+(<prefix><sha256><ext>), so objects that already exist are not uploaded again.
+The Photo, User, City and UPLOADED_PHOTO records are written in batches with
+ingest_photos_bulk. Every file whose graph write succeeded is appended to a
+checkpoint file, and an interrupted run resumes where it stopped.
+
+A sidecar CSV or JSON file supplies per-file metadata. Columns/keys: file
+(path relative to the directory, or basename), user_id, user_name, latitude,
+longitude, city, country, notes. JSON may be a list of such objects or a
+mapping of file name to object.
+
+Usage:
+  bulk_ingest.py <directory> [--sidecar meta.csv] [--workers N] [--batch-size N]
+                 [--checkpoint FILE] [--prefix photos/] [--user-id U] [--city C] [--country C]
+"""
+import argparse
+import csv
+import hashlib
+import json
+import os
+import sys
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from db.crud.ingest import build_ingest_params, ingest_photos_bulk
+from utils import s3
+
+# Concurrent S3 uploads (keep at or below S3_MAX_POOL_CONNECTIONS)
+BULK_UPLOAD_WORKERS = int(os.getenv("BULK_UPLOAD_WORKERS", "16"))
+# Photos written to the graph per batch
+BULK_INGEST_BATCH_SIZE = int(os.getenv("BULK_INGEST_BATCH_SIZE", "200"))
+# Seconds between progress lines
+BULK_PROGRESS_INTERVAL = float(os.getenv("BULK_PROGRESS_INTERVAL", "5"))
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp", ".heic", ".gif", ".bmp", ".tif", ".tiff"}
+CHECKPOINT_NAME = ".ingest-checkpoint.jsonl"
+
+
+def iter_images(root: Path) -> list:
+    """
+    Return the image files below root, sorted by relative path.
+    """
+    files = [p for p in root.rglob("*") if p.is_file() and p.suffix.lower() in IMAGE_EXTENSIONS]
+    return sorted(files, key=lambda p: p.relative_to(root).as_posix())
+
+
+def load_sidecar(path: str) -> dict:
+    """
+    Load per-file metadata from a CSV or JSON sidecar, keyed by file name.
+    """
+    with open(path, newline="") as f:
+        if path.lower().endswith(".csv"):
+            records = list(csv.DictReader(f))
+        else:
+            data = json.load(f)
+            if isinstance(data, dict):
+                records = [{**meta, "file": name} for name, meta in data.items()]
+            else:
+                records = data
+    sidecar = {}
+    for i, record in enumerate(records):
+        name = record.get("file") or record.get("filename")
+        if not name:
+            raise ValueError(f"Sidecar record {i} has no 'file' entry")
+        sidecar[Path(name).as_posix()] = record
+    return sidecar
+
+
+def file_sha256(path: Path, block_size: int = 1024 * 1024) -> str:
+    """
+    Hex SHA-256 of a file, read in blocks.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def object_key(digest: str, suffix: str, prefix: str = "photos/") -> str:
+    """
+    Content-addressed S3 key for a file.
+    """
+    return f"{prefix}{digest}{suffix.lower()}"
+
+
+def photo_id_for(digest: str) -> str:
+    """
+    Stable Photo id derived from the content hash, so re-imports update the same node.
+    """
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"photo:{digest}"))
+
+
+def object_exists(bucket: str, key: str) -> bool:
+    """
+    Return True if the object is already in the bucket.
+    """
+    try:
+        s3.get_s3_client().head_object(Bucket=bucket, Key=key)
+    except s3.ClientError as e:
+        if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+            return False
+        raise
+    return True
+
+
+class Checkpoint:
+    """
+    Append-only JSONL record of files whose photos were written to the graph.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.done = set()
+        if self.path.exists():
+            with open(self.path) as f:
+                for line in f:
+                    if line.strip():
+                        self.done.add(json.loads(line)["file"])
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.done
+
+    def mark(self, entries: list) -> None:
+        """
+        Record finished files; entries are dicts with at least a 'file' key.
+        """
+        with open(self.path, "a") as f:
+            for entry in entries:
+                f.write(json.dumps(entry) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.done.update(entry["file"] for entry in entries)
+
+
+class Progress:
+    """
+    Counts processed files and bytes and prints throughput periodically.
+    """
+
+    def __init__(self, total: int, interval: float = BULK_PROGRESS_INTERVAL, out=sys.stderr):
+        self.total = total
+        self.interval = interval
+        self.out = out
+        self.uploaded = 0
+        self.existing = 0
+        self.failed = 0
+        self.ingested = 0
+        self.bytes = 0
+        self.started = time.monotonic()
+        self._last_report = self.started
+
+    def add(self, uploaded: bool, size: int) -> None:
+        if uploaded:
+            self.uploaded += 1
+            self.bytes += size
+        else:
+            self.existing += 1
+
+    def summary(self) -> dict:
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        processed = self.uploaded + self.existing + self.failed
+        return {
+            "total": self.total,
+            "uploaded": self.uploaded,
+            "existing": self.existing,
+            "failed": self.failed,
+            "ingested": self.ingested,
+            "bytes": self.bytes,
+            "seconds": round(elapsed, 2),
+            "files_per_second": round(processed / elapsed, 2),
+            "mb_per_second": round(self.bytes / elapsed / 1e6, 2),
+        }
+
+    def report(self, force: bool = False) -> None:
+        now = time.monotonic()
+        if not force and now - self._last_report < self.interval:
+            return
+        self._last_report = now
+        s = self.summary()
+        processed = s["uploaded"] + s["existing"] + s["failed"]
+        print(
+            f"[{processed}/{s['total']}] uploaded={s['uploaded']} existing={s['existing']} "
+            f"failed={s['failed']} ingested={s['ingested']} "
+            f"{s['files_per_second']} files/s {s['mb_per_second']} MB/s",
+            file=self.out,
+        )
+
+
+def upload_one(path: Path, bucket: str, prefix: str) -> dict:
+    """
+    Hash a file and upload it unless its content-addressed object already exists.
+
+    :return: Dict with key, url, content_hash, size and uploaded (False if it already existed).
+    """
+    digest = file_sha256(path)
+    key = object_key(digest, path.suffix, prefix)
+    size = path.stat().st_size
+    if object_exists(bucket, key):
+        url = s3._public_url(bucket, key)
+        uploaded = False
+    else:
+        url = s3.upload_file_to_s3(str(path), bucket, key)
+        uploaded = True
+    return {"key": key, "url": url, "content_hash": digest, "size": size, "uploaded": uploaded}
+
+
+def _float(value):
+    return float(value) if value not in (None, "") else None
+
+
+def build_row(upload: dict, meta: dict, defaults: dict) -> dict:
+    """
+    Build the ingest parameters for an uploaded file from its sidecar metadata and CLI defaults.
+
+    :raises ValueError: if no user id or city is known for the file.
+    """
+    merged = {**defaults, **{k: v for k, v in meta.items() if v not in (None, "")}}
+    if not merged.get("user_id") or not merged.get("city"):
+        raise ValueError("missing user_id or city (add it to the sidecar or pass --user-id/--city)")
+    user = {"id": merged["user_id"], "name": merged.get("user_name")}
+    location = {
+        "city": merged["city"],
+        "country": merged.get("country"),
+        "latitude": _float(merged.get("latitude")),
+        "longitude": _float(merged.get("longitude")),
+    }
+    return build_ingest_params(
+        upload["url"],
+        user,
+        location,
+        photo_id=photo_id_for(upload["content_hash"]),
+        device=merged.get("device") or "bulk-import",
+        user_notes=merged.get("notes") or "",
+        content_hash=upload["content_hash"],
+    )
+
+
+def run_bulk_ingest(
+    root: str,
+    bucket: str,
+    sidecar: dict = None,
+    defaults: dict = None,
+    workers: int = BULK_UPLOAD_WORKERS,
+    batch_size: int = BULK_INGEST_BATCH_SIZE,
+    checkpoint_path: str = None,
+    prefix: str = "photos/",
+    progress: Progress = None,
+) -> dict:
+    """
+    Upload and ingest every image below root that is not in the checkpoint.
+
+    :return: Summary counters (see Progress.summary).
+    """
+    root = Path(root)
+    sidecar = sidecar or {}
+    defaults = defaults or {}
+    checkpoint = Checkpoint(checkpoint_path or root / CHECKPOINT_NAME)
+    pending = [p for p in iter_images(root) if p.relative_to(root).as_posix() not in checkpoint]
+    progress = progress or Progress(len(pending))
+    batch = []
+
+    def flush():
+        if not batch:
+            return
+        progress.ingested += ingest_photos_bulk([row for _, row in batch])
+        checkpoint.mark([{"file": name, "photo_id": row["photo_id"], "url": row["url"]} for name, row in batch])
+        batch.clear()
+
+    files = iter(pending)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        in_flight = {}
+        while True:
+            # Keep a bounded window of submitted uploads
+            while len(in_flight) < workers * 2:
+                path = next(files, None)
+                if path is None:
+                    break
+                in_flight[pool.submit(upload_one, path, bucket, prefix)] = path
+            if not in_flight:
+                break
+            finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                path = in_flight.pop(future)
+                name = path.relative_to(root).as_posix()
+                meta = sidecar.get(name) or sidecar.get(path.name) or {}
+                try:
+                    upload = future.result()
+                    row = build_row(upload, meta, defaults)
+                except Exception as e:
+                    progress.failed += 1
+                    print(f"Failed {name}: {e}", file=sys.stderr)
+                    continue
+                progress.add(upload["uploaded"], upload["size"])
+                batch.append((name, row))
+                if len(batch) >= batch_size:
+                    flush()
+            progress.report()
+    flush()
+    progress.report(force=True)
+    return progress.summary()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Upload a directory of photos to S3 and ingest them into Neo4j.')
+    parser.add_argument('directory', help='Directory to scan for images (recursively)')
+    parser.add_argument('--sidecar', help='CSV or JSON file with per-file user and GPS metadata')
+    parser.add_argument('--workers', type=int, default=BULK_UPLOAD_WORKERS,
+                        help='Concurrent uploads')
+    parser.add_argument('--batch-size', type=int, default=BULK_INGEST_BATCH_SIZE,
+                        help='Photos per graph write')
+    parser.add_argument('--checkpoint', help=f'Checkpoint file (default: <directory>/{CHECKPOINT_NAME})')
+    parser.add_argument('--prefix', default='photos/', help='S3 key prefix')
+    parser.add_argument('--user-id', help='User for files without one in the sidecar')
+    parser.add_argument('--user-name', help='User name for files without one in the sidecar')
+    parser.add_argument('--city', help='City for files without one in the sidecar')
+    parser.add_argument('--country', help='Country for files without one in the sidecar')
+    args = parser.parse_args()
+
+    bucket = os.getenv("AWS_S3_BUCKET")
+    if not bucket:
+        print("Error: AWS_S3_BUCKET environment variable is not set.", file=sys.stderr)
+        sys.exit(1)
+
+    defaults = {
+        "user_id": args.user_id,
+        "user_name": args.user_name,
+        "city": args.city,
+        "country": args.country,
+    }
+    summary = run_bulk_ingest(
+        args.directory,
+        bucket,
+        sidecar=load_sidecar(args.sidecar) if args.sidecar else None,
+        defaults={k: v for k, v in defaults.items() if v},
+        workers=args.workers,
+        batch_size=args.batch_size,
+        checkpoint_path=args.checkpoint,
+        prefix=args.prefix,
+    )
+    print(json.dumps(summary))
+    if summary["failed"]:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
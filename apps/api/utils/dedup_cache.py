@@ -0,0 +1,216 @@
+"""
+Content-hash cache of image classifications.
+
+Maps an image's SHA-256 (and, when Pillow is available, its perceptual hash)
+to the classification and graph event produced for it, so re-uploads of the
+same or a near-identical photo can be linked to the existing event instead of
+calling the vision model again. Matches are scoped to the same city and
+geo cell (or a neighbouring one), so similar-looking photos taken elsewhere
+are never merged into one event. Stored in SQLite with LRU eviction.
+"""
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+from .env_loader import load_dotenv
+from .images import hash_distance
+from .metrics import record_cache
+
+load_dotenv()
+
+DEDUP_ENABLED = os.getenv("DEDUP_ENABLED", "1") not in ("0", "false", "False")
+DEDUP_CACHE_PATH = os.getenv(
+    "DEDUP_CACHE_PATH",
+    str(Path(__file__).resolve().parent.parent / "data" / "dedup.sqlite3"),
+)
+DEDUP_CACHE_SIZE = int(os.getenv("DEDUP_CACHE_SIZE", "10000"))
+# Maximum differing bits for two perceptual hashes to count as the same image
+DEDUP_PHASH_DISTANCE = int(os.getenv("DEDUP_PHASH_DISTANCE", "4"))
+# Edge of the geo cells (degrees) a photo is matched in, together with the 8 cells around it
+DEDUP_GEO_CELL = float(os.getenv("DEDUP_GEO_CELL", "0.005"))
+
+
+def geo_cell(latitude, longitude, size: float = DEDUP_GEO_CELL) -> str:
+    """
+    Return the grid cell ("row:col") containing a coordinate, or "" without coordinates.
+    """
+    if latitude is None or longitude is None:
+        return ""
+    return f"{math.floor(float(latitude) / size)}:{math.floor(float(longitude) / size)}"
+
+
+def _neighbour_cells(cell: str) -> list:
+    if not cell:
+        return [""]
+    row, col = (int(part) for part in cell.split(":"))
+    return [f"{row + dr}:{col + dc}" for dr in (-1, 0, 1) for dc in (-1, 0, 1)]
+
+
+@dataclass
+class DedupEntry:
+    """
+    A cached classification: the tool kind ('issue', 'maintenance' or 'irrelevant'),
+    the graph node it produced, the model output and the handler response.
+    """
+    content_hash: str
+    phash: Optional[str]
+    kind: str
+    event_id: str
+    classification: dict
+    response: dict
+    exact: bool = True
+
+
+class DedupCache:
+    """
+    SQLite-backed LRU of classifications keyed by content hash, city and geo cell.
+    """
+
+    _SCHEMA = """
+    CREATE TABLE IF NOT EXISTS classifications (
+        content_hash TEXT NOT NULL,
+        city_id TEXT NOT NULL,
+        geo_cell TEXT NOT NULL,
+        phash TEXT,
+        kind TEXT NOT NULL,
+        event_id TEXT NOT NULL,
+        classification TEXT NOT NULL,
+        response TEXT NOT NULL,
+        last_used REAL NOT NULL,
+        hits INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (content_hash, city_id, geo_cell)
+    );
+    CREATE INDEX IF NOT EXISTS classifications_lru ON classifications (last_used);
+    CREATE INDEX IF NOT EXISTS classifications_scope ON classifications (city_id, geo_cell);
+    """
+
+    def __init__(
+        self,
+        path: str = DEDUP_CACHE_PATH,
+        max_entries: int = DEDUP_CACHE_SIZE,
+        max_distance: int = DEDUP_PHASH_DISTANCE,
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_distance = max_distance
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(classifications)")}
+        if columns and "city_id" not in columns:
+            # Entries written before matches were scoped by city; it is only a cache
+            self._conn.execute("DROP TABLE classifications")
+        self._conn.executescript(self._SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    @staticmethod
+    def _entry(row, exact: bool) -> DedupEntry:
+        return DedupEntry(
+            content_hash=row[0], phash=row[1], kind=row[2], event_id=row[3],
+            classification=json.loads(row[4]), response=json.loads(row[5]), exact=exact,
+        )
+
+    def lookup(self, content_hash: str, phash: Optional[str], city_id: str, cell: str = "") -> Optional[DedupEntry]:
+        """
+        Return the entry for an identical image, else the closest near-identical
+        one within max_distance bits, else None. Only entries of the same city
+        and of the cell or its neighbours match (near-identical ones need a cell).
+        Hits refresh the LRU position.
+
+        :param cell: geo_cell() of the photo's location.
+        """
+        columns = "content_hash, phash, kind, event_id, classification, response, rowid"
+        cells = _neighbour_cells(cell)
+        scope = f"city_id = ? AND geo_cell IN ({', '.join('?' * len(cells))})"
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {columns} FROM classifications WHERE content_hash = ? AND {scope}",
+                (content_hash, city_id, *cells),
+            ).fetchone()
+            exact = row is not None
+            if row is None and phash is not None and cell:
+                best = None
+                for candidate in self._conn.execute(
+                    f"SELECT {columns} FROM classifications WHERE {scope} AND phash IS NOT NULL",
+                    (city_id, *cells),
+                ):
+                    distance = hash_distance(phash, candidate[1])
+                    if distance <= self.max_distance and (best is None or distance < best[0]):
+                        best = (distance, candidate)
+                row = best[1] if best else None
+            record_cache("dedup", row is not None)
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE classifications SET last_used = ?, hits = hits + 1 WHERE rowid = ?",
+                (time.time(), row[6]),
+            )
+        return self._entry(row, exact)
+
+    def store(
+        self,
+        content_hash: str,
+        phash: Optional[str],
+        kind: str,
+        event_id: str,
+        classification: dict,
+        response: dict,
+        city_id: str,
+        cell: str = "",
+    ) -> None:
+        """
+        Record a classification for a city and geo cell, evicting the least
+        recently used entries beyond max_entries.
+        """
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO classifications "
+                "(content_hash, city_id, geo_cell, phash, kind, event_id, classification, response, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (content_hash, city_id, cell, phash, kind, event_id,
+                 json.dumps(classification, default=str), json.dumps(response, default=str), time.time()),
+            )
+            self._conn.execute(
+                "DELETE FROM classifications WHERE rowid IN ("
+                "  SELECT rowid FROM classifications ORDER BY last_used DESC, rowid DESC LIMIT -1 OFFSET ?"
+                ")",
+                (self.max_entries,),
+            )
+
+    def discard(self, event_id: str) -> None:
+        """Forget the entries pointing at an event, e.g. when it was deleted from the graph."""
+        with self._lock:
+            self._conn.execute("DELETE FROM classifications WHERE event_id = ?", (event_id,))
+
+    def stats(self) -> dict:
+        """Return the number of entries and the total hits served."""
+        with self._lock:
+            count, hits = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(hits), 0) FROM classifications"
+            ).fetchone()
+        return {"entries": count, "hits": hits}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_dedup_cache() -> DedupCache:
+    """
+    Return the process-wide dedup cache (SQLite at DEDUP_CACHE_PATH).
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = DedupCache()
+        return _cache
@@ -0,0 +1,202 @@
+"""
+Server-side image preprocessing before the vision model call.
+
+Applies the EXIF orientation, strips metadata, downscales so the short side
+is at most IMAGE_MAX_SHORT_EDGE and the long side at most IMAGE_MAX_EDGE, and
+re-encodes as JPEG at IMAGE_JPEG_QUALITY. High-detail billing already scales
+the short side to 768px, so only a short side of 512px or less saves tiles. The result is sent to the model
+as an inline base64 data URL, or as a derivative uploaded to S3. Decoding runs
+in a process pool so it does not block the event loop.
+
+Pillow is optional: without it images are passed through unchanged.
+"""
+import asyncio
+import base64
+import io
+import math
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+    ImageOps = None
+
+from .env_loader import load_dotenv
+from .logs import get_logger
+from .s3 import upload_bytes_to_s3
+
+load_dotenv()
+
+# "inline" sends a base64 data URL, "s3" uploads a derivative, "off" sends the original URL
+IMAGE_PREPROCESS = os.getenv("IMAGE_PREPROCESS", "inline")
+IMAGE_MAX_EDGE = int(os.getenv("IMAGE_MAX_EDGE", "1024"))
+IMAGE_MAX_SHORT_EDGE = int(os.getenv("IMAGE_MAX_SHORT_EDGE", "512"))
+IMAGE_JPEG_QUALITY = int(os.getenv("IMAGE_JPEG_QUALITY", "85"))
+IMAGE_PREPROCESS_WORKERS = int(os.getenv("IMAGE_PREPROCESS_WORKERS", "2"))
+
+log = get_logger("preprocess")
+
+
+def estimate_image_tokens(width: int, height: int) -> int:
+    """
+    Estimate high-detail vision input tokens for an image of the given size:
+    fit within 2048x2048, scale the short side down to 768, then 170 tokens per
+    512px tile plus 85 base tokens.
+    """
+    if width <= 0 or height <= 0:
+        return 0
+    scale = min(1.0, 2048 / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, 768 / min(width, height))
+    width, height = width * scale, height * scale
+    return 85 + 170 * math.ceil(width / 512) * math.ceil(height / 512)
+
+
+def preprocess_image(
+    data: bytes,
+    max_edge: int = IMAGE_MAX_EDGE,
+    quality: int = IMAGE_JPEG_QUALITY,
+    max_short_edge: int = IMAGE_MAX_SHORT_EDGE,
+) -> tuple:
+    """
+    Orient, strip, downscale and re-encode an image. Runs in a worker process.
+
+    :return: Tuple of (jpeg_bytes, info) where info holds the original and output
+             sizes in bytes and pixels.
+    """
+    with Image.open(io.BytesIO(data)) as img:
+        original_size = img.size
+        img = ImageOps.exif_transpose(img)
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+        width, height = img.size
+        scale = min(1.0, max_edge / max(width, height), max_short_edge / min(width, height))
+        img.thumbnail((max(1, round(width * scale)), max(1, round(height * scale))))
+        out = io.BytesIO()
+        # Saving without exif/icc arguments drops the metadata
+        img.save(out, format="JPEG", quality=quality, optimize=True)
+        output_size = img.size
+    output = out.getvalue()
+    return output, {
+        "bytes_in": len(data),
+        "bytes_out": len(output),
+        "size_in": original_size,
+        "size_out": output_size,
+    }
+
+
+class PreprocessMetrics:
+    """
+    Running totals of the bytes and estimated tokens saved by preprocessing.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.images = 0
+        self.failures = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.tokens_in = 0
+        self.tokens_out = 0
+
+    def record(self, info: dict) -> None:
+        with self._lock:
+            self.images += 1
+            self.bytes_in += info["bytes_in"]
+            self.bytes_out += info["bytes_out"]
+            self.tokens_in += estimate_image_tokens(*info["size_in"])
+            self.tokens_out += estimate_image_tokens(*info["size_out"])
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+
+    def snapshot(self) -> dict:
+        """Return the totals, including bytes_saved and tokens_saved."""
+        with self._lock:
+            return {
+                "images": self.images,
+                "failures": self.failures,
+                "bytes_in": self.bytes_in,
+                "bytes_out": self.bytes_out,
+                "bytes_saved": self.bytes_in - self.bytes_out,
+                "tokens_in": self.tokens_in,
+                "tokens_out": self.tokens_out,
+                "tokens_saved": self.tokens_in - self.tokens_out,
+            }
+
+
+metrics = PreprocessMetrics()
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool() -> ProcessPoolExecutor:
+    """
+    Return the shared process pool for CPU-bound image work, creating it on first use.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=IMAGE_PREPROCESS_WORKERS)
+        return _pool
+
+def shutdown_pool() -> None:
+    """Stop the process pool, e.g. on server shutdown."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+async def run_in_pool(func, *args):
+    """
+    Run a picklable function in the image process pool.
+    """
+    return await asyncio.get_running_loop().run_in_executor(get_pool(), func, *args)
+
+
+def to_data_url(data: bytes, content_type: str = "image/jpeg") -> str:
+    """
+    Encode bytes as a base64 data URL accepted by the vision model.
+    """
+    return f"data:{content_type};base64,{base64.b64encode(data).decode('ascii')}"
+
+
+async def prepare_model_image(
+    image_url: str,
+    data: Optional[bytes],
+    mode: str = IMAGE_PREPROCESS,
+    derivative_name: str = None,
+) -> str:
+    """
+    Return the image reference to send to the model: a data URL or an S3 derivative
+    URL of the preprocessed image, or the original URL when preprocessing is off,
+    unavailable or fails.
+
+    :param image_url: Original image URL.
+    :param data: Original image bytes (None if they could not be fetched).
+    :param mode: 'inline', 's3' or 'off'.
+    :param derivative_name: S3 key for the derivative in 's3' mode.
+    """
+    if mode == "off" or data is None or Image is None:
+        return image_url
+    try:
+        output, info = await run_in_pool(preprocess_image, data)
+    except Exception as e:
+        metrics.record_failure()
+        log.warning("preprocess.failed", image_url=image_url, error=str(e))
+        return image_url
+    metrics.record(info)
+    if mode == "s3":
+        bucket = os.getenv("AWS_S3_BUCKET")
+        if bucket and derivative_name:
+            try:
+                return await asyncio.to_thread(upload_bytes_to_s3, output, bucket, derivative_name)
+            except Exception as e:
+                log.warning("preprocess.upload_failed", derivative=derivative_name, error=str(e))
+    return to_data_url(output)
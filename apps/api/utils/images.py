@@ -0,0 +1,119 @@
+"""
+Image fetching and hashing helpers for the analysis pipeline.
+
+Pillow is optional: without it only exact (SHA-256) hashes are available and
+perceptual_hash() returns None.
+
+fetch_image_bytes downloads URLs supplied by API clients, so it only follows
+http(s) URLs whose host resolves to public addresses (or is listed in
+IMAGE_FETCH_ALLOWED_HOSTS), and re-checks every redirect target.
+"""
+import asyncio
+import hashlib
+import io
+import ipaddress
+import os
+import socket
+from typing import Optional
+
+import httpx
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+# Refuse to download images larger than this many bytes
+IMAGE_MAX_BYTES = int(os.getenv("IMAGE_MAX_BYTES", str(25 * 1024 * 1024)))
+IMAGE_FETCH_TIMEOUT = float(os.getenv("IMAGE_FETCH_TIMEOUT", "10"))
+IMAGE_FETCH_MAX_REDIRECTS = int(os.getenv("IMAGE_FETCH_MAX_REDIRECTS", "5"))
+# Hosts fetched without the public-address check (e.g. the bench mock), comma separated
+IMAGE_FETCH_ALLOWED_HOSTS = {
+    host.strip().lower() for host in os.getenv("IMAGE_FETCH_ALLOWED_HOSTS", "").split(",") if host.strip()
+}
+
+
+async def check_fetch_url(url: str) -> None:
+    """
+    Refuse URLs the server must not fetch on a client's behalf: anything but
+    http(s), and hosts resolving to private, loopback, link-local or other
+    non-public addresses, unless the host is in IMAGE_FETCH_ALLOWED_HOSTS.
+
+    :raises ValueError: if the URL is not allowed.
+    """
+    parsed = httpx.URL(url)
+    if parsed.scheme not in ("http", "https") or not parsed.host:
+        raise ValueError(f"Refusing to fetch {url}: only http(s) URLs are allowed")
+    if parsed.host.lower() in IMAGE_FETCH_ALLOWED_HOSTS:
+        return
+    port = parsed.port or (443 if parsed.scheme == "https" else 80)
+    try:
+        infos = await asyncio.get_running_loop().getaddrinfo(parsed.host, port, type=socket.SOCK_STREAM)
+    except socket.gaierror as e:
+        raise ValueError(f"Refusing to fetch {url}: cannot resolve {parsed.host}: {e}")
+    for *_, sockaddr in infos:
+        address = ipaddress.ip_address(sockaddr[0].split("%", 1)[0])
+        if not address.is_global or address.is_multicast:
+            raise ValueError(f"Refusing to fetch {url}: {parsed.host} resolves to non-public address {address}")
+
+
+async def fetch_image_bytes(url: str, max_bytes: int = IMAGE_MAX_BYTES, timeout: float = IMAGE_FETCH_TIMEOUT) -> bytes:
+    """
+    Download an image, streaming so oversized responses are rejected early.
+    The URL and every redirect target are checked with check_fetch_url.
+
+    :raises ValueError: if the URL is not allowed or the image exceeds max_bytes.
+    :raises httpx.HTTPError: on network or HTTP status errors.
+    """
+    async with httpx.AsyncClient(timeout=timeout, follow_redirects=False) as http:
+        for _ in range(IMAGE_FETCH_MAX_REDIRECTS + 1):
+            await check_fetch_url(url)
+            async with http.stream("GET", url) as response:
+                if response.is_redirect:
+                    url = str(response.url.join(response.headers["location"]))
+                    continue
+                response.raise_for_status()
+                chunks, size = [], 0
+                async for chunk in response.aiter_bytes():
+                    size += len(chunk)
+                    if size > max_bytes:
+                        raise ValueError(f"Image at {url} is larger than {max_bytes} bytes")
+                    chunks.append(chunk)
+                return b"".join(chunks)
+    raise ValueError(f"Too many redirects fetching {url}")
+
+
+def content_hash(data: bytes) -> str:
+    """
+    Return the SHA-256 hex digest of the image bytes.
+    """
+    return hashlib.sha256(data).hexdigest()
+
+
+def perceptual_hash(data: bytes, size: int = 8) -> Optional[str]:
+    """
+    Return a 64-bit difference hash (dHash) as 16 hex chars, or None without Pillow
+    or for undecodable data. Near-identical images (re-encoded, resized) differ in
+    only a few bits.
+    """
+    if Image is None:
+        return None
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            pixels = list(img.convert("L").resize((size + 1, size)).getdata())
+    except Exception:
+        return None
+    bits = 0
+    for row in range(size):
+        for col in range(size):
+            left = pixels[row * (size + 1) + col]
+            right = pixels[row * (size + 1) + col + 1]
+            bits = (bits << 1) | (left > right)
+    return f"{bits:0{size * size // 4}x}"
+
+
+def hash_distance(a: str, b: str) -> int:
+    """
+    Hamming distance between two perceptual hashes.
+    """
+    return (int(a, 16) ^ int(b, 16)).bit_count()
@@ -0,0 +1,228 @@
+"""
+Durable job queue for background work such as message relevance analysis.
+
+JobQueue defines the interface; SQLiteJobQueue is the local implementation.
+Jobs are leased to a worker while they run. Failures are retried with
+exponential backoff, and after max_attempts a job moves to the dead-letter
+list. An expired lease (e.g. the worker was restarted) makes a job claimable
+again, so queued work survives deploys.
+"""
+import abc
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional
+
+from .env_loader import load_dotenv
+
+load_dotenv()
+
+# Location of the SQLite queue database (project root /data by default)
+JOB_QUEUE_PATH = os.getenv(
+    "JOB_QUEUE_PATH",
+    str(Path(__file__).resolve().parent.parent / "data" / "jobs.sqlite3"),
+)
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+JOB_BACKOFF_BASE = float(os.getenv("JOB_BACKOFF_BASE", "2"))
+JOB_BACKOFF_MAX = float(os.getenv("JOB_BACKOFF_MAX", "300"))
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "120"))
+
+
+@dataclass
+class Job:
+    """
+    A claimed job: its id, queue name, decoded payload and attempt number (1-based).
+    """
+    id: int
+    queue: str
+    payload: dict
+    attempts: int
+    last_error: Optional[str] = None
+
+
+class JobQueue(abc.ABC):
+    """
+    Interface for job queue backends.
+    """
+
+    @abc.abstractmethod
+    def enqueue(self, queue: str, payload: dict, delay: float = 0) -> int:
+        """Add a job and return its id."""
+
+    @abc.abstractmethod
+    def claim(self, queue: str, limit: int = 1, lease_seconds: float = JOB_LEASE_SECONDS) -> List[Job]:
+        """Lease up to `limit` ready jobs to the caller."""
+
+    @abc.abstractmethod
+    def ack(self, job_ids: list) -> None:
+        """Mark jobs as successfully processed."""
+
+    @abc.abstractmethod
+    def fail(self, job: Job, error: str) -> None:
+        """Record a failure; retry later with backoff or dead-letter the job."""
+
+    @abc.abstractmethod
+    def dead_letters(self, queue: str, limit: int = 100) -> List[Job]:
+        """List jobs that exhausted their retries."""
+
+    @abc.abstractmethod
+    def requeue_dead(self, job_ids: list) -> None:
+        """Move dead-lettered jobs back to the pending state."""
+
+    @abc.abstractmethod
+    def stats(self, queue: str) -> dict:
+        """Return job counts by status."""
+
+
+def backoff_delay(attempts: int, base: float = JOB_BACKOFF_BASE, cap: float = JOB_BACKOFF_MAX) -> float:
+    """
+    Exponential backoff with full jitter for the given attempt number.
+    """
+    return random.uniform(0, min(cap, base * (2 ** (attempts - 1))))
+
+
+class SQLiteJobQueue(JobQueue):
+    """
+    JobQueue stored in a local SQLite database (WAL mode, safe across processes).
+    """
+
+    _SCHEMA = """
+    CREATE TABLE IF NOT EXISTS jobs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        queue TEXT NOT NULL,
+        payload TEXT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'pending',
+        attempts INTEGER NOT NULL DEFAULT 0,
+        available_at REAL NOT NULL,
+        leased_until REAL,
+        last_error TEXT,
+        created_at REAL NOT NULL,
+        updated_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (queue, status, available_at);
+    """
+
+    def __init__(self, path: str = JOB_QUEUE_PATH, max_attempts: int = JOB_MAX_ATTEMPTS):
+        self.path = path
+        self.max_attempts = max_attempts
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(self._SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def enqueue(self, queue: str, payload: dict, delay: float = 0) -> int:
+        now = time.time()
+        with self._lock:
+            cur = self._conn.execute(
+                "INSERT INTO jobs (queue, payload, available_at, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (queue, json.dumps(payload, default=str), now + delay, now, now),
+            )
+            return cur.lastrowid
+
+    def claim(self, queue: str, limit: int = 1, lease_seconds: float = JOB_LEASE_SECONDS) -> List[Job]:
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                # A job whose worker died or hung never reaches fail(); dead-letter it once its attempts are used up
+                self._conn.execute(
+                    "UPDATE jobs SET status = 'dead', leased_until = NULL, "
+                    "last_error = 'lease expired after ' || attempts || ' attempts', updated_at = ? "
+                    "WHERE queue = ? AND status = 'running' AND leased_until < ? AND attempts >= ?",
+                    (now, queue, now, self.max_attempts),
+                )
+                rows = self._conn.execute(
+                    "SELECT id, payload, attempts, last_error FROM jobs "
+                    "WHERE queue = ? AND ("
+                    "  (status = 'pending' AND available_at <= ?) OR "
+                    "  (status = 'running' AND leased_until < ?)"
+                    ") ORDER BY available_at LIMIT ?",
+                    (queue, now, now, limit),
+                ).fetchall()
+                self._conn.executemany(
+                    "UPDATE jobs SET status = 'running', attempts = attempts + 1, "
+                    "leased_until = ?, updated_at = ? WHERE id = ?",
+                    [(now + lease_seconds, now, row[0]) for row in rows],
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return [
+            Job(id=row[0], queue=queue, payload=json.loads(row[1]), attempts=row[2] + 1, last_error=row[3])
+            for row in rows
+        ]
+
+    def ack(self, job_ids: list) -> None:
+        if not job_ids:
+            return
+        with self._lock:
+            self._conn.executemany("DELETE FROM jobs WHERE id = ?", [(i,) for i in job_ids])
+
+    def fail(self, job: Job, error: str) -> None:
+        now = time.time()
+        with self._lock:
+            if job.attempts >= self.max_attempts:
+                self._conn.execute(
+                    "UPDATE jobs SET status = 'dead', leased_until = NULL, last_error = ?, updated_at = ? "
+                    "WHERE id = ?",
+                    (error, now, job.id),
+                )
+            else:
+                self._conn.execute(
+                    "UPDATE jobs SET status = 'pending', leased_until = NULL, last_error = ?, "
+                    "available_at = ?, updated_at = ? WHERE id = ?",
+                    (error, now + backoff_delay(job.attempts), now, job.id),
+                )
+
+    def dead_letters(self, queue: str, limit: int = 100) -> List[Job]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, payload, attempts, last_error FROM jobs "
+                "WHERE queue = ? AND status = 'dead' ORDER BY updated_at LIMIT ?",
+                (queue, limit),
+            ).fetchall()
+        return [Job(id=r[0], queue=queue, payload=json.loads(r[1]), attempts=r[2], last_error=r[3]) for r in rows]
+
+    def requeue_dead(self, job_ids: list) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE jobs SET status = 'pending', attempts = 0, available_at = ?, updated_at = ? "
+                "WHERE id = ? AND status = 'dead'",
+                [(now, now, i) for i in job_ids],
+            )
+
+    def stats(self, queue: str) -> dict:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT status, COUNT(*) FROM jobs WHERE queue = ? GROUP BY status", (queue,)
+            ).fetchall()
+        return {status: count for status, count in rows}
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+def get_job_queue() -> JobQueue:
+    """
+    Return the process-wide job queue (SQLite at JOB_QUEUE_PATH).
+    """
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = SQLiteJobQueue()
+        return _queue
@@ -0,0 +1,123 @@
+"""
+Structured, sampled logging for the request path.
+
+Events are written as one JSON object per line ({"ts", "level", "logger",
+"event", ...fields}). Records are handed to a background thread through a
+queue, so a request never blocks on a stdout write. Per-request chatter is
+logged with sample=True and only a LOG_SAMPLE_RATE fraction of it is kept;
+warnings and errors are never sampled. Events logged inside a trace carry its
+trace_id.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+
+from .tracing import current_span
+
+# Minimum level written (DEBUG, INFO, WARNING, ERROR)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# Fraction of sampled (per-request) events written
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0.1"))
+
+_ROOT = "city"
+_configured = False
+_configure_lock = threading.Lock()
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Render a record as a JSON line with its event name and fields.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "event": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", None) or {})
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        elif record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Format nothing on the calling thread; only render the traceback while its frames exist
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def configure_logging(stream=None) -> None:
+    """
+    Route the app's loggers through the background writer (idempotent).
+
+    :param stream: Output stream, stdout by default.
+    """
+    global _configured, _listener
+    with _configure_lock:
+        if _configured:
+            return
+        records = queue.SimpleQueue()
+        output = logging.StreamHandler(stream or sys.stdout)
+        output.setFormatter(JsonFormatter())
+        _listener = logging.handlers.QueueListener(records, output)
+        _listener.start()
+        atexit.register(_listener.stop)
+        logger = logging.getLogger(_ROOT)
+        logger.addHandler(_QueueHandler(records))
+        logger.setLevel(LOG_LEVEL)
+        logger.propagate = False
+        _configured = True
+
+
+class EventLogger:
+    """
+    Logger taking an event name plus keyword fields: log.info("analyze.request", user_id=...).
+    """
+
+    def __init__(self, name: str):
+        self._logger = logging.getLogger(f"{_ROOT}.{name}")
+
+    def _log(self, level: int, event: str, sample: bool, exc_info, fields: dict) -> None:
+        if sample and random.random() >= LOG_SAMPLE_RATE:
+            return
+        if not _configured:
+            configure_logging()
+        if not self._logger.isEnabledFor(level):
+            return
+        span = current_span()
+        if span is not None:
+            fields["trace_id"] = span.trace_id
+        self._logger.log(level, event, exc_info=exc_info, extra={"fields": fields})
+
+    def debug(self, event: str, sample: bool = False, **fields) -> None:
+        self._log(logging.DEBUG, event, sample, None, fields)
+
+    def info(self, event: str, sample: bool = False, **fields) -> None:
+        self._log(logging.INFO, event, sample, None, fields)
+
+    def warning(self, event: str, exc_info=None, **fields) -> None:
+        self._log(logging.WARNING, event, False, exc_info, fields)
+
+    def error(self, event: str, exc_info=None, **fields) -> None:
+        self._log(logging.ERROR, event, False, exc_info, fields)
+
+
+def get_logger(name: str) -> EventLogger:
+    """
+    Return the event logger for a component (e.g. "vision", "server").
+    """
+    return EventLogger(name)
@@ -0,0 +1,473 @@
+"""
+Opt-in sampling profiler for single requests.
+
+A request sent with an `X-Profile-Token` header matching PROFILE_TOKEN runs
+under a sampling profiler (ProfileMiddleware). Every PROFILE_INTERVAL seconds
+a background thread takes the stacks of the work belonging to that request:
+
+- asyncio tasks created while the request is profiled (and analysis jobs it
+  queued): the running task's real stack, or the chain of awaits a
+  suspended task is waiting in, so the profile shows wall-clock time;
+- threads running its asyncio.to_thread calls.
+
+Other requests served at the same time are not included. The profile is
+written to PROFILE_DIR as speedscope JSON or collapsed stacks
+(flamegraph.pl / speedscope input), and its file name is returned in an
+X-Profile header. Without PROFILE_TOKEN the middleware does nothing.
+
+Usage (aggregate profiles across requests):
+  python -m utils.profiler [PATH ...] [--out merged.speedscope.json] [--top N]
+"""
+import argparse
+import asyncio
+import contextvars
+import functools
+import hmac
+import json
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+import weakref
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Iterable, Optional
+
+from .logs import get_logger
+
+# Admin token enabling per-request profiling (off when empty)
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+# Directory receiving the profiles
+PROFILE_DIR = os.getenv("PROFILE_DIR", "data/profiles")
+# Seconds between samples
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.005"))
+# Output format: speedscope (JSON) or collapsed (one "frame;frame;... weight" line per stack)
+PROFILE_FORMAT = os.getenv("PROFILE_FORMAT", "speedscope")
+
+log = get_logger("profiler")
+
+_active = contextvars.ContextVar("profile", default=None)
+_installed_loops = weakref.WeakSet()
+_COLLAPSED_FRAME = re.compile(r"^(.*) \((.*):(\d+)\)$")
+
+
+@lru_cache(maxsize=4096)
+def _short_path(filename: str) -> str:
+    # Relative to the longest sys.path entry containing it (site-packages, the app directory)
+    roots = sorted((os.path.abspath(p) for p in sys.path if p), key=len, reverse=True)
+    for root in roots:
+        if filename.startswith(root + os.sep):
+            return filename[len(root) + 1:]
+    return filename
+
+
+def _frame_key(frame) -> tuple:
+    code = frame.f_code
+    return code.co_name, _short_path(code.co_filename), code.co_firstlineno
+
+
+def _stack(frame, root=None, below=None) -> list:
+    """
+    Frame keys from the outermost frame to `frame`, starting at the frame `root`
+    or just below a frame running the code object `below`.
+    """
+    frames = []
+    while frame is not None:
+        if frame.f_code is below:
+            break
+        frames.append(frame)
+        if frame is root:
+            break
+        frame = frame.f_back
+    else:
+        if root is not None:
+            return []
+    return [_frame_key(f) for f in reversed(frames)]
+
+
+def _await_chain(task) -> list:
+    """Frames of a suspended task: its coroutine and whatever that awaits, outermost first."""
+    keys = []
+    awaitable = task.get_coro()
+    while awaitable is not None:
+        frame = getattr(awaitable, "cr_frame", None) or getattr(awaitable, "gi_frame", None)
+        if frame is None:
+            if keys:
+                # The C future iterator stands for the awaited Future
+                kind = type(awaitable).__name__.replace("FutureIter", "Future")
+                keys.append((f"await {kind}", "", 0))
+            break
+        keys.append(_frame_key(frame))
+        awaitable = getattr(awaitable, "cr_await", None) or getattr(awaitable, "gi_yieldfrom", None)
+    return keys
+
+
+class Profile:
+    """
+    Samples collected for one request: stack (tuple of (function, file, line)) -> sample count.
+    """
+
+    def __init__(self, name: str, interval: float = PROFILE_INTERVAL):
+        self.name = name
+        self.interval = interval
+        self.file_name = f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        self.samples = Counter()
+        self.tasks = weakref.WeakSet()
+        self._threads = Counter()
+        self._lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.duration = 0.0
+
+    def run_in_thread(self, fn):
+        """Run fn on the calling executor thread, sampling that thread meanwhile."""
+        ident = threading.get_ident()
+        with self._lock:
+            self._threads[ident] += 1
+        try:
+            return fn()
+        finally:
+            with self._lock:
+                self._threads[ident] -= 1
+                if not self._threads[ident]:
+                    del self._threads[ident]
+
+    def sample(self, frames: dict, running: dict) -> None:
+        """
+        Record one sample of every task and thread of this profile.
+
+        :param frames: sys._current_frames().
+        :param running: Task currently running on each event loop thread -> thread id.
+        """
+        for task in list(self.tasks):
+            if task.done():
+                continue
+            ident = running.get(task)
+            keys = None
+            if ident is not None and ident in frames:
+                # Running now: its real stack from the coroutine down (includes sync calls such as validation)
+                keys = _stack(frames[ident], root=getattr(task.get_coro(), "cr_frame", None))
+            if not keys:
+                keys = _await_chain(task)
+            if keys:
+                self.samples[(("async", "", 0), *keys)] += 1
+        with self._lock:
+            threads = list(self._threads)
+        for ident in threads:
+            frame = frames.get(ident)
+            if frame is not None:
+                keys = _stack(frame, below=Profile.run_in_thread.__code__)
+                if keys:
+                    self.samples[(("thread", "", 0), *keys)] += 1
+
+    def write(self, directory: str = PROFILE_DIR, fmt: str = PROFILE_FORMAT) -> str:
+        """
+        Write the profile in the given format; returns the file path.
+        """
+        os.makedirs(directory, exist_ok=True)
+        weights = {stack: count * self.interval for stack, count in self.samples.items()}
+        if fmt == "collapsed":
+            path = os.path.join(directory, f"{self.file_name}.collapsed")
+            text = to_collapsed(weights)
+        else:
+            path = os.path.join(directory, f"{self.file_name}.speedscope.json")
+            text = json.dumps(to_speedscope(weights, self.name))
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        return path
+
+
+class _Sampler:
+    """Background thread sampling every active profile until none is left."""
+
+    def __init__(self):
+        self._profiles = set()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def add(self, profile: Profile) -> None:
+        with self._lock:
+            self._profiles.add(profile)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+                self._thread.start()
+
+    def remove(self, profile: Profile) -> None:
+        with self._lock:
+            self._profiles.discard(profile)
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                profiles = list(self._profiles)
+                if not profiles:
+                    self._thread = None
+                    return
+            frames = sys._current_frames()
+            running = {}
+            for loop in list(_installed_loops):
+                task = asyncio.tasks._current_tasks.get(loop)
+                ident = getattr(loop, "_thread_id", None)
+                if task is not None and ident is not None:
+                    running[task] = ident
+            for profile in profiles:
+                profile.sample(frames, running)
+            del frames
+            time.sleep(min(p.interval for p in profiles))
+
+
+_sampler = _Sampler()
+
+
+class _ProfilingExecutor(ThreadPoolExecutor):
+    """Default executor sampling the threads that run a profiled request's to_thread calls."""
+
+    def submit(self, fn, /, *args, **kwargs):
+        # asyncio.to_thread submits functools.partial(context.run, func, ...)
+        context = getattr(getattr(fn, "func", None), "__self__", None)
+        if isinstance(context, contextvars.Context):
+            profile = context.get(_active)
+            if profile is not None:
+                fn = functools.partial(profile.run_in_thread, functools.partial(fn, *args, **kwargs))
+                args, kwargs = (), {}
+        return super().submit(fn, *args, **kwargs)
+
+
+def install(loop: asyncio.AbstractEventLoop = None) -> None:
+    """
+    Make a loop's tasks and to_thread calls attributable to profiles (idempotent).
+    """
+    loop = loop or asyncio.get_running_loop()
+    if loop in _installed_loops:
+        return
+    previous = loop.get_task_factory()
+
+    def task_factory(loop, coro, context=None):
+        if previous is not None:
+            task = previous(loop, coro) if context is None else previous(loop, coro, context=context)
+        else:
+            task = asyncio.Task(coro, loop=loop, context=context)
+        profile = context.get(_active) if context is not None else _active.get()
+        if profile is not None:
+            profile.tasks.add(task)
+        return task
+
+    loop.set_task_factory(task_factory)
+    loop.set_default_executor(_ProfilingExecutor())
+    _installed_loops.add(loop)
+
+
+def current_profile() -> Optional[Profile]:
+    """Return the profile of the work running in this context, if any."""
+    return _active.get()
+
+
+@contextmanager
+def attach(profile: Optional[Profile]):
+    """
+    Profile the current task (and tasks/threads it starts) as part of `profile`; no-op for None.
+    """
+    if profile is None:
+        yield
+        return
+    token = _active.set(profile)
+    task = asyncio.current_task()
+    if task is not None:
+        profile.tasks.add(task)
+    try:
+        yield
+    finally:
+        if task is not None:
+            profile.tasks.discard(task)
+        _active.reset(token)
+
+
+@contextmanager
+def profiling(name: str, interval: float = PROFILE_INTERVAL):
+    """
+    Sample the current task and the work it starts until the block exits.
+    """
+    install()
+    profile = Profile(name, interval)
+    _sampler.add(profile)
+    try:
+        with attach(profile):
+            yield profile
+    finally:
+        _sampler.remove(profile)
+        profile.duration = time.perf_counter() - profile.started
+
+
+class ProfileMiddleware:
+    """
+    ASGI middleware profiling requests sent with a valid X-Profile-Token header.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not PROFILE_TOKEN:
+            return await self.app(scope, receive, send)
+        token = None
+        for key, value in scope.get("headers", ()):
+            if key == b"x-profile-token":
+                token = value.decode("latin-1")
+                break
+        if token is None:
+            return await self.app(scope, receive, send)
+        name = f"{scope.get('method', '')} {scope.get('path', '')}"
+        if not hmac.compare_digest(token.encode(), PROFILE_TOKEN.encode()):
+            log.warning("profile.denied", request=name)
+            return await self.app(scope, receive, send)
+
+        with profiling(name) as profile:
+            async def send_with_profile(message):
+                if message["type"] == "http.response.start":
+                    message["headers"] = [*message.get("headers", ()), (b"x-profile", profile.file_name.encode())]
+                await send(message)
+
+            await self.app(scope, receive, send_with_profile)
+        path = await asyncio.to_thread(profile.write, PROFILE_DIR, PROFILE_FORMAT)
+        log.info("profile.written", request=name, path=path, samples=sum(profile.samples.values()),
+                 duration_ms=round(profile.duration * 1000, 1))
+
+
+def _label(frame: tuple) -> str:
+    name, filename, line = frame
+    return f"{name} ({filename}:{line})" if filename else name
+
+
+def to_collapsed(weights: dict) -> str:
+    """
+    Render {stack: seconds} as collapsed stacks with integer microsecond weights.
+    """
+    lines = []
+    for stack, seconds in sorted(weights.items(), key=lambda item: -item[1]):
+        micros = round(seconds * 1e6)
+        if micros:
+            lines.append(";".join(_label(f).replace(";", ",") for f in stack) + f" {micros}")
+    return "\n".join(lines) + "\n"
+
+
+def to_speedscope(weights: dict, name: str) -> dict:
+    """
+    Render {stack: seconds} as a speedscope file with one sampled profile per root (async, thread).
+    """
+    frames, index = [], {}
+    lanes = {}
+    for stack, seconds in weights.items():
+        ids = []
+        for frame in stack[1:]:
+            if frame not in index:
+                index[frame] = len(frames)
+                entry = {"name": frame[0]}
+                if frame[1]:
+                    entry.update(file=frame[1], line=frame[2])
+                frames.append(entry)
+            ids.append(index[frame])
+        lane = lanes.setdefault(stack[0][0], {"samples": [], "weights": []})
+        lane["samples"].append(ids)
+        lane["weights"].append(seconds)
+    profiles = [{
+        "type": "sampled",
+        "name": f"{name} [{lane}]",
+        "unit": "seconds",
+        "startValue": 0,
+        "endValue": sum(data["weights"]),
+        "samples": data["samples"],
+        "weights": data["weights"],
+    } for lane, data in lanes.items()]
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "name": name,
+        "exporter": "city-issues-profiler",
+        "shared": {"frames": frames},
+        "profiles": profiles,
+    }
+
+
+def load_profile(path: str) -> Counter:
+    """
+    Read a speedscope or collapsed profile into {stack: seconds}.
+    """
+    weights = Counter()
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    if path.endswith(".json"):
+        data = json.loads(text)
+        frames = [(f["name"], f.get("file", ""), f.get("line", 0)) for f in data["shared"]["frames"]]
+        for profile in data["profiles"]:
+            lane = profile["name"].rsplit("[", 1)[-1].rstrip("]") if "[" in profile["name"] else "async"
+            for ids, seconds in zip(profile["samples"], profile["weights"]):
+                weights[((lane, "", 0), *(frames[i] for i in ids))] += seconds
+        return weights
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        stack, _, micros = line.rpartition(" ")
+        frames = []
+        for label in stack.split(";"):
+            match = _COLLAPSED_FRAME.match(label)
+            frames.append((match.group(1), match.group(2), int(match.group(3))) if match else (label, "", 0))
+        weights[tuple(frames)] += int(micros) / 1e6
+    return weights
+
+
+def _profile_files(paths: Iterable[str]) -> list:
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(
+                os.path.join(path, name) for name in sorted(os.listdir(path))
+                if name.endswith((".speedscope.json", ".collapsed"))
+            )
+        else:
+            files.append(path)
+    return files
+
+
+def top_functions(weights: dict, limit: int = 20) -> list:
+    """
+    Return (frame, self seconds, total seconds) of the functions with the most total time.
+    """
+    own, total = Counter(), Counter()
+    for stack, seconds in weights.items():
+        own[stack[-1]] += seconds
+        for frame in set(stack[1:]):
+            total[frame] += seconds
+    return [(frame, own[frame], seconds) for frame, seconds in total.most_common(limit)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Aggregate request profiles.')
+    parser.add_argument('paths', nargs='*', default=[PROFILE_DIR], help='Profile files or directories (default: PROFILE_DIR)')
+    parser.add_argument('--out', help='Write the merged profile (.json: speedscope, otherwise collapsed stacks)')
+    parser.add_argument('--top', type=int, default=20, help='Print the N functions with the most total time')
+    args = parser.parse_args()
+
+    missing = [path for path in args.paths if not os.path.exists(path)]
+    if missing:
+        parser.error(f"not found: {', '.join(missing)}")
+    files = _profile_files(args.paths)
+    merged = Counter()
+    for path in files:
+        merged.update(load_profile(path))
+    print(f"{len(files)} profiles, {sum(merged.values()):.3f} s sampled")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            if args.out.endswith(".json"):
+                json.dump(to_speedscope(merged, f"{len(files)} profiles"), f)
+            else:
+                f.write(to_collapsed(merged))
+        print(f"written to {args.out}")
+    if args.top:
+        print(f"{'self s':>9} {'total s':>9}  function")
+        for frame, own, total in top_functions(merged, args.top):
+            print(f"{own:9.3f} {total:9.3f}  {_label(frame)}")
+
+if __name__ == '__main__':
+    main()
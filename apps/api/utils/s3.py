@@ -1,38 +1,99 @@
 """
 Utilities for Amazon S3 interactions.
+
+A single S3 client is created per process and shared across threads (boto3
+clients are thread-safe), with a sized connection pool and TCP keep-alive.
+Presigned URLs are cached per (bucket, key) until they get close to expiry.
 """
+import asyncio
 import os
+import threading
+import time
+from collections import OrderedDict
 from pathlib import Path
+from typing import Awaitable, Callable
 
 try:
     import boto3
+    from boto3.s3.transfer import TransferConfig
+    from botocore.config import Config
     from botocore.exceptions import ClientError
 except ImportError:
     boto3 = None
+    TransferConfig = None
+    Config = None
     class ClientError(Exception):
         pass
 
 from .env_loader import load_dotenv
+from .metrics import record_cache
+from .tracing import KIND_CLIENT, traced
+
+load_dotenv()
+
+# Part size for streamed multipart uploads (S3 minimum is 5 MiB except for the last part)
+S3_PART_SIZE = int(os.getenv("S3_PART_SIZE", str(8 * 1024 * 1024)))
+# HTTP connections kept by the shared client (bounds concurrent requests)
+S3_MAX_POOL_CONNECTIONS = int(os.getenv("S3_MAX_POOL_CONNECTIONS", "50"))
+# Concurrent part uploads per upload_file_to_s3 call
+S3_TRANSFER_CONCURRENCY = int(os.getenv("S3_TRANSFER_CONCURRENCY", "8"))
+# Maximum number of cached presigned URLs
+S3_PRESIGN_CACHE_SIZE = int(os.getenv("S3_PRESIGN_CACHE_SIZE", "10000"))
+
+_client = None
+_client_lock = threading.Lock()
+
+def _public_url(bucket: str, object_name: str) -> str:
+    region = os.getenv('AWS_REGION')
+    return f"https://{bucket}.s3.{region}.amazonaws.com/{object_name}"
 
 def get_s3_client():
     """
-    Initialize and return an S3 client using credentials from environment variables.
+    Return the process-wide S3 client, creating it on first use from environment variables.
     """
+    global _client
     if boto3 is None:
         raise ImportError(
             "boto3 library is required for S3 operations. Please install it via 'pip install boto3'."
         )
-    load_dotenv()
-    aws_access_key_id = os.getenv('AWS_ACCESS_KEY_ID')
-    aws_secret_access_key = os.getenv('AWS_SECRET_ACCESS_KEY')
-    region_name = os.getenv('AWS_REGION')
-    session = boto3.session.Session(
-        aws_access_key_id=aws_access_key_id,
-        aws_secret_access_key=aws_secret_access_key,
-        region_name=region_name
+    client = _client
+    if client is not None:
+        return client
+    with _client_lock:
+        if _client is None:
+            session = boto3.session.Session(
+                aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
+                aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY'),
+                region_name=os.getenv('AWS_REGION')
+            )
+            _client = session.client('s3', config=Config(
+                max_pool_connections=S3_MAX_POOL_CONNECTIONS,
+                tcp_keepalive=True,
+                retries={"max_attempts": 5, "mode": "adaptive"},
+            ))
+        return _client
+
+def reset_s3_client() -> None:
+    """
+    Drop the shared client and presigned URL cache, e.g. after rotating credentials.
+    """
+    global _client
+    with _client_lock:
+        _client = None
+    presigned_urls.clear()
+
+def get_transfer_config():
+    """
+    Return the TransferConfig used for managed (multipart, concurrent) file uploads.
+    """
+    return TransferConfig(
+        multipart_threshold=S3_PART_SIZE,
+        multipart_chunksize=S3_PART_SIZE,
+        max_concurrency=S3_TRANSFER_CONCURRENCY,
+        use_threads=True,
     )
-    return session.client('s3')
 
+@traced(kind=KIND_CLIENT)
 def upload_file_to_s3(file_path: str, bucket: str, object_name: str = None) -> str:
     """
     Upload a local file to an S3 bucket.
@@ -51,24 +112,95 @@ def upload_file_to_s3(file_path: str, bucket: str, object_name: str = None) -> s
             str(file_path),
             bucket,
             object_name,
-            ExtraArgs={ 'ACL': 'public-read' }
+            ExtraArgs={ 'ACL': 'public-read' },
+            Config=get_transfer_config(),
         )
     except ClientError as e:
         raise RuntimeError(
             f"Failed to upload {file_path} to s3://{bucket}/{object_name}: {e}"
         )
-    region = os.getenv('AWS_REGION')
-    return f"https://{bucket}.s3.{region}.amazonaws.com/{object_name}"
+    return _public_url(bucket, object_name)
+
+@traced(kind=KIND_CLIENT)
+def upload_bytes_to_s3(data: bytes, bucket: str, object_name: str, content_type: str = "image/jpeg") -> str:
+    """
+    Upload in-memory bytes to an S3 bucket.
+
+    :param data: Object contents.
+    :param bucket: S3 bucket name.
+    :param object_name: S3 object key.
+    :param content_type: Content-Type stored with the object.
+    :return: Public URL of the uploaded object.
+    """
+    s3_client = get_s3_client()
+    try:
+        s3_client.put_object(
+            Bucket=bucket,
+            Key=object_name,
+            Body=data,
+            ContentType=content_type,
+            ACL='public-read',
+        )
+    except ClientError as e:
+        raise RuntimeError(
+            f"Failed to upload bytes to s3://{bucket}/{object_name}: {e}"
+        )
+    return _public_url(bucket, object_name)
+
+class PresignedUrlCache:
+    """
+    LRU of presigned URLs keyed by (bucket, key, expiration). An entry is
+    reused while at least half of its lifetime remains, so callers never
+    receive a URL that is about to expire or that outlives what they asked for.
+    """
+
+    def __init__(self, maxsize: int = S3_PRESIGN_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._urls = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, bucket: str, object_name: str, expiration: int):
+        cache_key = (bucket, object_name, expiration)
+        with self._lock:
+            entry = self._urls.get(cache_key)
+            if entry is None:
+                return None
+            url, expires_at = entry
+            if expires_at - time.time() < expiration / 2:
+                del self._urls[cache_key]
+                return None
+            self._urls.move_to_end(cache_key)
+            return url
+
+    def put(self, bucket: str, object_name: str, url: str, expiration: int) -> None:
+        cache_key = (bucket, object_name, expiration)
+        with self._lock:
+            self._urls[cache_key] = (url, time.time() + expiration)
+            self._urls.move_to_end(cache_key)
+            while len(self._urls) > self.maxsize:
+                self._urls.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._urls.clear()
+
 
+presigned_urls = PresignedUrlCache()
+
+@traced(kind=KIND_CLIENT)
 def generate_presigned_url(bucket: str, object_name: str, expiration: int = 3600) -> str:
     """
-    Generate a presigned URL to download an S3 object.
+    Generate a presigned URL to download an S3 object, reusing a cached one while it is fresh.
 
     :param bucket: S3 bucket name.
     :param object_name: S3 object key.
     :param expiration: Time in seconds for the presigned URL to remain valid.
     :return: Presigned URL as string.
     """
+    url = presigned_urls.get(bucket, object_name, expiration)
+    record_cache("presigned_url", url is not None)
+    if url is not None:
+        return url
     s3_client = get_s3_client()
     try:
         url = s3_client.generate_presigned_url(
@@ -80,4 +212,66 @@ def generate_presigned_url(bucket: str, object_name: str, expiration: int = 3600
         raise RuntimeError(
             f"Failed to generate presigned URL for s3://{bucket}/{object_name}: {e}"
         )
-    return url
\ No newline at end of file
+    presigned_urls.put(bucket, object_name, url, expiration)
+    return url
+
+@traced(kind=KIND_CLIENT)
+async def stream_upload_to_s3(
+    read: Callable[[int], Awaitable[bytes]],
+    bucket: str,
+    object_name: str,
+    content_type: str = "application/octet-stream",
+    part_size: int = S3_PART_SIZE,
+) -> dict:
+    """
+    Stream data to S3 part by part, holding at most two parts in memory.
+    Bodies smaller than one part are sent with a single put_object.
+    The next part is read while the previous one uploads.
+
+    :param read: Async callable returning up to n bytes (b"" at end of stream),
+                 e.g. UploadFile.read.
+    :param bucket: S3 bucket name.
+    :param object_name: S3 object key.
+    :param content_type: Content-Type stored with the object.
+    :param part_size: Bytes per multipart part.
+    :return: Dict with 'url' and 'size'.
+    """
+    s3_client = await asyncio.to_thread(get_s3_client)
+    chunk = await read(part_size)
+    if len(chunk) < part_size:
+        await asyncio.to_thread(upload_bytes_to_s3, chunk, bucket, object_name, content_type)
+        return {"url": _public_url(bucket, object_name), "size": len(chunk)}
+
+    upload = await asyncio.to_thread(
+        s3_client.create_multipart_upload,
+        Bucket=bucket, Key=object_name, ContentType=content_type, ACL='public-read',
+    )
+    upload_id = upload["UploadId"]
+    parts, size = [], 0
+    try:
+        while chunk:
+            part_number = len(parts) + 1
+            pending = asyncio.ensure_future(asyncio.to_thread(
+                s3_client.upload_part,
+                Bucket=bucket, Key=object_name, UploadId=upload_id,
+                PartNumber=part_number, Body=chunk,
+            ))
+            size += len(chunk)
+            try:
+                chunk = await read(part_size)
+            finally:
+                response = await pending
+            parts.append({"ETag": response["ETag"], "PartNumber": part_number})
+        await asyncio.to_thread(
+            s3_client.complete_multipart_upload,
+            Bucket=bucket, Key=object_name, UploadId=upload_id,
+            MultipartUpload={"Parts": parts},
+        )
+    except BaseException as e:
+        await asyncio.to_thread(
+            s3_client.abort_multipart_upload, Bucket=bucket, Key=object_name, UploadId=upload_id
+        )
+        if isinstance(e, ClientError):
+            raise RuntimeError(f"Failed to stream upload to s3://{bucket}/{object_name}: {e}")
+        raise
+    return {"url": _public_url(bucket, object_name), "size": size}
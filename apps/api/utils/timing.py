@@ -0,0 +1,71 @@
+"""
+Per-request stage timings.
+
+Code wraps its phases in `with stage("model"):`. Every stage is observed in
+the analysis_stage_seconds histogram; inside record_stages() the durations
+(in milliseconds) are also added to the active dict. Tasks created while
+recording share the same dict, so concurrent stages (e.g. ingest and model
+call) are both recorded and may overlap. The server reports the result as a
+Server-Timing header. Within a trace, each stage is also a span named stage.<name>.
+"""
+import contextvars
+import time
+from contextlib import contextmanager
+
+from utils.metrics import STAGE_SECONDS
+from utils.tracing import start_span
+
+_timings = contextvars.ContextVar("stage_timings", default=None)
+
+
+@contextmanager
+def record_stages():
+    """
+    Collect the stages run in this context into the yielded dict.
+    """
+    timings = {}
+    token = _timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _timings.reset(token)
+
+
+@contextmanager
+def stage(name: str):
+    """
+    Time a block as the given stage.
+    """
+    timings = _timings.get()
+    start = time.perf_counter()
+    try:
+        with start_span(f"stage.{name}"):
+            yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage=name)
+        if timings is not None:
+            timings[name] = timings.get(name, 0.0) + elapsed * 1000
+
+
+def server_timing(timings: dict) -> str:
+    """
+    Format stage durations as a Server-Timing header value.
+    """
+    return ", ".join(f"{name};dur={ms:.1f}" for name, ms in timings.items())
+
+
+def parse_server_timing(header: str) -> dict:
+    """
+    Parse a Server-Timing header value into {stage: milliseconds}.
+    """
+    timings = {}
+    for entry in (header or "").split(","):
+        name, *params = [part.strip() for part in entry.split(";")]
+        for param in params:
+            if param.startswith("dur="):
+                try:
+                    timings[name] = float(param[4:])
+                except ValueError:
+                    pass
+    return timings
@@ -0,0 +1,410 @@
+"""
+Lightweight request tracing.
+
+A trace starts at an incoming request (TraceMiddleware) and continues through
+every span opened while it is current: stages, CRUD calls, S3 and model calls.
+The current span lives in a context variable, so tasks and asyncio.to_thread
+calls started inside a span become its children, and concurrent work shows up
+as overlapping spans. A W3C `traceparent` request header continues the
+caller's trace; queued work (analysis jobs, relevance jobs) carries the
+traceparent of the request that queued it.
+
+Finished spans are written by a background thread to TRACE_FILE as OTLP/JSON
+lines (one ExportTraceServiceRequest per line), the format read by the
+OpenTelemetry collector's file receiver. Without TRACE_FILE no spans are
+created and the instrumentation costs one context variable lookup.
+
+Usage:
+  python -m utils.tracing [--file traces.jsonl] [--slowest N] [--trace TRACE_ID]
+"""
+import argparse
+import asyncio
+import atexit
+import contextvars
+import functools
+import json
+import os
+import queue
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterable, Optional
+
+# OTLP/JSON lines file receiving finished spans (tracing is off when empty)
+TRACE_FILE = os.getenv("TRACE_FILE", "")
+# Fraction of requests traced when the caller sent no traceparent
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "1.0"))
+# service.name resource attribute of exported spans
+TRACE_SERVICE_NAME = os.getenv("TRACE_SERVICE_NAME", "city-issues-api")
+
+# OTLP span kinds
+KIND_INTERNAL = 1
+KIND_SERVER = 2
+KIND_CLIENT = 3
+KIND_CONSUMER = 5
+
+_TRACEPARENT = re.compile(r"^[0-9a-f]{2}-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+_current = contextvars.ContextVar("trace_span", default=None)
+
+
+def _new_id(bits: int) -> str:
+    return f"{random.getrandbits(bits):0{bits // 4}x}"
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _plain_value(value: dict):
+    kind, raw = next(iter(value.items()))
+    return int(raw) if kind == "intValue" else raw
+
+
+class Span:
+    """
+    A timed operation within a trace.
+    """
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "kind", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, name: str, trace_id: str, parent_id: str = None, kind: int = KIND_INTERNAL, attributes: dict = None):
+        self.trace_id = trace_id
+        self.span_id = _new_id(64)
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = dict(attributes or {})
+        self.error = None
+
+    def set(self, **attributes) -> None:
+        """Add attributes to the span."""
+        self.attributes.update(attributes)
+
+    @property
+    def traceparent(self) -> str:
+        """W3C traceparent value making this span the parent of downstream work."""
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def to_otlp(self) -> dict:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns or self.start_ns),
+            "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in self.attributes.items() if v is not None],
+            "status": {"code": 2, "message": self.error} if self.error else {"code": 1},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+class FileExporter:
+    """
+    Appends finished spans to an OTLP/JSON lines file from a background thread,
+    in batches of up to batch_size spans or every interval seconds.
+    """
+
+    def __init__(self, path: str, batch_size: int = 512, interval: float = 1.0):
+        self.path = path
+        self.batch_size = batch_size
+        self.interval = interval
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        if self._thread is None:
+            self._start()
+        self._queue.put(span)
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+
+    def _run(self) -> None:
+        batch = []
+        deadline = time.monotonic() + self.interval
+        while True:
+            try:
+                span = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                span = False
+            if span:
+                batch.append(span)
+            if span is None or span is False or len(batch) >= self.batch_size:
+                if batch:
+                    self._write(batch)
+                    batch = []
+                deadline = time.monotonic() + self.interval
+            if span is None:
+                return
+
+    def _write(self, spans: list) -> None:
+        line = json.dumps({"resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": TRACE_SERVICE_NAME}}]},
+            "scopeSpans": [{"scope": {"name": "city-issues"}, "spans": [s.to_otlp() for s in spans]}],
+        }]})
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+        except OSError:
+            # Tracing must never break the request path
+            pass
+
+    def close(self) -> None:
+        """Write the pending spans and stop the background thread."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join(timeout=5)
+
+
+_exporter = FileExporter(TRACE_FILE) if TRACE_FILE else None
+
+
+def set_exporter(exporter) -> None:
+    """
+    Send finished spans to an object with an export(span) method; None turns tracing off.
+    """
+    global _exporter
+    _exporter = exporter
+
+
+def current_span() -> Optional[Span]:
+    """Return the span active in this context, if any."""
+    return _current.get()
+
+
+def current_traceparent() -> Optional[str]:
+    """Return the traceparent of the active span, for handing to queued work."""
+    span = _current.get()
+    return span.traceparent if span is not None else None
+
+
+def parse_traceparent(header: Optional[str]) -> Optional[tuple]:
+    """
+    Parse a W3C traceparent header into (trace_id, parent_span_id, sampled).
+    """
+    match = _TRACEPARENT.match((header or "").strip().lower())
+    if not match:
+        return None
+    trace_id, parent_id, flags = match.groups()
+    if trace_id == "0" * 32 or parent_id == "0" * 16:
+        return None
+    return trace_id, parent_id, bool(int(flags, 16) & 1)
+
+
+@contextmanager
+def _activate(span: Span):
+    token = _current.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        span.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        span.end_ns = time.time_ns()
+        _current.reset(token)
+        exporter = _exporter
+        if exporter is not None:
+            exporter.export(span)
+
+
+@contextmanager
+def start_trace(name: str, traceparent: str = None, sample_new: bool = True, kind: int = KIND_SERVER, **attributes):
+    """
+    Open the root span of a unit of work, continuing the trace in traceparent
+    when one is given. Yields None when the work is not traced.
+
+    :param sample_new: Without a traceparent, start a new trace (sampled at
+                       TRACE_SAMPLE_RATE); if False, trace only continued work.
+    """
+    if _exporter is None:
+        yield None
+        return
+    parent = parse_traceparent(traceparent)
+    if parent is not None:
+        trace_id, parent_id, sampled = parent
+    elif sample_new:
+        trace_id, parent_id, sampled = _new_id(128), None, random.random() < TRACE_SAMPLE_RATE
+    else:
+        sampled = False
+    if not sampled:
+        yield None
+        return
+    with _activate(Span(name, trace_id, parent_id, kind, attributes)) as span:
+        yield span
+
+
+@contextmanager
+def start_span(name: str, kind: int = KIND_INTERNAL, **attributes):
+    """
+    Open a child of the active span. Yields None outside of a trace.
+    """
+    parent = _current.get()
+    if parent is None:
+        yield None
+        return
+    with _activate(Span(name, parent.trace_id, parent.span_id, kind, attributes)) as span:
+        yield span
+
+
+def traced(name: str = None, kind: int = KIND_INTERNAL):
+    """
+    Decorator running each call of a sync or async function in a child span.
+
+    :param name: Span name; defaults to <module>.<function>.
+    """
+    def decorate(fn):
+        label = name or f"{fn.__module__.rsplit('.', 1)[-1]}.{fn.__name__}"
+
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                if _current.get() is None:
+                    return await fn(*args, **kwargs)
+                with start_span(label, kind):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _current.get() is None:
+                return fn(*args, **kwargs)
+            with start_span(label, kind):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+class TraceMiddleware:
+    """
+    ASGI middleware opening a server span per HTTP request. The trace id is
+    returned in an X-Trace-Id response header.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or _exporter is None:
+            return await self.app(scope, receive, send)
+        traceparent = None
+        for key, value in scope.get("headers", ()):
+            if key == b"traceparent":
+                traceparent = value.decode("latin-1")
+                break
+        method, path = scope.get("method", ""), scope.get("path", "")
+        with start_trace(f"{method} {path}", traceparent, **{"http.method": method, "http.target": path}) as span:
+            if span is None:
+                return await self.app(scope, receive, send)
+
+            async def send_with_trace_id(message):
+                if message["type"] == "http.response.start":
+                    span.set(**{"http.status_code": message["status"]})
+                    message["headers"] = [*message.get("headers", ()), (b"x-trace-id", span.trace_id.encode())]
+                await send(message)
+
+            await self.app(scope, receive, send_with_trace_id)
+
+
+def load_spans(path: str) -> list:
+    """
+    Read the spans of an OTLP/JSON lines file as plain dicts (ids, name, start/end in ns, attributes, error).
+    """
+    spans = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            for resource in json.loads(line).get("resourceSpans", []):
+                for scope in resource.get("scopeSpans", []):
+                    for span in scope.get("spans", []):
+                        status = span.get("status", {})
+                        spans.append({
+                            "trace_id": span["traceId"],
+                            "span_id": span["spanId"],
+                            "parent_id": span.get("parentSpanId"),
+                            "name": span["name"],
+                            "start": int(span["startTimeUnixNano"]),
+                            "end": int(span["endTimeUnixNano"]),
+                            "attributes": {a["key"]: _plain_value(a["value"]) for a in span.get("attributes", [])},
+                            "error": status.get("message") if status.get("code") == 2 else None,
+                        })
+    return spans
+
+
+def format_trace(spans: Iterable[dict], width: int = 40) -> str:
+    """
+    Render one trace as an indented waterfall: offset and duration in ms, and a
+    bar showing where each span ran within the trace.
+    """
+    spans = sorted(spans, key=lambda s: s["start"])
+    ids = {s["span_id"] for s in spans}
+    children = {}
+    for span in spans:
+        parent = span["parent_id"] if span["parent_id"] in ids else None
+        children.setdefault(parent, []).append(span)
+    origin = spans[0]["start"]
+    total = max(max(s["end"] for s in spans) - origin, 1)
+    lines = [f"trace {spans[0]['trace_id']}  {total / 1e6:.1f} ms"]
+
+    def walk(parent, depth):
+        for span in children.get(parent, []):
+            first = int((span["start"] - origin) / total * width)
+            last = max(int((span["end"] - origin) / total * width), first + 1)
+            bar = " " * first + "#" * (last - first) + " " * (width - last)
+            flag = f"  ! {span['error']}" if span["error"] else ""
+            lines.append(
+                f"{(span['start'] - origin) / 1e6:9.1f} {(span['end'] - span['start']) / 1e6:9.1f}  "
+                f"|{bar}|  {'  ' * depth}{span['name']}{flag}"
+            )
+            walk(span["span_id"], depth + 1)
+
+    walk(None, 0)
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Show traces from an OTLP/JSON lines file as waterfalls.')
+    parser.add_argument('--file', default=TRACE_FILE or 'data/traces.jsonl', help='Trace file (default: TRACE_FILE)')
+    parser.add_argument('--slowest', type=int, default=5, help='Show the N longest traces')
+    parser.add_argument('--trace', help='Show only this trace id')
+    args = parser.parse_args()
+
+    traces = {}
+    for span in load_spans(args.file):
+        traces.setdefault(span["trace_id"], []).append(span)
+    if args.trace:
+        selected = [traces.get(args.trace, [])]
+    else:
+        def duration(spans):
+            return max(s["end"] for s in spans) - min(s["start"] for s in spans)
+        selected = sorted(traces.values(), key=duration, reverse=True)[:args.slowest]
+    for spans in selected:
+        if spans:
+            print(format_trace(spans))
+            print()
+
+if __name__ == '__main__':
+    main()